@@ -7,6 +7,7 @@ from kbdebugger.types.ui import ProgressCallback
 
 # from .chunk import chunk_corpus
 from .decompose import decompose_documents
+from .quality_dedup import QualityDedupConfig, dedup_qualities, save_quality_dedup_json
 from .types import DecomposeMode, Qualities
 from .pdf_to_paragraphs import extract_paragraphs_with_docling
 
@@ -64,6 +65,9 @@ def extract_paragraphs_from_pdf(
 def decompose_paragraphs_to_qualities(
     *,
     paragraphs: List[Document],
+    batch_size: Optional[int] = None,
+    max_concurrency: int = 1,
+    batch_retries: int = 0,
     progress: Optional[ProgressCallback] = None,
     # mode: str = "paragraph",
 ) -> tuple[Qualities, dict]:
@@ -74,6 +78,15 @@ def decompose_paragraphs_to_qualities(
     ----------
     paragraphs:
         Paragraph Documents to be decomposed by the LLM decomposer.
+    batch_size:
+        Paragraphs per LLM call; None = token-aware adaptive batching.
+    max_concurrency:
+        Batches in flight at once. Above 1, batches run in parallel and a
+        failing batch only loses its own paragraphs.
+    batch_retries:
+        Extra attempts for a failing batch.
+
+    Pass the `PipelineConfig.decomposer_*` fields for these.
 
     Returns
     -------
@@ -86,6 +99,10 @@ def decompose_paragraphs_to_qualities(
     qualities, decomposer_log = decompose_documents(
         docs=paragraphs, 
         mode=DecomposeMode.CHUNKS,
+        batch_size=batch_size,
+        parallel=max_concurrency > 1,
+        max_workers=max_concurrency,
+        batch_retries=batch_retries,
         progress=progress
     )
 
@@ -93,3 +110,31 @@ def decompose_paragraphs_to_qualities(
     #     raise ValueError("Decomposition produced no qualities.")
     
     return qualities, decomposer_log
+
+
+# 3. 🧹 Quality dedup: qualities → distinct qualities
+def deduplicate_qualities(
+    *,
+    qualities: Qualities,
+    cfg: Optional[QualityDedupConfig] = None,
+) -> tuple[Qualities, dict]:
+    """
+    Public API: drop exact and near-duplicate qualities before the vector
+    similarity filter (see `extraction.quality_dedup`).
+
+    Parameters
+    ----------
+    qualities:
+        Decomposer output, in document order.
+    cfg:
+        Dedup configuration (`PipelineConfig.quality_dedup`).
+
+    Returns
+    -------
+    tuple[Qualities, dict]
+        The representatives (first occurrences, in order) and the dedup log
+        payload, which maps each representative to its removed duplicates.
+    """
+    cfg = cfg or QualityDedupConfig()
+    result = dedup_qualities(qualities, cfg)
+    return result.qualities, save_quality_dedup_json(result, cfg)
@@ -3,18 +3,24 @@ from __future__ import annotations
 from dataclasses import dataclass
 import json
 import re
-from typing import List, TypeVar
+from typing import Any, Dict, List, Optional, TypeVar
 
-from kbdebugger.extraction.types import BatchTextDecomposer, TextDecomposer, Qualities
-from kbdebugger.llm.model_access import respond
+from kbdebugger.extraction.types import AsyncBatchTextDecomposer, BatchTextDecomposer, ChunkQualitiesCallback, ServedBy, TextDecomposer, Qualities
+from kbdebugger.llm.batch_planner import DECOMPOSE_STAGE, get_batch_planner
+from kbdebugger.llm.batch_repair import arequest_with_repair, batch_items_from_completion
+from kbdebugger.llm.model_access import respond, acomplete_batch
 from kbdebugger.utils import ensure_json_object
-from kbdebugger.prompts import render_prompt, load_json_resource
-from .utils import _call_with_rate_limit_retries, coerce_batch_qualities, coerce_qualities, sanitize_chunk
+from kbdebugger.prompts import PromptParts, load_examples_json, load_output_schema, render_prompt_parts
+from .utils import coerce_batch_qualities, coerce_qualities, sanitize_chunk
 
 @dataclass(frozen=True)
 class ChunkDecomposeConfig:
     # chunks can be longer, so allow more newlines than for single sentences
     prompt_max_newlines: int = 20
+    max_tokens: int = 2048
+    temperature: float = 0.0
+    # How often a rate-limited call is retried (see `llm.rate_limit`)
+    max_retries: int = 8
 
 
 @dataclass(frozen=True)
@@ -41,7 +47,7 @@ class ChunkBatchDecomposeConfig:
     max_qualities_per_chunk: int = 12
     max_tokens: int = 1024
     temperature: float = 0.0
-    # Retry policy (kept simple and explicit)
+    # How often a rate-limited call is retried (see `llm.rate_limit`)
     max_retries: int = 8
 
 
@@ -50,9 +56,8 @@ def build_chunk_decomposer(
 ) -> TextDecomposer:
     cfg = config or ChunkDecomposeConfig()
 
-    # Load few-shot examples once from JSON
-    examples = load_json_resource("chunk_decompose")
-    examples_json = json.dumps(examples, ensure_ascii=False)
+    # Few-shot examples, serialized once (shared, byte-stable prompt prefix)
+    examples_json = load_examples_json("chunk_decompose")
 
     def decompose_chunk(text: str) -> Qualities:
         """
@@ -68,9 +73,10 @@ def build_chunk_decomposer(
         # We embed the text as a JSON string literal in the prompt
         text_json = json.dumps(s, ensure_ascii=False)
 
-        # 2. Build prompt from template + JSON examples
-        prompt_str = render_prompt(
+        # 2. Build prompt from template + JSON examples (static prefix + text)
+        prompt = render_prompt_parts(
             "chunk_decompose",
+            dynamic_var="text_json",
             examples_json=examples_json,
             text_json=text_json,
         )
@@ -83,16 +89,16 @@ def build_chunk_decomposer(
         #     json_mode=True,
         # )
 
-        # ✅ This ensures: 429 never silently kills a batch.
-        # It will wait and retry as Groq instructs.
-        raw_response = _call_with_rate_limit_retries(
-            lambda: respond(
-                prompt_str,
-                max_tokens=cfg.max_tokens,
-                temperature=cfg.temperature,
-                json_mode=True,
-            ),
+        # ✅ 429 never silently kills a chunk: respond() waits on the shared
+        # rate limiter and retries as Groq instructs.
+        raw_response = respond(
+            prompt.text,
+            prompt_prefix=prompt.prefix,
+            max_tokens=cfg.max_tokens,
+            temperature=cfg.temperature,
+            json_mode=True,
             max_retries=cfg.max_retries,
+            stage=DECOMPOSE_STAGE.name,
         )
 
         # 4. Parse JSON into Python object
@@ -141,8 +147,7 @@ def build_chunk_batch_decomposer(
     cfg = config or ChunkBatchDecomposeConfig()
 
     # Reuse the exact same few-shot examples used by the single-chunk prompt.
-    examples = load_json_resource("chunk_decompose")
-    examples_json = json.dumps(examples, ensure_ascii=False)
+    examples_json = load_examples_json("chunk_decompose")
 
     def decompose_chunks(texts: List[str]) -> List[Qualities]:
         """
@@ -162,39 +167,175 @@ def build_chunk_batch_decomposer(
         if not texts:
             return []
 
-        sanitized: List[str] = [sanitize_chunk(t) for t in texts]
-        # If some chunks are empty, we still preserve alignment.
-        # We'll send them as empty strings; model should return empty qualities.
-        chunks_payload = {
-            "chunks": [{"id": i, "text": sanitized[i]} for i in range(len(sanitized))]
-        }
-        chunks_json = json.dumps(chunks_payload, ensure_ascii=False)
-
-        prompt_str = render_prompt(
-            "chunk_decompose_batch",
-            examples_json=examples_json,
-            chunks_json=chunks_json,
-            max_qualities_per_chunk=str(cfg.max_qualities_per_chunk),
-        )
+        prompt = _build_chunk_batch_prompt(texts, cfg=cfg, examples_json=examples_json)
 
         raw_response = respond(
-            prompt_str,
+            prompt.text,
+            prompt_prefix=prompt.prefix,
             max_tokens=cfg.max_tokens,
             temperature=cfg.temperature,
             json_mode=True,
+            max_retries=cfg.max_retries,
+            stage=DECOMPOSE_STAGE.name,
+            batch_size=len(texts),
+            json_schema=load_output_schema("chunk_decompose_batch"),
         )
 
-        obj = ensure_json_object(raw_response)
-        id_to_qualities = coerce_batch_qualities(obj, expected_n=len(texts))
+        return _parse_chunk_batch_response(raw_response, expected_n=len(texts), cfg=cfg)
 
-        # Reconstruct a dense, ordered list, applying a hard cap for safety.
-        out: List[Qualities] = []
-        for i in range(len(texts)):
-            q = id_to_qualities.get(i, [])
-            if q and cfg.max_qualities_per_chunk > 0:
-                q = q[: cfg.max_qualities_per_chunk]
-            out.append(q)
+    return decompose_chunks
 
-        return out
 
-    return decompose_chunks
+def build_async_chunk_batch_decomposer(
+    config: ChunkBatchDecomposeConfig | None = None,
+) -> AsyncBatchTextDecomposer:
+    """
+    Async twin of `build_chunk_batch_decomposer`.
+
+    Same prompt, same parsing, same output contract; the LLM call is awaited
+    so many batches can be in flight at once (see `llm.concurrency`).
+
+    The returned decomposer accepts an optional per-call `max_tokens` (planned
+    by `llm.batch_planner`) and reports every response back to the planner so
+    it can learn the decomposer's output-per-input ratio.
+
+    With `on_item`, each chunk's qualities are reported as `on_item(index, qualities)`
+    as soon as they are parsed — while the rest of the batch is still being
+    generated when LLM_STREAMING is enabled. Each index is reported once.
+
+    With `served_by`, the (backend, model) that answered each chunk is recorded
+    in it by index, for calls that report it (routed calls, see `llm.routing`).
+    """
+    cfg = config or ChunkBatchDecomposeConfig()
+    planner = get_batch_planner()
+
+    examples_json = load_examples_json("chunk_decompose")
+
+    async def adecompose_chunks(
+        texts: List[str],
+        *,
+        max_tokens: Optional[int] = None,
+        on_item: Optional[ChunkQualitiesCallback] = None,
+        served_by: Optional[ServedBy] = None,
+    ) -> List[Qualities]:
+        if not texts:
+            return []
+
+        emitted: set[int] = set()
+
+        async def _call(pairs: List[tuple[int, str]]) -> Dict[int, Qualities]:
+            sub_texts = [t for _, t in pairs]
+            prompt = _build_chunk_batch_prompt(sub_texts, cfg=cfg, examples_json=examples_json)
+
+            def _emit(element: Any) -> None:
+                if on_item is None:
+                    return
+                parsed = coerce_batch_qualities({"results": [element]}, expected_n=len(sub_texts))
+                for i, q in parsed.items():
+                    idx = pairs[i][0]
+                    if idx not in emitted:
+                        emitted.add(idx)
+                        on_item(idx, _cap_qualities(q, cfg))
+
+            completion = await acomplete_batch(
+                prompt.text,
+                key="results",
+                prompt_prefix=prompt.prefix,
+                on_item=_emit if on_item is not None else None,
+                max_tokens=max_tokens or cfg.max_tokens,
+                temperature=cfg.temperature,
+                json_mode=True,
+                max_retries=cfg.max_retries,
+                stage=DECOMPOSE_STAGE.name,
+                batch_size=len(sub_texts),
+                json_schema=load_output_schema("chunk_decompose_batch"),
+            )
+
+            planner.observe(
+                DECOMPOSE_STAGE,
+                input_tokens=sum(planner.count_tokens(sanitize_chunk(t)) for t in sub_texts),
+                n_items=len(sub_texts),
+                response=completion.text,
+                truncated=completion.truncated,
+            )
+
+            # Prompt ids are local to this (sub-)batch; map them back to input positions.
+            items = batch_items_from_completion(completion, "results")
+            local = coerce_batch_qualities({"results": items}, expected_n=len(sub_texts))
+            if served_by is not None and completion.served_by is not None:
+                for i in local:
+                    served_by[pairs[i][0]] = completion.served_by
+            return {pairs[i][0]: _cap_qualities(q, cfg) for i, q in local.items()}
+
+        # Truncated / incomplete responses: only the missing chunks are re-requested.
+        resolved = await arequest_with_repair(
+            list(enumerate(texts)),
+            _call,
+            on_unresolved=lambda _i, _t: [],
+            label="chunk_batch_decomposer",
+        )
+        return [resolved[i] for i in range(len(texts))]
+
+    return adecompose_chunks
+
+
+def chunk_batch_prompt_overhead_tokens(config: ChunkBatchDecomposeConfig | None = None) -> int:
+    """
+    Estimated tokens of the batched decomposer prompt with no chunks in it
+    (template + few-shot examples), used by the batch planner.
+    """
+    cfg = config or ChunkBatchDecomposeConfig()
+    prompt = _build_chunk_batch_prompt([], cfg=cfg, examples_json=load_examples_json("chunk_decompose"))
+    return get_batch_planner().count_tokens(prompt.text)
+
+
+def _build_chunk_batch_prompt(
+    texts: List[str],
+    *,
+    cfg: ChunkBatchDecomposeConfig,
+    examples_json: str,
+) -> PromptParts:
+    """
+    Render the `chunk_decompose_batch` prompt for a group of chunk texts,
+    split into the cached static prefix and the chunks payload.
+    """
+    sanitized: List[str] = [sanitize_chunk(t) for t in texts]
+    # If some chunks are empty, we still preserve alignment.
+    # We'll send them as empty strings; model should return empty qualities.
+    chunks_payload = {
+        "chunks": [{"id": i, "text": sanitized[i]} for i in range(len(sanitized))]
+    }
+    chunks_json = json.dumps(chunks_payload, ensure_ascii=False)
+
+    return render_prompt_parts(
+        "chunk_decompose_batch",
+        dynamic_var="chunks_json",
+        examples_json=examples_json,
+        chunks_json=chunks_json,
+        max_qualities_per_chunk=str(cfg.max_qualities_per_chunk),
+    )
+
+
+def _parse_chunk_batch_response(
+    raw_response: str,
+    *,
+    expected_n: int,
+    cfg: ChunkBatchDecomposeConfig,
+) -> List[Qualities]:
+    """
+    Parse a batched decomposer response into a dense list aligned with the input.
+    """
+    obj = ensure_json_object(raw_response)
+    id_to_qualities = coerce_batch_qualities(obj, expected_n=expected_n)
+
+    # Reconstruct a dense, ordered list, applying a hard cap for safety.
+    return [_cap_qualities(id_to_qualities.get(i, []), cfg) for i in range(expected_n)]
+
+
+def _cap_qualities(qualities: Qualities, cfg: ChunkBatchDecomposeConfig) -> Qualities:
+    """
+    Hard-cap the number of qualities per chunk (the prompt cap is only a soft one).
+    """
+    if qualities and cfg.max_qualities_per_chunk > 0:
+        return qualities[: cfg.max_qualities_per_chunk]
+    return qualities
@@ -2,26 +2,44 @@ from __future__ import annotations
 
 import math
 import os
-from typing import List, Optional, Sequence, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Any, Tuple
 from kbdebugger.types.ui import ProgressCallback
-from rich.progress import track
 
 from kbdebugger.compat.langchain import Document
-from kbdebugger.utils import batched
+from kbdebugger.llm.batch_planner import DECOMPOSE_STAGE, PlannedBatch, get_batch_planner
+from kbdebugger.llm.concurrency import default_max_concurrency, map_bounded
+from kbdebugger.llm.micro_batcher import MicroBatcher, get_micro_batcher, micro_batching_enabled
+from kbdebugger.llm.model_access import streaming_enabled
 from .sentence_to_qualities import build_sentence_decomposer
-from .chunk_to_qualities import build_chunk_decomposer, build_chunk_batch_decomposer
-from .types import Qualities, TextDecomposer, BatchTextDecomposer, DecomposeMode
+from .chunk_to_qualities import (
+    ChunkBatchDecomposeConfig,
+    build_chunk_decomposer,
+    build_chunk_batch_decomposer,
+    build_async_chunk_batch_decomposer,
+    chunk_batch_prompt_overhead_tokens,
+)
+from .types import (
+    Qualities,
+    TextDecomposer,
+    BatchTextDecomposer,
+    AsyncBatchTextDecomposer,
+    ChunkQualitiesCallback,
+    DecomposeMode,
+    ServedBy,
+)
 from .logging import save_qualities_json
+from .paragraph_cache import get_paragraph_cache
 
 # ---------------------------------------------------------------------------
 # Module-level decomposer singletons
 # ---------------------------------------------------------------------------
 # These are initialized once at import time to avoid re-loading prompt resources
 # and few-shot examples repeatedly inside tight loops.
+_CHUNK_BATCH_CONFIG = ChunkBatchDecomposeConfig()
 _sentence_to_qualities_decomposer: TextDecomposer = build_sentence_decomposer()
 _chunk_to_qualities_decomposer: TextDecomposer = build_chunk_decomposer()
 _chunk_batch_to_qualities_decomposer: BatchTextDecomposer = build_chunk_batch_decomposer()
+_async_chunk_batch_to_qualities_decomposer: AsyncBatchTextDecomposer = build_async_chunk_batch_decomposer(_CHUNK_BATCH_CONFIG)
 
 
 def decompose(
@@ -70,42 +88,155 @@ def decompose(
     raise ValueError(f"Unsupported DecomposeMode: {mode}")
 
 
-def _decompose_one_batch(
-    batch_id: int,
-    group: List[str],
-) -> Tuple[int, List[Qualities]]:
+async def _chunk_batch_to_qualities(
+    batch: PlannedBatch[str],
+    on_item: Optional[ChunkQualitiesCallback] = None,
+    served_by: Optional[ServedBy] = None,
+) -> List[Qualities]:
     """
-    Worker wrapper for parallel batch decomposition.
+    Run the (async) batched decomposer on one planned batch with its own `max_tokens`.
 
-    Returns
-    -------
-    (batch_id, batch_results)
-        batch_id is used to optionally re-order results deterministically.
+    `on_item` receives *document* indices (batch offset applied); `served_by`
+    is keyed by index in the batch.
     """
-    return batch_id, _chunk_batch_to_qualities_decomposer(group)
+    return await _async_chunk_batch_to_qualities_decomposer(
+        batch.items,
+        max_tokens=batch.max_tokens,
+        on_item=(lambda i, q: on_item(batch.start + i, q)) if on_item else None,
+        served_by=served_by,
+    )
 
 
-def _safe_chunk_batch_to_qualities_decomposer(group: List[str]) -> List[Qualities]:
+async def _safe_chunk_batch_to_qualities_decomposer(
+    batch: PlannedBatch[str],
+    on_item: Optional[ChunkQualitiesCallback] = None,
+    *,
+    retries: int = 0,
+    isolate: bool = True,
+    failures: Optional[Dict[int, str]] = None,
+    served_by: Optional[ServedBy] = None,
+) -> List[Qualities]:
     """
-    Safe wrapper around the batched decomposer.
+    Safe wrapper around the (async) batched decomposer.
 
     Why this exists
     ---------------
-    `ThreadPoolExecutor.map()` will propagate exceptions and stop iteration
-    on the first failure. For a pipeline stage, it's usually better to be
-    *best-effort* and preserve output alignment.
+    The bounded executor propagates the first exception and cancels the rest.
+    For a pipeline stage running many batches concurrently, it's usually better
+    to be *best-effort* and preserve output alignment.
+
+    A failing batch (timeout, unparseable answer, ...) is first retried up to
+    `retries` times; rate-limit waits are already handled per call.
 
     Contract
     --------
-    Returns `List[Qualities]` aligned with `group` length:
+    Returns `List[Qualities]` aligned with `batch.items` length:
       - one Qualities list per input chunk text
-      - on failure: returns `[[], [], ...]` (same length as group)
+      - on failure (after retries), with `isolate=True`: returns `[[], [], ...]`
+        (same length as the batch) and records the error in
+        `failures[batch.start]`; with `isolate=False` the error is raised.
     """
-    try:
-        return _chunk_batch_to_qualities_decomposer(group)
-    except Exception as e:  # noqa: BLE001 (intentionally broad in pipeline boundary)
-        print(f"[decompose_documents] Batch failed (size={len(group)}): {e}")
-        return [[] for _ in range(len(group))]
+    attempts = max(0, retries) + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            return await _chunk_batch_to_qualities(batch, on_item, served_by)
+        except Exception as e:  # noqa: BLE001 (intentionally broad in pipeline boundary)
+            if attempt < attempts:
+                print(
+                    f"[decompose_documents] 🔁 Batch at paragraph {batch.start} failed "
+                    f"(attempt {attempt}/{attempts}): {e}; retrying"
+                )
+                continue
+            if not isolate:
+                raise
+            print(f"[decompose_documents] Batch failed (size={len(batch.items)}): {e}")
+            if failures is not None:
+                failures[batch.start] = str(e)
+    return [[] for _ in range(len(batch.items))]
+
+
+def _lookup_paragraphs(
+    texts: Sequence[str],
+    *,
+    use_cache: bool,
+) -> Tuple[List[str], Dict[str, Qualities], List[str]]:
+    """
+    Paragraph-cache lookup for `texts`.
+
+    Returns
+    -------
+    (keys, cached, pending)
+        - keys: cache key of every paragraph (equal for repeated paragraphs)
+        - cached: qualities of the keys found in the cache
+        - pending: keys still to decompose, each once, in document order
+    """
+    cache = get_paragraph_cache()
+    keys = cache.keys(
+        texts,
+        temperature=_CHUNK_BATCH_CONFIG.temperature,
+        max_qualities_per_chunk=_CHUNK_BATCH_CONFIG.max_qualities_per_chunk,
+    )
+    cached = cache.get_many(keys) if use_cache else {}
+    pending = [k for k in dict.fromkeys(keys) if k not in cached]
+    return keys, cached, pending
+
+
+def _plan_batches(texts: List[str], batch_size: Optional[int]) -> List[PlannedBatch[str]]:
+    return get_batch_planner().plan(
+        DECOMPOSE_STAGE,
+        texts,
+        text_of=lambda t: t,
+        prompt_overhead_tokens=chunk_batch_prompt_overhead_tokens(_CHUNK_BATCH_CONFIG),
+        batch_size=batch_size,
+    )
+
+
+# A paragraph's qualities and the (backend, model) that answered it, if reported.
+_Decomposed = Tuple[Qualities, Optional[Tuple[str, str]]]
+
+
+def _decompose_micro_batcher(retries: int) -> MicroBatcher[str, _Decomposed]:
+    """
+    The shared cross-job decomposer batcher (`llm.micro_batcher`).
+
+    A batch that still fails after `retries` extra attempts fails every
+    paragraph in it; each job then isolates or raises as it would for its own batch.
+    """
+    async def _run_batch(batch: PlannedBatch[str]) -> List[_Decomposed]:
+        served: ServedBy = {}
+        out = await _safe_chunk_batch_to_qualities_decomposer(
+            batch, retries=retries, isolate=False, served_by=served
+        )
+        return [(qualities, served.get(i)) for i, qualities in enumerate(out)]
+
+    return get_micro_batcher(
+        (DECOMPOSE_STAGE.name, retries),
+        lambda: MicroBatcher(
+            DECOMPOSE_STAGE,
+            _run_batch,
+            text_of=lambda t: t,
+            prompt_overhead_tokens=lambda: chunk_batch_prompt_overhead_tokens(_CHUNK_BATCH_CONFIG),
+        ),
+    )
+
+
+def plan_decompose_batches(
+    texts: Sequence[str],
+    *,
+    batch_size: Optional[int] = None,
+    use_paragraph_cache: bool = True,
+) -> List[PlannedBatch[str]]:
+    """
+    The batches `decompose_documents` sends for `texts` (CHUNKS mode, batched):
+    paragraphs already in the paragraph cache and repeats are left out.
+
+    Exposed so callers (e.g. the UI job runner) can size progress bars from
+    the same plan the decomposer runs. With LLM_MICRO_BATCHING the batches
+    are formed across jobs at run time, and progress is reported per paragraph.
+    """
+    keys, _cached, pending = _lookup_paragraphs(texts, use_cache=use_paragraph_cache)
+    text_of_key = dict(zip(keys, texts))
+    return _plan_batches([text_of_key[k] for k in pending], batch_size)
 
 # ---------------------------------------------------------------------------
 # Public API
@@ -114,15 +245,43 @@ def decompose_documents(
     docs: Sequence[Document],
     *,
     mode: DecomposeMode,
-    batch_size: int = 5,
+    batch_size: Optional[int] = None,
     use_batch_decomposer: bool = True,
     parallel: bool = False,
-    max_workers: Optional[int] = 2,
+    max_workers: Optional[int] = None,
+    batch_retries: int = 0,
+    use_paragraph_cache: bool = True,
     progress: Optional[ProgressCallback] = None
 ) -> Tuple[Qualities, dict]:
     """
     Decompose a list of LangChain Documents into a flat list of qualities.
 
+    With `parallel=True`, up to `max_workers` batches (default: LLM_MAX_CONCURRENCY)
+    are in flight at once. Batches finish in any order; their results are
+    reassembled by batch index, so qualities stay in document order. `progress`
+    is reported per finished batch, and a batch that still fails after
+    `batch_retries` extra attempts only loses its own paragraphs (listed under
+    `failed_batches` in the log payload). Without `parallel`, a failing batch
+    aborts the stage after its retries.
+
+    With LLM_STREAMING enabled, `progress` is reported per paragraph as soon as
+    its qualities are generated (instead of once per finished batch).
+
+    Batches are planned by `llm.batch_planner`: with `batch_size=None` as many
+    paragraphs as fit the token budget go into one call, and every call gets a
+    `max_tokens` sized from the expected output of its paragraphs. Pass an
+    explicit `batch_size` to force fixed-size batches.
+
+    With `use_paragraph_cache=True`, paragraphs decomposed by an earlier run
+    (same sanitized text, prompt and model) are served from the paragraph
+    cache (`extraction.paragraph_cache`) and only the others are sent to the
+    LLM; a paragraph repeated within `docs` is sent once.
+
+    With LLM_MICRO_BATCHING, the paragraphs to decompose are submitted one by
+    one to the shared cross-job batcher (`llm.micro_batcher`), which packs
+    them with other jobs' paragraphs; `batch_size` / `max_workers` do not
+    apply and `progress` is reported per paragraph.
+
     Returns
     -------
     (qualities, log_payload)
@@ -148,62 +307,152 @@ def decompose_documents(
 
     # --- Fast path: batched chunk decomposition ---
     if mode == DecomposeMode.CHUNKS and use_batch_decomposer:
-        num_batches = math.ceil(len(texts) / batch_size)
+        cache = get_paragraph_cache()
+        use_cache = use_paragraph_cache and cache.enabled
+        keys, results, pending = _lookup_paragraphs(texts, use_cache=use_cache)
+        indices_of_key: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            indices_of_key.setdefault(k, []).append(i)
+        num_cached = sum(len(indices_of_key[k]) for k in results)
+        if use_cache:
+            print(
+                f"[INFO] 🧷 Paragraph cache: {num_cached}/{len(texts)} paragraphs cached, "
+                f"decomposing {len(pending)}."
+            )
+
+        pending_texts = [texts[indices_of_key[k][0]] for k in pending]
+
+        def _store(idx: int, qualities: Qualities, served: Optional[Tuple[str, str]]) -> None:
+            # `idx` indexes `pending`; a routed answer goes under the model that gave it.
+            key = pending[idx]
+            if served is not None:
+                key = cache.keys(
+                    [pending_texts[idx]],
+                    temperature=_CHUNK_BATCH_CONFIG.temperature,
+                    max_qualities_per_chunk=_CHUNK_BATCH_CONFIG.max_qualities_per_chunk,
+                    served_by=served,
+                )[0]
+            cache.put(key, qualities)
+        micro = micro_batching_enabled()
+        groups = [] if micro else _plan_batches(pending_texts, batch_size)
+        num_batches = len(groups)
+        batch_sizes = [len(g.items) for g in groups] or [0]
+        batch_size_label = batch_size if batch_size is not None else f"adaptive {min(batch_sizes)}–{max(batch_sizes)}"
+
+        # Both paths run on the bounded async executor; `parallel` only decides
+        # how many batches may be in flight and whether a failing batch is isolated.
+        concurrency = (max_workers or default_max_concurrency()) if parallel else 1
+        label = "🧷 LLM Decomposer (parallel)" if parallel else "🧷 LLM Decomposer"
+
+        stream_progress = progress is not None and streaming_enabled()
+        # Paragraph indices already reported (a retried batch may stream them again).
+        paragraphs_done: set[int] = {i for k in results for i in indices_of_key[k]}
+        failures: Dict[int, str] = {}
 
-        if parallel:
-            with ThreadPoolExecutor(max_workers=max_workers) as pool:
-                results_iter = pool.map(
-                    _safe_chunk_batch_to_qualities_decomposer,
-                    batched(texts, batch_size=batch_size),
+        def _on_paragraph(idx: int, _qualities: Qualities) -> None:
+            # `idx` indexes `pending`; every copy of that paragraph is done.
+            paragraphs_done.update(indices_of_key[pending[idx]])
+            if progress:
+                progress(
+                    len(paragraphs_done),
+                    len(texts),
+                    f"{label}: Decomposed paragraph ({len(paragraphs_done)}/{len(texts)}) ..."
                 )
 
-                for batch_idx, group_results in track(
-                    enumerate(results_iter),
-                    total=num_batches,
-                    description=(
-                        f"🧷 LLM Decomposer (parallel): paragraphs → qualities "
-                        f"(num_batches={num_batches}, batch size={batch_size})"
-                    ),
-                ):
-                    if progress:
-                        progress(
-                            batch_idx + 1,  # nicer: 1-based progress
-                            num_batches,
-                            f"🧷 LLM Decomposer (parallel): Processing batch ({batch_idx+1}/{num_batches}) ..."
-                        )
-
-                    for qualities in group_results:
-                        all_qualities.extend(qualities)
+        def _on_done(done: int, total: int) -> None:
+            if progress and not stream_progress:
+                failed = f", {len(failures)} failed" if failures else ""
+                progress(
+                    done,
+                    total,
+                    f"{label}: Finished batch ({done}/{total}{failed}) ..."
+                )
+
+        async def _run_batch(batch: PlannedBatch[str]) -> List[Qualities]:
+            served: ServedBy = {}
+            out = await _safe_chunk_batch_to_qualities_decomposer(
+                batch,
+                _on_paragraph if stream_progress else None,
+                retries=batch_retries,
+                isolate=parallel,
+                failures=failures,
+                served_by=served,
+            )
+            # Cache as soon as a batch lands, so an interrupted run keeps its progress.
+            if use_cache and batch.start not in failures:
+                for i, qualities in enumerate(out):
+                    _store(batch.start + i, qualities, served.get(i))
+            return out
+
+        def _on_micro(idx: int, outcome: Any) -> None:
+            if isinstance(outcome, BaseException):
+                print(f"[decompose_documents] Paragraph {indices_of_key[pending[idx]][0]} failed: {outcome}")
+                failures[idx] = str(outcome)
+                qualities: Qualities = []
+            else:
+                qualities, served = outcome
+                if use_cache:
+                    _store(idx, qualities, served)
+            _on_paragraph(idx, qualities)
 
+        if micro:
+            # Shared cross-job batches; `failures` is keyed by index in `pending`.
+            outcomes = _decompose_micro_batcher(batch_retries).map(
+                pending_texts, on_item=_on_micro, return_exceptions=parallel
+            )
+            for i, outcome in enumerate(outcomes):
+                results[pending[i]] = [] if isinstance(outcome, BaseException) else outcome[0]
+            failed_batches = [
+                {"paragraphs": indices_of_key[pending[i]], "error": error}
+                for i, error in sorted(failures.items())
+            ]
         else:
-            for batch_idx, group in track(
-                enumerate(batched(texts, batch_size=batch_size)),
-                total=num_batches,
+            results_per_group: List[List[Qualities]] = map_bounded(
+                _run_batch,
+                groups,
+                max_concurrency=concurrency,
+                on_done=_on_done,
                 description=(
-                    f"🧷 LLM Decomposer: paragraphs → qualities "
-                    f"(num_batches={num_batches}, batch size={batch_size})"
+                    f"{label}: paragraphs → qualities "
+                    f"(num_batches={num_batches}, batch size={batch_size_label})"
                 ),
-            ):
-                if progress:
-                    progress(
-                        batch_idx + 1,
-                        num_batches,
-                        f"🧷 LLM Decomposer: Processing batch ({batch_idx+1}/{num_batches}) ..."
-                    )
-
-                group_results: List[Qualities] = _chunk_batch_to_qualities_decomposer(group)
-                for qualities in group_results:
-                    all_qualities.extend(qualities)
+            )
+
+            # Reassemble by paragraph index (cached and freshly decomposed alike).
+            for group, group_results in zip(groups, results_per_group):
+                for i, qualities in enumerate(group_results):
+                    results[pending[group.start + i]] = qualities
+            failed_batches = [
+                {
+                    "paragraphs": [
+                        i for k in pending[g.start:g.start + len(g.items)] for i in indices_of_key[k]
+                    ],
+                    "error": failures[g.start],
+                }
+                for g in groups
+                if g.start in failures
+            ]
+        get_batch_planner().save()
+
+        for key in keys:
+            all_qualities.extend(results.get(key, []))
 
         log_payload = save_qualities_json(
             qualities=all_qualities,
             mode=mode,
             num_input_docs=len(docs),
             use_batch_decomposer=True,
-            batch_size=batch_size,
-            num_batches=num_batches,
+            batch_size=None if micro else (batch_size if batch_size is not None else max(batch_sizes)),
+            num_batches=None if micro else num_batches,
             parallel=parallel,
-            max_workers=max_workers if parallel else None,
+            max_workers=concurrency if parallel and not micro else None,
+            failed_batches=failed_batches or None,
+            paragraph_cache={
+                "enabled": use_cache,
+                "cached": num_cached,
+                "decomposed": len(pending),
+                "repeated": len(texts) - num_cached - len(pending),
+            },
         )
         return all_qualities, log_payload
 
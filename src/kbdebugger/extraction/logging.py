@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 import rich
 
 from kbdebugger.compat.langchain import Document
@@ -112,6 +112,8 @@ def build_decomposer_payload(
     num_batches: Optional[int],
     parallel: bool,
     max_workers: Optional[int],
+    failed_batches: Optional[List[Dict[str, Any]]] = None,
+    paragraph_cache: Optional[Dict[str, Any]] = None,
     created_at: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
@@ -135,6 +137,8 @@ def build_decomposer_payload(
         "num_batches": num_batches,
         "parallel": parallel,
         "max_workers": max_workers if parallel else None,
+        "failed_batches": failed_batches,
+        "paragraph_cache": paragraph_cache,
         "qualities": list(qualities),
     }
 
@@ -152,6 +156,8 @@ def save_qualities_json(
     num_batches: Optional[int] = None,
     parallel: bool = False,
     max_workers: Optional[int] = None,
+    failed_batches: Optional[List[Dict[str, Any]]] = None,
+    paragraph_cache: Optional[Dict[str, Any]] = None,
     output_dir: str = "logs",
 ) -> Dict[str, Any]:
     """
@@ -169,6 +175,8 @@ def save_qualities_json(
         num_batches=num_batches,
         parallel=parallel,
         max_workers=max_workers,
+        failed_batches=failed_batches,
+        paragraph_cache=paragraph_cache,
     )
 
     ts = now_utc_compact()
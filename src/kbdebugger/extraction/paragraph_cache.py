@@ -0,0 +1,152 @@
+"""
+Per-paragraph cache of decomposer output (opt-in).
+
+`decompose_documents` looks every paragraph up here and only sends the misses
+to the LLM, so a re-run over a mostly unchanged document (or the same PDF for
+another keyword) only decomposes the changed paragraphs.
+
+Key: sha256(sanitized paragraph, prompt version, backend, model, temperature,
+max_qualities_per_chunk). The prompt version hashes the
+`chunk_decompose_batch` template and its examples; backend / model are those
+that answered (a routed fallback stores under its own model). Only non-empty
+results are stored (an empty list may be an unresolved batch item).
+
+Environment variables
+---------------------
+DECOMPOSE_CACHE_ENABLED:
+    Enable the paragraph cache. Default: "0"
+
+DECOMPOSE_CACHE_PATH:
+    SQLite file path. Default: ".cache/decomposer_paragraphs.sqlite3"
+
+DECOMPOSE_CACHE_MAX_BYTES:
+    Size bound (LRU eviction beyond it). Default: 134217728 (128 MiB)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from kbdebugger.llm.cache import ResponseCache, ResponseCacheConfig
+from kbdebugger.llm.model_access import resolve_backend_and_model
+from kbdebugger.prompts import get_prompt_registry
+
+from .types import Qualities
+from .utils import sanitize_chunk
+
+
+@dataclass(frozen=True, slots=True)
+class ParagraphCacheConfig:
+    """
+    Runtime configuration for the paragraph cache.
+    """
+    enabled: bool = False
+    path: str = ".cache/decomposer_paragraphs.sqlite3"
+    max_bytes: int = 128 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls) -> ParagraphCacheConfig:
+        enabled = os.getenv("DECOMPOSE_CACHE_ENABLED", "0").strip().lower() in {"1", "true", "yes"}
+        path = os.getenv("DECOMPOSE_CACHE_PATH", ".cache/decomposer_paragraphs.sqlite3").strip()
+        max_bytes = int(os.getenv("DECOMPOSE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)).strip())
+
+        return cls(enabled=enabled and bool(path), path=path, max_bytes=max(0, max_bytes))
+
+
+def decompose_prompt_version(
+    template_name: str = "chunk_decompose_batch",
+    examples_name: str = "chunk_decompose",
+) -> str:
+    """
+    Short hash of the decomposer template + few-shot examples currently loaded.
+    """
+    registry = get_prompt_registry()
+    material = registry.template(template_name).template.template + "\x00" + registry.examples_resource(examples_name).json
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class ParagraphQualitiesCache:
+    """
+    Sanitized paragraph → qualities, on top of the SQLite `ResponseCache` store.
+    """
+
+    def __init__(self, config: Optional[ParagraphCacheConfig] = None) -> None:
+        self.config = config or ParagraphCacheConfig.from_env()
+        self.store = ResponseCache(
+            ResponseCacheConfig(
+                enabled=self.config.enabled,
+                path=self.config.path,
+                max_bytes=self.config.max_bytes,
+            )
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.store.enabled
+
+    def keys(
+        self,
+        texts: Sequence[str],
+        *,
+        temperature: float,
+        max_qualities_per_chunk: int,
+        served_by: Optional[Tuple[str, str]] = None,
+    ) -> List[str]:
+        """
+        Cache key of every paragraph, for the current prompt and the default
+        model (or `served_by`, the backend / model that answered).
+        """
+        backend, model = served_by or resolve_backend_and_model(None, None)
+        version = decompose_prompt_version()
+        out: List[str] = []
+        for text in texts:
+            material = json.dumps(
+                {
+                    "paragraph": sanitize_chunk(text),
+                    "prompt_version": version,
+                    "backend": backend,
+                    "model": model,
+                    "temperature": temperature,
+                    "max_qualities_per_chunk": max_qualities_per_chunk,
+                },
+                ensure_ascii=False,
+                sort_keys=True,
+            )
+            out.append(hashlib.sha256(material.encode("utf-8")).hexdigest())
+        return out
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Qualities]:
+        """
+        Cached qualities for the given keys (misses are left out).
+        """
+        out: Dict[str, Qualities] = {}
+        if not self.enabled:
+            return out
+        for key in dict.fromkeys(keys):
+            raw = self.store.get(key)
+            if raw is None:
+                continue
+            try:
+                qualities = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(qualities, list):
+                out[key] = [str(q) for q in qualities]
+        return out
+
+    def put(self, key: str, qualities: Qualities) -> None:
+        if qualities:
+            self.store.put(key, json.dumps(list(qualities), ensure_ascii=False))
+
+
+@lru_cache(maxsize=1)
+def get_paragraph_cache() -> ParagraphQualitiesCache:
+    """
+    Process-wide paragraph cache (configured from the environment on first use).
+    """
+    return ParagraphQualitiesCache()
@@ -0,0 +1,296 @@
+"""
+Near-duplicate elimination for decomposed qualities.
+
+Runs between the decomposer and the vector similarity filter and keeps one
+representative (the first occurrence) per group of duplicates:
+
+1) exact: equal after normalization (case, punctuation, whitespace)
+2) near (opt-in, `jaccard_threshold` < 1): MinHash/LSH over word bigrams
+   proposes pairs, merged if their bigram Jaccard is >= `jaccard_threshold`
+
+Pairs that differ in negation or in a number, or where one quality only adds
+words to the other, are never merged. The representative → duplicates mapping
+is written to `logs/01.3_quality_dedup_<ts>.json`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import rich
+
+from kbdebugger.utils.json import write_json
+from kbdebugger.utils.time import now_utc_compact, now_utc_human
+
+from .types import Qualities
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WS = re.compile(r"\s+")
+
+# "isn't" normalizes to "isn t"
+_CONTRACTED_NOT = re.compile(r"n t\b")
+_NEGATIONS = frozenset({"not", "no", "never", "none", "nor", "cannot", "without", "neither"})
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+@dataclass(frozen=True, slots=True)
+class QualityDedupConfig:
+    """
+    Configuration for the quality dedup stage.
+
+    Attributes
+    ----------
+    enabled:
+        If False, the stage passes qualities through unchanged.
+    jaccard_threshold:
+        Minimum word-bigram Jaccard similarity for two qualities to be merged
+        as near-duplicates. 1.0 (the default) drops exact (normalized)
+        duplicates only.
+    num_perm:
+        MinHash signature length.
+    bands:
+        LSH bands (`num_perm` must be divisible by it). More bands find more
+        candidate pairs at lower similarity; candidates are always verified.
+    """
+    enabled: bool = True
+    jaccard_threshold: float = 1.0
+    num_perm: int = 64
+    bands: int = 16
+
+
+@dataclass(slots=True)
+class QualityDedupResult:
+    """
+    Output of `dedup_qualities`.
+
+    Attributes
+    ----------
+    qualities:
+        Representatives, in first-occurrence order.
+    duplicates:
+        representative → its removed duplicates, each as
+        {"quality", "index", "match": "exact" | "near", "jaccard"}.
+    """
+    qualities: Qualities
+    duplicates: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    num_input: int = 0
+    num_exact: int = 0
+    num_near: int = 0
+
+
+def normalize_quality(text: str) -> str:
+    """
+    Case-, punctuation- and whitespace-insensitive form of a quality.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _WS.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+def _shingles(normalized: str) -> FrozenSet[str]:
+    words = normalized.split()
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def _adds_qualifier(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """
+    True if one word set strictly contains the other (one quality only adds words).
+    """
+    return a < b or b < a
+
+
+def _guard(normalized: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Negation words and numbers of a quality: near-duplicates must agree on both.
+    """
+    words = _CONTRACTED_NOT.sub(" not", normalized).split()
+    return (
+        frozenset(w for w in words if w in _NEGATIONS),
+        frozenset(w for w in words if any(c.isdigit() for c in w)),
+    )
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _MinHasher:
+    """
+    Fixed-seed universal hash family: h_i(x) = (a_i * x + b_i) mod p, truncated to 32 bits.
+    """
+
+    def __init__(self, num_perm: int, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: FrozenSet[str]) -> Tuple[int, ...]:
+        if not shingles:
+            return tuple(_MAX_HASH for _ in self.params)
+        hashes = [_hash64(s) for s in shingles]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.params
+        )
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # The smaller index (earlier occurrence) stays the root.
+            lo, hi = min(ri, rj), max(ri, rj)
+            self.parent[hi] = lo
+
+
+def dedup_qualities(
+    qualities: Sequence[str],
+    cfg: Optional[QualityDedupConfig] = None,
+) -> QualityDedupResult:
+    """
+    Drop exact and near-duplicate qualities, keeping the first occurrence.
+
+    Parameters
+    ----------
+    qualities:
+        Decomposer output, in document order.
+    cfg:
+        Thresholds / MinHash parameters. Defaults to `QualityDedupConfig()`.
+
+    Returns
+    -------
+    QualityDedupResult
+    """
+    cfg = cfg or QualityDedupConfig()
+    items = [str(q) for q in qualities]
+    if not cfg.enabled or not items:
+        return QualityDedupResult(qualities=list(items), num_input=len(items))
+
+    # 1) Exact: one slot per distinct normalized text (first occurrence wins).
+    normalized = [normalize_quality(q) for q in items]
+    slot_of: Dict[str, int] = {}
+    first_index: List[int] = []
+    for i, norm in enumerate(normalized):
+        if norm not in slot_of:
+            slot_of[norm] = len(first_index)
+            first_index.append(i)
+
+    # 2) Near: MinHash LSH candidates over distinct texts, verified by Jaccard.
+    uf = _UnionFind(len(first_index))
+    similarity: Dict[int, float] = {}
+    if cfg.jaccard_threshold < 1.0 and len(first_index) > 1:
+        shingles = [_shingles(normalized[i]) for i in first_index]
+        guards = [_guard(normalized[i]) for i in first_index]
+        words = [frozenset(normalized[i].split()) for i in first_index]
+        hasher = _MinHasher(cfg.num_perm)
+        rows = max(1, cfg.num_perm // max(1, cfg.bands))
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        for slot, sh in enumerate(shingles):
+            sig = hasher.signature(sh)
+            for band in range(0, len(sig), rows):
+                buckets[(band, sig[band:band + rows])].append(slot)
+
+        checked: set[Tuple[int, int]] = set()
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pair = (members[x], members[y])
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+                    if guards[pair[0]] != guards[pair[1]]:
+                        continue
+                    if _adds_qualifier(words[pair[0]], words[pair[1]]):
+                        continue
+                    score = _jaccard(shingles[pair[0]], shingles[pair[1]])
+                    if score >= cfg.jaccard_threshold:
+                        uf.union(*pair)
+                        similarity[pair[1]] = max(similarity.get(pair[1], 0.0), score)
+
+    # 3) Assemble representatives + provenance.
+    result = QualityDedupResult(qualities=[], num_input=len(items))
+    rep_text: Dict[int, str] = {}
+    for i, norm in enumerate(normalized):
+        slot = slot_of[norm]
+        root = uf.find(slot)
+        if i == first_index[root]:
+            rep_text[root] = items[i]
+            result.qualities.append(items[i])
+            continue
+
+        exact = i != first_index[slot] and slot == root
+        if exact:
+            result.num_exact += 1
+        else:
+            result.num_near += 1
+        result.duplicates.setdefault(rep_text[root], []).append(
+            {
+                "quality": items[i],
+                "index": i,
+                "match": "exact" if exact else "near",
+                # Near matches joined only transitively have no direct score.
+                "jaccard": 1.0 if exact else (round(similarity[slot], 4) if slot in similarity else None),
+            }
+        )
+
+    return result
+
+
+def save_quality_dedup_json(
+    result: QualityDedupResult,
+    cfg: QualityDedupConfig,
+    *,
+    output_dir: str = "logs",
+) -> Dict[str, Any]:
+    """
+    Print a one-line summary, write the dedup log and return its payload.
+    """
+    payload: Dict[str, Any] = {
+        "created_at": now_utc_human(),
+        "enabled": cfg.enabled,
+        "jaccard_threshold": cfg.jaccard_threshold,
+        "num_input_qualities": result.num_input,
+        "num_output_qualities": len(result.qualities),
+        "num_exact_duplicates": result.num_exact,
+        "num_near_duplicates": result.num_near,
+        "duplicates": [
+            {"representative": rep, "duplicates": dups}
+            for rep, dups in result.duplicates.items()
+        ],
+        "qualities": list(result.qualities),
+    }
+
+    path = f"{output_dir}/01.3_quality_dedup_{now_utc_compact()}.json"
+    write_json(path, payload)
+
+    rich.print(
+        f"\n[INFO] 🧹 Quality dedup: {result.num_input} → {len(result.qualities)} qualities "
+        f"({result.num_exact} exact, {result.num_near} near duplicates) → {path}"
+    )
+    return payload
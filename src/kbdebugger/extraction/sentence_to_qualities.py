@@ -8,7 +8,7 @@ import json
 from kbdebugger.extraction.types import TextDecomposer, Qualities
 from kbdebugger.llm.model_access import respond
 from kbdebugger.utils.json import ensure_json_object
-from kbdebugger.prompts import render_prompt, load_json_resource
+from kbdebugger.prompts import load_examples_json, render_prompt_parts
 from .utils import coerce_qualities
 
 @dataclass(frozen=True)
@@ -18,9 +18,8 @@ class DecomposeConfig:
 def build_sentence_decomposer(config: DecomposeConfig | None = None) -> TextDecomposer:
     cfg = config or DecomposeConfig()
 
-    # load examples once from JSON
-    examples = load_json_resource("sentence_decompose")
-    examples_json = json.dumps(examples, ensure_ascii=False)
+    # load examples once from JSON (shared, byte-stable prompt prefix)
+    examples_json = load_examples_json("sentence_decompose")
 
     def decompose_sentence(sentence: str) -> Qualities:
         # 1. Light sanitization: collapse all whitespace, keep full content
@@ -32,18 +31,21 @@ def build_sentence_decomposer(config: DecomposeConfig | None = None) -> TextDeco
         sentence_json = json.dumps(s, ensure_ascii=False)
 
         # 2. build prompt from template + json examples
-        prompt_str = render_prompt(
+        prompt = render_prompt_parts(
             "sentence_decompose",
+            dynamic_var="sentence_json",
             examples_json=examples_json,
             sentence_json=sentence_json,
         )
 
         # 3. call LLM
         response = respond(
-            prompt_str,
+            prompt.text,
+            prompt_prefix=prompt.prefix,
             max_tokens=2048,
             temperature=0.0,
             json_mode=True,
+            stage="sentence_decompose",
         )
 
         # 4. parse JSON
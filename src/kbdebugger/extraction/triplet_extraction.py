@@ -1,27 +1,23 @@
 from __future__ import annotations
 
-# Safe, device-agnostic loader for PEFT models (CPU by default; CUDA+4bit if available)
-# --------------------------------------------------------------------------------------
-# For loading a PEFT model, we need to use a special object for CausalLM from PEFT
-# instead of the regular HuggingFace object.
 import os, json, rich
-import torch # type: ignore
 
 from kbdebugger.types import ExtractionResult
 from kbdebugger.utils.json import ensure_json_object
+from kbdebugger.llm.batch_planner import TRIPLETS_STAGE
 from kbdebugger.llm.model_access import respond
-from kbdebugger.llm.hf_backend import use_hf_local, get_hf_causal_model
-from kbdebugger.prompts import render_prompt
+from kbdebugger.prompts import PromptParts, render_prompt_parts
 from .utils import coerce_triplets
 
-def build_triplet_extraction_prompt(sentence: str) -> str:
-    return render_prompt(
+def build_triplet_extraction_prompt(sentence: str) -> PromptParts:
+    return render_prompt_parts(
         "triplets_single",
+        dynamic_var="sentence_json",
         sentence_json=json.dumps(sentence.strip(), ensure_ascii=False),
     )
 
 # -------------------------
-# LLM path (Groq / HTTP / any responder)
+# LLM path (Groq / HTTP / HF local — any responder)
 # -------------------------
 def _extract_via_llm(sentence: str) -> ExtractionResult:
     """
@@ -33,9 +29,11 @@ def _extract_via_llm(sentence: str) -> ExtractionResult:
     prompt = build_triplet_extraction_prompt(sentence)
 
     response = respond(
-        prompt, 
+        prompt.text,
+        prompt_prefix=prompt.prefix,
         max_tokens=512,
         temperature=0.0,
+        stage=TRIPLETS_STAGE.name,
         # If using Groq, this triggers JSON object mode; other backends ignore it.
         json_mode=True)
 
@@ -44,44 +42,14 @@ def _extract_via_llm(sentence: str) -> ExtractionResult:
     obj = ensure_json_object(response)
     return coerce_triplets(obj, sentence)
 
-# -------------------------
-# HF path (lazy-loaded local model)
-# -------------------------
-@torch.no_grad()
-def _extract_via_hf(sentence: str) -> ExtractionResult:
-    empty: ExtractionResult = {"sentence": sentence, "triplets": []}
-    try:
-        model, tokenizer, device = get_hf_causal_model()
-    except Exception as e:
-        rich.print(f"[extract_triplets] ❌ Could not load HF model: {e}")
-        return empty
-
-    prompt = build_triplet_extraction_prompt(sentence)
-    inputs = tokenizer(prompt, return_tensors="pt", padding=True)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
-
-    output_tokens = model.generate(
-        inputs["input_ids"],
-        attention_mask=inputs.get("attention_mask"),
-        pad_token_id=tokenizer.pad_token_id,
-        max_new_tokens=128,
-    )[0]
-
-    res_text = tokenizer.decode(output_tokens, skip_special_tokens=True)
-    # remove prompt echo if present
-    res_text = res_text.replace(prompt, "")
-
-    obj = ensure_json_object(res_text)
-    return coerce_triplets(obj, sentence)
-
 # -------------------------
 # Public API
 # -------------------------
 def extract_triplets(sentence: str) -> ExtractionResult:
     """
-    Choose backend by MODEL_BACKEND.
-    If 'hf_local', run HF; otherwise use remote LLM responder (e.g., Groq).
+    Extract triplets for one sentence with the backend selected by MODEL_BACKEND.
+
+    With 'hf_local', concurrent calls are batched into one local `generate`
+    (see `llm.hf_generation`).
     """
-    if use_hf_local():
-        return _extract_via_hf(sentence)
     return _extract_via_llm(sentence)
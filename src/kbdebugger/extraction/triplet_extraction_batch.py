@@ -1,25 +1,30 @@
 import math
 import os
-from typing import Iterable, List, Sequence
-from kbdebugger.llm.hf_backend import use_hf_local, get_hf_causal_model
-from kbdebugger.llm.model_access import respond
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from kbdebugger.llm.model_access import respond, acomplete_batch
+from kbdebugger.llm.batch_repair import arequest_with_repair, batch_items_from_completion
+from kbdebugger.llm.batch_planner import TRIPLETS_STAGE, PlannedBatch, get_batch_planner
+from kbdebugger.llm.concurrency import map_bounded
+from kbdebugger.llm.micro_batcher import MicroBatcher, get_micro_batcher, micro_batching_enabled
 from kbdebugger.novelty.types import QualityNoveltyResult
-from kbdebugger.prompts import load_json_resource, render_prompt
+from kbdebugger.prompts import PromptParts, load_examples_json, load_output_schema, render_prompt_parts
+from kbdebugger.prompts.compaction import compact_prompt
 from kbdebugger.utils.json import ensure_json_object
 from kbdebugger.types import ExtractionResult
-from kbdebugger.utils import batched
 from kbdebugger.extraction.utils import (
     coerce_triplets_batch, 
+    coerce_triplets_batch_by_id,
     save_results_json,
     load_triplet_qualifying_decisions,
 )
 import json
 from kbdebugger.subgraph_similarity.types import KeptQuality
-import torch # type: ignore
 import rich
-from rich.progress import track
 
-def build_triplet_extraction_prompt_batch(sentences: list[str]) -> str:
+ExtractionResultCallback = Callable[[ExtractionResult], None]
+
+
+def build_triplet_extraction_prompt_batch(sentences: list[str]) -> PromptParts:
     """
     Build a prompt that asks the LLM to extract triplets for multiple sentences
     in one call, returning a single JSON object:
@@ -30,24 +35,28 @@ def build_triplet_extraction_prompt_batch(sentences: list[str]) -> str:
         ...
       ]
     }
+
+    The prompt is split into the cached static prefix (instructions + examples)
+    and the sentences payload (compacted, see `prompts.compaction`).
     """
-    # Load few-shot examples once from JSON
-    examples = load_json_resource("triplets_batch")
-    examples_json = json.dumps(examples, ensure_ascii=False)
+    # Few-shot examples, serialized once
+    examples_json = load_examples_json("triplets_batch")
     
     payload = [
         {"id": i, "sentence": s.strip()}
         for i, s in enumerate(sentences)
         if s.strip()
     ]
-    payload_json = json.dumps(payload, ensure_ascii=False)
-    
-    
-    return render_prompt(
-        "triplets_batch", 
-        examples_json=examples_json,
-        payload_json=payload_json
-    )
+
+    def _render(payload_json: str, compact_examples_json: Optional[str]) -> PromptParts:
+        return render_prompt_parts(
+            "triplets_batch",
+            dynamic_var="payload_json",
+            examples_json=compact_examples_json or examples_json,
+            payload_json=payload_json
+        )
+
+    return compact_prompt("triplets_batch", payload, render=_render, stage=TRIPLETS_STAGE.name)
 
 
 def _extract_batch_via_llm(sentences: list[str]) -> list[ExtractionResult]:
@@ -56,10 +65,14 @@ def _extract_batch_via_llm(sentences: list[str]) -> list[ExtractionResult]:
 
     prompt = build_triplet_extraction_prompt_batch(sentences)
     response = respond(
-        prompt,
+        prompt.text,
+        prompt_prefix=prompt.prefix,
         max_tokens=4096,
         temperature=0.0,
-        json_mode=True
+        json_mode=True,
+        stage=TRIPLETS_STAGE.name,
+        batch_size=len(sentences),
+        json_schema=load_output_schema("triplets_batch"),
     )
 
     parsed = ensure_json_object(response)
@@ -68,59 +81,149 @@ def _extract_batch_via_llm(sentences: list[str]) -> list[ExtractionResult]:
     return triplets
 
 
-@torch.no_grad()
-def _extract_batch_via_hf(sentences: list[str]) -> list[ExtractionResult]:
+async def _aextract_batch_via_llm(
+    batch: PlannedBatch[str],
+    on_result: Optional[ExtractionResultCallback] = None,
+) -> list[ExtractionResult]:
+    """
+    Async twin of `_extract_batch_via_llm` for the bounded concurrent executor.
+
+    Uses the batch's planned `max_tokens` and reports every response back to
+    the batch planner. If the response is truncated or skips sentences, only
+    the missing sentences are re-requested (`llm.batch_repair`).
+
+    `on_result` sees each sentence's result once, as soon as it is parsed
+    (streamed when LLM_STREAMING is enabled).
+    """
+    sentences = batch.items
     if not sentences:
         return []
 
-    try:
-        model, tokenizer, device = get_hf_causal_model()
-    except Exception as e:
-        rich.print(f"[extract_triplets_batch] ❌ Could not load HF model: {e}")
-        return [{"sentence": s, "triplets": []} for s in sentences]
+    planner = get_batch_planner()
+    emitted: set[int] = set()
+
+    async def _call(pairs: List[tuple[int, str]]) -> Dict[int, ExtractionResult]:
+        sub = [s for _, s in pairs]
+        prompt = build_triplet_extraction_prompt_batch(sub)
+
+        def _emit(element: Any) -> None:
+            if on_result is None:
+                return
+            for i, result in coerce_triplets_batch_by_id({"triplets_batch": [element]}, sub).items():
+                if pairs[i][0] not in emitted:
+                    emitted.add(pairs[i][0])
+                    on_result(result)
+
+        completion = await acomplete_batch(
+            prompt.text,
+            key="triplets_batch",
+            prompt_prefix=prompt.prefix,
+            on_item=_emit if on_result is not None else None,
+            max_tokens=batch.max_tokens,
+            temperature=0.0,
+            json_mode=True,
+            stage=TRIPLETS_STAGE.name,
+            batch_size=len(sub),
+            json_schema=load_output_schema("triplets_batch"),
+        )
+        planner.observe(
+            TRIPLETS_STAGE,
+            input_tokens=sum(planner.count_tokens(s) for s in sub),
+            n_items=len(sub),
+            response=completion.text,
+            truncated=completion.truncated,
+        )
+
+        # Prompt ids are local to this (sub-)batch; map them back to batch positions.
+        items = batch_items_from_completion(completion, "triplets_batch")
+        local = coerce_triplets_batch_by_id({"triplets_batch": items}, sub)
+        return {pairs[i][0]: result for i, result in local.items()}
+
+    resolved = await arequest_with_repair(
+        list(enumerate(sentences)),
+        _call,
+        on_unresolved=lambda _i, s: {"sentence": s, "triplets": []},
+        label="extract_triplets_batch",
+    )
+    return [resolved[i] for i in range(len(sentences))]
 
-    prompt = build_triplet_extraction_prompt_batch(sentences)
-    inputs = tokenizer(prompt, return_tensors="pt", padding=True)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
 
-    output_tokens = model.generate(
-        inputs["input_ids"],
-        attention_mask=inputs.get("attention_mask"),
-        pad_token_id=tokenizer.pad_token_id,
-        max_new_tokens=512,
-    )[0]
+def _triplets_prompt_overhead_tokens() -> int:
+    return get_batch_planner().count_tokens(build_triplet_extraction_prompt_batch([]).text)
 
-    res_text = tokenizer.decode(output_tokens, skip_special_tokens=True)
-    res_text = res_text.replace(prompt, "")
 
-    parsed = ensure_json_object(res_text)
-    return coerce_triplets_batch(parsed, sentences)
+def _triplets_micro_batcher() -> MicroBatcher[str, ExtractionResult]:
+    """
+    The shared cross-job triplet extraction batcher (`llm.micro_batcher`).
+    """
+    return get_micro_batcher(
+        (TRIPLETS_STAGE.name,),
+        lambda: MicroBatcher(
+            TRIPLETS_STAGE,
+            _aextract_batch_via_llm,
+            text_of=lambda s: s,
+            prompt_overhead_tokens=_triplets_prompt_overhead_tokens,
+        ),
+    )
 
 
 def extract_triplets_batch(
     sentences: Iterable[str],
     *,
-    batch_size: int = 5,
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    on_result: Optional[ExtractionResultCallback] = None,
 ) -> List[ExtractionResult]:
+    """
+    Extract S-P-O triplets for many sentences, several sentences per LLM call.
+
+    Batches are planned by `llm.batch_planner` (token-budgeted when
+    `batch_size` is None, fixed-size otherwise), sent concurrently (at most
+    `max_concurrency` in flight, default: LLM_MAX_CONCURRENCY) and results are
+    returned in input order.
+
+    `on_result` (optional) is called once per sentence as soon as its triplets
+    are parsed — while the batch is still generating when LLM_STREAMING is
+    enabled — so e.g. a KG upsert can start before the stage finishes.
+
+    With LLM_MICRO_BATCHING, the sentences are submitted one by one to the
+    shared cross-job batcher instead (`batch_size` / `max_concurrency` do not
+    apply, and `on_result` is called as each sentence's batch completes).
+    """
     sent_list = [s.strip() for s in sentences if s and s.strip()]
     if not sent_list:
         return []
 
     all_results: List[ExtractionResult] = []
 
-    num_batches = math.ceil(len(sent_list) / batch_size) # No iterator materialization
-
-    for batch in track(
-        batched(sent_list, batch_size),
-        description=f"🧬 Triplet extraction: sentences → S-P-O. (batch size={batch_size}, num_batches={num_batches})",
-        total=num_batches,
-    ):
-        # if use_hf_local():
-        #     batch_results = _extract_batch_via_hf(batch)
-        # else:
-        #     batch_results = _extract_batch_via_llm(batch)
-        
-        batch_results = _extract_batch_via_llm(batch)
+    planner = get_batch_planner()
+    if micro_batching_enabled():
+        all_results = _triplets_micro_batcher().map(
+            sent_list,
+            on_item=(lambda _i, result: on_result(result)) if on_result else None,
+        )  # type: ignore[assignment]
+        planner.save()
+        save_results_json(all_results)
+        return all_results
+
+    groups = planner.plan(
+        TRIPLETS_STAGE,
+        sent_list,
+        text_of=lambda s: s,
+        prompt_overhead_tokens=_triplets_prompt_overhead_tokens(),
+        batch_size=batch_size,
+    )
+    num_batches = len(groups)
+    batch_size_label = batch_size if batch_size is not None else "adaptive"
+
+    group_results = map_bounded(
+        lambda b: _aextract_batch_via_llm(b, on_result),
+        groups,
+        max_concurrency=max_concurrency,
+        description=f"🧬 Triplet extraction: sentences → S-P-O. (batch size={batch_size_label}, num_batches={num_batches})",
+    )
+    planner.save()
+    for batch_results in group_results:
         all_results.extend(batch_results)
 
     save_results_json(all_results)
@@ -131,7 +234,7 @@ def extract_triplets_batch(
 def extract_triplets_from_novelty_results(
     results: Sequence[QualityNoveltyResult],
     *,
-    batch_size: int = 5,
+    batch_size: Optional[int] = None,
 ) -> List[ExtractionResult]:
     """
     Extract KG triplets from novelty results based on decision policy.
@@ -142,36 +245,57 @@ def extract_triplets_from_novelty_results(
     3) Extracts the corresponding quality sentences
     4) Calls extract_triplets_batch on them
 
+    Results that already carry `triplets` (fused novelty + triplets mode,
+    `classify_qualities_novelty(..., fused_triplets=True)`) are used as they
+    are; only the others go through `extract_triplets_batch`, so a fully
+    fused run makes no triplet extraction LLM call at all. The decision filter
+    applies in both modes: fusing only changes how many LLM rounds are made.
+
     Args:
         results:
             Novelty comparator results.
         batch_size:
-            Batch size for LLM triplet extraction.
+            Fixed batch size for LLM triplet extraction
+            (None = token-aware adaptive batching).
 
     Returns:
-        List of ExtractionResult.
+        List of ExtractionResult, in the order of `results`.
     """
-    # qualifying_decisions = load_triplet_qualifying_decisions()
+    qualifying_decisions = load_triplet_qualifying_decisions()
 
-    sentences: List[str] = [
-        r.quality
+    selected = [
+        r
         for r in results
-        # if r.decision in qualifying_decisions
+        if r.quality.strip() # extract_triplets_batch drops empty sentences too
+        and r.decision in qualifying_decisions
     ]
 
-    if not sentences:
-        return []
-
-    return extract_triplets_batch(
-        sentences,
-        batch_size=batch_size,
+    sentences: List[str] = [r.quality for r in selected if r.triplets is None]
+    extracted = iter(
+        extract_triplets_batch(sentences, batch_size=batch_size) if sentences else []
     )
 
+    out: List[ExtractionResult] = [
+        next(extracted) if r.triplets is None
+        else {"sentence": r.quality, "triplets": list(r.triplets)}
+        for r in selected
+    ]
+
+    fused = len(selected) - len(sentences)
+    if fused:
+        rich.print(
+            f"[INFO] 🧬 Used fused novelty triplets for {fused}/{len(selected)} qualities "
+            f"({len(sentences)} sent to triplet extraction)."
+        )
+        save_results_json(out)
+
+    return out
+
 
 def extract_triplets_from_kept_qualities(
     kept_qualities: Sequence[KeptQuality],
     *,
-    batch_size: int = 5,
+    batch_size: Optional[int] = None,
 ) -> List[ExtractionResult]:
 
     sentences: List[str] = [
@@ -1,4 +1,4 @@
-from typing import Callable, List
+from typing import Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
 from enum import Enum
 
 class SourceKind(str, Enum):
@@ -11,6 +11,21 @@ Qualities = list[str]  # e.g., ["Transparency is a property of KI system.", ...]
 TextDecomposer = Callable[[str], Qualities] # e.g., decompose("some text") -> ["quality1", "quality2", ...]
 BatchTextDecomposer = Callable[[List[str]], List[Qualities]] # e.g., decompose_batch(["text1", "text2"]) -> [["quality1", ...], ["qualityA", ...]]
 
+ChunkQualitiesCallback = Callable[[int, Qualities], None] # e.g., on_item(3, ["quality1", ...]) as soon as chunk 3 is decomposed
+ServedBy = Dict[int, Tuple[str, str]] # e.g., {3: ("groq", "llama-3.1-8b-instant")}: backend/model that answered chunk 3
+
+class AsyncBatchTextDecomposer(Protocol):
+    # e.g., await adecompose_batch(["text1", "text2"], max_tokens=1500, on_item=print)
+    def __call__(
+        self,
+        texts: List[str],
+        *,
+        max_tokens: Optional[int] = None,
+        on_item: Optional[ChunkQualitiesCallback] = None,
+        served_by: Optional[ServedBy] = None,
+    ) -> Awaitable[List[Qualities]]: ...
+
+
 class DecomposeMode(str, Enum):
     SENTENCES = "sentences"
     CHUNKS = "chunks"
@@ -1,8 +1,6 @@
 import os
-from random import random
 import re
-from time import time
-from typing import Any, Callable, List, Optional, TypeVar
+from typing import Any, List, Optional
 
 from kbdebugger.novelty.types import NoveltyDecision
 from kbdebugger.types import ExtractionResult, TripletSubjectObjectPredicate
@@ -31,7 +29,7 @@ def coerce_triplets(item: Dict[str, Any], fallback_sentence: str) -> ExtractionR
     return {"sentence": str(sentence), "triplets": triplets}
 
 
-def coerce_triplets_batch(obj: Dict[str, Any], sentences: List[str]) -> List[ExtractionResult]:
+def coerce_triplets_batch_by_id(obj: Dict[str, Any], sentences: List[str]) -> Dict[int, ExtractionResult]:
     """
     Coerce the LLM batch output of shape:
     {
@@ -40,15 +38,16 @@ def coerce_triplets_batch(obj: Dict[str, Any], sentences: List[str]) -> List[Ext
         ...
       ]
     }
-    into a list[ExtractionResult], aligned by input index.
+    into a *sparse* id -> ExtractionResult mapping.
+
+    Only ids that the model actually returned (and that are in range) are
+    present, so callers can tell "no triplets" apart from "item missing".
     """
-    # Default: one empty result per input sentence
-    empty: ExtractionResult = {"sentence": "", "triplets": []}
-    results: List[ExtractionResult] = [empty for _ in sentences]
+    out: Dict[int, ExtractionResult] = {}
 
     batch = obj.get("triplets_batch", [])
     if not isinstance(batch, list):
-        return results
+        return out
 
     # Map by id, but also be robust
     for item in batch:
@@ -57,14 +56,22 @@ def coerce_triplets_batch(obj: Dict[str, Any], sentences: List[str]) -> List[Ext
 
         idx = item.get("id")
         if isinstance(idx, int) and 0 <= idx < len(sentences):
-            results[idx] = coerce_triplets(item, sentences[idx])
+            out[idx] = coerce_triplets(item, sentences[idx])
+
+    return out
 
-    # Fill any missing entries with fallback (no triplets)
-    for i, res in enumerate(results):
-        if res["sentence"] == "":
-            results[i] = {"sentence": sentences[i], "triplets": []}
 
-    return results
+def coerce_triplets_batch(obj: Dict[str, Any], sentences: List[str]) -> List[ExtractionResult]:
+    """
+    Dense variant of `coerce_triplets_batch_by_id`: a list[ExtractionResult]
+    aligned by input index, where missing entries get a fallback
+    (the input sentence with no triplets).
+    """
+    by_id = coerce_triplets_batch_by_id(obj, sentences)
+    return [
+        by_id.get(i, {"sentence": sentence, "triplets": []})
+        for i, sentence in enumerate(sentences)
+    ]
 
 
 def coerce_qualities(obj: Dict) -> Qualities:
@@ -219,81 +226,3 @@ def load_triplet_qualifying_decisions() -> set[NoveltyDecision]:
         decisions = fallback
 
     return decisions
-
-# ---------------------------------------------------------------------------
-# Parallelism helpers
-# ---------------------------------------------------------------------------
-T = TypeVar("T")
-
-_RETRY_AFTER_RE = re.compile(r"try again in\s+([0-9]*\.?[0-9]+)s", re.IGNORECASE)
-
-
-def _extract_retry_after_seconds(error_text: str) -> Optional[float]:
-    """
-    Extract a retry delay (in seconds) from Groq-style 429 error messages.
-
-    Example message fragment:
-        "Please try again in 13.45s."
-
-    Returns
-    -------
-    Optional[float]
-        The parsed delay in seconds if present, otherwise None.
-    """
-    match = _RETRY_AFTER_RE.search(error_text or "")
-    if not match:
-        return None
-
-    try:
-        return float(match.group(1))
-    except ValueError:
-        return None
-    
-
-def _call_with_rate_limit_retries(
-    fn: Callable[[], T],
-    *,
-    max_retries: int = 8,
-    default_backoff_s: float = 2.0,
-    max_sleep_s: float = 30.0,
-) -> T:
-    """
-    Call `fn()` with rate-limit-aware retries.
-
-    Strategy
-    --------
-    - If the exception message contains "try again in Xs", sleep for X seconds
-      (+ small jitter) and retry.
-    - Otherwise, use a conservative exponential backoff.
-
-    Why this exists
-    ---------------
-    Groq on-demand has strict TPM (Token-per-Minute) limits. When we batch or parallelize,
-    occasional 429s are expected. Dropping a batch silently corrupts results.
-
-    Raises
-    ------
-    RuntimeError
-        If all retry attempts fail.
-    """
-    last_err: Exception | None = None
-
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn()
-        except Exception as e:  # SDKs often raise generic exceptions
-            last_err = e
-            msg = str(e)
-
-            retry_after = _extract_retry_after_seconds(msg)
-            if retry_after is not None:
-                # Add a tiny jitter to avoid synchronizing retries across threads.
-                sleep_s = retry_after + random.uniform(0.1, 0.4)
-            else:
-                # Exponential backoff for unknown transient failures
-                sleep_s = default_backoff_s * (2 ** (attempt - 1))
-
-            sleep_s = min(sleep_s, max_sleep_s)
-            time.sleep(sleep_s)
-
-    raise RuntimeError(f"LLM call failed after {max_retries} retries") from last_err
\ No newline at end of file
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
 
 from kbdebugger.types.ui import ProgressCallback
 from rich.progress import track
@@ -11,6 +13,41 @@ from .types import (
 )
 from .logging import save_keybert_result
 
+Embed = Callable[[List[str]], np.ndarray]
+# texts -> L2-normalized embeddings (N, dim)
+
+
+def _load_embedding_model(cfg: KeyBERTConfig) -> Tuple[Any, Embed]:
+    """
+    The model handed to KeyBERT, and an `embed` function for the similarity fallbacks.
+
+    With KB_ENCODER_BACKEND=onnx both use the cached ONNX export
+    (`subgraph_similarity.onnx_encoder`) instead of PyTorch.
+    """
+    if cfg.encoder_backend == "onnx":
+        from keybert.backend import BaseEmbedder
+        from kbdebugger.subgraph_similarity.onnx_encoder import get_onnx_encoder
+
+        encoder = get_onnx_encoder(cfg.embedding_model, normalize=True, int8=cfg.encoder_onnx_int8)
+
+        class _OnnxEmbedder(BaseEmbedder):
+            def embed(self, documents: Any, verbose: bool = False) -> np.ndarray:
+                return encoder.encode(list(documents))
+
+        return _OnnxEmbedder(), lambda texts: encoder.encode(texts)
+
+    from sentence_transformers import SentenceTransformer
+
+    sentence_model = SentenceTransformer(cfg.embedding_model)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            sentence_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    return sentence_model, embed
+
 
 def run_keybert_matching(
     paragraphs: List[str],
@@ -49,16 +86,16 @@ def run_keybert_matching(
     separate lists for matched and unmatched paragraphs.
     """
     from keybert import KeyBERT
-    from sentence_transformers import SentenceTransformer, util as sbert_util
 
     cfg = config or KeyBERTConfig()
     synonyms = synonyms or []
     synonym_set = set(s.lower() for s in synonyms)
     search_keyword_lower = search_keyword.lower()
 
-    sentence_model = SentenceTransformer(cfg.embedding_model)
-    kw_model = KeyBERT(sentence_model)
-    search_keyword_embedding = sentence_model.encode(search_keyword, convert_to_tensor=True)
+    embedding_model, embed = _load_embedding_model(cfg)
+    kw_model = KeyBERT(embedding_model)
+    search_keyword_embedding = embed([search_keyword])[0]
+    # Embeddings are unit vectors, so cosine similarity is a dot product.
 
     matched: List[ParagraphMatch] = []
     unmatched: List[ParagraphMatch] = []
@@ -103,37 +140,22 @@ def run_keybert_matching(
             # Step 3: Fallback to semantic similarity
 
             # Fallback 1: Cosine similarity with the paragraph as a whole
-            paragraph_embedding = sentence_model.encode(paragraph, convert_to_tensor=True)
-            similarity_score = float(
-                sbert_util.cos_sim(
-                    search_keyword_embedding, 
-                    paragraph_embedding
-                )
-                .item()
-            ) 
-            # similaroty_score is a 1x1 tensor -- a matrix with a single cosine similarity value
-            # .item() extracts the scalar value from a tensor (e.g., tensor([[0.4632]]) → 0.4632)
+            paragraph_embedding = embed([paragraph])[0]
+            similarity_score = float(search_keyword_embedding @ paragraph_embedding)
             if similarity_score >= cfg.search_kw_to_paragraph_similarity_threshold:
                 match_type = "near_paragraph_global"
                 score = similarity_score
             else:
                 # Fallback 2: Compare to each extracted keyword in this paragraph
-                keyword_embeddings = sentence_model.encode(paragraph_keywords, convert_to_tensor=True)
-                # - keyword_embeddings is a list of vectors, one for each extracted keyword.
-                # - So if a paragraph has 8 keywords, then this will be a tensor of shape: [8, embedding_dim].
-                sim_scores = sbert_util.cos_sim(
-                    search_keyword_embedding, 
-                    keyword_embeddings
-                )[0]
-                # - This is comparing a single vector (1 × dim) vs. a matrix (8 × dim).
-                # - The result will be a 1×8 matrix: cosine similarity of the keyword with each of the 8 keywords.
-
-                # 🧾 What does [0] do?
-                # - It removes the first dimension ([1, N] → [N]) to give you a flat list of scores.
-                # - Now sim_scores is a 1D tensor with N values (one per keyword).
-                
+                keyword_embeddings = embed(paragraph_keywords)
+                # - keyword_embeddings holds one vector per extracted keyword.
+                # - So if a paragraph has 8 keywords, this is an array of shape: [8, embedding_dim].
+                sim_scores = keyword_embeddings @ search_keyword_embedding
+                # - Comparing a single vector (dim) against a matrix (8 × dim)
+                #   gives one cosine similarity per keyword: shape [8].
+
                 # We want the most semantically similar keyword match, so we take the highest similarity value.
-                max_score = float(sim_scores.max().item())
+                max_score = float(sim_scores.max()) if len(sim_scores) else 0.0
                 if max_score >= cfg.search_kw_to_keywords_similarity_threshold:
                     match_type = "near_paragraph_keywords"
                     score = max_score
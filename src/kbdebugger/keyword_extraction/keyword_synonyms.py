@@ -1,4 +1,4 @@
-from kbdebugger.prompts import render_prompt
+from kbdebugger.prompts import render_prompt_parts
 from kbdebugger.llm.model_access import respond
 from kbdebugger.utils import ensure_json_object
 import rich
@@ -18,9 +18,16 @@ def generate_synonyms_for_keyword(keyword: str) -> list[str]:
     list[str]
         A list of synonym strings to be used in downstream semantic expansion.
     """
-    prompt = render_prompt("keyword_synonyms", keyword=keyword)
+    prompt = render_prompt_parts("keyword_synonyms", dynamic_var="keyword", keyword=keyword)
 
-    raw = respond(prompt, json_mode=True, temperature=0.0, max_tokens=512)
+    raw = respond(
+        prompt.text,
+        prompt_prefix=prompt.prefix,
+        json_mode=True,
+        temperature=0.0,
+        max_tokens=512,
+        stage="keyword_synonyms",
+    )
     obj = ensure_json_object(raw)
     synonyms = obj.get("synonyms", [])
     
@@ -1,5 +1,6 @@
 
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from typing import List, Literal, Optional, Tuple
 
 from kbdebugger.compat.langchain import Document
@@ -36,6 +37,12 @@ class KeyBERTConfig:
     search_kw_to_paragraph_similarity_threshold: float = 0.45  # Fallback semantic similarity (paragraph vs keyword)
     search_kw_to_keywords_similarity_threshold: float = 0.65
 
+    # Same switches as the vector similarity encoder (see subgraph_similarity.onnx_encoder)
+    encoder_backend: str = field(default_factory=lambda: os.getenv("KB_ENCODER_BACKEND", "torch").strip().lower())
+    encoder_onnx_int8: bool = field(
+        default_factory=lambda: os.getenv("KB_ENCODER_ONNX_INT8", "false").strip().lower() in {"1", "true", "yes"}
+    )
+
 
 
 @dataclass(frozen=True)
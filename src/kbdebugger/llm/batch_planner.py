@@ -0,0 +1,324 @@
+"""
+Token-aware batch planning for batched LLM prompts.
+
+Items are packed greedily, in order, until the prompt plus the expected output
+would exceed the context budget (or the output cap), and each call's
+`max_tokens` is sized from the items it contains. Expected output per item is
+`per_item_overhead + ratio * input_tokens`, with `ratio` learned per stage
+from observed responses and persisted across runs.
+
+Environment variables
+---------------------
+LLM_CONTEXT_TOKENS:
+    Context window budget per call (prompt + completion). Default: 8192
+
+LLM_MAX_OUTPUT_TOKENS:
+    Upper bound for the planned `max_tokens` of a single call. Default: 4096
+
+LLM_BATCH_MAX_ITEMS:
+    Upper bound for the number of items in one batch. Default: 20
+
+LLM_BATCH_STATS_PATH:
+    JSON file where learned per-stage output ratios are stored.
+    Empty disables persistence. Default: ".cache/batch_output_stats.json"
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Generic, List, Optional, Sequence, TypeVar
+
+from .rate_limit import CHARS_PER_TOKEN
+
+T = TypeVar("T")
+
+TokenCounter = Callable[[str], int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Heuristic token count (~4 characters per token).
+    """
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN))
+
+
+@dataclass(frozen=True, slots=True)
+class StageProfile:
+    """
+    Prior output model of one batched stage.
+
+    Attributes
+    ----------
+    name:
+        Key under which the learned ratio is stored.
+    per_item_overhead:
+        Output tokens per item that do not depend on its length
+        (JSON keys, ids, decision labels, ...).
+    default_ratio:
+        Output tokens per input token, used until observations exist.
+    """
+    name: str
+    per_item_overhead: int
+    default_ratio: float
+
+
+# Priors for the stages in this repo (refined from observations at runtime).
+DECOMPOSE_STAGE = StageProfile(name="decompose", per_item_overhead=16, default_ratio=1.2)
+NOVELTY_STAGE = StageProfile(name="novelty", per_item_overhead=120, default_ratio=0.1)
+TRIPLETS_STAGE = StageProfile(name="triplets", per_item_overhead=24, default_ratio=2.0)
+# Fused novelty + triplets prompt: a novelty answer plus the quality's triplets.
+NOVELTY_TRIPLETS_STAGE = StageProfile(name="novelty_triplets", per_item_overhead=140, default_ratio=0.5)
+
+
+@dataclass(frozen=True, slots=True)
+class BatchPlannerConfig:
+    """
+    Budgets used to pack batches.
+    """
+    context_tokens: int = 8192
+    max_output_tokens: int = 4096
+    max_items_per_batch: int = 20
+    min_output_tokens: int = 256
+    safety_margin: float = 1.3
+    ema_alpha: float = 0.2
+    stats_path: str = ".cache/batch_output_stats.json"
+
+    @classmethod
+    def from_env(cls) -> BatchPlannerConfig:
+        context_tokens = int(os.getenv("LLM_CONTEXT_TOKENS", "8192").strip())
+        max_output_tokens = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "4096").strip())
+        max_items = int(os.getenv("LLM_BATCH_MAX_ITEMS", "20").strip())
+        stats_path = os.getenv("LLM_BATCH_STATS_PATH", ".cache/batch_output_stats.json").strip()
+
+        return cls(
+            context_tokens=max(512, context_tokens),
+            max_output_tokens=max(64, max_output_tokens),
+            max_items_per_batch=max(1, max_items),
+            stats_path=stats_path,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedBatch(Generic[T]):
+    """
+    One LLM call worth of items.
+
+    Attributes
+    ----------
+    items:
+        Items in input order.
+    start:
+        Index of the first item in the original sequence (stable id offset).
+    max_tokens:
+        Completion budget for this call.
+    input_tokens:
+        Estimated tokens of the items themselves (without prompt overhead);
+        pass it back to `BatchPlanner.observe`.
+    """
+    items: List[T]
+    start: int
+    max_tokens: int
+    input_tokens: int
+
+
+class BatchPlanner:
+    """
+    Packs items into token-budgeted batches and learns per-stage output ratios.
+
+    Thread-safe: `observe()` may be called concurrently from the async executor.
+    """
+
+    def __init__(
+        self,
+        config: Optional[BatchPlannerConfig] = None,
+        *,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        self.config = config or BatchPlannerConfig.from_env()
+        self.count_tokens: TokenCounter = token_counter or estimate_tokens
+        self._lock = Lock()
+        self._ratios: Dict[str, Dict[str, float]] = self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        path = self.config.stats_path
+        if not path or not Path(path).is_file():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        """
+        Persist learned ratios (no-op when LLM_BATCH_STATS_PATH is empty).
+        """
+        path = self.config.stats_path
+        if not path:
+            return
+        with self._lock:
+            data = json.dumps(self._ratios, indent=2, sort_keys=True)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # Output model
+    # ------------------------------------------------------------------
+    def ratio(self, stage: StageProfile) -> float:
+        with self._lock:
+            entry = self._ratios.get(stage.name)
+            return float(entry["ratio"]) if entry else stage.default_ratio
+
+    def expected_output(self, stage: StageProfile, input_tokens: int, *, n_items: int = 1) -> float:
+        return n_items * stage.per_item_overhead + self.ratio(stage) * input_tokens
+
+    def observe(
+        self,
+        stage: StageProfile,
+        *,
+        input_tokens: int,
+        n_items: int,
+        response: str,
+        truncated: bool = False,
+    ) -> None:
+        """
+        Update the stage's output ratio from one observed response.
+
+        A `truncated` response (cut off at `max_tokens`) only tells us the real
+        ratio is *at least* what was generated: it can raise the estimate but
+        never lower it, otherwise every truncation would shrink the next plan's
+        budget and truncate again.
+        """
+        if n_items <= 0 or input_tokens <= 0 or not response:
+            return
+
+        output_tokens = self.count_tokens(response)
+        sample = max(0.0, (output_tokens - n_items * stage.per_item_overhead) / input_tokens)
+
+        with self._lock:
+            entry = self._ratios.get(stage.name)
+            current = float(entry["ratio"]) if entry else stage.default_ratio
+            if truncated and sample <= current:
+                return
+            if entry is None:
+                self._ratios[stage.name] = {"ratio": sample, "samples": 1}
+                return
+            alpha = self.config.ema_alpha
+            entry["ratio"] = (1 - alpha) * float(entry["ratio"]) + alpha * sample
+            entry["samples"] = int(entry.get("samples", 0)) + 1
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+    def _budget_max_tokens(self, expected: float, input_tokens: int, prompt_overhead_tokens: int) -> int:
+        cfg = self.config
+        room = cfg.context_tokens - prompt_overhead_tokens - input_tokens
+        cap = max(cfg.min_output_tokens, min(cfg.max_output_tokens, room))
+        return int(min(cap, max(cfg.min_output_tokens, math.ceil(expected * cfg.safety_margin))))
+
+    def plan(
+        self,
+        stage: StageProfile,
+        items: Sequence[T],
+        *,
+        text_of: Callable[[T], str],
+        prompt_overhead_tokens: int = 0,
+        batch_size: Optional[int] = None,
+        max_tokens_per_item: Optional[int] = None,
+    ) -> List[PlannedBatch[T]]:
+        """
+        Split `items` into contiguous, order-preserving batches.
+
+        Parameters
+        ----------
+        stage:
+            Output model of the calling stage.
+        items:
+            Work items (paragraphs, kept qualities, sentences).
+        text_of:
+            Returns the text an item contributes to the prompt.
+        prompt_overhead_tokens:
+            Tokens of the prompt without any items (template + few-shot examples).
+        batch_size:
+            If given, use fixed-size batches (legacy behaviour) and only plan
+            `max_tokens`. If None, pack adaptively by token budget.
+        max_tokens_per_item:
+            Optional ceiling on the expected output of a single item.
+
+        Returns
+        -------
+        list[PlannedBatch]
+            Batches covering `items` exactly once, in order.
+        """
+        cfg = self.config
+        margin = cfg.safety_margin
+
+        def _expected(tokens: int) -> float:
+            out = self.expected_output(stage, tokens)
+            return min(out, max_tokens_per_item) if max_tokens_per_item else out
+
+        batches: List[PlannedBatch[T]] = []
+        current: List[T] = []
+        start = 0
+        in_tokens = 0
+        out_tokens = 0.0
+
+        def _close() -> None:
+            nonlocal current, in_tokens, out_tokens
+            if current:
+                batches.append(
+                    PlannedBatch(
+                        items=current,
+                        start=start,
+                        max_tokens=self._budget_max_tokens(out_tokens, in_tokens, prompt_overhead_tokens),
+                        input_tokens=in_tokens,
+                    )
+                )
+            current, in_tokens, out_tokens = [], 0, 0.0
+
+        for idx, item in enumerate(items):
+            tokens = self.count_tokens(text_of(item))
+            out = _expected(tokens)
+
+            if current:
+                if batch_size is not None:
+                    full = len(current) >= batch_size
+                else:
+                    new_out = (out_tokens + out) * margin
+                    full = (
+                        len(current) >= cfg.max_items_per_batch
+                        or new_out > cfg.max_output_tokens
+                        or prompt_overhead_tokens + in_tokens + tokens + new_out > cfg.context_tokens
+                    )
+                if full:
+                    _close()
+
+            if not current:
+                start = idx
+            current.append(item)
+            in_tokens += tokens
+            out_tokens += out
+
+        _close()
+        return batches
+
+
+@lru_cache(maxsize=1)
+def get_batch_planner() -> BatchPlanner:
+    """
+    Process-wide batch planner (configured from the environment on first use).
+    """
+    return BatchPlanner()
@@ -0,0 +1,91 @@
+"""
+Recover batched LLM calls item by item instead of batch by batch.
+
+`arequest_with_repair` keeps every item a (possibly truncated) batched response
+did return, re-requests only the missing ids, halves a re-request that comes
+back empty, and gives up on an item only once it fails on its own.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Sequence, Tuple, TypeVar
+
+from kbdebugger.utils.json import ensure_json_object, salvage_json_array_items
+from .llm_protocol import LLMCompletion
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+R = TypeVar("R")
+
+BatchCall = Callable[[List[Tuple[K, T]]], Awaitable[Dict[K, R]]]
+# receives (id, item) pairs, returns {id: result} for the ids it could resolve
+
+
+def batch_items_from_completion(completion: LLMCompletion, key: str) -> List[Any]:
+    """
+    Return the array under `key` from a batched response.
+
+    If the response is not valid JSON (typically: truncated), the complete
+    array elements are salvaged instead.
+    """
+    obj = ensure_json_object(completion.text)
+    items = obj.get(key) if isinstance(obj, dict) else None
+    if isinstance(items, list):
+        return items
+    return salvage_json_array_items(completion.text, key)
+
+
+async def arequest_with_repair(
+    items: Sequence[Tuple[K, T]],
+    call: BatchCall[K, T, R],
+    *,
+    on_unresolved: Callable[[K, T], R],
+    label: str = "batch",
+) -> Dict[K, R]:
+    """
+    Resolve every `(id, item)` via `call`, re-issuing only missing ids.
+
+    Parameters
+    ----------
+    items:
+        `(id, item)` pairs of one batch. Ids must be unique.
+    call:
+        Issues one LLM call for the given pairs and returns the results it
+        could parse, keyed by id. Missing ids are retried; extra ids are ignored.
+        Exceptions (network, rate limit) propagate unchanged.
+    on_unresolved:
+        Result for an item that is still missing as a single-item call
+        (return a neutral value, or raise to fail the stage).
+    label:
+        Used in log lines.
+
+    Returns
+    -------
+    dict
+        One result per input id.
+    """
+    wanted = {k for k, _ in items}
+    got = {k: v for k, v in (await call(list(items))).items() if k in wanted}
+
+    missing = [(k, it) for k, it in items if k not in got]
+    if not missing:
+        return got
+
+    if len(items) == 1:
+        k, it = items[0]
+        print(f"[{label}] ⚠️ Item {k!r} unresolved after retrying it alone.")
+        got[k] = on_unresolved(k, it)
+        return got
+
+    print(f"[{label}] 🔁 {len(missing)}/{len(items)} items missing; re-requesting only those.")
+
+    if len(missing) < len(items):
+        # Progress was made: retry the missing ids as one smaller batch.
+        got.update(await arequest_with_repair(missing, call, on_unresolved=on_unresolved, label=label))
+        return got
+
+    # Nothing came back: split so the next attempts are strictly smaller.
+    mid = len(missing) // 2
+    for half in (missing[:mid], missing[mid:]):
+        got.update(await arequest_with_repair(half, call, on_unresolved=on_unresolved, label=label))
+    return got
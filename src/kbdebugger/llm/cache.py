@@ -0,0 +1,311 @@
+"""
+Content-addressed, persistent cache for LLM responses (opt-in).
+
+Sits in front of `respond()` / `arespond()`, keyed by
+sha256(prompt, backend, model, temperature, max_tokens, json_mode), where
+backend / model are those of the responder that answered. Stored in SQLite
+with size-based LRU eviction and an optional TTL.
+
+Environment variables
+---------------------
+LLM_CACHE_ENABLED:
+    Enable the cache. Default: "0"
+
+LLM_CACHE_PATH:
+    SQLite file path. Default: ".cache/llm_responses.sqlite3"
+
+LLM_CACHE_MAX_BYTES:
+    Upper bound for the total size of cached responses (bytes, UTF-8).
+    Default: 536870912 (512 MiB)
+
+LLM_CACHE_TTL_SECONDS:
+    Entries older than this are treated as misses and removed.
+    0 disables expiry. Default: 0
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional
+
+from .telemetry import current_llm_run
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseCacheConfig:
+    """
+    Runtime configuration for the LLM response cache.
+    """
+    enabled: bool = False
+    path: str = ".cache/llm_responses.sqlite3"
+    max_bytes: int = 512 * 1024 * 1024
+    ttl_seconds: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> ResponseCacheConfig:
+        enabled = os.getenv("LLM_CACHE_ENABLED", "0").strip().lower() in {"1", "true", "yes"}
+        path = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3").strip()
+        max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)).strip())
+        ttl_seconds = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0").strip())
+
+        return cls(
+            enabled=enabled and bool(path),
+            path=path,
+            max_bytes=max(0, max_bytes),
+            ttl_seconds=max(0.0, ttl_seconds),
+        )
+
+
+@dataclass
+class CacheStats:
+    """
+    Cache counters (monotonic). `ResponseCache.stats` counts the whole process,
+    `ResponseCache.run_stats(run_id)` one run opened with `open_run(run_id)`.
+    """
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    expired: int = 0
+
+    def snapshot(self) -> "CacheStats":
+        return CacheStats(**asdict(self))
+
+    def since(self, start: Optional["CacheStats"] = None) -> Dict[str, Any]:
+        """
+        Counters accumulated since `start` (default: all of them), plus the hit rate.
+        """
+        start = start or CacheStats()
+        hits = self.hits - start.hits
+        misses = self.misses - start.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "writes": self.writes - start.writes,
+            "evictions": self.evictions - start.evictions,
+            "expired": self.expired - start.expired,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+        }
+
+
+def make_cache_key(
+    *,
+    prompt: str,
+    backend: str,
+    model: str,
+    temperature: Any,
+    max_tokens: Any,
+    json_mode: Any,
+) -> str:
+    """
+    Content-address a request: sha256 over a canonical JSON encoding of its inputs.
+    """
+    material = json.dumps(
+        {
+            "prompt": prompt,
+            "backend": backend,
+            "model": model,
+            "temperature": None if temperature is None else float(temperature),
+            "max_tokens": None if max_tokens is None else int(max_tokens),
+            "json_mode": None if json_mode is None else bool(json_mode),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with size-based LRU eviction and optional TTL.
+
+    All public methods are thread-safe. When the config is disabled, `get`
+    always misses (without counting) and `put` is a no-op.
+    """
+
+    def __init__(self, config: Optional[ResponseCacheConfig] = None) -> None:
+        self.config = config or ResponseCacheConfig.from_env()
+        self.stats = CacheStats()
+        self._run_stats: Dict[str, CacheStats] = {}
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+
+        if self.config.enabled:
+            self._open()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        """
+        Bump `counter` process-wide and for the current run (if it is open).
+        Caller must hold `self._lock`.
+        """
+        setattr(self.stats, counter, getattr(self.stats, counter) + n)
+        run_id = current_llm_run()
+        run = self._run_stats.get(run_id) if run_id is not None else None
+        if run is not None:
+            setattr(run, counter, getattr(run, counter) + n)
+
+    def open_run(self, run_id: str) -> None:
+        """
+        Start counting the lookups made under `llm_run(run_id)`.
+        """
+        with self._lock:
+            self._run_stats.setdefault(run_id, CacheStats())
+
+    def close_run(self, run_id: str) -> CacheStats:
+        """
+        Stop counting for `run_id` and return its final counters.
+        """
+        with self._lock:
+            return self._run_stats.pop(run_id, None) or CacheStats()
+
+    def run_stats(self, run_id: str) -> CacheStats:
+        """
+        Snapshot of the counters of an open run.
+        """
+        with self._lock:
+            return (self._run_stats.get(run_id) or CacheStats()).snapshot()
+
+    def _open(self) -> None:
+        Path(self.config.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.config.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+        row = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._total_bytes = int(row[0])
+        self._conn = conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response for `key`, or None on a miss / expired entry.
+        """
+        if self._conn is None:
+            return None
+
+        now = time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._count("misses")
+                return None
+
+            value, size, created_at = row
+            if self.config.ttl_seconds and (now - created_at) > self.config.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= int(size)
+                self._count("expired")
+                self._count("misses")
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store a response and evict least-recently-used entries beyond `max_bytes`.
+
+        Empty responses are not cached: they are almost always failures.
+        """
+        if self._conn is None or not value:
+            return
+
+        size = len(value.encode("utf-8"))
+        if self.config.max_bytes and size > self.config.max_bytes:
+            return
+
+        now = time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._total_bytes -= int(old[0])
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size
+            self._count("writes")
+
+            if self.config.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """
+        Drop least-recently-used rows until the total size fits the budget.
+        Caller must hold `self._lock`.
+        """
+        assert self._conn is not None
+        while self._total_bytes > self.config.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= int(size)
+                self._count("evictions")
+                if self._total_bytes <= self.config.max_bytes:
+                    return
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses (counters are kept).
+        """
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Static facts about the cache (for run logs).
+        """
+        return {
+            "enabled": self.enabled,
+            "path": self.config.path if self.enabled else None,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.config.max_bytes,
+            "ttl_seconds": self.config.ttl_seconds or None,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> ResponseCache:
+    """
+    Process-wide response cache (configured from the environment on first use).
+    """
+    return ResponseCache()
@@ -0,0 +1,203 @@
+"""
+Bounded, order-preserving async fan-out for LLM stages.
+
+One long-lived event loop runs in a daemon thread, so async HTTP clients keep
+their connection pools across stages. Synchronous code calls
+`map_bounded(...)`, which runs the work on that loop and returns results in
+input order. The caller's context variables (request class, run id) are
+carried into the coroutines.
+
+Environment variables
+---------------------
+LLM_MAX_CONCURRENCY:
+    Default number of LLM requests in flight per stage.
+    Default: 8
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+from threading import Lock, Thread
+from typing import Awaitable, Callable, Coroutine, List, Optional, Sequence, TypeVar
+
+from rich.progress import Progress
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DoneCallback = Callable[[int, int], None]
+# done, total
+
+
+def default_max_concurrency() -> int:
+    """
+    Read the default in-flight request bound from LLM_MAX_CONCURRENCY.
+    """
+    raw = os.getenv("LLM_MAX_CONCURRENCY", "8").strip()
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return 8
+
+
+# ---------------------------------------------------------------------------
+# Shared background event loop
+# ---------------------------------------------------------------------------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[Thread] = None
+_loop_lock = Lock()
+
+
+def get_llm_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide LLM event loop, starting its daemon thread on first use.
+    """
+    global _loop, _loop_thread
+
+    with _loop_lock:
+        if _loop is not None and _loop.is_running():
+            return _loop
+
+        loop = asyncio.new_event_loop()
+        thread = Thread(target=loop.run_forever, name="kbdebugger-llm-loop", daemon=True)
+        thread.start()
+
+        _loop, _loop_thread = loop, thread
+        return loop
+
+
+async def _in_context(coro: Coroutine[object, object, T], ctx: contextvars.Context) -> T:
+    # The task runs in its own copy of the loop thread's context; the values
+    # set here stay private to it.
+    for var, value in ctx.items():
+        var.set(value)
+    return await coro
+
+
+def run_sync(coro: Coroutine[object, object, T]) -> T:
+    """
+    Run a coroutine on the shared LLM loop and block until it finishes.
+
+    The coroutine sees the calling thread's context variables.
+
+    Safe to call from any thread (Flask job threads, notebooks with a running
+    loop, ThreadPoolExecutor workers) except the LLM loop thread itself.
+
+    Raises
+    ------
+    RuntimeError
+        If called from inside the LLM loop (that would deadlock).
+    """
+    loop = get_llm_event_loop()
+
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the LLM event loop; await the coroutine instead.")
+
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), loop).result()
+
+
+# ---------------------------------------------------------------------------
+# Bounded fan-out
+# ---------------------------------------------------------------------------
+async def gather_bounded(
+    fn: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    *,
+    max_concurrency: Optional[int] = None,
+    on_done: Optional[DoneCallback] = None,
+) -> List[R]:
+    """
+    Await `fn(item)` for every item with at most `max_concurrency` in flight.
+
+    Parameters
+    ----------
+    fn:
+        Coroutine function applied to each item (typically: one LLM batch).
+    items:
+        Finite, indexable sequence of work items.
+    max_concurrency:
+        In-flight bound. Defaults to LLM_MAX_CONCURRENCY.
+    on_done:
+        Optional callback `(done, total)` invoked after each item completes,
+        in completion order (use it to drive progress bars).
+
+    Returns
+    -------
+    list[R]
+        Results aligned with `items` (input order, not completion order).
+
+    Raises
+    ------
+    Exception
+        The first exception raised by `fn` is propagated; remaining in-flight
+        items are cancelled. Wrap `fn` if you want per-item failure isolation.
+    """
+    total = len(items)
+    if total == 0:
+        return []
+
+    limit = max(1, max_concurrency or default_max_concurrency())
+    semaphore = asyncio.Semaphore(limit)
+    results: List[Optional[R]] = [None] * total
+    done = 0
+
+    async def _run(idx: int, item: T) -> None:
+        nonlocal done
+        async with semaphore:
+            results[idx] = await fn(item)
+        done += 1
+        if on_done:
+            on_done(done, total)
+
+    tasks = [asyncio.ensure_future(_run(i, item)) for i, item in enumerate(items)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    return results  # type: ignore[return-value]
+
+
+def map_bounded(
+    fn: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    *,
+    max_concurrency: Optional[int] = None,
+    on_done: Optional[DoneCallback] = None,
+    description: Optional[str] = None,
+) -> List[R]:
+    """
+    Synchronous entry point for `gather_bounded` (used by pipeline stages).
+
+    If `description` is given, a Rich progress bar is shown and advanced as
+    items complete (this replaces `rich.progress.track` for concurrent loops).
+    """
+    if not items:
+        return []
+
+    if description is None:
+        return run_sync(
+            gather_bounded(fn, items, max_concurrency=max_concurrency, on_done=on_done)
+        )
+
+    with Progress() as bar:
+        task_id = bar.add_task(description, total=len(items))
+
+        def _on_done(done: int, total: int) -> None:
+            bar.update(task_id, completed=done)
+            if on_done:
+                on_done(done, total)
+
+        return run_sync(
+            gather_bounded(fn, items, max_concurrency=max_concurrency, on_done=_on_done)
+        )
@@ -1,26 +1,118 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
-from groq import Groq, BadRequestError
+from typing import Any, AsyncIterator, Dict, Optional
+from groq import (
+    APIConnectionError,
+    AsyncGroq,
+    BadRequestError,
+    Groq,
+    InternalServerError,
+    RateLimitError,
+)
 from kbdebugger.utils.json import ensure_json_object
+from .llm_protocol import LLMCompletion
+from .rate_limit import (
+    ProviderUnavailable,
+    RateLimitExceeded,
+    TokenBucketLimiter,
+    parse_duration_seconds,
+)
+from .registry import HTTPPoolConfig, build_async_httpx_client
+
+# Errors the shared limiter retries (the SDK's own retries are disabled).
+_TRANSIENT_ERRORS = (InternalServerError, APIConnectionError)
 
 class GroqResponder:
     """
     LLMResponder that calls Groq Chat Completions.
     Expects `inputs` dict with at least {"prompt": "..."}.
     Optional keys: max_tokens (int), temperature (float), json_mode (bool)
+
+    `http_client` is an optional pooled `httpx.Client` (see `llm.registry`).
+    Passing one lets all calls reuse keep-alive (and HTTP/2) connections
+    instead of paying a TCP/TLS handshake per call.
+
+    `ainvoke` uses an `AsyncGroq` client that is created lazily on first use,
+    i.e. on the shared LLM event loop (`llm.concurrency`).
+
+    `astream` yields text deltas for incremental parsing of batched responses.
+
+    If a `rate_limiter` is given, every response's `x-ratelimit-*` headers are
+    fed into it, and a 429 is surfaced as `RateLimitExceeded` (after blocking
+    the limiter until Groq's reset) so `respond()` can wait and retry.
+
+    The SDK clients run with `max_retries=0`: 429s, 5xx and connection errors
+    (`ProviderUnavailable`) are retried by `respond()` through the limiter,
+    not behind its back.
     """
-    def __init__(self, model: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        http_client: Any = None,
+        pool: Optional[HTTPPoolConfig] = None,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+    ) -> None:
         self.model = model or os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+        self._pool = pool
+        self._async_client: Optional[AsyncGroq] = None
+        self.rate_limiter = rate_limiter
 
-    def invoke(self, inputs: Dict[str, Any]) -> str:
+    def _rate_limited(self, e: RateLimitError) -> RateLimitExceeded:
+        """
+        Record a 429 in the shared limiter and translate it for `respond()`.
+        """
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        retry_after = parse_duration_seconds(headers.get("retry-after")) if headers else None
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe_headers(headers)
+        return RateLimitExceeded(f"Groq rate limit hit for {self.model}: {e}", retry_after=retry_after)
+
+    def _unavailable(self, e: Exception) -> ProviderUnavailable:
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        retry_after = parse_duration_seconds(headers.get("retry-after")) if headers else None
+        return ProviderUnavailable(f"Groq request failed for {self.model}: {e}", retry_after=retry_after)
+
+    def _create(self, kwargs: Dict[str, Any]) -> Any:
+        """
+        Sync completion call through the raw-response API (to read rate-limit headers).
+        """
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            raise self._rate_limited(e) from e
+        except _TRANSIENT_ERRORS as e:
+            raise self._unavailable(e) from e
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe_headers(raw.headers)
+        return raw.parse()
+
+    async def _acreate(self, kwargs: Dict[str, Any]) -> Any:
+        """
+        Async twin of `_create`.
+        """
+        assert self._async_client is not None
+        try:
+            raw = await self._async_client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            raise self._rate_limited(e) from e
+        except _TRANSIENT_ERRORS as e:
+            raise self._unavailable(e) from e
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe_headers(raw.headers)
+        return raw.parse()
+
+    def _build_request(self, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Translate `inputs` into Chat Completions kwargs.
+
+        Returns None for an empty prompt (caller short-circuits).
+        """
         prompt: str = inputs.get("prompt", "")
-        
+
         if not prompt:
-            # For JSON mode, empty prompt => empty object
-            return "{}" if inputs.get("json_mode", False) else ""
+            return None
 
         max_tokens: int = int(inputs.get("max_tokens", 2048))
         temperature: float = float(inputs.get("temperature", 0.0))
@@ -57,20 +149,108 @@ class GroqResponder:
             # Valid-JSON guarantee (no extra prose)
             kwargs["response_format"] = {"type": "json_object"}
 
+        return kwargs
+
+    @staticmethod
+    def _to_completion(resp: Any) -> LLMCompletion:
+        choice = resp.choices[0]
+        usage = getattr(resp, "usage", None)
+        return LLMCompletion(
+            text=(choice.message.content or "").strip(),
+            finish_reason=getattr(choice, "finish_reason", None),
+            usage=(
+                {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens,
+                }
+                if usage is not None else None
+            ),
+        )
+
+    def complete(self, inputs: Dict[str, Any]) -> LLMCompletion:
+        kwargs = self._build_request(inputs)
+        if kwargs is None:
+            # For JSON mode, empty prompt => empty object
+            return LLMCompletion(text="{}" if inputs.get("json_mode", False) else "", finish_reason="stop")
+
         try:
-            resp = self.client.chat.completions.create(**kwargs)
+            resp = self._create(kwargs)
         except BadRequestError as e:
             # Only handle the JSON validate failure specially in JSON mode
-            if not json_mode:
+            if "response_format" not in kwargs:
                 raise
             # raise e from e
 
             # Retry WITHOUT response_format, then we'll do our own post-processing
             retry_kwargs = dict(kwargs)
             retry_kwargs.pop("response_format", None)
-            resp = self.client.chat.completions.create(**retry_kwargs)
+            resp = self._create(retry_kwargs)
+
+        return self._to_completion(resp)
+
+    async def acomplete(self, inputs: Dict[str, Any]) -> LLMCompletion:
+        kwargs = self._build_request(inputs)
+        if kwargs is None:
+            return LLMCompletion(text="{}" if inputs.get("json_mode", False) else "", finish_reason="stop")
+
+        self._ensure_async_client()
+
+        try:
+            resp = await self._acreate(kwargs)
+        except BadRequestError:
+            if "response_format" not in kwargs:
+                raise
+            retry_kwargs = dict(kwargs)
+            retry_kwargs.pop("response_format", None)
+            resp = await self._acreate(retry_kwargs)
 
-        content = (resp.choices[0].message.content or "").strip()
+        return self._to_completion(resp)
 
-        return content
+    def _ensure_async_client(self) -> AsyncGroq:
+        if self._async_client is None:
+            self._async_client = AsyncGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                http_client=build_async_httpx_client(self._pool),
+                max_retries=0,
+            )
+        return self._async_client
+
+    async def astream(self, inputs: Dict[str, Any]) -> AsyncIterator[LLMCompletion]:
+        """
+        Stream the completion as text deltas.
+
+        Each yielded `LLMCompletion` carries a text *delta*; the last one also
+        carries the finish reason. Groq JSON mode does not support streaming,
+        so `response_format` is dropped and the caller parses the JSON itself
+        (see `utils.json.IncrementalJsonArrayParser`).
+        """
+        kwargs = self._build_request(inputs)
+        if kwargs is None:
+            yield LLMCompletion(text="{}" if inputs.get("json_mode", False) else "", finish_reason="stop")
+            return
+
+        kwargs.pop("response_format", None)
+        client = self._ensure_async_client()
+
+        try:
+            stream = await client.chat.completions.create(**kwargs, stream=True)
+        except RateLimitError as e:
+            raise self._rate_limited(e) from e
+        except _TRANSIENT_ERRORS as e:
+            raise self._unavailable(e) from e
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = getattr(choice.delta, "content", None) or ""
+            finish_reason = getattr(choice, "finish_reason", None)
+            if delta or finish_reason:
+                yield LLMCompletion(text=delta, finish_reason=finish_reason)
+
+    def invoke(self, inputs: Dict[str, Any]) -> str:
+        return self.complete(inputs).text
 
+    async def ainvoke(self, inputs: Dict[str, Any]) -> str:
+        return (await self.acomplete(inputs)).text
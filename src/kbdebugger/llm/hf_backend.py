@@ -16,6 +16,8 @@ except Exception:  # BitsAndBytes not available (e.g., CPU-only install)
 
 from transformers import PreTrainedModel, PreTrainedTokenizerBase
 
+from .peft_merge import find_merged_model
+
 @dataclass(frozen=True)
 class HFBackendConfig:
     """
@@ -63,29 +65,41 @@ def use_hf_local(config: HFBackendConfig | None = None) -> bool:
     return config.use_hf_local
 
 
-@lru_cache(maxsize=1)
-def get_hf_causal_model(
-    config: HFBackendConfig | None = None,
-) -> Tuple[PreTrainedModel, PreTrainedTokenizerBase, str]:
-    """
-    Lazily load a causal LM + tokenizer for local inference.
+def _is_peft_dir(path: str) -> bool:
+    return os.path.isdir(path) and os.path.isfile(os.path.join(path, "adapter_config.json"))
 
-    Returns:
-        (model, tokenizer, device_str)
+
+def load_causal_lm(
+    model_source: str,
+    *,
+    device: str,
+) -> Tuple[PreTrainedModel, PreTrainedTokenizerBase]:
     """
-    if config is None:
-        config = HFBackendConfig()
+    Load a causal LM + tokenizer from a hub id, a local model dir or a PEFT adapter dir.
 
-    device = config.device
-    rich.print(f"[HFBackend] Running on [bold]{device.upper()}[/bold] (USE_CUDA={config.use_cuda})")
+    For a PEFT adapter dir, a merged artifact of the same adapter version
+    (`llm.peft_merge`, `python -m tools.merge_peft_adapter`) is loaded instead
+    when one exists: plain safetensors, memory-mapped, in their stored dtype.
+
+    On CUDA (with bitsandbytes installed) the model is loaded in 4-bit.
+    The tokenizer pads with EOS.
 
-    model_source = config.model_source
+    Returns:
+        (model, tokenizer)
+    """
+    merged_source = find_merged_model(model_source) if _is_peft_dir(model_source) else None
+    if merged_source:
+        rich.print(f"[HFBackend] Using merged adapter: [cyan]{merged_source}[/cyan]")
+        model_source = merged_source
     rich.print(f"[HFBackend] Loading model from: [cyan]{model_source}[/cyan]")
 
     load_kwargs: dict[str, Any] = {
         "low_cpu_mem_usage": True,
-        "dtype": config.torch_dtype,
+        "dtype": torch.float16 if device == "cuda" else torch.float32,
     }
+    if merged_source and device != "cuda":
+        # Keep the exported dtype: no upcast copy of the mmapped weights.
+        load_kwargs["dtype"] = "auto"
 
     # ------------------ Optional 4-bit quantization ------------------
     bnb_config = None
@@ -102,9 +116,6 @@ def get_hf_causal_model(
         rich.print("[HFBackend] ❌ Loading without quantization")
 
     # ------------------ PEFT vs plain model ------------------
-    def _is_peft_dir(path: str) -> bool:
-        return os.path.isdir(path) and os.path.isfile(os.path.join(path, "adapter_config.json"))
-
     if _is_peft_dir(model_source):
         from peft import AutoPeftModelForCausalLM
         rich.print("[HFBackend] Detected PEFT adapter")
@@ -120,7 +131,6 @@ def get_hf_causal_model(
 
     tokenizer: PreTrainedTokenizerBase = AutoTokenizer.from_pretrained(model_source)
     tokenizer.pad_token = tokenizer.eos_token
-    tokenizer.padding_side = "right"
 
     try:
         model.config.use_cache = True  # type: ignore[attr-defined]
@@ -131,4 +141,26 @@ def get_hf_causal_model(
     if bnb_config is None:
         model.to(device)  # type: ignore[call-arg]
 
-    return model, tokenizer, device
\ No newline at end of file
+    return model, tokenizer
+
+
+@lru_cache(maxsize=1)
+def get_hf_causal_model(
+    config: HFBackendConfig | None = None,
+) -> Tuple[PreTrainedModel, PreTrainedTokenizerBase, str]:
+    """
+    Lazily load a causal LM + tokenizer for local inference.
+
+    Returns:
+        (model, tokenizer, device_str)
+    """
+    if config is None:
+        config = HFBackendConfig()
+
+    device = config.device
+    rich.print(f"[HFBackend] Running on [bold]{device.upper()}[/bold] (USE_CUDA={config.use_cuda})")
+
+    model, tokenizer = load_causal_lm(config.model_source, device=device)
+    tokenizer.padding_side = "right"
+
+    return model, tokenizer, device
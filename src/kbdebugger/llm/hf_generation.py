@@ -0,0 +1,368 @@
+"""
+Batched local generation for the `hf_local` backend.
+
+`HFMicroBatcher` queues concurrent `complete()` calls and hands up to
+HF_GENERATE_BATCH_SIZE of them to `HFGenerationEngine.generate`, which runs
+one left-padded `model.generate(...)` per batch. Prompts that share a
+`prompt_prefix` reuse its cached KV state, and JSON requests are decoded
+under their schema (`llm.json_constraint`).
+
+Environment variables
+---------------------
+HF_GENERATE_BATCH_SIZE:
+    Maximum number of prompts in one `generate` call. Default: 8
+
+HF_BATCH_WAIT_MS:
+    How long the worker waits for more requests after the first one arrives.
+    Default: 20
+
+HF_PREFIX_CACHE_SIZE:
+    Number of prompt-prefix KV caches kept in memory (0 disables prefix
+    caching). Default: 4
+
+HF_JSON_CONSTRAINED:
+    "1" enables schema-constrained decoding for JSON requests. Default: "1"
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .json_constraint import JsonSchema, JsonSchemaLogitsProcessor, TokenPieces
+from .llm_protocol import LLMCompletion
+
+logger = logging.getLogger(__name__)
+
+ModelLoader = Callable[[], Tuple[Any, Any, str]]
+# returns (model, tokenizer, device)
+
+
+@dataclass(frozen=True, slots=True)
+class HFGenerationConfig:
+    """
+    Micro-batching settings for local generation.
+    """
+    max_batch_size: int = 8
+    max_wait_ms: float = 20.0
+    prefix_cache_size: int = 4
+    json_constrained: bool = True
+
+    @classmethod
+    def from_env(cls) -> HFGenerationConfig:
+        max_batch_size = int(os.getenv("HF_GENERATE_BATCH_SIZE", "8").strip())
+        max_wait_ms = float(os.getenv("HF_BATCH_WAIT_MS", "20").strip())
+        prefix_cache_size = int(os.getenv("HF_PREFIX_CACHE_SIZE", "4").strip())
+        json_constrained = os.getenv("HF_JSON_CONSTRAINED", "1").strip().lower() in {"1", "true", "yes"}
+
+        return cls(
+            max_batch_size=max(1, max_batch_size),
+            max_wait_ms=max(0.0, max_wait_ms),
+            prefix_cache_size=max(0, prefix_cache_size),
+            json_constrained=json_constrained,
+        )
+
+
+class HFGenerationEngine:
+    """
+    Runs many prompts through one `model.generate` call.
+
+    The model is loaded lazily (thread-safe) on first use via `loader`.
+    Not safe for concurrent `generate` calls (the micro-batcher serializes them).
+    """
+
+    def __init__(self, loader: ModelLoader, *, prefix_cache_size: int = 4) -> None:
+        self._loader = loader
+        self._loaded: Optional[Tuple[Any, Any, str]] = None
+        self._init_lock = threading.Lock()
+        self.prefix_cache_size = prefix_cache_size
+        self._prefix_cache: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+        self._pieces: Optional[TokenPieces] = None
+
+    def _ensure_model(self) -> Tuple[Any, Any, str]:
+        if self._loaded is None:
+            with self._init_lock:
+                if self._loaded is None:
+                    model, tokenizer, device = self._loader()
+                    # Decoder-only models must be padded on the left so every
+                    # row's prompt ends right where generation starts.
+                    tokenizer.padding_side = "left"
+                    if tokenizer.pad_token is None:
+                        tokenizer.pad_token = tokenizer.eos_token
+                    self._loaded = (model, tokenizer, device)
+        return self._loaded
+
+    @property
+    def tokenizer(self) -> Any:
+        return self._ensure_model()[1]
+
+    def _json_processor(
+        self,
+        json_schemas: Optional[Sequence[Optional[JsonSchema]]],
+        *,
+        sample: bool,
+    ) -> Optional[JsonSchemaLogitsProcessor]:
+        if not json_schemas or all(s is None for s in json_schemas):
+            return None
+        tokenizer = self.tokenizer
+        if self._pieces is None:
+            self._pieces = TokenPieces(tokenizer)  # decoded token texts, shared across batches
+        return JsonSchemaLogitsProcessor(
+            json_schemas,
+            self._pieces,
+            eos_token_id=tokenizer.eos_token_id,
+            sample=sample,
+        )
+
+    def _prefix_kv(self, prefix: str) -> Tuple[Any, Any]:
+        """
+        (prefix input_ids [1, P], KV cache of the prefix), computed once per prefix.
+        """
+        hit = self._prefix_cache.get(prefix)
+        if hit is not None:
+            self._prefix_cache.move_to_end(prefix)
+            return hit
+
+        import torch  # type: ignore  # lazy: heavy dependency
+
+        model, tokenizer, device = self._ensure_model()
+        ids = tokenizer(prefix, return_tensors="pt")["input_ids"].to(device)
+        with torch.no_grad():
+            kv = model(input_ids=ids, use_cache=True).past_key_values
+
+        self._prefix_cache[prefix] = (ids, kv)
+        while len(self._prefix_cache) > self.prefix_cache_size:
+            self._prefix_cache.popitem(last=False)
+        return ids, kv
+
+    def _encode_with_prefix(self, prompts: Sequence[str], prefix: str) -> Tuple[Dict[str, Any], Any]:
+        """
+        Encode `prefix + payload` rows so that generation can start from the
+        cached prefix KV. Payloads are left-padded *after* the shared prefix;
+        the attention mask hides the padding.
+        """
+        import torch  # type: ignore  # lazy: heavy dependency
+
+        _model, tokenizer, device = self._ensure_model()
+        prefix_ids, prefix_kv = self._prefix_kv(prefix)
+        n = len(prompts)
+
+        enc = tokenizer(
+            [p[len(prefix):] for p in prompts],
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False,
+        )
+        input_ids = torch.cat([prefix_ids.expand(n, -1), enc["input_ids"].to(device)], dim=1)
+        attention_mask = torch.cat(
+            [torch.ones((n, prefix_ids.shape[1]), dtype=enc["attention_mask"].dtype, device=device),
+             enc["attention_mask"].to(device)],
+            dim=1,
+        )
+
+        # `generate` extends the cache in place: hand it a copy, widened to the batch.
+        kv = copy.deepcopy(prefix_kv)
+        if n > 1:
+            kv.batch_repeat_interleave(n)
+        return {"input_ids": input_ids, "attention_mask": attention_mask}, kv
+
+    def generate(
+        self,
+        prompts: Sequence[str],
+        *,
+        max_new_tokens: Sequence[int],
+        temperature: float = 0.0,
+        prefix: Optional[str] = None,
+        json_schemas: Optional[Sequence[Optional[JsonSchema]]] = None,
+    ) -> List[LLMCompletion]:
+        """
+        Generate completions for `prompts` in one forward batch.
+
+        Parameters
+        ----------
+        prompts:
+            Raw prompt strings (no chat template is applied).
+        max_new_tokens:
+            Per-prompt completion budget, aligned with `prompts`. The batch
+            runs for the largest budget; each row is cut to its own.
+        temperature:
+            0.0 means greedy decoding; > 0 enables sampling.
+        prefix:
+            Static prompt prefix shared by all `prompts`. If given (and prefix
+            caching is enabled), its KV cache is computed once and reused.
+        json_schemas:
+            Optional JSON schema per prompt (None = free text). Rows with a
+            schema can only produce JSON matching it.
+
+        Returns
+        -------
+        list[LLMCompletion]
+            Generated text only (no prompt echo), aligned with `prompts`.
+        """
+        if not prompts:
+            return []
+
+        import torch  # type: ignore  # lazy: heavy dependency
+
+        model, tokenizer, device = self._ensure_model()
+
+        gen_kwargs: Dict[str, Any] = {
+            "max_new_tokens": max(max_new_tokens),
+            "pad_token_id": tokenizer.pad_token_id,
+            "use_cache": True,
+        }
+
+        enc: Optional[Dict[str, Any]] = None
+        if prefix and self.prefix_cache_size > 0 and all(p.startswith(prefix) for p in prompts):
+            try:
+                enc, gen_kwargs["past_key_values"] = self._encode_with_prefix(prompts, prefix)
+            except Exception as e:  # noqa: BLE001 (e.g. model/cache type without batch expansion)
+                logger.warning("Prefix KV cache unavailable, prefilling full prompts: %s", e)
+                enc = None
+
+        if enc is None:
+            enc = tokenizer(list(prompts), return_tensors="pt", padding=True)
+            enc = {k: v.to(device) for k, v in enc.items()}
+        prompt_len = enc["input_ids"].shape[1]
+        if temperature > 0:
+            gen_kwargs.update(do_sample=True, temperature=temperature)
+        else:
+            gen_kwargs["do_sample"] = False
+
+        json_processor = self._json_processor(json_schemas, sample=temperature > 0)
+        if json_processor is not None:
+            from transformers import LogitsProcessorList  # type: ignore  # lazy: heavy dependency
+            gen_kwargs["logits_processor"] = LogitsProcessorList([json_processor])
+
+        with torch.no_grad():
+            output = model.generate(**enc, **gen_kwargs)
+
+        eos_id = tokenizer.eos_token_id
+        prompt_tokens = enc["attention_mask"].sum(dim=1).tolist()
+
+        completions: List[LLMCompletion] = []
+        for row, budget, n_prompt in zip(output[:, prompt_len:].tolist(), max_new_tokens, prompt_tokens):
+            ids = row[:budget]
+            if eos_id is not None and eos_id in ids:
+                ids = ids[:ids.index(eos_id)]
+                finish_reason = "stop"
+            else:
+                finish_reason = "length" if len(ids) >= budget else "stop"
+
+            completions.append(
+                LLMCompletion(
+                    text=tokenizer.decode(ids, skip_special_tokens=True).strip(),
+                    finish_reason=finish_reason,
+                    usage={
+                        "prompt_tokens": int(n_prompt),
+                        "completion_tokens": len(ids),
+                        "total_tokens": int(n_prompt) + len(ids),
+                    },
+                )
+            )
+        return completions
+
+
+@dataclass
+class _Request:
+    prompt: str
+    max_new_tokens: int
+    temperature: float
+    prefix: Optional[str] = None
+    json_schema: Optional[JsonSchema] = None
+    future: Future = field(default_factory=Future)
+
+
+class HFMicroBatcher:
+    """
+    Collects concurrent single-prompt requests into `generate` batches.
+
+    `submit()` is thread-safe and returns a `concurrent.futures.Future`
+    (await it from asyncio with `asyncio.wrap_future`). One daemon worker
+    thread owns the model, so generation never runs twice at the same time.
+    """
+
+    def __init__(self, engine: HFGenerationEngine, config: Optional[HFGenerationConfig] = None) -> None:
+        self.engine = engine
+        self.config = config or HFGenerationConfig.from_env()
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(
+        self,
+        prompt: str,
+        *,
+        max_new_tokens: int,
+        temperature: float = 0.0,
+        prefix: Optional[str] = None,
+        json_schema: Optional[JsonSchema] = None,
+    ) -> Future:
+        self._ensure_worker()
+        request = _Request(
+            prompt=prompt,
+            max_new_tokens=max(1, int(max_new_tokens)),
+            temperature=float(temperature),
+            prefix=prefix if prefix and prompt.startswith(prefix) else None,
+            json_schema=json_schema if self.config.json_constrained else None,
+        )
+        self._queue.put(request)
+        return request.future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="hf-micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[_Request]:
+        """
+        Block for the first request, then gather more until the batch is full
+        or the wait window closes.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.config.max_wait_ms / 1000.0
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+
+            # Sampling settings and the cached prefix are per `generate` call.
+            groups: Dict[Tuple[float, Optional[str]], List[_Request]] = {}
+            for req in batch:
+                groups.setdefault((req.temperature, req.prefix), []).append(req)
+
+            for (temperature, prefix), reqs in groups.items():
+                try:
+                    results = self.engine.generate(
+                        [r.prompt for r in reqs],
+                        max_new_tokens=[r.max_new_tokens for r in reqs],
+                        temperature=temperature,
+                        prefix=prefix,
+                        json_schemas=[r.json_schema for r in reqs],
+                    )
+                except Exception as e:  # noqa: BLE001 (surface to every waiting caller)
+                    for r in reqs:
+                        r.future.set_exception(e)
+                    continue
+                for r, result in zip(reqs, results):
+                    r.future.set_result(result)
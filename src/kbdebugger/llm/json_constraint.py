@@ -0,0 +1,377 @@
+"""
+JSON-schema-constrained decoding for the local HF backend.
+
+At every step only tokens that keep the output a valid prefix of a document
+matching the schema are allowed, and EOS is forced once the value is complete.
+Candidates are checked in logit order, stopping at the first valid one
+(greedy) or `top_k` (sampling).
+
+Supported schema subset (enough for `prompts/schemas/*.json`): "type" (or a
+list of types), object "properties" / "required", array "items" /
+"minItems" / "maxItems", string "enum". `json_mode=True` without a schema
+means "any JSON object".
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+JsonSchema = Mapping[str, Any]
+
+# A free-form JSON object (json_mode without a specific schema).
+ANY_OBJECT_SCHEMA: JsonSchema = {"type": "object"}
+
+_WS = " \t\n\r"
+_NUMBER_PREFIX = re.compile(r"-?(?:(?:0|[1-9]\d*)(?:\.\d*|(?:\.\d+)?[eE][+-]?\d*)?)?")
+_NUMBER_FULL = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_INTEGER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?")
+_INTEGER_FULL = re.compile(r"-?(?:0|[1-9]\d*)")
+_HEX = set("0123456789abcdefABCDEF")
+_LITERALS = {"t": ("boolean", "rue"), "f": ("boolean", "alse"), "n": ("null", "ull")}
+
+# Parser frames (immutable tuples, so a state can be branched for free):
+#   ("V", schema)                                 expecting a value
+#   ("O", schema, phase, seen_keys, current_key)   inside an object
+#   ("K", candidates | None, buf, esc)             inside an object key
+#   ("A", schema, phase, count)                    inside an array
+#   ("S", enum | None, buf, esc)                   inside a string
+#   ("N", buf, integer)                            inside a number
+#   ("L", remaining)                               inside true / false / null
+# esc: 0 = normal, -1 = after a backslash, n > 0 = hex digits left of \uXXXX
+Frame = Tuple[Any, ...]
+Stack = Tuple[Frame, ...]
+MatcherState = Tuple[Stack, bool]  # (stack, previous char was whitespace)
+
+
+def _types(schema: JsonSchema) -> Optional[frozenset]:
+    if "enum" in schema:
+        return frozenset({"string"})
+    t = schema.get("type")
+    if t is None:
+        return None  # any value
+    return frozenset([t] if isinstance(t, str) else t)
+
+
+def _allows(schema: JsonSchema, type_name: str) -> bool:
+    types = _types(schema)
+    if types is None:
+        return True
+    if type_name == "integer":
+        return "integer" in types
+    if type_name == "number":
+        return "number" in types or "integer" in types
+    return type_name in types
+
+
+def _required(schema: JsonSchema) -> frozenset:
+    return frozenset(schema.get("required", ()))
+
+
+def _open_value(schema: JsonSchema, ch: str) -> Optional[Frame]:
+    """
+    Frame for a value of `schema` starting with `ch` (None if impossible).
+    """
+    if ch == "{" and _allows(schema, "object"):
+        return ("O", schema, "first", frozenset(), None)
+    if ch == "[" and _allows(schema, "array"):
+        return ("A", schema, "first", 0)
+    if ch == '"' and _allows(schema, "string"):
+        enum = schema.get("enum")
+        return ("S", tuple(enum) if enum is not None else None, "", 0)
+    if ch == "-" or ch.isdigit():
+        if not _allows(schema, "number"):
+            return None
+        types = _types(schema)
+        integer = types is not None and "number" not in types
+        return ("N", ch, integer)
+    if ch in _LITERALS:
+        type_name, rest = _LITERALS[ch]
+        if _allows(schema, type_name):
+            return ("L", rest)
+    return None
+
+
+def _string_char(enum: Optional[Tuple[str, ...]], buf: str, esc: int, ch: str) -> Optional[Tuple[str, int, bool]]:
+    """
+    Feed one char to a string body. Returns (buf, esc, closed) or None.
+    """
+    if esc == -1:
+        if ch in '"\\/bfnrt':
+            return buf, 0, False
+        if ch == "u":
+            return buf, 4, False
+        return None
+    if esc > 0:
+        return (buf, esc - 1, False) if ch in _HEX else None
+
+    if ch == '"':
+        if enum is not None and buf not in enum:
+            return None
+        return buf, 0, True
+    if ch == "\\":
+        return (buf, -1, False) if enum is None else None
+    if ord(ch) < 0x20:
+        return None
+    if enum is not None:
+        nxt = buf + ch
+        return (nxt, 0, False) if any(e.startswith(nxt) for e in enum) else None
+    return buf, 0, False
+
+
+def _close(stack: Stack) -> Stack:
+    """
+    Pop a finished value (parents already moved to their "after value" phase).
+    """
+    return stack[:-1]
+
+
+def _feed(stack: Stack, ch: str) -> Optional[Stack]:
+    """
+    Advance the parser by one char; None if `ch` cannot continue a valid document.
+    """
+    if not stack:
+        return stack if ch in _WS else None
+
+    top = stack[-1]
+    kind = top[0]
+
+    if kind == "V":
+        if ch in _WS:
+            return stack
+        frame = _open_value(top[1], ch)
+        return stack[:-1] + (frame,) if frame is not None else None
+
+    if kind == "S":
+        _, enum, buf, esc = top
+        res = _string_char(enum, buf, esc, ch)
+        if res is None:
+            return None
+        buf, esc, closed = res
+        if closed:
+            return _close(stack)
+        return stack[:-1] + (("S", enum, buf if enum is not None else "", esc),)
+
+    if kind == "N":
+        _, buf, integer = top
+        prefix = _INTEGER_PREFIX if integer else _NUMBER_PREFIX
+        if prefix.fullmatch(buf + ch):
+            return stack[:-1] + (("N", buf + ch, integer),)
+        full = _INTEGER_FULL if integer else _NUMBER_FULL
+        if not full.fullmatch(buf):
+            return None
+        # The number ended; `ch` belongs to the parent.
+        return _feed(_close(stack), ch)
+
+    if kind == "L":
+        rest = top[1]
+        if ch != rest[0]:
+            return None
+        return _close(stack) if len(rest) == 1 else stack[:-1] + (("L", rest[1:]),)
+
+    if kind == "K":
+        _, candidates, buf, esc = top
+        res = _string_char(candidates, buf, esc, ch)
+        if res is None:
+            return None
+        buf, esc, closed = res
+        if not closed:
+            return stack[:-1] + (("K", candidates, buf if candidates is not None else "", esc),)
+        parent = stack[-2]
+        _, schema, _phase, seen, _key = parent
+        key = buf if candidates is not None else None
+        seen = seen | {key} if key is not None else seen
+        return stack[:-2] + (("O", schema, "colon", seen, key),)
+
+    if kind == "O":
+        _, schema, phase, seen, key = top
+        if ch in _WS:
+            return stack
+        props: Dict[str, Any] = schema.get("properties") or {}
+        remaining = tuple(k for k in props if k not in seen) if props else None
+        complete = _required(schema) <= seen
+
+        if phase in ("first", "key"):
+            if ch == '"' and (remaining is None or remaining):
+                return stack + (("K", remaining, "", 0),)
+            if ch == "}" and phase == "first" and complete:
+                return _close(stack)
+            return None
+        if phase == "colon":
+            if ch != ":":
+                return None
+            value_schema = props.get(key, {}) if key else {}
+            return stack[:-1] + (("O", schema, "after", seen, None), ("V", value_schema))
+        if phase == "after":
+            if ch == "," and (remaining is None or remaining):
+                return stack[:-1] + (("O", schema, "key", seen, None),)
+            if ch == "}" and complete:
+                return _close(stack)
+            return None
+
+    if kind == "A":
+        _, schema, phase, count = top
+        if ch in _WS:
+            return stack
+        min_items = int(schema.get("minItems", 0))
+        max_items = schema.get("maxItems")
+        if phase in ("first", "after") and ch == "]" and count >= min_items:
+            return _close(stack)
+        if phase == "after":
+            return stack[:-1] + (("A", schema, "next", count),) if ch == "," else None
+        if max_items is not None and count >= int(max_items):
+            return None
+        # phase "first" / "next": a new element starts with `ch`.
+        pushed = stack[:-1] + (("A", schema, "after", count + 1), ("V", schema.get("items", {})))
+        return _feed(pushed, ch)
+
+    return None
+
+
+class JsonSchemaMatcher:
+    """
+    Incremental validator: is a text a valid *prefix* of a schema-valid JSON document?
+
+    States are immutable, so one state can be advanced with many candidate
+    tokens without copying.
+    """
+
+    @staticmethod
+    def start(schema: JsonSchema) -> MatcherState:
+        return ((("V", schema),), False)
+
+    @staticmethod
+    def advance(state: MatcherState, text: str) -> Optional[MatcherState]:
+        stack, prev_ws = state
+        for ch in text:
+            in_string = bool(stack) and stack[-1][0] in ("S", "K")
+            if not in_string and ch in _WS:
+                if prev_ws:
+                    return None
+                prev_ws = True
+            else:
+                prev_ws = False
+            nxt = _feed(stack, ch)
+            if nxt is None:
+                return None
+            stack = nxt
+        return stack, prev_ws
+
+    @staticmethod
+    def is_complete(state: MatcherState) -> bool:
+        return not state[0]
+
+
+class TokenPieces:
+    """
+    Lazily decoded text of single vocabulary tokens (with their leading space).
+
+    Decoding a token on its own drops the leading space of sentencepiece
+    tokens, so every token is decoded after a fixed anchor token instead.
+    """
+
+    def __init__(self, tokenizer: Any) -> None:
+        self.tokenizer = tokenizer
+        self._anchor = tokenizer.encode("a", add_special_tokens=False)[-1]
+        self._anchor_text = tokenizer.decode([self._anchor], clean_up_tokenization_spaces=False)
+        self._special = set(getattr(tokenizer, "all_special_ids", []) or [])
+        self._cache: Dict[int, Optional[str]] = {}
+
+    def get(self, token_id: int) -> Optional[str]:
+        """
+        Text of `token_id`, or None for special / partial-UTF-8 tokens.
+        """
+        if token_id in self._cache:
+            return self._cache[token_id]
+        piece: Optional[str] = None
+        if token_id not in self._special:
+            text = self.tokenizer.decode([self._anchor, token_id], clean_up_tokenization_spaces=False)
+            piece = text[len(self._anchor_text):] if text.startswith(self._anchor_text) else None
+            if not piece or "�" in piece:
+                piece = None
+        self._cache[token_id] = piece
+        return piece
+
+
+class JsonSchemaLogitsProcessor:
+    """
+    transformers logits processor that keeps every row inside its JSON schema.
+
+    Parameters
+    ----------
+    schemas:
+        One schema per batch row (None = unconstrained row).
+    pieces:
+        Token text lookup for the model's tokenizer.
+    eos_token_id:
+        Allowed only once a row's JSON value is complete (and then forced).
+    top_k:
+        Valid candidates kept per step when sampling (greedy keeps one).
+    """
+
+    def __init__(
+        self,
+        schemas: Sequence[Optional[JsonSchema]],
+        pieces: TokenPieces,
+        *,
+        eos_token_id: Optional[int],
+        sample: bool = False,
+        top_k: int = 32,
+    ) -> None:
+        self.pieces = pieces
+        self.eos_token_id = eos_token_id
+        self.keep = max(1, top_k) if sample else 1
+        self.states: List[Optional[MatcherState]] = [
+            JsonSchemaMatcher.start(s) if s is not None else None for s in schemas
+        ]
+        self.finished = [False] * len(self.states)
+        self._prompt_len: Optional[int] = None
+
+    def _accept_last_token(self, row: int, token_id: int) -> None:
+        state = self.states[row]
+        if state is None or self.finished[row]:
+            return
+        if token_id == self.eos_token_id:
+            self.finished[row] = True
+            return
+        piece = self.pieces.get(token_id)
+        nxt = JsonSchemaMatcher.advance(state, piece) if piece is not None else None
+        # Cannot happen for tokens we allowed; stop constraining rather than fail.
+        self.states[row] = nxt
+
+    def _allowed(self, state: MatcherState, order: List[int]) -> List[int]:
+        if JsonSchemaMatcher.is_complete(state):
+            return [self.eos_token_id] if self.eos_token_id is not None else []
+        allowed: List[int] = []
+        for token_id in order:
+            if token_id == self.eos_token_id:
+                continue
+            piece = self.pieces.get(token_id)
+            if piece is not None and JsonSchemaMatcher.advance(state, piece) is not None:
+                allowed.append(token_id)
+                if len(allowed) >= self.keep:
+                    break
+        return allowed
+
+    def __call__(self, input_ids: Any, scores: Any) -> Any:
+        import torch  # type: ignore  # lazy: heavy dependency
+
+        if self._prompt_len is None:
+            self._prompt_len = int(input_ids.shape[1])
+        elif input_ids.shape[1] > self._prompt_len:
+            last = input_ids[:, -1].tolist()
+            for row, token_id in enumerate(last):
+                self._accept_last_token(row, int(token_id))
+
+        for row, state in enumerate(self.states):
+            if state is None or self.finished[row]:
+                continue
+            order = torch.argsort(scores[row], descending=True).tolist()
+            allowed = self._allowed(state, order)
+            if not allowed:
+                continue
+            masked = torch.full_like(scores[row], float("-inf"))
+            idx = torch.tensor(allowed, device=scores.device)
+            masked[idx] = scores[row, idx]
+            scores[row] = masked
+        return scores
@@ -0,0 +1,324 @@
+"""
+llama.cpp backend: quantized GGUF models on CPU (MODEL_BACKEND=llamacpp).
+
+Two modes:
+1) Server: a `llama-server` with parallel slots and continuous batching,
+   either running at LLAMACPP_SERVER_URL or spawned with
+   LLAMACPP_SPAWN_SERVER=1 (`get_llamacpp_server()`).
+2) In-process: llama-cpp-python, one model copy per slot
+   (`LlamaCppSlotPool`), preferring a slot that last served the same prefix.
+
+Both honour `json_schema` / `json_mode` through grammar-constrained decoding.
+
+Environment variables
+---------------------
+LLAMACPP_MODEL_PATH:
+    GGUF weights (required for the in-process mode and LLAMACPP_SPAWN_SERVER).
+
+LLAMACPP_SERVER_URL:
+    Base URL of a running llama-server, e.g. "http://127.0.0.1:8080".
+
+LLAMACPP_SPAWN_SERVER:
+    "1" starts a llama-server for LLAMACPP_MODEL_PATH. Default: "0"
+
+LLAMACPP_SERVER_BIN:
+    llama-server executable. Default: "llama-server"
+
+LLAMACPP_SERVER_PORT:
+    Port of the spawned server. Default: 8091 (8089 is the mock LLM server's)
+
+LLAMACPP_PARALLEL:
+    Parallel slots (server `--parallel`, or in-process model copies).
+    Default: 4
+
+LLAMACPP_N_CTX:
+    Context window per slot. Default: 8192
+
+LLAMACPP_N_THREADS:
+    CPU threads (server) / threads per slot (in-process).
+    Default: all cores (server), cores / LLAMACPP_PARALLEL (in-process)
+
+LLAMACPP_N_GPU_LAYERS:
+    Layers offloaded to a GPU if llama.cpp was built with one. Default: 0
+
+LLAMACPP_TIMEOUT:
+    Request timeout in seconds (CPU generation is slow). Default: 600
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional
+
+import requests
+import rich
+
+from .llm_protocol import LLMCompletion
+
+
+@dataclass(frozen=True, slots=True)
+class LlamaCppConfig:
+    """
+    Runtime configuration for the llama.cpp backend.
+    """
+    model_path: str = ""
+    server_url: str = ""
+    spawn_server: bool = False
+    server_bin: str = "llama-server"
+    server_port: int = 8091
+    parallel: int = 4
+    n_ctx: int = 8192
+    n_threads: int = 0
+    n_gpu_layers: int = 0
+    timeout: float = 600.0
+    startup_timeout: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> LlamaCppConfig:
+        return cls(
+            model_path=os.getenv("LLAMACPP_MODEL_PATH", "").strip(),
+            server_url=os.getenv("LLAMACPP_SERVER_URL", "").strip().rstrip("/"),
+            spawn_server=os.getenv("LLAMACPP_SPAWN_SERVER", "0").strip().lower() in {"1", "true", "yes"},
+            server_bin=os.getenv("LLAMACPP_SERVER_BIN", "llama-server").strip(),
+            server_port=int(os.getenv("LLAMACPP_SERVER_PORT", "8091").strip()),
+            parallel=max(1, int(os.getenv("LLAMACPP_PARALLEL", "4").strip())),
+            n_ctx=max(512, int(os.getenv("LLAMACPP_N_CTX", "8192").strip())),
+            n_threads=max(0, int(os.getenv("LLAMACPP_N_THREADS", "0").strip() or 0)),
+            n_gpu_layers=int(os.getenv("LLAMACPP_N_GPU_LAYERS", "0").strip()),
+            timeout=float(os.getenv("LLAMACPP_TIMEOUT", "600").strip()),
+        )
+
+    @property
+    def uses_server(self) -> bool:
+        return bool(self.server_url) or self.spawn_server
+
+    @property
+    def model_name(self) -> str:
+        """Registry / cache label of the configured model."""
+        if self.model_path:
+            return os.path.basename(self.model_path)
+        return "llamacpp-server"
+
+
+def json_response_format(inputs: Mapping[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    llama.cpp `response_format` for a request with `json_schema` / `json_mode`.
+    """
+    schema = inputs.get("json_schema")
+    if schema:
+        return {"type": "json_object", "schema": dict(schema)}
+    if inputs.get("json_mode"):
+        return {"type": "json_object"}
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Managed llama-server process
+# ---------------------------------------------------------------------------
+class LlamaCppServer:
+    """
+    A `llama-server` child process with parallel slots and continuous batching.
+    """
+
+    def __init__(self, config: LlamaCppConfig) -> None:
+        self.config = config
+        self.url = f"http://127.0.0.1:{config.server_port}"
+        self._process: Optional[subprocess.Popen] = None
+
+    def command(self) -> List[str]:
+        cfg = self.config
+        cmd = [
+            cfg.server_bin,
+            "--model", cfg.model_path,
+            "--host", "127.0.0.1",
+            "--port", str(cfg.server_port),
+            "--parallel", str(cfg.parallel),
+            "--cont-batching",
+            # The server splits its context evenly across the slots.
+            "--ctx-size", str(cfg.n_ctx * cfg.parallel),
+            "--n-gpu-layers", str(cfg.n_gpu_layers),
+        ]
+        if cfg.n_threads:
+            cmd += ["--threads", str(cfg.n_threads)]
+        return cmd
+
+    def healthy(self) -> bool:
+        try:
+            return requests.get(f"{self.url}/health", timeout=2.0).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def start(self) -> str:
+        """
+        Start the server (unless one already answers on the port) and wait until
+        the model is loaded. Returns the base URL.
+        """
+        if self.healthy():
+            return self.url
+        if not self.config.model_path:
+            raise ValueError("LLAMACPP_SPAWN_SERVER=1 requires LLAMACPP_MODEL_PATH (a .gguf file).")
+        if shutil.which(self.config.server_bin) is None and not os.path.isfile(self.config.server_bin):
+            raise FileNotFoundError(f"llama-server executable not found: {self.config.server_bin!r} (LLAMACPP_SERVER_BIN)")
+
+        rich.print(f"[INFO] 🦙 Starting llama-server ({self.config.parallel} slots) for {self.config.model_path}")
+        self._process = subprocess.Popen(
+            self.command(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        atexit.register(self.stop)
+
+        deadline = time.monotonic() + self.config.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"llama-server exited with code {self._process.returncode} during startup")
+            if self.healthy():
+                rich.print(f"[INFO] 🦙 llama-server ready at {self.url}")
+                return self.url
+            time.sleep(0.5)
+
+        self.stop()
+        raise TimeoutError(f"llama-server did not become ready within {self.config.startup_timeout:.0f}s")
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+_SERVER: Optional[LlamaCppServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def get_llamacpp_server() -> LlamaCppServer:
+    """
+    Process-wide managed llama-server (LLAMACPP_SPAWN_SERVER=1), started on first use.
+
+    Startup can take minutes (model load); concurrent first callers wait on
+    this module's lock, so only one server is spawned. Call it before taking
+    any other lock (see `model_access.get_llm_responder`).
+    """
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            server = LlamaCppServer(LlamaCppConfig.from_env())
+            server.start()
+            _SERVER = server
+        return _SERVER
+
+
+def llamacpp_server_url(config: LlamaCppConfig) -> str:
+    """
+    Base URL of the server to talk to: LLAMACPP_SERVER_URL, or the managed one.
+    """
+    if config.server_url:
+        return config.server_url
+    return get_llamacpp_server().url
+
+
+# ---------------------------------------------------------------------------
+# In-process slots (llama-cpp-python)
+# ---------------------------------------------------------------------------
+class _Slot:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.llm: Any = None
+        self.last_prefix: Optional[str] = None
+
+
+class LlamaCppSlotPool:
+    """
+    LLAMACPP_PARALLEL in-process llama.cpp contexts serving requests in parallel.
+
+    Models are loaded lazily, one per slot on its first request.
+    """
+
+    def __init__(self, config: Optional[LlamaCppConfig] = None) -> None:
+        self.config = config or LlamaCppConfig.from_env()
+        if not self.config.model_path:
+            raise ValueError("MODEL_BACKEND=llamacpp needs LLAMACPP_MODEL_PATH (a .gguf file) or LLAMACPP_SERVER_URL.")
+
+        self._slots = [_Slot(i) for i in range(self.config.parallel)]
+        self._idle: List[_Slot] = list(self._slots)
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.config.parallel, thread_name_prefix="llamacpp-slot")
+
+    def _load(self) -> Any:
+        try:
+            from llama_cpp import Llama  # type: ignore
+        except ImportError as e:
+            raise ImportError(
+                "MODEL_BACKEND=llamacpp without LLAMACPP_SERVER_URL requires llama-cpp-python "
+                "(pip install llama-cpp-python)."
+            ) from e
+
+        threads = self.config.n_threads or max(1, (os.cpu_count() or 1) // self.config.parallel)
+        return Llama(
+            model_path=self.config.model_path,
+            n_ctx=self.config.n_ctx,
+            n_threads=threads,
+            n_gpu_layers=self.config.n_gpu_layers,
+            verbose=False,
+        )
+
+    def _checkout(self, prefix: Optional[str]) -> _Slot:
+        with self._cond:
+            while not self._idle:
+                self._cond.wait()
+            # Prefer the slot whose KV cache already holds this prefix.
+            slot = next((s for s in self._idle if prefix and s.last_prefix == prefix), self._idle[0])
+            self._idle.remove(slot)
+            return slot
+
+    def _checkin(self, slot: _Slot) -> None:
+        with self._cond:
+            self._idle.append(slot)
+            self._cond.notify()
+
+    def _run(self, inputs: Mapping[str, Any]) -> LLMCompletion:
+        prefix = inputs.get("prompt_prefix")
+        slot = self._checkout(prefix)
+        try:
+            if slot.llm is None:
+                slot.llm = self._load()
+            kwargs: dict[str, Any] = {
+                "messages": [{"role": "user", "content": inputs["prompt"]}],
+                "max_tokens": int(inputs.get("max_tokens", 500)),
+                "temperature": float(inputs.get("temperature", 0.0)),
+            }
+            response_format = json_response_format(inputs)
+            if response_format:
+                kwargs["response_format"] = response_format
+
+            payload = slot.llm.create_chat_completion(**kwargs)
+            slot.last_prefix = prefix
+        finally:
+            self._checkin(slot)
+
+        choice = payload["choices"][0]
+        usage = payload.get("usage")
+        return LLMCompletion(
+            text=choice["message"]["content"] or "",
+            finish_reason=choice.get("finish_reason"),
+            usage=dict(usage) if isinstance(usage, Mapping) else None,
+        )
+
+    def submit(self, inputs: Mapping[str, Any]) -> Future:
+        """
+        Queue one request; the future resolves to its `LLMCompletion`.
+        """
+        prompt = inputs.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError("LlamaCppResponder.invoke expects inputs['prompt'] as a non-empty string.")
+        return self._executor.submit(self._run, dict(inputs))
@@ -1,8 +1,58 @@
 from __future__ import annotations
-from typing import Protocol, runtime_checkable, Any, Dict
+from dataclasses import dataclass
+from typing import AsyncIterator, Protocol, runtime_checkable, Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class LLMCompletion:
+    """
+    Assistant message content plus the metadata needed to judge it.
+
+    Attributes
+    ----------
+    text:
+        Assistant message content.
+    finish_reason:
+        Provider finish reason ("stop", "length", ...). None if unknown.
+    usage:
+        Token usage as reported by the provider
+        (e.g. {"prompt_tokens": ..., "completion_tokens": ..., "total_tokens": ...}).
+    served_by:
+        (backend, model) that produced the answer, when a router chose it
+        (see `llm.routing`). None means the responder that was called.
+    """
+    text: str
+    finish_reason: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+    served_by: Optional[Tuple[str, str]] = None
+
+    @property
+    def truncated(self) -> bool:
+        """True if generation stopped because it hit `max_tokens`."""
+        return self.finish_reason == "length"
+
 
 @runtime_checkable
 class LLMResponder(Protocol):
-    """Minimal interface for an LLM/chain callable."""
+    """
+    Minimal interface for an LLM/chain callable.
+
+    `invoke` blocks; `ainvoke` is the asyncio-native twin used by the bounded
+    concurrent executor (`llm.concurrency`). Both take the same `inputs` dict
+    and return the assistant message content.
+
+    `complete` / `acomplete` return the same content wrapped in an
+    `LLMCompletion` (finish reason + usage), e.g. to detect truncated output.
+
+    `astream` yields the content as `LLMCompletion` text deltas; the last
+    delta carries the finish reason.
+    """
     def invoke(self, inputs: Dict[str, Any]) -> str: ...
 
+    async def ainvoke(self, inputs: Dict[str, Any]) -> str: ...
+
+    def complete(self, inputs: Dict[str, Any]) -> LLMCompletion: ...
+
+    async def acomplete(self, inputs: Dict[str, Any]) -> LLMCompletion: ...
+
+    def astream(self, inputs: Dict[str, Any]) -> AsyncIterator[LLMCompletion]: ...
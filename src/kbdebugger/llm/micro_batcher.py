@@ -0,0 +1,291 @@
+"""
+In-process micro-batching of LLM work items across concurrent jobs.
+
+Stages submit single items; items from all jobs wait in one queue per stage
+and prompt settings (at most LLM_MICRO_BATCH_MAX_WAIT_MS), are packed into
+shared batched prompts by the batch planner, and each submitter gets its own
+result back. `run_batch` is the stage's usual per-batch coroutine. An
+exception instance in its result list fails only that item.
+
+Items are reported when their batch completes (no per-item streaming).
+
+Environment variables
+---------------------
+LLM_MICRO_BATCHING:
+    Route the batched stages through the shared micro-batchers. Default: "0"
+
+LLM_MICRO_BATCH_MAX_WAIT_MS:
+    Longest time the first queued item waits for others before its batch is
+    sent. Default: 100
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from .batch_planner import PlannedBatch, StageProfile, get_batch_planner
+from .concurrency import default_max_concurrency, run_sync
+from .scheduler import current_request_context
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+ItemCallback = Callable[[int, Any], None]
+# index in the submitted sequence, result (or exception)
+
+
+@dataclass(frozen=True, slots=True)
+class MicroBatchConfig:
+    """
+    Micro-batching switch and queueing deadline.
+
+    Attributes
+    ----------
+    enabled:
+        Whether stages submit items to the shared micro-batchers.
+    max_wait_ms:
+        Deadline for the first queued item of a batch.
+    max_concurrency:
+        Batches in flight per batcher. 0 means LLM_MAX_CONCURRENCY.
+    """
+    enabled: bool = False
+    max_wait_ms: int = 100
+    max_concurrency: int = 0
+
+    @classmethod
+    def from_env(cls) -> MicroBatchConfig:
+        return cls(
+            enabled=os.getenv("LLM_MICRO_BATCHING", "0").strip().lower() in {"1", "true", "yes"},
+            max_wait_ms=max(0, int(os.getenv("LLM_MICRO_BATCH_MAX_WAIT_MS", "100").strip())),
+        )
+
+
+def micro_batching_enabled() -> bool:
+    """
+    Whether batched stages should go through the shared micro-batchers (LLM_MICRO_BATCHING).
+    """
+    return MicroBatchConfig.from_env().enabled
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Queue of single items of one stage, flushed as shared batched LLM calls.
+
+    Parameters
+    ----------
+    stage:
+        Planner profile used to pack the queued items.
+    run_batch:
+        Coroutine function answering one planned batch, aligned with
+        `batch.items`.
+    text_of:
+        Text an item contributes to the prompt (token budgeting).
+    prompt_overhead_tokens:
+        Returns the tokens of the prompt without items (called per flush).
+    max_tokens_per_item:
+        Optional ceiling on the expected output of one item.
+    config:
+        Defaults to `MicroBatchConfig.from_env()`.
+    """
+
+    def __init__(
+        self,
+        stage: StageProfile,
+        run_batch: Callable[[PlannedBatch[T]], Awaitable[List[Union[R, BaseException]]]],
+        *,
+        text_of: Callable[[T], str],
+        prompt_overhead_tokens: Callable[[], int],
+        max_tokens_per_item: Optional[int] = None,
+        config: Optional[MicroBatchConfig] = None,
+    ) -> None:
+        self.stage = stage
+        self.run_batch = run_batch
+        self.text_of = text_of
+        self.prompt_overhead_tokens = prompt_overhead_tokens
+        self.max_tokens_per_item = max_tokens_per_item
+        self.config = config or MicroBatchConfig.from_env()
+
+        # Only touched from the LLM loop thread.
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._stats_lock = Lock()
+        self._stats: Dict[str, int] = {"items": 0, "batches": 0, "flushes_full": 0, "flushes_deadline": 0}
+
+    # ------------------------------------------------------------------
+    # Queue (LLM loop only)
+    # ------------------------------------------------------------------
+    def _full_size(self) -> int:
+        return max(1, get_batch_planner().config.max_items_per_batch)
+
+    async def submit(self, item: T) -> R:
+        """
+        Queue one item and wait for its result. Must run on the LLM loop.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self._full_size():
+            self._flush(reason="flushes_full")
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                self.config.max_wait_ms / 1000.0, self._flush, "flushes_deadline"
+            )
+        return await future
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        # Callers that gave up (cancelled) need no answer.
+        pending = [(item, fut) for item, fut in pending if not fut.done()]
+        if not pending:
+            return
+
+        batches = get_batch_planner().plan(
+            self.stage,
+            [item for item, _ in pending],
+            text_of=self.text_of,
+            prompt_overhead_tokens=self.prompt_overhead_tokens(),
+            max_tokens_per_item=self.max_tokens_per_item,
+        )
+        with self._stats_lock:
+            self._stats["items"] += len(pending)
+            self._stats["batches"] += len(batches)
+            self._stats[reason] += 1
+
+        for batch in batches:
+            futures = [fut for _, fut in pending[batch.start:batch.start + len(batch.items)]]
+            # Prompt ids start at 0 in every shared batch.
+            task = asyncio.ensure_future(self._run(replace(batch, start=0), futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: PlannedBatch[T], futures: List[asyncio.Future]) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrency or default_max_concurrency())
+        try:
+            async with self._semaphore:
+                results = await self.run_batch(batch)
+        except BaseException as e:  # noqa: BLE001 (delivered to every submitter of the batch)
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        for fut, result in zip(futures, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    # ------------------------------------------------------------------
+    # Job-side API
+    # ------------------------------------------------------------------
+    async def amap(
+        self,
+        items: Sequence[T],
+        *,
+        on_item: Optional[ItemCallback] = None,
+        return_exceptions: bool = False,
+    ) -> List[Union[R, BaseException]]:
+        """
+        Submit every item and wait for all of them (results in input order).
+
+        `on_item(index, result)` is called as each item completes. With
+        `return_exceptions=True`, a failed item yields its exception instead
+        of failing the whole call.
+        """
+        async def _one(idx: int, item: T) -> Union[R, BaseException]:
+            try:
+                result: Union[R, BaseException] = await self.submit(item)
+            except Exception as e:  # noqa: BLE001
+                if not return_exceptions:
+                    raise
+                result = e
+            if on_item:
+                on_item(idx, result)
+            return result
+
+        return list(await asyncio.gather(*(_one(i, item) for i, item in enumerate(items))))
+
+    def map(
+        self,
+        items: Sequence[T],
+        *,
+        on_item: Optional[ItemCallback] = None,
+        return_exceptions: bool = False,
+    ) -> List[Union[R, BaseException]]:
+        """
+        Synchronous `amap` (call from pipeline / job threads).
+        """
+        if not items:
+            return []
+        return run_sync(self.amap(items, on_item=on_item, return_exceptions=return_exceptions))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Items and batches sent so far, and the resulting items per call.
+        """
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["items_per_batch"] = round(out["items"] / out["batches"], 2) if out["batches"] else 0.0
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Process-wide registry
+# ---------------------------------------------------------------------------
+_batchers: Dict[Hashable, MicroBatcher] = {}
+_batchers_lock = Lock()
+
+
+def get_micro_batcher(key: Hashable, factory: Callable[[], MicroBatcher]) -> MicroBatcher:
+    """
+    The shared batcher for `key`, created by `factory` on first use.
+
+    `key` must cover everything that changes the prompt or the call
+    (stage, temperature, backend/model, ...): only items with equal keys are
+    packed together. Batchers are kept apart per request class of the caller.
+    """
+    key = (key, current_request_context().request_class)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = factory()
+        return batcher
+
+
+def micro_batching_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    `MicroBatcher.stats()` of every batcher, by stage name and key.
+    """
+    with _batchers_lock:
+        items = list(_batchers.items())
+    return {f"{b.stage.name}:{key!r}": b.stats() for key, b in items}
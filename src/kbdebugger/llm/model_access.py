@@ -1,14 +1,44 @@
 from __future__ import annotations
 from dotenv import load_dotenv
 
-from dataclasses import dataclass
-from typing import Any, NoReturn, Final
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, NoReturn, Final, Optional
+import json
+import asyncio
 import os
 import time
+from concurrent.futures import Future
 
 import requests
+from kbdebugger.utils.json import IncrementalJsonArrayParser
+from .cache import get_response_cache, make_cache_key
 from .groq_responder import GroqResponder
-from .llm_protocol import LLMResponder
+from .hf_generation import HFGenerationConfig, HFGenerationEngine, HFMicroBatcher
+from .json_constraint import ANY_OBJECT_SCHEMA
+from .llamacpp_backend import LlamaCppConfig, LlamaCppSlotPool, json_response_format, llamacpp_server_url
+from .llm_protocol import LLMCompletion, LLMResponder
+from .rate_limit import (
+    CHARS_PER_TOKEN,
+    RateLimitExceeded,
+    RateLimitStats,
+    TokenBucketLimiter,
+    acall_with_rate_limit,
+    call_with_rate_limit,
+    estimate_prompt_tokens,
+    get_rate_limiter,
+    note_transport_retry,
+    parse_duration_seconds,
+)
+from .routing import RoutedBackend, RoutingConfig, RoutingResponder
+from .scheduler import current_request_context
+from .telemetry import get_llm_telemetry
+from .registry import (
+    RESPONDER_REGISTRY,
+    HTTPPoolConfig,
+    build_async_httpx_client,
+    build_httpx_client,
+    build_requests_session,
+)
 
 
 # -----------------------------
@@ -59,13 +89,32 @@ class HTTPChatResponder:
     }
 
     Returns assistant message content as a string.
+
+    All calls go through one pooled `requests.Session` so consecutive calls
+    (and concurrent calls from worker threads) reuse keep-alive connections.
+    `ainvoke` uses a pooled `httpx.AsyncClient`, created lazily on the shared
+    LLM event loop.
+
+    Rate-limit headers are fed into `rate_limiter` (if any). HTTP 429 is not
+    retried here: it is raised as `RateLimitExceeded` so the shared limiter
+    (not this responder's fixed backoff) decides when to try again. Other
+    failures are retried `retries` times here and counted as transport
+    retries in the call's telemetry.
     """
     url: str
     model: str
     timeout: float = 30.0
     retries: int = 2
+    session: Optional[requests.Session] = field(default=None, repr=False)
+    pool: Optional[HTTPPoolConfig] = field(default=None, repr=False)
+    rate_limiter: Optional[TokenBucketLimiter] = field(default=None, repr=False)
 
-    def invoke(self, inputs: dict[str, Any]) -> str:
+    def __post_init__(self) -> None:
+        if self.session is None:
+            self.session = build_requests_session(self.pool)
+        self._async_client: Any = None
+
+    def _build_payload(self, inputs: dict[str, Any]) -> dict[str, Any]:
         prompt = inputs.get("prompt")
         if not isinstance(prompt, str) or not prompt.strip():
             raise ValueError("HTTPChatResponder.invoke expects inputs['prompt'] as a non-empty string.")
@@ -77,81 +126,258 @@ class HTTPChatResponder:
         }
         if "temperature" in inputs:
             data["temperature"] = float(inputs["temperature"])
+        return data
+
+    def _observe(self, resp: Any) -> None:
+        """
+        Feed response headers to the limiter; raise `RateLimitExceeded` on 429.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe_headers(resp.headers)
+        if resp.status_code == 429:
+            raise RateLimitExceeded(
+                f"HTTPChatResponder rate limited by {self.url}",
+                retry_after=parse_duration_seconds(resp.headers.get("retry-after")),
+            )
+
+    @staticmethod
+    def _to_completion(payload: dict[str, Any]) -> LLMCompletion:
+        # Expect OpenAI-like shape
+        choice = payload["choices"][0]
+        usage = payload.get("usage")
+        return LLMCompletion(
+            text=choice["message"]["content"],
+            finish_reason=choice.get("finish_reason"),
+            usage=usage if isinstance(usage, dict) else None,
+        )
+
+    def invoke(self, inputs: dict[str, Any]) -> str:
+        return self.complete(inputs).text
+
+    async def ainvoke(self, inputs: dict[str, Any]) -> str:
+        return (await self.acomplete(inputs)).text
+
+    def complete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        data = self._build_payload(inputs)
 
         last_exception: Exception | None = None
         for attempt in range(1, self.retries + 2):  # first try + retries
             try:
-                resp = requests.post(self.url, json=data, timeout=self.timeout)
+                resp = self.session.post(self.url, json=data, timeout=self.timeout)  # type: ignore[union-attr]
+                self._observe(resp)
                 resp.raise_for_status() # Raises HTTPError, if one occurred.
-                payload = resp.json()
-                # Expect OpenAI-like shape
-                content = payload["choices"][0]["message"]["content"]
-                return content
+                return self._to_completion(resp.json())
+            except RateLimitExceeded:
+                raise
             except Exception as exc:
                 last_exception = exc
                 if attempt <= self.retries:
+                    note_transport_retry()
                     time.sleep(0.5 * attempt)
                     continue
                 else:
                     raise RuntimeError(f"HTTPChatResponder failed after {attempt} attempts: {exc}") from exc
                 
         # It should not reach here, but mypy needs a return
-        return ""
+        return LLMCompletion(text="")
         
         # # This should never be reached due to the raise above, but added for type safety
         # raise RuntimeError(f"HTTPChatResponder failed after all attempts: {last_exception}")
 
+    async def acomplete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        data = self._build_payload(inputs)
+
+        if self._async_client is None:
+            self._async_client = build_async_httpx_client(self.pool, timeout=self.timeout)
+
+        for attempt in range(1, self.retries + 2):  # first try + retries
+            try:
+                resp = await self._async_client.post(self.url, json=data)
+                self._observe(resp)
+                resp.raise_for_status()
+                return self._to_completion(resp.json())
+            except RateLimitExceeded:
+                raise
+            except Exception as exc:
+                if attempt <= self.retries:
+                    note_transport_retry()
+                    await asyncio.sleep(0.5 * attempt)
+                    continue
+                raise RuntimeError(f"HTTPChatResponder failed after {attempt} attempts: {exc}") from exc
+
+        return LLMCompletion(text="")
+
+    async def astream(self, inputs: dict[str, Any]) -> AsyncIterator[LLMCompletion]:
+        """
+        Stream the completion as text deltas (OpenAI-compatible SSE, `stream: true`).
+
+        Each yielded `LLMCompletion` carries a text *delta*; the last one also
+        carries the finish reason. No transparent retries: a stream that
+        already produced output cannot be replayed safely.
+        """
+        data = self._build_payload(inputs)
+        data["stream"] = True
+
+        if self._async_client is None:
+            self._async_client = build_async_httpx_client(self.pool, timeout=self.timeout)
+
+        async with self._async_client.stream("POST", self.url, json=data) as resp:
+            self._observe(resp)
+            resp.raise_for_status()
+
+            async for line in resp.aiter_lines():
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                body = line[len("data:"):].strip()
+                if body == "[DONE]":
+                    break
+                try:
+                    event = json.loads(body)
+                except json.JSONDecodeError:
+                    continue
+
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                choice = choices[0]
+                delta = (choice.get("delta") or {}).get("content") or ""
+                finish_reason = choice.get("finish_reason")
+                if delta or finish_reason:
+                    yield LLMCompletion(text=delta, finish_reason=finish_reason)
+
+
+# -----------------------------
+# llama.cpp (quantized GGUF on CPU)
+# -----------------------------
+@dataclass
+class LlamaCppServerResponder(HTTPChatResponder):
+    """
+    Calls a `llama-server` (OpenAI-compatible, continuous batching) — see
+    `llm.llamacpp_backend`.
+
+    Same inputs as `HTTPChatResponder`, plus `json_schema` / `json_mode`
+    (grammar-constrained JSON). `cache_prompt` lets a slot reuse the KV cache
+    of the static prompt prefix it served last.
+    """
+
+    def _build_payload(self, inputs: dict[str, Any]) -> dict[str, Any]:
+        data = super()._build_payload(inputs)
+        data["cache_prompt"] = True
+        response_format = json_response_format(inputs)
+        if response_format:
+            data["response_format"] = response_format
+        return data
+
+
+class LlamaCppLocalResponder:
+    """
+    In-process llama.cpp backend (llama-cpp-python) with LLAMACPP_PARALLEL slots.
+
+    Same inputs as `HFLocalResponder`. Calls run on the slot pool's worker
+    threads, never on the event loop.
+    """
+    def __init__(self, config: Optional[LlamaCppConfig] = None) -> None:
+        self.pool = LlamaCppSlotPool(config)
+
+    def complete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        return self.pool.submit(inputs).result()
+
+    def invoke(self, inputs: dict[str, Any]) -> str:
+        return self.complete(inputs).text
+
+    async def acomplete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        return await asyncio.wrap_future(self.pool.submit(inputs))
+
+    async def ainvoke(self, inputs: dict[str, Any]) -> str:
+        return (await self.acomplete(inputs)).text
+
+    async def astream(self, inputs: dict[str, Any]) -> AsyncIterator[LLMCompletion]:
+        yield await self.acomplete(inputs)
+
 
 # -----------------------------
-# HF local client (simple text-generation)
+# HF local client (batched generation)
 # -----------------------------
 class HFLocalResponder:
     """
-    Minimal local Hugging Face text-generation backend.
+    Local Hugging Face causal-LM backend with batched generation.
     Loads model/tokenizer lazily on first call. Works on 🚗 CPU by default.
 
     Expected inputs to .invoke():
     {
         "prompt": "<final prompt string>",   # required
         "max_tokens": 256,                   # optional override
+        "temperature": 0.0,                  # optional (0.0 = greedy)
+        "prompt_prefix": "<static prefix>",  # optional, see below
+        "json_schema": {...},                # optional, see below
+        "json_mode": True,                   # optional
         ...
     }
 
-    Returns plain generated text string (no special chat formatting).
+    Returns the generated text only (no prompt echo, no chat formatting).
+
+    Concurrent calls — from worker threads or from the shared LLM event loop —
+    are collected by an `HFMicroBatcher` and run as ONE left-padded
+    `model.generate` batch (see `llm.hf_generation`, HF_GENERATE_BATCH_SIZE).
+    `model_name` may also be a local model or PEFT adapter directory.
+
+    If `prompt_prefix` is given (the static instructions + few-shot examples
+    part of `prompt`, see `prompts.PromptParts`), its KV cache is computed once
+    and reused by every call with the same prefix.
+
+    If `json_schema` is given (`prompts.load_output_schema`) — or `json_mode`
+    is set, meaning any JSON object — decoding is constrained so the output is
+    always valid JSON of that shape (`llm.json_constraint`, HF_JSON_CONSTRAINED).
     """
-    def __init__(self, model_name: str, device: str = "cpu", max_new_tokens: int = 256) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        max_new_tokens: int = 256,
+        generation: Optional[HFGenerationConfig] = None,
+    ) -> None:
         self.model_name = model_name
         self.device = device
         self.default_max_new_tokens = max_new_tokens
-        self._pipe = None  # lazy init
+        generation = generation or HFGenerationConfig.from_env()
+        self.engine = HFGenerationEngine(self._load_model, prefix_cache_size=generation.prefix_cache_size)
+        self.batcher = HFMicroBatcher(self.engine, generation)
 
-    def _ensure_pipeline(self):
-        if self._pipe is not None:
-            return
+    def _load_model(self) -> tuple[Any, Any, str]:
         # Lazy import to avoid heavy deps until needed
-        from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline  # type: ignore
-        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        model = AutoModelForCausalLM.from_pretrained(self.model_name)
-        self._pipe = pipeline(
-            task="text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            device=0 if self.device == "cuda" else -1,
-        )
+        from .hf_backend import load_causal_lm
+        model, tokenizer = load_causal_lm(self.model_name, device=self.device)
+        return model, tokenizer, self.device
 
-    def invoke(self, inputs: dict[str, Any]) -> str:
+    def _submit(self, inputs: dict[str, Any]) -> Future:
         prompt = inputs.get("prompt")
         if not isinstance(prompt, str) or not prompt.strip():
             raise ValueError("HFLocalResponder.invoke expects inputs['prompt'] as a non-empty string.")
-        max_new_tokens = int(inputs.get("max_tokens", self.default_max_new_tokens))
-        self._ensure_pipeline()
+        return self.batcher.submit(
+            prompt,
+            max_new_tokens=int(inputs.get("max_tokens", self.default_max_new_tokens)),
+            temperature=float(inputs.get("temperature", 0.0)),
+            prefix=inputs.get("prompt_prefix"),
+            json_schema=inputs.get("json_schema") or (ANY_OBJECT_SCHEMA if inputs.get("json_mode") else None),
+        )
+
+    def complete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        return self._submit(inputs).result()
 
-        # Generate; pipeline returns list[dict]
-        outs = self._pipe(prompt, max_new_tokens=max_new_tokens)  # type: ignore[attr-defined]
-        if isinstance(outs, list) and outs and "generated_text" in outs[0]:
-            return outs[0]["generated_text"]
-        # Fallback stringify
-        return str(outs)
+    def invoke(self, inputs: dict[str, Any]) -> str:
+        return self.complete(inputs).text
+
+    async def acomplete(self, inputs: dict[str, Any]) -> LLMCompletion:
+        # Generation runs on the micro-batcher's worker thread, never on the event loop.
+        return await asyncio.wrap_future(self._submit(inputs))
+
+    async def ainvoke(self, inputs: dict[str, Any]) -> str:
+        return (await self.acomplete(inputs)).text
+
+    async def astream(self, inputs: dict[str, Any]) -> AsyncIterator[LLMCompletion]:
+        # Batched generation does not stream: emit the whole completion at once.
+        yield await self.acomplete(inputs)
 
 
 def _unsupported_backend(backend: str) -> NoReturn:
@@ -160,50 +386,527 @@ def _unsupported_backend(backend: str) -> NoReturn:
 # -----------------------------
 # Factory
 # -----------------------------
-def get_llm_responder() -> LLMResponder:
+def resolve_backend_and_model(
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+) -> tuple[str, str]:
     """
-    Factory that returns an object satisfying LLMResponder.
-    Chooses backend via MODEL_BACKEND: "groq", "http", or "hf_local".
+    Resolve the effective `(backend, model)` pair, filling gaps from the environment.
 
-    Usage:
-        llm = get_llm_responder()
-        result = llm.invoke({"prompt": "Hello model!"})
+    This pair is the registry key: one pooled responder exists per pair.
     """
-    backend = os.getenv("MODEL_BACKEND", "groq").lower()
+    backend = (backend or os.getenv("MODEL_BACKEND", "groq")).lower()
 
     match backend:
         case "groq":
-            return GroqResponder(model=os.getenv("GROQ_MODEL"))
+            model = model or os.getenv("GROQ_MODEL") or "llama-3.1-8b-instant"
+        case "hf_local":
+            model = model or HF_LOCAL_MODEL
+        case "llamacpp":
+            model = model or LlamaCppConfig.from_env().model_name
+        case "http":
+            model = model or MODEL_SERVICE_NAME
+        case _:
+            _unsupported_backend(backend)
+
+    return backend, model
+
+
+def _build_responder(backend: str, model: str) -> LLMResponder:
+    """
+    Construct a new responder for `(backend, model)` with a pooled HTTP client.
+
+    Only called by the registry; use `get_llm_responder()` everywhere else.
+    """
+    pool = HTTPPoolConfig.from_env()
+    limiter = get_rate_limiter(backend, model)
+
+    match backend:
+        case "groq":
+            return GroqResponder(
+                model=model,
+                http_client=build_httpx_client(pool),
+                pool=pool,
+                rate_limiter=limiter,
+            )
         case "hf_local":
             return HFLocalResponder(
-                model_name=HF_LOCAL_MODEL,
+                model_name=model,
                 device=HF_DEVICE,
                 max_new_tokens=HF_MAX_NEW_TOKENS,
+                generation=HFGenerationConfig.from_env(),
+            )
+        case "llamacpp":
+            cfg = LlamaCppConfig.from_env()
+            if not cfg.uses_server:
+                return LlamaCppLocalResponder(cfg)
+            return LlamaCppServerResponder(
+                url=f"{llamacpp_server_url(cfg)}/v1/chat/completions",
+                model=model,
+                timeout=cfg.timeout,
+                retries=REQUEST_RETRIES,
+                session=build_requests_session(pool),
+                pool=pool,
             )
         case "http":
             return HTTPChatResponder(
                 url=MODEL_SERVICE_URL,
-                model=MODEL_SERVICE_NAME,
+                model=model,
                 timeout=REQUEST_TIMEOUT,
                 retries=REQUEST_RETRIES,
+                session=build_requests_session(pool),
+                pool=pool,
+                rate_limiter=limiter,
             )
         case _:
             _unsupported_backend(backend)  # NoReturn → type checker knows we never return here
 
 
+def get_llm_responder(
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+) -> LLMResponder:
+    """
+    Return the process-wide responder for the selected backend/model.
+    Chooses backend via MODEL_BACKEND: "groq", "http", "hf_local" or
+    "llamacpp" (quantized GGUF on CPU, see `llm.llamacpp_backend`).
+
+    Responders are pooled: repeated calls (from any thread) return the same
+    object, so its keep-alive connections are reused across all LLM stages.
+
+    If LLM_FALLBACK_BACKENDS is set, the default responder (no explicit
+    `backend` / `model`) is a `RoutingResponder` over MODEL_BACKEND followed
+    by the fallbacks: slow calls are hedged and failing backends are skipped
+    (see `llm.routing`). Explicit `backend` / `model` always return that
+    single backend.
+
+    Usage:
+        llm = get_llm_responder()
+        result = llm.invoke({"prompt": "Hello model!"})
+    """
+    key = resolve_backend_and_model(backend, model)
+
+    if backend is None and model is None:
+        routing = RoutingConfig.from_env()
+        if routing.enabled:
+            return _get_routing_responder(key, routing)
+
+    if key[0] == "llamacpp":
+        # Spawning llama-server waits for the model to load: do it before
+        # taking the registry lock, which every other backend lookup needs.
+        cfg = LlamaCppConfig.from_env()
+        if cfg.uses_server:
+            llamacpp_server_url(cfg)
+
+    return RESPONDER_REGISTRY.get_or_create(key, lambda: _build_responder(*key))
+
+
+def _get_routing_responder(primary: tuple[str, str], routing: RoutingConfig) -> LLMResponder:
+    """
+    Pooled `RoutingResponder` for `primary` + the configured fallbacks.
+    """
+    members = [primary] + [resolve_backend_and_model(b, m) for b, m in routing.fallbacks]
+    members = list(dict.fromkeys(members))  # drop duplicates, keep order
+    route_key = ("routed", *members)
+
+    # Resolve members first: the registry lock is not re-entrant.
+    backends = [
+        RoutedBackend(
+            name=f"{b}:{m}",
+            responder=get_llm_responder(b, m),
+            rate_limiter=get_rate_limiter(b, m),
+            key=(b, m),
+        )
+        for b, m in members
+    ]
+    return RESPONDER_REGISTRY.get_or_create(route_key, lambda: RoutingResponder(backends, routing))
+
+
 # -----------------------------
 # Convenience wrapper (optional)
 # -----------------------------
-def respond(prompt: str, **kwargs: Any) -> str:
+def _cache_key_for(
+    prompt: str,
+    kwargs: dict[str, Any],
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Content-address a `respond()` call for the response cache.
+
+    Lookups use the requested backend; answers are stored under the backend
+    that produced them (`LLMCompletion.served_by`, see `_store_in_cache`).
+    """
+    backend, model = resolve_backend_and_model(backend, model)
+    return make_cache_key(
+        prompt=prompt,
+        backend=backend,
+        model=model,
+        temperature=kwargs.get("temperature"),
+        max_tokens=kwargs.get("max_tokens"),
+        json_mode=kwargs.get("json_mode"),
+    )
+
+
+def _store_in_cache(
+    key: Optional[str],
+    prompt: str,
+    kwargs: dict[str, Any],
+    completion: LLMCompletion,
+) -> None:
+    """
+    Cache a finished (non-truncated) answer under the backend that produced it.
+    """
+    if key is None or completion.truncated:
+        return
+    if completion.served_by is not None:
+        key = _cache_key_for(prompt, kwargs, *completion.served_by)
+    get_response_cache().put(key, completion.text)
+
+
+def _estimated_request_tokens(prompt: str, kwargs: dict[str, Any]) -> int:
+    """
+    TPM reservation for one call: estimated prompt tokens + the completion budget.
+    """
+    return estimate_prompt_tokens(prompt) + int(kwargs.get("max_tokens", 0) or 0)
+
+
+def _used_tokens(prompt: str) -> Callable[[LLMCompletion], float]:
+    """
+    Tokens a finished call consumed, for the limiter refund: the provider's
+    `usage.total_tokens`, or an estimate when it reports none (e.g. SSE streams).
+    """
+    def _of(completion: LLMCompletion) -> float:
+        usage = completion.usage or {}
+        if usage.get("total_tokens"):
+            return float(usage["total_tokens"])
+        return estimate_prompt_tokens(prompt) + len(completion.text) / CHARS_PER_TOKEN
+    return _of
+
+
+class _CallTelemetry:
+    """
+    Collects one `complete()` / `acomplete()` / `astream_items()` call into an
+    `LLMCallRecord` (see `llm.telemetry`).
+    """
+
+    def __init__(
+        self,
+        prompt: str,
+        *,
+        stage: Optional[str],
+        batch_size: Optional[int],
+        backend: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> None:
+        self.prompt = prompt
+        self.stage = stage or "other"
+        self.backend, self.model = resolve_backend_and_model(backend, model)
+        self.batch_size = batch_size
+        self.limits = RateLimitStats()
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+
+    def _record(self, completion: Optional[LLMCompletion], **fields: Any) -> None:
+        usage = completion.usage if completion is not None else None
+        if usage:
+            prompt_tokens = int(usage.get("prompt_tokens") or 0)
+            completion_tokens = int(usage.get("completion_tokens") or 0)
+        else:
+            # Providers that do not report usage (e.g. SSE streams): estimate.
+            prompt_tokens = estimate_prompt_tokens(self.prompt)
+            completion_tokens = int(len(completion.text) / CHARS_PER_TOKEN) if completion is not None else 0
+
+        get_llm_telemetry().record(
+            stage=self.stage,
+            backend=self.backend,
+            model=self.model,
+            started_at=self.started_at,
+            latency_s=time.monotonic() - self._t0,
+            queue_wait_s=self.limits.waited_s,
+            slot_wait_s=self.limits.slot_wait_s,
+            request_class=self.limits.request_class or str(current_request_context().request_class),
+            retries=self.limits.retries,
+            transport_retries=self.limits.transport_retries,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            usage_estimated=not usage,
+            batch_size=self.batch_size,
+            finish_reason=completion.finish_reason if completion is not None else None,
+            **fields,
+        )
+
+    def cache_hit(self, completion: LLMCompletion) -> LLMCompletion:
+        get_llm_telemetry().record(
+            stage=self.stage,
+            backend=self.backend,
+            model=self.model,
+            started_at=self.started_at,
+            latency_s=time.monotonic() - self._t0,
+            batch_size=self.batch_size,
+            request_class=str(current_request_context().request_class),
+            cache_hit=True,
+            finish_reason=completion.finish_reason,
+        )
+        return completion
+
+    def done(self, completion: LLMCompletion, *, streamed: bool = False) -> LLMCompletion:
+        if completion.served_by is not None:
+            # Routed call: log the backend that answered.
+            self.backend, self.model = completion.served_by
+        self._record(completion, streamed=streamed)
+        return completion
+
+    def failed(self, exc: BaseException, *, streamed: bool = False) -> None:
+        self._record(None, streamed=streamed, error=type(exc).__name__)
+
+
+def complete(
+    prompt: str,
+    *,
+    max_retries: Optional[int] = None,
+    stage: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    **kwargs: Any,
+) -> LLMCompletion:
+    """
+    Like `respond()`, but returns an `LLMCompletion` (text + finish reason + usage).
+
+    Use this when the caller must know whether the output was cut off by
+    `max_tokens` (`completion.truncated`).
+
+    Responses are served from / stored in the persistent response cache
+    (`llm.cache`, opt-in via LLM_CACHE_ENABLED) when it is enabled. Truncated
+    responses are never cached. Cache hits carry `finish_reason="stop"`.
+
+    Cache misses wait on the shared rate limiter (`llm.rate_limit`) before
+    sending, and are retried up to `max_retries` times (default:
+    LLM_RATE_LIMIT_MAX_RETRIES) if the provider still answers 429 or fails
+    transiently. The unused part of the `max_tokens` reservation is refunded
+    to the limiter from the reported usage.
+
+    Every call is recorded in the LLM telemetry (`llm.telemetry`) under
+    `stage` (e.g. "novelty"); pass `batch_size` for batched prompts. Neither
+    is sent to the provider.
+
+    `backend` / `model` select a specific responder (see `get_llm_responder`)
+    instead of the default one, e.g. a small model for a first pass.
+    """
+    call = _CallTelemetry(prompt, stage=stage, batch_size=batch_size, backend=backend, model=model)
+    cache = get_response_cache()
+    key = _cache_key_for(prompt, kwargs, backend, model) if cache.enabled else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return call.cache_hit(LLMCompletion(text=cached, finish_reason="stop"))
+
+    llm = get_llm_responder(backend, model)
+    payload: dict[str, Any] = {"prompt": prompt}
+    payload.update(kwargs)
+    try:
+        completion = call_with_rate_limit(
+            lambda: llm.complete(payload),
+            limiter=get_rate_limiter(call.backend, call.model),
+            tokens=_estimated_request_tokens(prompt, kwargs),
+            max_retries=max_retries,
+            stats=call.limits,
+            usage_of=_used_tokens(prompt),
+        )
+    except Exception as e:
+        call.failed(e)
+        raise
+    call.done(completion)
+
+    _store_in_cache(key, prompt, kwargs, completion)
+    return completion
+
+
+async def acomplete(
+    prompt: str,
+    *,
+    max_retries: Optional[int] = None,
+    stage: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    **kwargs: Any,
+) -> LLMCompletion:
+    """
+    Async twin of `complete()`.
+    """
+    call = _CallTelemetry(prompt, stage=stage, batch_size=batch_size, backend=backend, model=model)
+    cache = get_response_cache()
+    key = _cache_key_for(prompt, kwargs, backend, model) if cache.enabled else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return call.cache_hit(LLMCompletion(text=cached, finish_reason="stop"))
+
+    llm = get_llm_responder(backend, model)
+    payload: dict[str, Any] = {"prompt": prompt}
+    payload.update(kwargs)
+    try:
+        completion = await acall_with_rate_limit(
+            lambda: llm.acomplete(payload),
+            limiter=get_rate_limiter(call.backend, call.model),
+            tokens=_estimated_request_tokens(prompt, kwargs),
+            max_retries=max_retries,
+            stats=call.limits,
+            usage_of=_used_tokens(prompt),
+        )
+    except Exception as e:
+        call.failed(e)
+        raise
+    call.done(completion)
+
+    _store_in_cache(key, prompt, kwargs, completion)
+    return completion
+
+
+def respond(prompt: str, *, max_retries: Optional[int] = None, **kwargs: Any) -> str:
     """
     Convenience function for one-off calls without importing the responder:
         respond("your final prompt string", max_tokens=200)
 
     Equivalent to:
         get_llm_responder().invoke({"prompt": prompt, "max_tokens": 200})
+
+    Goes through `complete()`, i.e. the response cache and the shared rate
+    limiter apply.
+
+    Pass `prompt_prefix=` (the static part of `prompt`, see
+    `prompts.render_prompt_parts`) to let the HF local backend reuse the
+    prefix KV cache; remote backends ignore it and rely on the prefix being
+    byte-identical across calls for provider-side prompt caching.
+
+    Pass `stage=` / `batch_size=` to label the call in the LLM telemetry, and
+    `backend=` / `model=` to bypass the default responder. `json_schema=`
+    (`prompts.load_output_schema`) constrains HF local decoding to that
+    schema; remote backends ignore it.
+    """
+    return complete(prompt, max_retries=max_retries, **kwargs).text
+
+
+async def arespond(prompt: str, *, max_retries: Optional[int] = None, **kwargs: Any) -> str:
+    """
+    Async twin of `respond()`:
+        await arespond("your final prompt string", max_tokens=200)
+
+    Used by the bounded concurrent executor (`llm.concurrency.map_bounded`).
     """
-    llm = get_llm_responder()
+    return (await acomplete(prompt, max_retries=max_retries, **kwargs)).text
+
+
+# -----------------------------
+# Streaming
+# -----------------------------
+ItemCallback = Callable[[Any], None]
+
+
+def streaming_enabled() -> bool:
+    """
+    Whether batched stages should stream responses (LLM_STREAMING, default "0").
+    """
+    return os.getenv("LLM_STREAMING", "0").strip().lower() in {"1", "true", "yes"}
+
+
+async def astream_items(
+    prompt: str,
+    *,
+    key: str,
+    on_item: ItemCallback,
+    max_retries: Optional[int] = None,
+    stage: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    **kwargs: Any,
+) -> LLMCompletion:
+    """
+    Stream a batched JSON response and call `on_item(element)` for every
+    element of the array under `key` as soon as it closes.
+
+    Returns the full `LLMCompletion` (accumulated text + finish reason), so the
+    caller can still run its normal parsing / repair on the complete response.
+
+    Cache and rate limiting behave like `acomplete()`: a cache hit replays the
+    cached items through `on_item`; truncated streams are not cached.
+    """
+    call = _CallTelemetry(prompt, stage=stage, batch_size=batch_size, backend=backend, model=model)
+    cache = get_response_cache()
+    key_ = _cache_key_for(prompt, kwargs, backend, model) if cache.enabled else None
+    if key_ is not None:
+        cached = cache.get(key_)
+        if cached is not None:
+            for item in IncrementalJsonArrayParser(key).feed(cached):
+                on_item(item)
+            return call.cache_hit(LLMCompletion(text=cached, finish_reason="stop"))
+
+    llm = get_llm_responder(backend, model)
     payload: dict[str, Any] = {"prompt": prompt}
     payload.update(kwargs)
-    response = llm.invoke(payload)
-    return response
+
+    async def _stream() -> LLMCompletion:
+        parser = IncrementalJsonArrayParser(key)
+        parts: list[str] = []
+        finish_reason: Optional[str] = None
+        served_by: Optional[tuple[str, str]] = None
+
+        async for delta in llm.astream(payload):
+            if delta.text:
+                parts.append(delta.text)
+                for item in parser.feed(delta.text):
+                    on_item(item)
+            if delta.finish_reason:
+                finish_reason = delta.finish_reason
+            served_by = delta.served_by or served_by
+
+        return LLMCompletion(text="".join(parts).strip(), finish_reason=finish_reason, served_by=served_by)
+
+    try:
+        completion = await acall_with_rate_limit(
+            _stream,
+            limiter=get_rate_limiter(call.backend, call.model),
+            tokens=_estimated_request_tokens(prompt, kwargs),
+            max_retries=max_retries,
+            stats=call.limits,
+            usage_of=_used_tokens(prompt),
+        )
+    except Exception as e:
+        call.failed(e, streamed=True)
+        raise
+    call.done(completion, streamed=True)
+
+    _store_in_cache(key_, prompt, kwargs, completion)
+    return completion
+
+
+async def acomplete_batch(
+    prompt: str,
+    *,
+    key: str,
+    on_item: Optional[ItemCallback] = None,
+    max_retries: Optional[int] = None,
+    **kwargs: Any,
+) -> LLMCompletion:
+    """
+    Complete a batched JSON prompt, streaming it when useful.
+
+    If `on_item` is given and LLM_STREAMING is enabled, the response is
+    streamed and `on_item` sees every array element under `key` as soon as it
+    is generated. Otherwise this is plain `acomplete()` (and `on_item`, if
+    given, is called for every element once the response is complete).
+
+    `stage` / `batch_size` (telemetry labels) and `backend` / `model` are
+    passed through in `kwargs`.
+    """
+    if on_item is not None and streaming_enabled():
+        return await astream_items(prompt, key=key, on_item=on_item, max_retries=max_retries, **kwargs)
+
+    completion = await acomplete(prompt, max_retries=max_retries, **kwargs)
+    if on_item is not None:
+        for item in IncrementalJsonArrayParser(key).feed(completion.text):
+            on_item(item)
+    return completion
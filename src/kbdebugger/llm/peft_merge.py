@@ -0,0 +1,154 @@
+"""
+Merge-and-export of PEFT (LoRA) adapters for local inference.
+
+`merge_peft_adapter` folds the adapter into its base model once and saves it
+as safetensors; `load_causal_lm` (`llm.hf_backend`) loads that artifact
+instead of the adapter while it is current. Artifacts are keyed by an adapter
+fingerprint, so a retrained adapter is merged again.
+
+Environment variables
+---------------------
+PEFT_MERGED_DIR:
+    Root directory of merged artifacts. Default: ".cache/peft_merged"
+
+PEFT_USE_MERGED:
+    "0" always loads the adapter itself. Default: "1"
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import rich
+
+from kbdebugger.utils.json import write_json
+from kbdebugger.utils.time import now_utc_human
+
+MANIFEST_NAME = "merged_from.json"
+
+_DTYPES = ("float32", "bfloat16", "float16")
+
+
+def adapter_fingerprint(adapter_dir: str) -> str:
+    """
+    Short hash identifying an adapter version (config + weight files' size/mtime).
+    """
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(adapter_dir)):
+        path = os.path.join(adapter_dir, name)
+        if not os.path.isfile(path):
+            continue
+        if name == "adapter_config.json":
+            with open(path, "rb") as f:
+                h.update(f.read())
+        elif name.startswith("adapter_model"):
+            st = os.stat(path)
+            h.update(f"{name}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def merged_model_dir(adapter_dir: str, root: Optional[str] = None) -> str:
+    """
+    Where the merged artifact of the current `adapter_dir` version lives.
+    """
+    root = root or os.getenv("PEFT_MERGED_DIR", ".cache/peft_merged").strip()
+    name = os.path.basename(os.path.normpath(adapter_dir)) or "adapter"
+    return os.path.join(root, f"{name}-{adapter_fingerprint(adapter_dir)}")
+
+
+def find_merged_model(adapter_dir: str) -> Optional[str]:
+    """
+    The merged artifact for `adapter_dir` if one exists for its current version.
+    """
+    if os.getenv("PEFT_USE_MERGED", "1").strip().lower() not in {"1", "true", "yes"}:
+        return None
+    path = merged_model_dir(adapter_dir)
+    if os.path.isfile(os.path.join(path, MANIFEST_NAME)) and os.path.isfile(os.path.join(path, "config.json")):
+        return path
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class MergedModelInfo:
+    """
+    Manifest written next to a merged model (`merged_from.json`).
+    """
+    adapter_dir: str
+    adapter_fingerprint: str
+    base_model: str
+    output_dir: str
+    dtype: str
+    created_at: str
+
+
+def merge_peft_adapter(
+    adapter_dir: str,
+    *,
+    output_dir: Optional[str] = None,
+    dtype: str = "float32",
+    max_shard_size: str = "2GB",
+) -> MergedModelInfo:
+    """
+    Fold a LoRA adapter into its base model and save the result as safetensors.
+
+    Parameters
+    ----------
+    adapter_dir:
+        PEFT adapter directory (contains adapter_config.json).
+    output_dir:
+        Target directory. Defaults to `merged_model_dir(adapter_dir)`, where
+        `load_causal_lm` finds it automatically.
+    dtype:
+        Stored weight dtype: "float32", "bfloat16" (half the size and load
+        time; needs a CPU with fast bf16) or "float16" (GPU only).
+    max_shard_size:
+        Safetensors shard size.
+
+    Returns
+    -------
+    MergedModelInfo
+    """
+    if dtype not in _DTYPES:
+        raise ValueError(f"dtype must be one of {_DTYPES}, got {dtype!r}")
+    if not os.path.isfile(os.path.join(adapter_dir, "adapter_config.json")):
+        raise FileNotFoundError(f"Not a PEFT adapter directory (no adapter_config.json): {adapter_dir}")
+
+    import torch  # type: ignore
+    from peft import AutoPeftModelForCausalLM
+    from transformers import AutoTokenizer
+
+    output_dir = output_dir or merged_model_dir(adapter_dir)
+    torch_dtype = getattr(torch, dtype)
+
+    rich.print(f"[PEFTMerge] Loading adapter [cyan]{adapter_dir}[/cyan] ({dtype}, CPU)")
+    model = AutoPeftModelForCausalLM.from_pretrained(adapter_dir, dtype=torch_dtype, low_cpu_mem_usage=True)
+    base_model = str(getattr(model.peft_config["default"], "base_model_name_or_path", "") or "")
+
+    rich.print("[PEFTMerge] 🔀 Merging LoRA weights into the base model")
+    merged = model.merge_and_unload()
+
+    os.makedirs(output_dir, exist_ok=True)
+    merged.save_pretrained(output_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(adapter_dir)
+    except (OSError, ValueError):
+        # Adapter saved without its tokenizer: use the base model's.
+        tokenizer = AutoTokenizer.from_pretrained(base_model)
+    tokenizer.save_pretrained(output_dir)
+
+    info = MergedModelInfo(
+        adapter_dir=os.path.abspath(adapter_dir),
+        adapter_fingerprint=adapter_fingerprint(adapter_dir),
+        base_model=base_model,
+        output_dir=os.path.abspath(output_dir),
+        dtype=dtype,
+        created_at=now_utc_human(),
+    )
+    # Written last: its presence marks a complete artifact.
+    write_json(os.path.join(output_dir, MANIFEST_NAME), asdict(info))
+    rich.print(f"[PEFTMerge] ✅ Merged model saved to [cyan]{output_dir}[/cyan]")
+    return info
+
@@ -0,0 +1,593 @@
+"""
+Process-wide, provider-aware rate limiting for LLM calls.
+
+Every call waits before sending: `limiter.acquire(prompt tokens + max_tokens)`
+on RPM / TPM token buckets per `(backend, model)`. The buckets are calibrated
+from the environment and from the provider's `x-ratelimit-*` headers (minus
+what is in flight); the unused part of a reservation is refunded from the
+reported usage. On a 429 or transient provider error (`RateLimitExceeded` /
+`ProviderUnavailable`) all callers wait for the reset (or a backoff) and the
+call is retried; responders must not retry these themselves.
+
+The helpers first take a slot from the request scheduler (`llm.scheduler`);
+lower request classes may not draw the buckets below the reserve kept for
+higher ones.
+
+Environment variables
+---------------------
+LLM_RATE_LIMIT_RPM:
+    Requests per minute for remote backends. 0 = learn from headers only.
+    Default: 0
+
+LLM_RATE_LIMIT_TPM:
+    Tokens per minute for remote backends. 0 = learn from headers only.
+    Default: 0
+
+LLM_RATE_LIMIT_MAX_RETRIES:
+    How many times a rate-limited call is retried after waiting.
+    Default: 8
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+from .scheduler import DeadlineExceeded, SlotGrant, get_llm_scheduler
+
+T = TypeVar("T")
+
+# Rough but stable heuristic: ~4 characters per token for English prose / JSON.
+CHARS_PER_TOKEN = 4.0
+
+# Chat wrapper overhead (system message, role tokens) added to every request.
+REQUEST_OVERHEAD_TOKENS = 64
+
+# Never sleep longer than this in one go; re-check the buckets instead
+# (headers from other calls may have freed budget in the meantime).
+_MAX_SLEEP_SLICE_S = 5.0
+
+
+class RetryableLLMError(RuntimeError):
+    """
+    Base of the provider errors the wait-then-send helpers retry.
+
+    Attributes
+    ----------
+    retry_after:
+        Seconds the provider asked us to wait (if it said so).
+    """
+
+    def __init__(self, message: str, *, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(RetryableLLMError):
+    """
+    Raised by responders when the provider rejects a call with HTTP 429.
+    """
+
+
+class ProviderUnavailable(RetryableLLMError):
+    """
+    Raised by responders on a transient provider failure (5xx, connection error).
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitConfig:
+    """
+    Static limits; zero means "unknown until the provider tells us".
+    """
+    rpm: float = 0.0
+    tpm: float = 0.0
+    max_retries: int = 8
+
+    @classmethod
+    def from_env(cls) -> RateLimitConfig:
+        rpm = float(os.getenv("LLM_RATE_LIMIT_RPM", "0").strip() or 0)
+        tpm = float(os.getenv("LLM_RATE_LIMIT_TPM", "0").strip() or 0)
+        max_retries = int(os.getenv("LLM_RATE_LIMIT_MAX_RETRIES", "8").strip())
+        return cls(rpm=max(0.0, rpm), tpm=max(0.0, tpm), max_retries=max(0, max_retries))
+
+
+def estimate_prompt_tokens(text: str) -> int:
+    """
+    Cheap prompt-size estimate used for TPM budgeting (no tokenizer needed).
+    """
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN)) + REQUEST_OVERHEAD_TOKENS
+
+
+_DURATION_RE = re.compile(r"([0-9]*\.?[0-9]+)(ms|h|m|s)")
+
+
+def parse_duration_seconds(value: Any) -> Optional[float]:
+    """
+    Parse provider duration formats into seconds.
+
+    Accepts plain numbers ("13", "13.4") and compound strings used by Groq /
+    OpenAI headers ("7.66s", "2m59.56s", "120ms", "1h2m3s").
+    """
+    if value is None:
+        return None
+    s = str(value).strip().lower()
+    if not s:
+        return None
+
+    try:
+        return float(s)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for number, unit in _DURATION_RE.findall(s):
+        matched = True
+        n = float(number)
+        total += {"ms": n / 1000.0, "s": n, "m": n * 60.0, "h": n * 3600.0}[unit]
+    return total if matched else None
+
+
+def _header_float(headers: Mapping[str, Any], name: str) -> Optional[float]:
+    raw = headers.get(name)
+    if raw is None:
+        return None
+    try:
+        return float(str(raw).strip())
+    except ValueError:
+        return None
+
+
+@dataclass
+class _Bucket:
+    """
+    Classic token bucket: refills continuously at `capacity / 60` per second.
+    A zero capacity means "unlimited".
+    """
+    capacity: float = 0.0
+    level: float = 0.0
+    updated: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def refill(self, now: float) -> None:
+        if not self.enabled:
+            return
+        rate = self.capacity / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if available now)."""
+        if not self.enabled or self.level >= amount:
+            return 0.0
+        rate = self.capacity / 60.0
+        return (amount - self.level) / rate
+
+    def set_capacity(self, capacity: float, now: float) -> None:
+        if capacity <= 0:
+            return
+        if not self.enabled:
+            # First calibration: start full, headers will correct the level.
+            self.level = capacity
+            self.updated = now
+        self.capacity = capacity
+        self.level = min(self.level, capacity)
+
+
+class TokenBucketLimiter:
+    """
+    Thread-safe RPM + TPM limiter shared by every caller of one `(backend, model)`.
+
+    Use `acquire()` from threads and `aacquire()` from the async executor.
+    """
+
+    def __init__(self, *, rpm: float = 0.0, tpm: float = 0.0, name: str = "") -> None:
+        now = time.monotonic()
+        self.name = name
+        self._lock = Lock()
+        self._requests = _Bucket()
+        self._tokens = _Bucket()
+        self._requests.set_capacity(rpm, now)
+        self._tokens.set_capacity(tpm, now)
+        self._blocked_until = 0.0
+
+        # Tokens reserved by calls that have not settled yet, and when the
+        # token level was last reset from provider headers.
+        self._in_flight_tokens = 0.0
+        self._synced_at = 0.0
+
+        # Explicit limits win over header-reported limits.
+        self._pinned_rpm = rpm > 0
+        self._pinned_tpm = tpm > 0
+
+    # ------------------------------------------------------------------
+    # Reservation
+    # ------------------------------------------------------------------
+    def _try_reserve(self, tokens: float, reserve: float = 0.0) -> float:
+        """
+        Reserve 1 request + `tokens` if possible. Returns 0 on success,
+        otherwise the number of seconds to wait before trying again.
+
+        `reserve` is the fraction of each bucket that must stay available
+        afterwards (kept for higher-priority request classes).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            self._requests.refill(now)
+            self._tokens.refill(now)
+
+            request_floor = min(self._requests.capacity * reserve, max(0.0, self._requests.capacity - 1.0))
+            token_floor = self._tokens.capacity * reserve
+
+            # A single request larger than the whole (usable) TPM budget would wait forever.
+            if self._tokens.enabled:
+                tokens = min(tokens, self._tokens.capacity - token_floor)
+
+            wait = max(
+                self._requests.wait_for(1.0 + request_floor),
+                self._tokens.wait_for(tokens + token_floor),
+            )
+            if wait > 0:
+                return wait
+
+            if self._requests.enabled:
+                self._requests.level -= 1.0
+            if self._tokens.enabled:
+                self._tokens.level -= tokens
+                self._in_flight_tokens += tokens
+            return 0.0
+
+    def acquire(self, tokens: float, *, reserve: float = 0.0, deadline: Optional[float] = None) -> float:
+        """
+        Block until the request fits the budget. Returns total seconds waited.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the budget will not be available before `deadline`
+            (a `time.monotonic()` timestamp).
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens, reserve)
+            if wait <= 0:
+                return waited
+            _check_deadline(deadline, wait, self.name)
+            slice_s = min(wait, _MAX_SLEEP_SLICE_S)
+            time.sleep(slice_s)
+            waited += slice_s
+
+    async def aacquire(self, tokens: float, *, reserve: float = 0.0, deadline: Optional[float] = None) -> float:
+        """
+        Async twin of `acquire()` (does not block the event loop).
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_reserve(tokens, reserve)
+            if wait <= 0:
+                return waited
+            _check_deadline(deadline, wait, self.name)
+            slice_s = min(wait, _MAX_SLEEP_SLICE_S)
+            await asyncio.sleep(slice_s)
+            waited += slice_s
+
+    def settle(self, reserved: float, used: Optional[float], *, sent_at: float) -> None:
+        """
+        Close a reservation of `reserved` tokens once its call has returned.
+
+        The unused part (`reserved - used`) goes back into the bucket. If the
+        token level was reset from provider headers after the call was sent,
+        the provider's `remaining` already accounts for the call, so the whole
+        reservation is returned. `used=None` (unknown) refunds nothing.
+        """
+        with self._lock:
+            if not self._tokens.enabled:
+                return
+            # Only what was actually taken (requests are clamped to the capacity).
+            reserved = min(reserved, self._in_flight_tokens)
+            self._in_flight_tokens -= reserved
+            if self._synced_at >= sent_at:
+                refund = reserved
+            elif used is None:
+                return
+            else:
+                refund = reserved - used
+            self._tokens.refill(time.monotonic())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + refund)
+
+    # ------------------------------------------------------------------
+    # Feedback from the provider
+    # ------------------------------------------------------------------
+    def penalize(self, seconds: float) -> None:
+        """
+        Block every caller for `seconds` (e.g. after a 429 with retry-after).
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def observe_headers(self, headers: Optional[Mapping[str, Any]]) -> None:
+        """
+        Calibrate the buckets from provider rate-limit headers.
+
+        Understood headers (Groq / OpenAI style):
+            x-ratelimit-limit-tokens       TPM ceiling
+            x-ratelimit-remaining-tokens   tokens left in the current window
+            x-ratelimit-reset-tokens       time until the TPM window resets
+            x-ratelimit-limit-requests     request ceiling
+            x-ratelimit-remaining-requests requests left in the current window
+            x-ratelimit-reset-requests     time until the request window resets
+            retry-after                    seconds to wait (on 429)
+
+        Note: Groq reports *requests per day* in the request headers, so we only
+        use them to block when the remaining count hits zero, not as an RPM.
+        """
+        if not headers:
+            return
+
+        now = time.monotonic()
+        limit_tokens = _header_float(headers, "x-ratelimit-limit-tokens")
+        remaining_tokens = _header_float(headers, "x-ratelimit-remaining-tokens")
+        remaining_requests = _header_float(headers, "x-ratelimit-remaining-requests")
+        reset_requests = parse_duration_seconds(headers.get("x-ratelimit-reset-requests"))
+        retry_after = parse_duration_seconds(headers.get("retry-after"))
+
+        with self._lock:
+            self._tokens.refill(now)
+
+            if limit_tokens and not self._pinned_tpm:
+                self._tokens.set_capacity(limit_tokens, now)
+
+            if remaining_tokens is not None and self._tokens.enabled:
+                # The provider's view, minus reservations it has not seen yet.
+                self._tokens.level = min(self._tokens.capacity, remaining_tokens) - self._in_flight_tokens
+                self._synced_at = now
+
+            if remaining_requests is not None and remaining_requests <= 0 and reset_requests:
+                self._blocked_until = max(self._blocked_until, now + reset_requests)
+
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current limiter state (for logs / debugging).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "name": self.name,
+                "rpm": self._requests.capacity or None,
+                "tpm": self._tokens.capacity or None,
+                "requests_available": self._requests.level if self._requests.enabled else None,
+                "tokens_available": self._tokens.level if self._tokens.enabled else None,
+                "tokens_in_flight": self._in_flight_tokens if self._tokens.enabled else None,
+                "blocked_for_seconds": max(0.0, self._blocked_until - now),
+            }
+
+
+def _check_deadline(deadline: Optional[float], wait: float, name: str) -> None:
+    if deadline is not None and time.monotonic() + wait > deadline:
+        raise DeadlineExceeded(f"Rate-limit budget for {name} not available before the request deadline")
+
+
+# ---------------------------------------------------------------------------
+# Process-wide limiter registry
+# ---------------------------------------------------------------------------
+_limiters: Dict[Tuple[str, str], TokenBucketLimiter] = {}
+_limiters_lock = Lock()
+
+# Backends that run locally have no provider budget to respect.
+_UNLIMITED_BACKENDS = {"hf_local", "llamacpp"}
+
+
+def get_rate_limiter(backend: str, model: str) -> TokenBucketLimiter:
+    """
+    Return the shared limiter for `(backend, model)`, creating it on first use.
+    """
+    key = (backend, model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            if backend in _UNLIMITED_BACKENDS:
+                limiter = TokenBucketLimiter(name=f"{backend}:{model}")
+            else:
+                cfg = RateLimitConfig.from_env()
+                limiter = TokenBucketLimiter(rpm=cfg.rpm, tpm=cfg.tpm, name=f"{backend}:{model}")
+            _limiters[key] = limiter
+        return limiter
+
+
+# ---------------------------------------------------------------------------
+# Wait-then-send helpers
+# ---------------------------------------------------------------------------
+@dataclass(slots=True)
+class RateLimitStats:
+    """
+    Filled in by the wait-then-send helpers (for per-call telemetry).
+    """
+    retries: int = 0
+    transport_retries: int = 0
+    waited_s: float = 0.0
+    slot_wait_s: float = 0.0
+    request_class: Optional[str] = None
+
+    def granted(self, grant: SlotGrant) -> None:
+        self.slot_wait_s = grant.waited_s
+        self.request_class = str(grant.request_class)
+
+
+_current_stats: ContextVar[Optional[RateLimitStats]] = ContextVar("llm_rate_limit_stats", default=None)
+
+
+def note_transport_retry() -> None:
+    """
+    Count a retry a responder made on its own (e.g. HTTP REQUEST_RETRIES)
+    against the call currently running in this context.
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.transport_retries += 1
+
+
+UsageOf = Callable[[Any], Optional[float]]
+
+
+def call_with_rate_limit(
+    fn: Callable[[], T],
+    *,
+    limiter: TokenBucketLimiter,
+    tokens: float,
+    max_retries: Optional[int] = None,
+    stats: Optional[RateLimitStats] = None,
+    usage_of: Optional[UsageOf] = None,
+) -> T:
+    """
+    Take a scheduler slot, wait on `limiter` for `tokens`, call `fn()`, and
+    retry on `RateLimitExceeded` / `ProviderUnavailable`.
+
+    The wait after a 429 is shared: the limiter blocks *every* caller until the
+    provider's reset, so concurrent workers do not stampede the endpoint again.
+
+    `usage_of(result)` returns the tokens the call actually used; the rest of
+    the reservation is refunded to the limiter. Without it nothing is refunded.
+
+    If `stats` is given, the number of 429 retries, the total time spent
+    waiting on the limiter and the scheduler slot wait are recorded in it.
+
+    Raises
+    ------
+    RetryableLLMError
+        If the call still fails with a retryable error after `max_retries` retries.
+    DeadlineExceeded
+        If the request deadline passes before the call could be sent.
+    """
+    retries = RateLimitConfig.from_env().max_retries if max_retries is None else max_retries
+    scheduler = get_llm_scheduler()
+    if not scheduler.config.enabled:
+        return _call_in_slot(fn, limiter, tokens, retries, stats, None, usage_of)
+    with scheduler.slot() as grant:
+        if stats is not None:
+            stats.granted(grant)
+        return _call_in_slot(fn, limiter, tokens, retries, stats, grant, usage_of)
+
+
+def _backoff_s(e: RetryableLLMError, attempt: int) -> float:
+    # Exponential fallback if the provider gave no hint.
+    return e.retry_after if e.retry_after else min(30.0, 2.0 * (2 ** attempt))
+
+
+def _call_in_slot(
+    fn: Callable[[], T],
+    limiter: TokenBucketLimiter,
+    tokens: float,
+    retries: int,
+    stats: Optional[RateLimitStats],
+    grant: Optional[SlotGrant],
+    usage_of: Optional[UsageOf],
+) -> T:
+    reserve = grant.rate_reserve if grant else 0.0
+    deadline = grant.deadline if grant else None
+
+    for attempt in range(retries + 1):
+        waited = limiter.acquire(tokens, reserve=reserve, deadline=deadline)
+        if stats is not None:
+            stats.retries = attempt
+            stats.waited_s += waited
+        sent_at = time.monotonic()
+        token = _current_stats.set(stats)
+        try:
+            result = fn()
+        except RetryableLLMError as e:
+            # Rejected before any generation: the whole reservation goes back.
+            limiter.settle(tokens, 0.0, sent_at=sent_at)
+            if attempt >= retries:
+                raise
+            limiter.penalize(_backoff_s(e, attempt))
+            continue
+        except BaseException:
+            limiter.settle(tokens, None, sent_at=sent_at)
+            raise
+        finally:
+            _current_stats.reset(token)
+        limiter.settle(tokens, usage_of(result) if usage_of else None, sent_at=sent_at)
+        return result
+
+    raise AssertionError("unreachable")
+
+
+async def acall_with_rate_limit(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    limiter: TokenBucketLimiter,
+    tokens: float,
+    max_retries: Optional[int] = None,
+    stats: Optional[RateLimitStats] = None,
+    usage_of: Optional[UsageOf] = None,
+) -> T:
+    """
+    Async twin of `call_with_rate_limit`.
+    """
+    retries = RateLimitConfig.from_env().max_retries if max_retries is None else max_retries
+    scheduler = get_llm_scheduler()
+    if not scheduler.config.enabled:
+        return await _acall_in_slot(fn, limiter, tokens, retries, stats, None, usage_of)
+    async with scheduler.aslot() as grant:
+        if stats is not None:
+            stats.granted(grant)
+        return await _acall_in_slot(fn, limiter, tokens, retries, stats, grant, usage_of)
+
+
+async def _acall_in_slot(
+    fn: Callable[[], Awaitable[T]],
+    limiter: TokenBucketLimiter,
+    tokens: float,
+    retries: int,
+    stats: Optional[RateLimitStats],
+    grant: Optional[SlotGrant],
+    usage_of: Optional[UsageOf],
+) -> T:
+    reserve = grant.rate_reserve if grant else 0.0
+    deadline = grant.deadline if grant else None
+
+    for attempt in range(retries + 1):
+        waited = await limiter.aacquire(tokens, reserve=reserve, deadline=deadline)
+        if stats is not None:
+            stats.retries = attempt
+            stats.waited_s += waited
+        sent_at = time.monotonic()
+        token = _current_stats.set(stats)
+        try:
+            result = await fn()
+        except RetryableLLMError as e:
+            limiter.settle(tokens, 0.0, sent_at=sent_at)
+            if attempt >= retries:
+                raise
+            limiter.penalize(_backoff_s(e, attempt))
+            continue
+        except BaseException:
+            limiter.settle(tokens, None, sent_at=sent_at)
+            raise
+        finally:
+            _current_stats.reset(token)
+        limiter.settle(tokens, usage_of(result) if usage_of else None, sent_at=sent_at)
+        return result
+
+    raise AssertionError("unreachable")
@@ -0,0 +1,183 @@
+"""
+Process-wide registry of pooled LLM responders.
+
+One responder per `(backend, model)` for the lifetime of the process, each
+with a keep-alive connection pool shared by all threads.
+
+Environment variables
+---------------------
+LLM_HTTP_POOL_CONNECTIONS:
+    Number of distinct host pools kept by `requests` (HTTP backend).
+    Default: 4
+
+LLM_HTTP_POOL_MAXSIZE:
+    Maximum number of keep-alive connections per host. Should be >= the
+    number of concurrent LLM calls you intend to run.
+    Default: 16
+
+LLM_HTTP_KEEPALIVE_EXPIRY:
+    Seconds an idle keep-alive connection is kept open (httpx / Groq backend).
+    Default: 30.0
+
+LLM_HTTP2:
+    Enable HTTP/2 where the backend supports it (Groq SDK via httpx).
+    Requires the optional `h2` package; silently falls back to HTTP/1.1 otherwise.
+    Default: "1"
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass(frozen=True, slots=True)
+class HTTPPoolConfig:
+    """
+    Connection pool settings shared by all pooled responders.
+    """
+    pool_connections: int = 4
+    pool_maxsize: int = 16
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+
+    @classmethod
+    def from_env(cls) -> HTTPPoolConfig:
+        pool_connections = int(os.getenv("LLM_HTTP_POOL_CONNECTIONS", "4").strip())
+        pool_maxsize = int(os.getenv("LLM_HTTP_POOL_MAXSIZE", "16").strip())
+        keepalive_expiry = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30.0").strip())
+        http2 = os.getenv("LLM_HTTP2", "1").strip().lower() in {"1", "true", "yes"}
+
+        return cls(
+            pool_connections=max(1, pool_connections),
+            pool_maxsize=max(1, pool_maxsize),
+            keepalive_expiry=max(0.0, keepalive_expiry),
+            http2=http2,
+        )
+
+
+def http2_available() -> bool:
+    """
+    Return True if httpx can negotiate HTTP/2 (i.e. the `h2` package is installed).
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_requests_session(pool: HTTPPoolConfig | None = None) -> requests.Session:
+    """
+    Build a `requests.Session` with a keep-alive connection pool.
+
+    `requests` only speaks HTTP/1.1, so pooling is the only lever here.
+    The underlying urllib3 pool is thread-safe, so one session can be shared
+    by all worker threads.
+    """
+    pool = pool or HTTPPoolConfig.from_env()
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool.pool_connections,
+        pool_maxsize=pool.pool_maxsize,
+        pool_block=False,  # never deadlock a stage; overflow connections are simply not kept alive
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _httpx_client_kwargs(pool: HTTPPoolConfig | None, timeout: float | None) -> Dict[str, Any]:
+    """
+    Shared keyword arguments for sync and async httpx clients.
+    """
+    import httpx  # type: ignore
+
+    pool = pool or HTTPPoolConfig.from_env()
+
+    limits = httpx.Limits(
+        max_connections=pool.pool_maxsize,
+        max_keepalive_connections=pool.pool_maxsize,
+        keepalive_expiry=pool.keepalive_expiry,
+    )
+    kwargs: Dict[str, Any] = {
+        "limits": limits,
+        "http2": pool.http2 and http2_available(),
+    }
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return kwargs
+
+
+def build_httpx_client(pool: HTTPPoolConfig | None = None, *, timeout: float | None = None) -> Any:
+    """
+    Build an `httpx.Client` with a keep-alive pool and HTTP/2 (if available).
+
+    Used for SDKs that accept a custom `http_client` (e.g. Groq).
+    httpx is imported lazily because it is only a transitive dependency.
+    """
+    import httpx  # type: ignore
+
+    return httpx.Client(**_httpx_client_kwargs(pool, timeout))
+
+
+def build_async_httpx_client(pool: HTTPPoolConfig | None = None, *, timeout: float | None = None) -> Any:
+    """
+    Async twin of `build_httpx_client` for `ainvoke` paths.
+
+    Must be created (lazily) on the shared LLM event loop
+    (`llm.concurrency.get_llm_event_loop`), since httpx async pools are bound
+    to the loop they are first used on.
+    """
+    import httpx  # type: ignore
+
+    return httpx.AsyncClient(**_httpx_client_kwargs(pool, timeout))
+
+
+ResponderKey = Tuple[str, str]  # (backend, model)
+
+
+class ResponderRegistry:
+    """
+    Thread-safe, process-wide cache of responders keyed by `(backend, model)`.
+
+    Responders are created on first use and then reused by every caller in the
+    process, so their connection pools (and any lazily loaded local models)
+    are shared.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._responders: Dict[Hashable, Any] = {}
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the responder registered under `key`, creating it via `factory()` once.
+
+        Creation happens under the registry lock so that two threads racing on
+        the first call never build two clients (and two pools) for the same key.
+        """
+        with self._lock:
+            responder = self._responders.get(key)
+            if responder is None:
+                responder = factory()
+                self._responders[key] = responder
+            return responder
+
+    def keys(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._responders.keys())
+
+    def clear(self) -> None:
+        """
+        Drop all cached responders (e.g. after changing credentials in a notebook).
+        """
+        with self._lock:
+            self._responders.clear()
+
+
+# Global singleton (same pattern as the UI JOB_STORE).
+RESPONDER_REGISTRY = ResponderRegistry()
@@ -0,0 +1,326 @@
+"""
+Hedged requests and failover across an ordered list of LLM backends.
+
+`RoutingResponder` (primary first) sends a duplicate request to the next
+backend when a call outlives the primary's LLM_HEDGE_PERCENTILE latency and
+keeps the first answer; a backend that raises is skipped, and demoted for a
+cooldown after LLM_FAILOVER_ERRORS consecutive errors. Completions carry the
+backend that answered (`LLMCompletion.served_by`), which is what the response
+cache and telemetry record.
+
+Environment variables
+---------------------
+LLM_FALLBACK_BACKENDS:
+    Comma-separated backends tried after MODEL_BACKEND, each `backend` or
+    `backend:model` (e.g. "groq:llama-3.1-8b-instant,hf_local").
+    Empty disables routing. Default: ""
+
+LLM_HEDGE_PERCENTILE:
+    Latency percentile of the primary after which a hedge is sent
+    (0 disables hedging). Default: 0.95
+
+LLM_HEDGE_MIN_SAMPLES:
+    Successful primary calls needed before hedging starts. Default: 20
+
+LLM_FAILOVER_ERRORS:
+    Consecutive errors after which a backend is demoted. Default: 3
+
+LLM_FAILOVER_COOLDOWN_S:
+    How long a demoted backend stays at the end of the list. Default: 60
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from threading import Lock
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .concurrency import run_sync
+from .llm_protocol import LLMCompletion, LLMResponder
+from .rate_limit import TokenBucketLimiter, estimate_prompt_tokens
+from .scheduler import current_rate_reserve
+
+
+@dataclass(frozen=True, slots=True)
+class RoutingConfig:
+    """
+    Hedging / failover policy of a `RoutingResponder`.
+    """
+    fallbacks: Tuple[Tuple[str, Optional[str]], ...] = ()
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+    failover_errors: int = 3
+    failover_cooldown_s: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> RoutingConfig:
+        raw = os.getenv("LLM_FALLBACK_BACKENDS", "").strip()
+        fallbacks: List[Tuple[str, Optional[str]]] = []
+        for entry in raw.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            backend, _, model = entry.partition(":")
+            fallbacks.append((backend.strip().lower(), model.strip() or None))
+
+        hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95").strip())
+        hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20").strip())
+        failover_errors = int(os.getenv("LLM_FAILOVER_ERRORS", "3").strip())
+        failover_cooldown_s = float(os.getenv("LLM_FAILOVER_COOLDOWN_S", "60").strip())
+
+        return cls(
+            fallbacks=tuple(fallbacks),
+            hedge_percentile=min(max(0.0, hedge_percentile), 1.0),
+            hedge_min_samples=max(1, hedge_min_samples),
+            failover_errors=max(1, failover_errors),
+            failover_cooldown_s=max(0.0, failover_cooldown_s),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.fallbacks)
+
+
+@dataclass(slots=True)
+class _BackendState:
+    """
+    Latency window + health of one routed backend.
+    """
+    name: str
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+    calls: int = 0
+    errors: int = 0
+    consecutive_errors: int = 0
+    demoted_until: float = 0.0
+    hedges_sent: int = 0
+    wins: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class RoutedBackend:
+    """
+    One member of a routing list. `key` is its (backend, model), reported as
+    `LLMCompletion.served_by`.
+    """
+    name: str
+    responder: LLMResponder
+    rate_limiter: Optional[TokenBucketLimiter] = None
+    key: Optional[Tuple[str, str]] = None
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class RoutingResponder:
+    """
+    LLMResponder over an ordered list of backends with hedging and failover.
+
+    The first backend is the primary; its rate limit is handled by the caller
+    (`model_access.complete`). Fallback backends wait on their own limiter
+    before every request they receive.
+    """
+
+    def __init__(self, backends: Sequence[RoutedBackend], config: Optional[RoutingConfig] = None) -> None:
+        if not backends:
+            raise ValueError("RoutingResponder needs at least one backend.")
+        self.backends = list(backends)
+        self.config = config or RoutingConfig.from_env()
+        self._lock = Lock()
+        self._state: Dict[str, _BackendState] = {b.name: _BackendState(name=b.name) for b in self.backends}
+
+    # ------------------------------------------------------------------
+    # Health / latency bookkeeping
+    # ------------------------------------------------------------------
+    def _order(self) -> List[RoutedBackend]:
+        """
+        Backends in configured order, demoted ones moved to the end.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [b for b in self.backends if self._state[b.name].demoted_until <= now]
+            demoted = [b for b in self.backends if self._state[b.name].demoted_until > now]
+        return healthy + demoted
+
+    def _hedge_delay(self, backend: RoutedBackend) -> Optional[float]:
+        cfg = self.config
+        if cfg.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            window = list(self._state[backend.name].latencies)
+        if len(window) < cfg.hedge_min_samples:
+            return None
+        return _percentile(window, cfg.hedge_percentile)
+
+    def _record_success(self, backend: RoutedBackend, latency: float) -> None:
+        with self._lock:
+            st = self._state[backend.name]
+            st.calls += 1
+            st.consecutive_errors = 0
+            st.latencies.append(latency)
+
+    def _record_error(self, backend: RoutedBackend, exc: BaseException) -> None:
+        with self._lock:
+            st = self._state[backend.name]
+            st.calls += 1
+            st.errors += 1
+            st.consecutive_errors += 1
+            demote = st.consecutive_errors >= self.config.failover_errors
+            if demote:
+                st.demoted_until = time.monotonic() + self.config.failover_cooldown_s
+        print(f"[RoutingResponder] ⚠️ {backend.name} failed: {exc}")
+        if demote:
+            print(
+                f"[RoutingResponder] 🔀 {backend.name} demoted for "
+                f"{self.config.failover_cooldown_s:.0f}s after {self.config.failover_errors} consecutive errors."
+            )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-backend counters and latency percentiles (for logs).
+        """
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for name, st in self._state.items():
+                window = list(st.latencies)
+                out[name] = {
+                    "calls": st.calls,
+                    "errors": st.errors,
+                    "hedges_sent": st.hedges_sent,
+                    "wins": st.wins,
+                    "p50_s": _percentile(window, 0.5) if window else None,
+                    "p95_s": _percentile(window, 0.95) if window else None,
+                }
+            return out
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    async def _acall(self, backend: RoutedBackend, inputs: Dict[str, Any], *, primary: bool) -> LLMCompletion:
+        # The primary's budget is taken by `respond()`; fallbacks reserve their own.
+        limiter = backend.rate_limiter if not primary else None
+        tokens = estimate_prompt_tokens(str(inputs.get("prompt", ""))) + int(inputs.get("max_tokens", 0) or 0)
+        if limiter is not None:
+            await limiter.aacquire(tokens, reserve=current_rate_reserve())
+
+        t0 = time.monotonic()
+        try:
+            completion = await backend.responder.acomplete(inputs)
+        except asyncio.CancelledError:
+            # Lost a hedge race: keep the (lower-bound) latency so the tail
+            # stays visible in the percentile window.
+            with self._lock:
+                self._state[backend.name].latencies.append(time.monotonic() - t0)
+            if limiter is not None:
+                limiter.settle(tokens, None, sent_at=t0)
+            raise
+        except Exception as e:  # noqa: BLE001 (any backend failure triggers failover)
+            self._record_error(backend, e)
+            if limiter is not None:
+                limiter.settle(tokens, None, sent_at=t0)
+            raise
+        self._record_success(backend, time.monotonic() - t0)
+        if limiter is not None:
+            usage = completion.usage or {}
+            limiter.settle(tokens, usage.get("total_tokens"), sent_at=t0)
+        return replace(completion, served_by=backend.key) if backend.key else completion
+
+    async def acomplete(self, inputs: Dict[str, Any]) -> LLMCompletion:
+        order = self._order()
+        primary = self.backends[0]
+        pending: Dict[asyncio.Task, RoutedBackend] = {}
+        next_idx = 0
+        last_exc: Optional[BaseException] = None
+
+        def _launch() -> None:
+            nonlocal next_idx
+            backend = order[next_idx]
+            next_idx += 1
+            task = asyncio.ensure_future(self._acall(backend, inputs, primary=backend is primary))
+            pending[task] = backend
+
+        _launch()
+        try:
+            while pending:
+                # Hedge only while exactly one request is in flight and a fallback is left.
+                timeout = None
+                if len(pending) == 1 and next_idx < len(order):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    slow = next(iter(pending.values()))
+                    with self._lock:
+                        self._state[order[next_idx].name].hedges_sent += 1
+                    print(f"[RoutingResponder] 🏎️ {slow.name} slower than its p{self.config.hedge_percentile * 100:.0f}; hedging to {order[next_idx].name}.")
+                    _launch()
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    exc = task.exception()
+                    if exc is None:
+                        with self._lock:
+                            self._state[backend.name].wins += 1
+                        return task.result()
+                    last_exc = exc
+
+                # Every in-flight request failed: fail over to the next backend.
+                if not pending and next_idx < len(order):
+                    _launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        assert last_exc is not None
+        raise last_exc
+
+    def complete(self, inputs: Dict[str, Any]) -> LLMCompletion:
+        # Hedging needs concurrency: run on the shared LLM event loop.
+        return run_sync(self.acomplete(inputs))
+
+    def invoke(self, inputs: Dict[str, Any]) -> str:
+        return self.complete(inputs).text
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> str:
+        return (await self.acomplete(inputs)).text
+
+    async def astream(self, inputs: Dict[str, Any]) -> AsyncIterator[LLMCompletion]:
+        """
+        Stream from the first healthy backend. Streams are not hedged; a backend
+        that fails before yielding anything is skipped (failover), a failure
+        mid-stream propagates.
+        """
+        primary = self.backends[0]
+        last_exc: Optional[BaseException] = None
+
+        for backend in self._order():
+            if backend is not primary and backend.rate_limiter is not None:
+                tokens = estimate_prompt_tokens(str(inputs.get("prompt", ""))) + int(inputs.get("max_tokens", 0) or 0)
+                await backend.rate_limiter.aacquire(tokens, reserve=current_rate_reserve())
+
+            t0 = time.monotonic()
+            started = False
+            try:
+                async for delta in backend.responder.astream(inputs):
+                    started = True
+                    yield replace(delta, served_by=backend.key) if backend.key else delta
+            except Exception as e:  # noqa: BLE001
+                self._record_error(backend, e)
+                if started:
+                    raise
+                last_exc = e
+                continue
+            self._record_success(backend, time.monotonic() - t0)
+            return
+
+        assert last_exc is not None
+        raise last_exc
@@ -0,0 +1,458 @@
+"""
+Priority-aware scheduling of LLM requests.
+
+Every call carries a request class (INTERACTIVE, BULK, BACKGROUND; set with
+`llm_request_class(...)`) and takes one of LLM_SCHEDULER_SLOTS in-flight
+slots before the rate limiter. Queued calls get free slots by class weight,
+earliest deadline first within a class; the last
+LLM_SCHEDULER_INTERACTIVE_RESERVED slots are kept for INTERACTIVE calls.
+Lower classes also leave a rate-limit reserve for higher ones, and a call
+still waiting at its deadline fails with `DeadlineExceeded`.
+
+Environment variables
+---------------------
+LLM_SCHEDULER:
+    "0" disables slot scheduling (rate-limit reserves and deadlines then do
+    not apply either). Default: "1"
+
+LLM_SCHEDULER_SLOTS:
+    Calls in flight across all classes. Default: 2 × LLM_MAX_CONCURRENCY
+
+LLM_SCHEDULER_WEIGHTS:
+    Weighted shares, e.g. "interactive=6,bulk=3,background=1" (the default).
+
+LLM_SCHEDULER_INTERACTIVE_RESERVED:
+    Slots only INTERACTIVE calls may use. Default: 1
+
+LLM_SCHEDULER_RATE_RESERVE:
+    Scale of the rate-limit reserve kept for higher classes (0 disables).
+    Default: 0.5
+
+LLM_DEADLINE_S:
+    Per-class deadline of one call in seconds, 0 = none, e.g.
+    "interactive=120,bulk=0,background=0" (the default).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from threading import Event, Lock
+from typing import AsyncIterator, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .concurrency import default_max_concurrency
+
+
+class RequestClass(str, Enum):
+    """Priority classes, highest first."""
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+    BACKGROUND = "background"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# Highest priority first (used for rate-limit reserves and tie-breaking).
+_PRIORITY_ORDER: Tuple[RequestClass, ...] = (
+    RequestClass.INTERACTIVE,
+    RequestClass.BULK,
+    RequestClass.BACKGROUND,
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when an LLM call is still queued (slot or rate budget) at its deadline.
+    """
+
+
+def _parse_class_map(raw: str, defaults: Mapping[RequestClass, float]) -> Dict[RequestClass, float]:
+    """
+    Parse "interactive=6,bulk=3" into a per-class mapping (unknown names are ignored).
+    """
+    out = dict(defaults)
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        try:
+            out[RequestClass(name.strip().lower())] = float(value.strip())
+        except ValueError:
+            continue
+    return out
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulerConfig:
+    """
+    Slot budget, class weights, reserves and deadlines.
+    """
+    enabled: bool = True
+    slots: int = 16
+    weights: Mapping[RequestClass, float] = field(
+        default_factory=lambda: {
+            RequestClass.INTERACTIVE: 6.0,
+            RequestClass.BULK: 3.0,
+            RequestClass.BACKGROUND: 1.0,
+        }
+    )
+    interactive_reserved: int = 1
+    rate_reserve: float = 0.5
+    deadlines_s: Mapping[RequestClass, float] = field(
+        default_factory=lambda: {
+            RequestClass.INTERACTIVE: 120.0,
+            RequestClass.BULK: 0.0,
+            RequestClass.BACKGROUND: 0.0,
+        }
+    )
+
+    @classmethod
+    def from_env(cls) -> SchedulerConfig:
+        base = cls()
+        return cls(
+            enabled=os.getenv("LLM_SCHEDULER", "1").strip().lower() in {"1", "true", "yes"},
+            slots=max(1, int(os.getenv("LLM_SCHEDULER_SLOTS", "").strip() or 2 * default_max_concurrency())),
+            weights={
+                c: max(1e-3, w)
+                for c, w in _parse_class_map(os.getenv("LLM_SCHEDULER_WEIGHTS", ""), base.weights).items()
+            },
+            interactive_reserved=max(0, int(os.getenv("LLM_SCHEDULER_INTERACTIVE_RESERVED", "1").strip())),
+            rate_reserve=min(1.0, max(0.0, float(os.getenv("LLM_SCHEDULER_RATE_RESERVE", "0.5").strip()))),
+            deadlines_s=_parse_class_map(os.getenv("LLM_DEADLINE_S", ""), base.deadlines_s),
+        )
+
+    def rate_reserve_for(self, request_class: RequestClass) -> float:
+        """
+        Fraction of each rate-limit bucket `request_class` must leave untouched.
+        """
+        higher = _PRIORITY_ORDER[:_PRIORITY_ORDER.index(request_class)]
+        total = sum(self.weights.values())
+        if not higher or total <= 0:
+            return 0.0
+        return self.rate_reserve * sum(self.weights[c] for c in higher) / total
+
+
+# ---------------------------------------------------------------------------
+# Request context
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True, slots=True)
+class RequestContext:
+    """
+    Class of the work running in this context, and an optional deadline override.
+    """
+    request_class: RequestClass = RequestClass.BULK
+    deadline_s: Optional[float] = None
+
+
+_request_context: ContextVar[RequestContext] = ContextVar("llm_request_context", default=RequestContext())
+
+
+@contextmanager
+def llm_request_class(
+    request_class: RequestClass,
+    *,
+    deadline_s: Optional[float] = None,
+) -> Iterator[RequestContext]:
+    """
+    Label every LLM call made inside the block (and in work it submits to the
+    LLM event loop) with `request_class`.
+
+    `deadline_s` overrides the class deadline (LLM_DEADLINE_S) of each call.
+
+    Usage:
+    ```
+    with llm_request_class(RequestClass.INTERACTIVE):
+        extract_triplets_batch(sentences)
+    ```
+    """
+    ctx = RequestContext(request_class=request_class, deadline_s=deadline_s)
+    token = _request_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _request_context.reset(token)
+
+
+def current_request_context() -> RequestContext:
+    """
+    The request class (and deadline override) of the calling context.
+    """
+    return _request_context.get()
+
+
+def current_rate_reserve() -> float:
+    """
+    Rate-limit bucket fraction the calling context's class must leave to higher classes.
+    """
+    scheduler = get_llm_scheduler()
+    if not scheduler.config.enabled:
+        return 0.0
+    return scheduler.config.rate_reserve_for(current_request_context().request_class)
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+@dataclass(slots=True)
+class SlotGrant:
+    """
+    A held in-flight slot.
+
+    Attributes
+    ----------
+    request_class:
+        Class the slot was granted to.
+    waited_s:
+        Time spent queued for the slot.
+    deadline:
+        `time.monotonic()` deadline of the call (None = no deadline); the rate
+        limiter honours it too.
+    rate_reserve:
+        Bucket fraction this call must leave to higher classes.
+    """
+    request_class: RequestClass
+    waited_s: float = 0.0
+    deadline: Optional[float] = None
+    rate_reserve: float = 0.0
+
+
+@dataclass(eq=False)
+class _Waiter:
+    request_class: RequestClass
+    deadline: Optional[float]
+    event: Optional[Event] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    future: Optional[asyncio.Future] = None
+    granted: bool = False
+    expired: bool = False
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Weighted, deadline-aware admission of LLM calls into a fixed number of slots.
+
+    Thread-safe; use `slot()` from threads and `aslot()` on an event loop.
+    """
+
+    def __init__(self, config: Optional[SchedulerConfig] = None) -> None:
+        self.config = config or SchedulerConfig.from_env()
+        self._lock = Lock()
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._queues: Dict[RequestClass, List[Tuple[float, int, _Waiter]]] = {c: [] for c in RequestClass}
+        # Stride scheduling: a grant advances the class pass by 1 / weight.
+        self._pass: Dict[RequestClass, float] = {c: 0.0 for c in RequestClass}
+        self._vtime = 0.0
+        self._stats: Dict[RequestClass, Dict[str, float]] = {
+            c: {"granted": 0, "expired": 0, "waited_s": 0.0} for c in RequestClass
+        }
+
+    # ------------------------------------------------------------------
+    # Core (under self._lock)
+    # ------------------------------------------------------------------
+    def _capacity_for(self, request_class: RequestClass) -> int:
+        if request_class == RequestClass.INTERACTIVE:
+            return self.config.slots
+        return max(1, self.config.slots - self.config.interactive_reserved)
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.request_class]
+        if not queue:
+            # Returning from idle: no credit for the time it was not competing.
+            self._pass[waiter.request_class] = max(self._pass[waiter.request_class], self._vtime)
+        key = waiter.deadline if waiter.deadline is not None else math.inf
+        heapq.heappush(queue, (key, next(self._seq), waiter))
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while True:
+            candidates = [
+                c for c in _PRIORITY_ORDER
+                if self._queues[c] and self._in_flight < self._capacity_for(c)
+            ]
+            if not candidates:
+                return
+            # Lowest pass wins; ties go to the higher class (candidates are in priority order).
+            chosen = min(candidates, key=lambda c: self._pass[c])
+            _, _, waiter = heapq.heappop(self._queues[chosen])
+            if waiter.deadline is not None and waiter.deadline <= now:
+                waiter.expired = True
+                waiter.wake()
+                continue
+            waiter.granted = True
+            self._in_flight += 1
+            self._pass[chosen] += 1.0 / self.config.weights[chosen]
+            self._vtime = self._pass[chosen]
+            waiter.wake()
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """
+        Remove a waiter that gave up. Returns True if it was granted meanwhile.
+        """
+        if waiter.granted:
+            return True
+        queue = self._queues[waiter.request_class]
+        for i, (_, _, w) in enumerate(queue):
+            if w is waiter:
+                queue.pop(i)
+                heapq.heapify(queue)
+                break
+        return False
+
+    def _grant(self, waiter: _Waiter, started: float) -> SlotGrant:
+        waited = time.monotonic() - started
+        with self._lock:
+            stats = self._stats[waiter.request_class]
+            stats["granted"] += 1
+            stats["waited_s"] += waited
+        return SlotGrant(
+            request_class=waiter.request_class,
+            waited_s=waited,
+            deadline=waiter.deadline,
+            rate_reserve=self.config.rate_reserve_for(waiter.request_class),
+        )
+
+    def _expire(self, waiter: _Waiter) -> DeadlineExceeded:
+        # Called with self._lock held; the caller raises after releasing it.
+        self._stats[waiter.request_class]["expired"] += 1
+        return DeadlineExceeded(
+            f"LLM {waiter.request_class} request still queued for a slot at its deadline"
+        )
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._dispatch()
+
+    def _new_waiter(self) -> _Waiter:
+        ctx = current_request_context()
+        deadline_s = ctx.deadline_s if ctx.deadline_s is not None else self.config.deadlines_s.get(ctx.request_class, 0.0)
+        deadline = time.monotonic() + deadline_s if deadline_s and deadline_s > 0 else None
+        return _Waiter(request_class=ctx.request_class, deadline=deadline)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    @contextmanager
+    def slot(self) -> Iterator[SlotGrant]:
+        """
+        Hold one in-flight slot for the calling context's request class (blocking).
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline passes before a slot is granted.
+        """
+        started = time.monotonic()
+        waiter = self._new_waiter()
+        waiter.event = Event()
+        with self._lock:
+            self._enqueue(waiter)
+            self._dispatch()
+
+        while not waiter.granted:
+            timeout = None if waiter.deadline is None else max(0.0, waiter.deadline - time.monotonic())
+            if not waiter.event.wait(timeout) or waiter.expired:
+                error: Optional[DeadlineExceeded] = None
+                with self._lock:
+                    if not self._withdraw(waiter):
+                        error = self._expire(waiter)
+                if error is not None:
+                    raise error
+            waiter.event.clear()
+
+        try:
+            yield self._grant(waiter, started)
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[SlotGrant]:
+        """
+        Async twin of `slot()` (does not block the event loop).
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = self._new_waiter()
+        waiter.loop = loop
+
+        while True:
+            waiter.future = loop.create_future()
+            with self._lock:
+                if not waiter.granted and not any(w is waiter for _, _, w in self._queues[waiter.request_class]):
+                    self._enqueue(waiter)
+                self._dispatch()
+            if waiter.granted:
+                break
+            timeout = None if waiter.deadline is None else max(0.0, waiter.deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                with self._lock:
+                    granted = self._withdraw(waiter)
+                if granted:
+                    self.release()
+                raise
+            if waiter.granted:
+                break
+            if waiter.expired or (waiter.deadline is not None and time.monotonic() >= waiter.deadline):
+                error: Optional[DeadlineExceeded] = None
+                with self._lock:
+                    if not self._withdraw(waiter):
+                        error = self._expire(waiter)
+                if error is not None:
+                    raise error
+                break
+
+        try:
+            yield self._grant(waiter, started)
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Slots in use, queue lengths and per-class grant statistics.
+        """
+        with self._lock:
+            return {
+                "slots": self.config.slots,
+                "in_flight": self._in_flight,
+                "queued": {str(c): len(q) for c, q in self._queues.items()},
+                "classes": {
+                    str(c): {
+                        "granted": int(s["granted"]),
+                        "expired": int(s["expired"]),
+                        "mean_wait_s": round(s["waited_s"] / s["granted"], 4) if s["granted"] else 0.0,
+                    }
+                    for c, s in self._stats.items()
+                },
+            }
+
+
+@lru_cache(maxsize=1)
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Process-wide LLM scheduler (configured from the environment on first use).
+    """
+    return LLMScheduler()
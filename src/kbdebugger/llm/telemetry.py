@@ -0,0 +1,228 @@
+"""
+Per-call LLM telemetry.
+
+Every `complete()` / `acomplete()` / `astream_items()` call is recorded as an
+`LLMCallRecord` (stage, backend, waits, retries, tokens, cache hit, finish
+reason, ...) and `summarize()` aggregates them per stage. Records carry the
+run id set with `llm_run(...)`, so concurrent runs read back only their own
+calls (`since(mark, run_id=...)`).
+
+Environment variables
+---------------------
+LLM_TELEMETRY_MAX_RECORDS:
+    Records kept in memory (oldest are dropped first). Default: 50000
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+@dataclass(frozen=True, slots=True)
+class LLMCallRecord:
+    """
+    One LLM call as seen by `model_access`.
+
+    Attributes
+    ----------
+    seq:
+        Process-wide sequence number (used to slice records per run).
+    run_id:
+        Run (pipeline run / UI job) the call was made for, see `llm_run()`.
+    stage:
+        Calling stage label (e.g. "decompose", "novelty", "triplets").
+    latency_s:
+        Wall time of the call including limiter wait and retries.
+    queue_wait_s:
+        Time spent waiting on the shared rate limiter (`llm.rate_limit`).
+    slot_wait_s:
+        Time spent queued for an in-flight slot (`llm.scheduler`).
+    request_class:
+        Priority class of the call ("interactive", "bulk", "background").
+    retries:
+        Rate-limit / transient-error retries (429, 5xx) before the call
+        succeeded or gave up.
+    transport_retries:
+        Retries inside the HTTP responder (REQUEST_RETRIES: timeouts,
+        connection and HTTP errors).
+    prompt_tokens / completion_tokens:
+        From the provider `usage` field; estimated (chars/4) when missing,
+        see `usage_estimated`.
+    batch_size:
+        Items in the batched prompt (None for single-item calls).
+    cache_hit:
+        Served from the response cache (no provider call).
+    error:
+        Exception type name if the call failed.
+    """
+    seq: int
+    stage: str
+    backend: str
+    model: str
+    started_at: float
+    latency_s: float
+    queue_wait_s: float = 0.0
+    slot_wait_s: float = 0.0
+    request_class: Optional[str] = None
+    retries: int = 0
+    transport_retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    usage_estimated: bool = False
+    batch_size: Optional[int] = None
+    cache_hit: bool = False
+    finish_reason: Optional[str] = None
+    streamed: bool = False
+    error: Optional[str] = None
+    run_id: Optional[str] = None
+
+
+_current_run: ContextVar[Optional[str]] = ContextVar("llm_run_id", default=None)
+
+
+@contextmanager
+def llm_run(run_id: str) -> Iterator[str]:
+    """
+    Label every LLM call made inside the block (and in work it submits to the
+    LLM event loop) with `run_id`.
+
+    Usage:
+    ```
+    with llm_run(job_id):
+        run_pipeline(...)
+    ```
+    """
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+
+
+def current_llm_run() -> Optional[str]:
+    """
+    Run id of the calling context (None outside `llm_run()`).
+    """
+    return _current_run.get()
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {f"p{int(q * 100)}": None for q in PERCENTILES} | {"max": None}
+    ordered = sorted(values)
+    out: Dict[str, Optional[float]] = {}
+    for q in PERCENTILES:
+        idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        out[f"p{int(q * 100)}"] = round(float(ordered[idx]), 4)
+    out["max"] = round(float(ordered[-1]), 4)
+    return out
+
+
+def summarize(records: Sequence[LLMCallRecord]) -> Dict[str, Any]:
+    """
+    Aggregate call records per stage (plus an "all" entry).
+
+    Latency percentiles are computed over provider calls only (cache hits
+    would hide the real latency distribution).
+    """
+    by_stage: Dict[str, List[LLMCallRecord]] = {}
+    for r in records:
+        by_stage.setdefault(r.stage, []).append(r)
+    if records:
+        by_stage["all"] = list(records)
+
+    summary: Dict[str, Any] = {}
+    for stage, recs in by_stage.items():
+        live = [r for r in recs if not r.cache_hit]
+        batch_sizes = [r.batch_size for r in recs if r.batch_size]
+        summary[stage] = {
+            "calls": len(recs),
+            "provider_calls": len(live),
+            "cache_hits": sum(r.cache_hit for r in recs),
+            "errors": sum(r.error is not None for r in recs),
+            "retries": sum(r.retries + r.transport_retries for r in recs),
+            "transport_retries": sum(r.transport_retries for r in recs),
+            "truncated": sum(r.finish_reason == "length" for r in recs),
+            "streamed": sum(r.streamed for r in recs),
+            "prompt_tokens": sum(r.prompt_tokens for r in live),
+            "completion_tokens": sum(r.completion_tokens for r in live),
+            "mean_batch_size": round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else None,
+            "latency_s": _percentiles([r.latency_s for r in live]),
+            "queue_wait_s": _percentiles([r.queue_wait_s for r in live]),
+            "slot_wait_s": _percentiles([r.slot_wait_s for r in live]),
+            "request_classes": {
+                c: sum(r.request_class == c for r in recs)
+                for c in sorted({r.request_class for r in recs if r.request_class})
+            },
+            "prompt_tokens_per_call": _percentiles([r.prompt_tokens for r in live]),
+            "completion_tokens_per_call": _percentiles([r.completion_tokens for r in live]),
+        }
+    return summary
+
+
+class LLMTelemetry:
+    """
+    Thread-safe in-memory store of `LLMCallRecord`s.
+
+    Usage
+    -----
+    >>> mark = telemetry.mark()
+    >>> with llm_run("run-1"):
+    ...     ...  # run a stage
+    >>> summarize(telemetry.since(mark, run_id="run-1"))
+    """
+
+    def __init__(self, max_records: int = 50000) -> None:
+        self._lock = Lock()
+        self._records: Deque[LLMCallRecord] = deque(maxlen=max(1, max_records))
+        self._seq = 0
+
+    def record(self, **fields: Any) -> LLMCallRecord:
+        fields.setdefault("run_id", current_llm_run())
+        with self._lock:
+            rec = LLMCallRecord(seq=self._seq, **fields)
+            self._seq += 1
+            self._records.append(rec)
+        return rec
+
+    def mark(self) -> int:
+        """
+        Sequence number of the next record (pass it to `since()` later).
+        """
+        with self._lock:
+            return self._seq
+
+    def since(self, mark: int, *, run_id: Optional[str] = None) -> List[LLMCallRecord]:
+        """
+        Records from `mark` on; only those of `run_id` if given.
+        """
+        with self._lock:
+            return [r for r in self._records if r.seq >= mark and (run_id is None or r.run_id == run_id)]
+
+    def as_json(self, mark: int, *, run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Summary + raw records since `mark` (JSON-serializable).
+        """
+        records = self.since(mark, run_id=run_id)
+        return {
+            "summary": summarize(records),
+            "calls": [asdict(r) for r in records],
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_telemetry() -> LLMTelemetry:
+    """
+    Process-wide telemetry store (configured from the environment on first use).
+    """
+    return LLMTelemetry(max_records=int(os.getenv("LLM_TELEMETRY_MAX_RECORDS", "50000").strip()))
@@ -0,0 +1,151 @@
+"""
+Cheap-model-first cascade for the novelty comparator.
+
+With a cascade configured, `classify_qualities_novelty` classifies every item
+with a small model first and re-classifies with the large (default) model
+only the items it is unsure about: confidence below
+NOVELTY_CASCADE_CONFIDENCE, or (unless disabled) PARTIALLY_NEW. Each run logs
+the escalation rate and how often the two models agreed.
+
+Environment variables
+---------------------
+NOVELTY_CASCADE_MODEL:
+    Small model as `backend` or `backend:model`
+    (e.g. "groq:llama-3.1-8b-instant", "hf_local"). Empty disables the
+    cascade. Default: ""
+
+NOVELTY_CASCADE_CONFIDENCE:
+    Items whose small-model confidence is below this are escalated.
+    Default: 0.8
+
+NOVELTY_CASCADE_ESCALATE_PARTIAL:
+    "1" escalates every PARTIALLY_NEW decision regardless of confidence.
+    Default: "1"
+"""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+from kbdebugger.utils.json import write_json
+from kbdebugger.utils.time import now_utc_compact, now_utc_human
+
+from .types import NoveltyDecision, QualityNoveltyResult
+
+
+@dataclass(frozen=True, slots=True)
+class NoveltyCascadeConfig:
+    """
+    Small model + escalation policy of the novelty cascade.
+    """
+    backend: Optional[str] = None
+    model: Optional[str] = None
+    confidence_threshold: float = 0.8
+    escalate_partially_new: bool = True
+
+    @classmethod
+    def from_env(cls) -> NoveltyCascadeConfig:
+        raw = os.getenv("NOVELTY_CASCADE_MODEL", "").strip()
+        backend, _, model = raw.partition(":")
+        threshold = float(os.getenv("NOVELTY_CASCADE_CONFIDENCE", "0.8").strip())
+        escalate_partial = os.getenv("NOVELTY_CASCADE_ESCALATE_PARTIAL", "1").strip().lower() in {"1", "true", "yes"}
+
+        return cls(
+            backend=backend.strip().lower() or None,
+            model=model.strip() or None,
+            confidence_threshold=min(max(0.0, threshold), 1.0),
+            escalate_partially_new=escalate_partial,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def label(self) -> str:
+        return f"{self.backend}:{self.model}" if self.model else str(self.backend)
+
+    def escalation_reason(self, result: QualityNoveltyResult) -> Optional[str]:
+        """
+        Why `result` must be re-checked by the large model (None = accept it).
+        """
+        if self.escalate_partially_new and result.decision == NoveltyDecision.PARTIALLY_NEW:
+            return "partially_new"
+        if result.confidence < self.confidence_threshold:
+            return "low_confidence"
+        return None
+
+
+@dataclass(slots=True)
+class CascadeStats:
+    """
+    Escalation / agreement counters of one cascade run.
+    """
+    config: NoveltyCascadeConfig
+    total: int = 0
+    reasons: Counter = field(default_factory=Counter)
+    # (small decision, large decision) -> count, escalated items only
+    transitions: Counter = field(default_factory=Counter)
+
+    @property
+    def escalated(self) -> int:
+        return sum(self.reasons.values())
+
+    @property
+    def agreed(self) -> int:
+        return sum(n for (small, large), n in self.transitions.items() if small == large)
+
+    def observe(self, small: QualityNoveltyResult, large: QualityNoveltyResult, reason: str) -> None:
+        self.reasons[reason] += 1
+        self.transitions[(str(small.decision), str(large.decision))] += 1
+
+    def as_json_dict(self) -> Dict[str, Any]:
+        compared = sum(self.transitions.values())
+        return {
+            "small_model": self.config.label,
+            "confidence_threshold": self.config.confidence_threshold,
+            "escalate_partially_new": self.config.escalate_partially_new,
+            "total": self.total,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / self.total, 4) if self.total else 0.0,
+            "escalation_reasons": dict(self.reasons),
+            "agreement_rate": round(self.agreed / compared, 4) if compared else None,
+            "decision_matrix": {f"{s}->{l}": n for (s, l), n in sorted(self.transitions.items())},
+        }
+
+
+def split_for_escalation(
+    config: NoveltyCascadeConfig,
+    results: Sequence[QualityNoveltyResult],
+) -> Dict[int, str]:
+    """
+    Indices of `results` to escalate, mapped to the escalation reason.
+    """
+    out: Dict[int, str] = {}
+    for i, r in enumerate(results):
+        reason = config.escalation_reason(r)
+        if reason is not None:
+            out[i] = reason
+    return out
+
+
+def save_cascade_stats_json(stats: CascadeStats) -> Dict[str, Any]:
+    """
+    Print a one-line summary and write the cascade stats next to the
+    comparator results.
+    """
+    data = {"created_at": now_utc_human(), **stats.as_json_dict()}
+    path = f"logs/04_novelty_cascade_{now_utc_compact()}.json"
+    write_json(path, data)
+
+    agreement = data["agreement_rate"]
+    print(
+        f"[INFO] 🪜 Novelty cascade ({stats.config.label}): escalated "
+        f"{stats.escalated}/{stats.total} ({data['escalation_rate']:.0%}), "
+        f"agreement on escalated: {'n/a' if agreement is None else f'{agreement:.0%}'} → {path}"
+    )
+    return data
+
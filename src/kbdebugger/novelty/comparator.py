@@ -18,23 +18,48 @@ The comparator decides whether a candidate quality is:
 - EXISTING: no meaningful new semantic value compared to its neighbors
 - PARTIALLY_NEW: overlaps strongly but adds meaningful details
 - NEW: introduces a new claim/aspect not covered by neighbors
+
+Either mode can run as a cascade (`novelty.cascade`, NOVELTY_CASCADE_MODEL):
+a small model classifies everything, the large model only re-checks the
+items the small model is unsure about.
+
+Fused novelty + triplets (batched mode, `fused_triplets=True`)
+-------------------------------------------------------------
+The same batched call also returns the (Subject, Object, Relation) triplets
+of every item whose decision qualifies for extraction
+(KB_TRIPLET_QUALIFY_DECISIONS). Results then carry `triplets`, and
+`extract_triplets_from_novelty_results` uses them instead of running a
+separate triplet extraction round. Meant for non-interactive runs, where no
+human selects the items to extract from in between.
 """
 
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, dataclass, field
 
 from encodings.punycode import T
+import json
 import math
-from typing import Any, Dict, List, Optional, Sequence, Tuple
-
-from kbdebugger.llm.model_access import respond
-from kbdebugger.prompts import build_prompt, build_prompt_batch
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from kbdebugger.llm.model_access import respond, acomplete_batch, streaming_enabled
+from kbdebugger.llm.batch_repair import arequest_with_repair, batch_items_from_completion
+from kbdebugger.llm.batch_planner import (
+    NOVELTY_STAGE,
+    NOVELTY_TRIPLETS_STAGE,
+    PlannedBatch,
+    StageProfile,
+    get_batch_planner,
+)
+from kbdebugger.llm.concurrency import map_bounded
+from kbdebugger.llm.micro_batcher import MicroBatcher, get_micro_batcher, micro_batching_enabled
+from kbdebugger.prompts import build_prompt_parts, build_prompt_batch, build_prompt_batch_parts, load_output_schema
+from kbdebugger.extraction.utils import load_triplet_qualifying_decisions
 from kbdebugger.subgraph_similarity.types import KeptQuality
 from kbdebugger.types.ui import ProgressCallback
-from kbdebugger.utils import batched
-from rich.progress import track
+from .cascade import CascadeStats, NoveltyCascadeConfig, save_cascade_stats_json, split_for_escalation
 from .types import (
+    NoveltyDecision,
     QualityNoveltyResult,
     QualityNoveltyInput,
 )
@@ -43,12 +68,16 @@ from .utils import (
     coerce_quality_novelty_result, 
     kept_quality_to_novelty_input,
     coerce_batched_novelty_response, 
+    coerce_batched_novelty_response_by_id,
 )
 from .logging import (
     save_novelty_results_json,
     pretty_print_novelty_results
 )
 
+NoveltyResultCallback = Callable[[QualityNoveltyResult], None]
+
+
 # -------------------------
 # Public API
 # -------------------------
@@ -57,6 +86,8 @@ def classify_quality_novelty(
     *,
     max_tokens: int = 700,
     temperature: float = 0.0,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
 ) -> QualityNoveltyResult:
     """
     Classify novelty for a single kept quality (one LLM call).
@@ -74,6 +105,9 @@ def classify_quality_novelty(
     temperature:
         Decoding temperature.
 
+    backend, model:
+        Specific responder to use (default: the configured one).
+
     Returns:
     -----------
     QualityNoveltyResult
@@ -83,31 +117,483 @@ def classify_quality_novelty(
     # Map KeptQuality to the minimal input schema expected by the prompt.
     novelty_input = kept_quality_to_novelty_input(kept)
 
-    prompt = build_prompt(
+    prompt = build_prompt_parts(
         prompt_name="quality_novelty_comparator",
         examples_name="quality_novelty_comparator",
         input_obj=novelty_input,
     )
     response = respond(
-        prompt,
+        prompt.text,
+        prompt_prefix=prompt.prefix,
         max_tokens=max_tokens,
         temperature=temperature,
         json_mode=True,
+        stage=NOVELTY_STAGE.name,
+        backend=backend,
+        model=model,
     )
     parsed = ensure_json_object(response)
     result = coerce_quality_novelty_result(parsed, novelty_input=novelty_input)
     return result
 
 
+def _novelty_item_text(kept: KeptQuality) -> str:
+    """
+    Prompt text one kept quality contributes (used for token budgeting).
+    """
+    return json.dumps(asdict(kept_quality_to_novelty_input(kept)), ensure_ascii=False)
+
+
+@dataclass(frozen=True, slots=True)
+class _NoveltyBatchPrompt:
+    """
+    Template, examples, output schema and planner stage of one batched prompt.
+
+    `triplet_decisions` is set for the fused novelty + triplets prompt only.
+    """
+    prompt_name: str
+    examples_name: str
+    stage: StageProfile
+    triplet_decisions: Optional[frozenset[NoveltyDecision]] = None
+    extra_vars: Dict[str, Any] = field(default_factory=dict)
+
+
+def _novelty_batch_prompt(fused_triplets: bool) -> _NoveltyBatchPrompt:
+    if not fused_triplets:
+        return _NoveltyBatchPrompt(
+            prompt_name="quality_novelty_comparator_batch",
+            examples_name="quality_novelty_comparator",
+            stage=NOVELTY_STAGE,
+        )
+
+    decisions = frozenset(load_triplet_qualifying_decisions())
+    return _NoveltyBatchPrompt(
+        prompt_name="quality_novelty_triplets_batch",
+        examples_name="quality_novelty_triplets_batch",
+        stage=NOVELTY_TRIPLETS_STAGE,
+        triplet_decisions=decisions,
+        # Sorted so the static prompt prefix stays byte-identical across calls.
+        extra_vars={"qualifying_decisions": ", ".join(sorted(str(d) for d in decisions))},
+    )
+
+
+def _novelty_batch_prompt_overhead_tokens(spec: _NoveltyBatchPrompt) -> int:
+    """
+    Estimated tokens of the batched comparator prompt with no items in it.
+    """
+    prompt = build_prompt_batch(
+        prompt_name=spec.prompt_name,
+        examples_name=spec.examples_name,
+        items=[],
+        extra_vars=spec.extra_vars,
+        compact=False,
+    )
+    return get_batch_planner().count_tokens(prompt)
+
+
+async def _aclassify_novelty_batch(
+    batch: PlannedBatch[KeptQuality],
+    *,
+    temperature: float,
+    spec: _NoveltyBatchPrompt,
+    on_result: Optional[NoveltyResultCallback] = None,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    isolate_unresolved: bool = False,
+) -> List[Union[QualityNoveltyResult, BaseException]]:
+    """
+    Classify one planned batch of kept qualities with a single (async) LLM call.
+
+    Items get stable integer ids `batch.start .. batch.start + len(batch.items) - 1`
+    so the response can be validated and re-aligned regardless of order.
+
+    `on_result` sees each result once, as soon as it is parsed (streamed when
+    LLM_STREAMING is enabled).
+
+    `spec` selects the prompt: plain novelty, or fused novelty + triplets.
+
+    An item still missing after repair raises ValueError, or with
+    `isolate_unresolved=True` gets the ValueError in its place in the returned
+    list (micro-batches mix items of several jobs; see `llm.micro_batcher`).
+    """
+    id_offset = batch.start
+
+    # 1) Map each kept quality to the minimal input schema expected by the prompt 
+    novelty_inputs: List[QualityNoveltyInput] = [
+        kept_quality_to_novelty_input(k) for k in batch.items
+    ]
+
+    # 2) 🏗️ Stable integer ids. We send dicts to the prompt (JSON contract),
+    #    but keep the typed objects (QualityNoveltyInput) for coercion and enrichment.
+    id_to_input: Dict[int, QualityNoveltyInput] = {
+        id_offset + i: ni for i, ni in enumerate(novelty_inputs)
+    }
+    planner = get_batch_planner()
+    emitted: set[int] = set()
+
+    async def _call(pairs: List[Tuple[int, QualityNoveltyInput]]) -> Dict[int, QualityNoveltyResult]:
+        sub_inputs = {rid: id_to_input[rid] for rid, _ in pairs}
+
+        def _emit(element: Any) -> None:
+            if on_result is None:
+                return
+            for rid, res in coerce_batched_novelty_response_by_id(
+                {"results": [element]},
+                id_to_input=sub_inputs,
+                triplet_decisions=spec.triplet_decisions,
+            ).items():
+                if rid not in emitted:
+                    emitted.add(rid)
+                    on_result(res)
+
+        # The novelty input dict for the prompt includes all fields of ni + the stable "id" field.
+        items_for_prompt: List[Dict[str, Any]] = []
+        for rid, ni in pairs:
+            d = asdict(ni)
+            d["id"] = rid
+            items_for_prompt.append(d)
+
+        # 3) Build the batched prompt using the shared prompt-builder.
+        prompt = build_prompt_batch_parts(
+            prompt_name=spec.prompt_name,
+            examples_name=spec.examples_name,
+            items=items_for_prompt,
+            # items_var="items_json",
+            # wrapper_key="items",
+            extra_vars=spec.extra_vars,
+            stage=spec.stage.name,
+        )
+
+        # 4) Call the LLM once for the (sub-)batch (planned completion budget).
+        completion = await acomplete_batch(
+            prompt.text,
+            key="results",
+            prompt_prefix=prompt.prefix,
+            on_item=_emit if on_result is not None else None,
+            max_tokens=batch.max_tokens,
+            temperature=temperature,
+            json_mode=True,
+            stage=spec.stage.name,
+            batch_size=len(pairs),
+            json_schema=load_output_schema(spec.prompt_name),
+            backend=backend,
+            model=model,
+        )
+        planner.observe(
+            spec.stage,
+            input_tokens=sum(planner.count_tokens(json.dumps(d, ensure_ascii=False)) for d in items_for_prompt),
+            n_items=len(pairs),
+            response=completion.text,
+            truncated=completion.truncated,
+        )
+
+        # 5) Lenient parse: keep what came back, let the repair loop re-request the rest.
+        parsed = {"results": batch_items_from_completion(completion, "results")}
+        return coerce_batched_novelty_response_by_id(
+            parsed, id_to_input=sub_inputs, triplet_decisions=spec.triplet_decisions
+        )
+
+    def _unresolved(rid: int, _ni: QualityNoveltyInput) -> Union[QualityNoveltyResult, BaseException]:
+        error = ValueError(
+            "Batched novelty response id mismatch.\n"
+            f"Missing ids: [{rid}] (still missing when requested alone)"
+        )
+        if isolate_unresolved:
+            return error
+        raise error
+
+    # Truncated / incomplete responses: only the missing ids are re-requested,
+    # splitting down to single items before giving up.
+    resolved: Dict[int, Union[QualityNoveltyResult, BaseException]] = await arequest_with_repair(
+        list(id_to_input.items()),
+        _call,
+        on_unresolved=_unresolved,
+        label="classify_qualities_novelty",
+    )
+    return [resolved[rid] for rid in sorted(id_to_input)]
+
+
+def _raise_failed(results: Sequence[Union[QualityNoveltyResult, BaseException]]) -> List[QualityNoveltyResult]:
+    """
+    Unwrap per-item results, raising the first failed item's exception.
+    """
+    out: List[QualityNoveltyResult] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        out.append(result)
+    return out
+
+
+def plan_novelty_batches(
+    kept_qualities: Sequence[KeptQuality],
+    *,
+    batch_size: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    fused_triplets: bool = False,
+) -> List[PlannedBatch[KeptQuality]]:
+    """
+    The batches `classify_qualities_novelty` sends in batched mode.
+
+    Exposed so callers (e.g. the UI job runner) can size progress bars from
+    the same plan the comparator runs.
+    """
+    spec = _novelty_batch_prompt(fused_triplets)
+    return get_batch_planner().plan(
+        spec.stage,
+        list(kept_qualities),
+        text_of=_novelty_item_text,
+        prompt_overhead_tokens=_novelty_batch_prompt_overhead_tokens(spec),
+        batch_size=batch_size,
+        max_tokens_per_item=max_tokens,
+    )
+
+
+def _novelty_micro_batcher(
+    spec: _NoveltyBatchPrompt,
+    *,
+    temperature: float,
+    max_tokens: Optional[int],
+    backend: Optional[str],
+    model: Optional[str],
+) -> MicroBatcher[KeptQuality, QualityNoveltyResult]:
+    """
+    The shared cross-job batcher for this prompt and these call settings.
+    """
+    key = (spec.stage.name, spec.triplet_decisions, temperature, max_tokens, backend, model)
+    return get_micro_batcher(
+        key,
+        lambda: MicroBatcher(
+            spec.stage,
+            lambda batch: _aclassify_novelty_batch(
+                batch,
+                temperature=temperature,
+                spec=spec,
+                backend=backend,
+                model=model,
+                isolate_unresolved=True,
+            ),
+            text_of=_novelty_item_text,
+            prompt_overhead_tokens=lambda: _novelty_batch_prompt_overhead_tokens(spec),
+            max_tokens_per_item=max_tokens,
+        ),
+    )
+
+
+def _classify_pass(
+    kept_qualities: Sequence[KeptQuality],
+    *,
+    max_tokens: Optional[int],
+    temperature: float,
+    use_batch: bool,
+    batch_size: Optional[int],
+    max_concurrency: Optional[int],
+    progress: Optional[ProgressCallback],
+    on_result: Optional[NoveltyResultCallback],
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    fused_triplets: bool = False,
+    title: str = "🧑🏻‍⚖️ LLM Novelty Comparator",
+) -> List[QualityNoveltyResult]:
+    """
+    Classify every item once with one model (sequential or batched).
+
+    Results are aligned with `kept_qualities`. `fused_triplets` applies to
+    batched mode only.
+
+    With LLM_MICRO_BATCHING, batched mode submits single items to the shared
+    cross-job batcher instead of planning its own batches (`batch_size` and
+    `max_concurrency` then do not apply).
+    """
+    # -------------------------
+    # Sequential mode
+    # -------------------------
+    if not use_batch:
+        results: List[QualityNoveltyResult] = []
+        for idx, kept in enumerate(kept_qualities, start=1):
+            if progress:
+                progress(
+                    idx,
+                    len(kept_qualities),
+                    f"🧑🏻‍⚖️ determining novelty for quality",
+                )
+            result = classify_quality_novelty(
+                kept,
+                max_tokens=max_tokens or 700,
+                temperature=temperature,
+                backend=backend,
+                model=model,
+            )
+            if on_result:
+                on_result(result)
+            results.append(result)
+        return results
+
+    # -------------------------
+    # Batched mode
+    # -------------------------
+    # Stable integer ids across batches: each planned batch starts at its
+    # position in `kept_qualities` (`PlannedBatch.start`).
+    spec = _novelty_batch_prompt(fused_triplets)
+    planner = get_batch_planner()
+
+    if micro_batching_enabled():
+        done = 0
+
+        def _on_micro(_idx: int, result: Any) -> None:
+            nonlocal done
+            done += 1
+            if progress:
+                progress(
+                    done,
+                    len(kept_qualities),
+                    f"🧑🏻‍⚖️ determining novelty for quality ({done}/{len(kept_qualities)} done)…",
+                )
+            if on_result:
+                on_result(result)
+
+        batcher = _novelty_micro_batcher(
+            spec, temperature=temperature, max_tokens=max_tokens, backend=backend, model=model
+        )
+        micro_results = batcher.map(list(kept_qualities), on_item=_on_micro)
+        planner.save()
+        return _raise_failed(micro_results)
+
+    groups = plan_novelty_batches(
+        kept_qualities,
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        fused_triplets=fused_triplets,
+    )
+    num_batches = len(groups)
+    batch_size_label = batch_size if batch_size is not None else "adaptive"
+
+    stream_progress = progress is not None and streaming_enabled()
+    items_done = 0
+
+    def _on_item(result: QualityNoveltyResult) -> None:
+        nonlocal items_done
+        items_done += 1
+        if progress and stream_progress:
+            progress(
+                items_done,
+                len(kept_qualities),
+                f"🧑🏻‍⚖️ determining novelty for quality ({items_done}/{len(kept_qualities)} done)…",
+            )
+        if on_result:
+            on_result(result)
+
+    def _on_done(done: int, total: int) -> None:
+        if progress and not stream_progress:
+            progress(
+                done,
+                total,
+                f"🧑🏻‍⚖️ determining novelty for a batch of qualities ({done}/{total} batches done)…",
+            )
+
+    # Use the Rich progress bar only when no UI progress callback is given
+    batch_results_list = map_bounded(
+        lambda batch: _aclassify_novelty_batch(
+            batch,
+            temperature=temperature,
+            spec=spec,
+            on_result=_on_item if (stream_progress or on_result) else None,
+            backend=backend,
+            model=model,
+        ),
+        groups,
+        max_concurrency=max_concurrency,
+        on_done=_on_done,
+        description=(
+            None if progress is not None
+            else f"{title}: batch_size={batch_size_label}, num_batches={num_batches}"
+        ),
+    )
+    planner.save()
+
+    all_results: List[QualityNoveltyResult] = []
+    for batch_results in batch_results_list:
+        all_results.extend(_raise_failed(batch_results))
+
+    # all_results is in ascending id order, which matches original kept order.
+    return all_results
+
+
+def _classify_cascade(
+    kept_qualities: Sequence[KeptQuality],
+    *,
+    cascade: NoveltyCascadeConfig,
+    on_result: Optional[NoveltyResultCallback],
+    **pass_kwargs: Any,
+) -> Tuple[List[QualityNoveltyResult], CascadeStats]:
+    """
+    Small model on everything, large (default) model on the unsure items.
+
+    Accepted small-model results are reported through `on_result` right away;
+    escalated items are reported once the large model has decided them.
+
+    `progress` runs over both passes: the small pass reports as usual, and the
+    escalated pass continues from where it stopped, against the combined total.
+    """
+    progress: Optional[ProgressCallback] = pass_kwargs.pop("progress", None)
+    small_total = 0
+
+    def _small_progress(current: int, total: int, message: str) -> None:
+        nonlocal small_total
+        small_total = total
+        if progress:
+            progress(current, total, message)
+
+    def _large_progress(current: int, total: int, message: str) -> None:
+        if progress:
+            progress(small_total + current, small_total + total, message)
+
+    def _on_small(result: QualityNoveltyResult) -> None:
+        if on_result and cascade.escalation_reason(result) is None:
+            on_result(result)
+
+    small_results = _classify_pass(
+        kept_qualities,
+        backend=cascade.backend,
+        model=cascade.model,
+        on_result=_on_small if on_result else None,
+        progress=_small_progress if progress else None,
+        title=f"🪜 Novelty cascade ({cascade.label})",
+        **pass_kwargs,
+    )
+
+    stats = CascadeStats(config=cascade, total=len(small_results))
+    escalate = split_for_escalation(cascade, small_results)
+    results = list(small_results)
+    if escalate:
+        indices = sorted(escalate)
+        large_results = _classify_pass(
+            [kept_qualities[i] for i in indices],
+            on_result=on_result,
+            progress=_large_progress if progress else None,
+            title="🧑🏻‍⚖️ LLM Novelty Comparator (escalated)",
+            **pass_kwargs,
+        )
+        for i, large in zip(indices, large_results):
+            stats.observe(small_results[i], large, escalate[i])
+            results[i] = large
+
+    return results, stats
+
+
 def classify_qualities_novelty(
     kept_qualities: Sequence[KeptQuality],
     *,
-    max_tokens: int = 2048,
+    max_tokens: Optional[int] = None,
     temperature: float = 0.0,
     use_batch: bool = True,
-    batch_size: int = 5,
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
     pretty_print: bool = True,
     progress: Optional[ProgressCallback] = None,
+    on_result: Optional[NoveltyResultCallback] = None,
+    cascade: Optional[NoveltyCascadeConfig] = None,
+    fused_triplets: bool = False,
 ) -> Tuple[
         Sequence[QualityNoveltyResult], 
         Dict
@@ -125,12 +611,11 @@ def classify_qualities_novelty(
         List of kept qualities (each includes neighbor relations and similarity scores).
 
     max_tokens:
-        Token budget for the LLM output.
+        Token budget for the LLM output *per item* (default: 700).
 
-        IMPORTANT:
-        - In sequential mode, this is "per item".
-        - In batched mode, this is "per batch".
-        ⚡️ Increase it when you increase `batch_size` or when rationales get long.
+        - In sequential mode, this is the `max_tokens` of each call.
+        - In batched mode, it caps the expected output of one item; each call's
+          `max_tokens` is planned from the items it contains (`llm.batch_planner`).
 
     temperature:
         Decoding temperature.
@@ -139,7 +624,32 @@ def classify_qualities_novelty(
         If True, run batched LLM calls. If False, run sequential.
 
     batch_size:
-        Number of kept items per LLM call (batched mode only).
+        Fixed number of kept items per LLM call (batched mode only).
+        None packs items adaptively up to the token budget.
+
+    max_concurrency:
+        Maximum number of batched LLM calls in flight (batched mode only).
+        Defaults to LLM_MAX_CONCURRENCY. Output order is preserved regardless.
+
+    on_result:
+        Optional callback invoked once per result as soon as it is available
+        (batched mode: while the batch is still generating when LLM_STREAMING
+        is enabled; completion order, not input order). With streaming,
+        `progress` is also reported per item instead of per batch.
+
+    cascade:
+        Small-model-first cascade (`novelty.cascade`). Defaults to
+        `NoveltyCascadeConfig.from_env()` (disabled unless
+        NOVELTY_CASCADE_MODEL is set). Escalation / agreement stats are saved
+        and returned under "cascade" in the log payload.
+
+    fused_triplets:
+        Batched mode only. If True, the same LLM calls also extract the
+        triplets of every item whose decision qualifies
+        (KB_TRIPLET_QUALIFY_DECISIONS); each result carries them in
+        `triplets` (empty for the other decisions), so no separate triplet
+        extraction round is needed (see `extract_triplets_from_novelty_results`).
+        Ignored in sequential mode.
 
     Returns
     -------
@@ -149,103 +659,36 @@ def classify_qualities_novelty(
     Raises
     ------
     ValueError
-        If the batched LLM response does not return exactly one result per input id.
+        If an item's result is still missing after re-requesting it alone
+        (missing ids are re-requested in smaller batches first).
     """
     if not kept_qualities:
         return [], {}
 
-    # -------------------------
-    # Sequential mode
-    # -------------------------
-    if not use_batch:
-        results: List[QualityNoveltyResult] = []
-        for idx, kept in enumerate(kept_qualities, start=1):
-            if progress:
-                progress(
-                    idx,
-                    len(kept_qualities),
-                    f"🧑🏻‍⚖️ determining novelty for quality",
-                )
-            results.append(
-                classify_quality_novelty(
-                    kept,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                )
-            )
-        pretty_print_novelty_results(kept=kept_qualities, results=results)
-        save_novelty_results_json(results)
-        return results, {}
-
-    # -------------------------
-    # Batched mode
-    # -------------------------
-    all_results: List[QualityNoveltyResult] = []
-    global_id = 0
-    num_batches = math.ceil(len(kept_qualities) / batch_size) 
-
-    groups = batched(list(kept_qualities), batch_size=batch_size)
-
-    # Use rich.track only when no UI progress callback is given
-    if progress is None:
-        groups = track(
-            groups,
-            description=f"🧑🏻‍⚖️ LLM Novelty Comparator: batch_size={batch_size}, num_batches={num_batches}",
-            total=num_batches,
-        )
-
-
-    for batch_idx, group in enumerate(groups, start=1):
-        if progress:
-            progress(
-                batch_idx,
-                num_batches,
-                f"🧑🏻‍⚖️ determining novelty for a batch of qualities (batch size={len(group)})…",
-            )
-
-        # 1) Map each kept quality to the minimal input schema expected by the prompt 
-        novelty_inputs: List[QualityNoveltyInput] = [
-            kept_quality_to_novelty_input(k) for k in group
-        ]
-
-        # 2) 🏗️ Build prompt items with stable integer ids.
-        #    We send dicts to the prompt (JSON contract), but we keep the typed
-        #    objects (of type: QualityNoveltyInput) separately for coercion and enrichment.
-        items_for_prompt: List[Dict[str, Any]] = []
-        id_to_input: Dict[int, QualityNoveltyInput] = {}
-
-        for i, ni in enumerate(novelty_inputs):
-            rid = global_id + i
-            id_to_input[rid] = ni
-
-            # The novelty input dict for the prompt includes all fields of ni + the stable "id" field.
-            d = asdict(ni)
-            d["id"] = rid
-            items_for_prompt.append(d)
+    cascade = cascade if cascade is not None else NoveltyCascadeConfig.from_env()
+    pass_kwargs: Dict[str, Any] = dict(
+        max_tokens=max_tokens,
+        temperature=temperature,
+        use_batch=use_batch,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        progress=progress,
+        fused_triplets=fused_triplets and use_batch,
+    )
 
-        # 3) Build the batched prompt using the shared prompt-builder.
-        prompt = build_prompt_batch(
-            prompt_name="quality_novelty_comparator_batch",
-            examples_name="quality_novelty_comparator",
-            items=items_for_prompt,
-            # items_var="items_json",
-            # wrapper_key="items",
+    cascade_stats: Optional[CascadeStats] = None
+    if cascade.enabled:
+        all_results, cascade_stats = _classify_cascade(
+            kept_qualities, cascade=cascade, on_result=on_result, **pass_kwargs
         )
+    else:
+        all_results = _classify_pass(kept_qualities, on_result=on_result, **pass_kwargs)
 
-        # 4) Call the LLM once for the entire batch.
-        response = respond(prompt, max_tokens=max_tokens, temperature=temperature, json_mode=True)
-        parsed = ensure_json_object(response)
-
-        # 5) Parse + validate + coerce using shared coercion logic.
-        batch_results = coerce_batched_novelty_response(parsed, id_to_input=id_to_input)
-        all_results.extend(batch_results)
-
-        global_id += len(group)
-
-    # all_results is in ascending id order, which matches original kept order.
-
-    if pretty_print:
+    # Sequential mode always printed its results (debugging baseline).
+    if pretty_print or not use_batch:
         pretty_print_novelty_results(kept=kept_qualities, results=all_results)
-    
+
     log_payload = save_novelty_results_json(all_results)
+    if cascade_stats is not None:
+        log_payload = {**log_payload, "cascade": save_cascade_stats_json(cascade_stats)}
     return all_results, log_payload
@@ -31,7 +31,8 @@ def save_novelty_results_json(results: Sequence[QualityNoveltyResult]) -> Dict:
           "confidence": 0.78,
           "matched_neighbor_sentence": "...",
           "novel_spans": [...],
-          "rationale": "..."
+          "rationale": "...",
+          "triplets": [["Subject", "Object", "Relation"], ...]   # fused mode only
         }
       ]
     }
@@ -58,6 +59,10 @@ def save_novelty_results_json(results: Sequence[QualityNoveltyResult]) -> Dict:
         # Make JSON serialization 100% deterministic/robust:
         d["decision"] = decision_str # so that enum becomes string
         d["novel_spans"] = list(r.novel_spans) # ensure list, not other Sequence
+        if r.triplets is None:
+            d.pop("triplets") # only the fused comparator mode extracts triplets
+        else:
+            d["triplets"] = [list(t) for t in r.triplets]
 
         items.append(d)
 
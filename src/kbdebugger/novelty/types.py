@@ -1,7 +1,10 @@
 from enum import Enum
 from typing import Any, Mapping, Optional, Sequence, TypedDict
+from typing_extensions import NotRequired
 from dataclasses import dataclass
 
+from kbdebugger.types.base import TripletSubjectObjectPredicate
+
 
 class NoveltyDecision(str, Enum):
     """Allowed novelty decision labels."""
@@ -51,6 +54,8 @@ class QualityNoveltyResultRaw(TypedDict):
     novel_spans: list[str]
     matched_neighbor_sentence: Optional[str]
     confidence: float
+    # Fused novelty + triplets prompt only; read with `.get("triplets")`.
+    triplets: NotRequired[Optional[Sequence[TripletSubjectObjectPredicate]]]
 
 
 @dataclass(frozen=True, slots=True)
@@ -60,6 +65,10 @@ class QualityNoveltyResult:
 
     We store `quality` so downstream stages (e.g., triplet extraction) can consume
     novelty results directly without relying on positional alignment with other lists.
+
+    `triplets` is only set by the fused comparator mode (novelty + triplets in
+    one call): the (Subject, Object, Relation) triplets of the quality, empty
+    for non-qualifying decisions. None means "not extracted yet".
     """
     quality: str
     max_score: float
@@ -69,3 +78,4 @@ class QualityNoveltyResult:
     novel_spans: Sequence[str]
     matched_neighbor_sentence: Optional[str]
     confidence: float
+    triplets: Optional[Sequence[TripletSubjectObjectPredicate]] = None
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import rich
 
-from typing import Any, Dict, Mapping, Mapping, Sequence, cast, List
-from dataclasses import asdict
+from typing import Any, Collection, Dict, Mapping, Mapping, Optional, Sequence, cast, List
+from dataclasses import asdict, replace
 
+from kbdebugger.extraction.utils import coerce_triplets
 from kbdebugger.subgraph_similarity.types import KeptQuality, NeighborHit
 
 from .types import (
@@ -302,6 +303,50 @@ def coerce_batched_novelty_response(
 
     return out
 
+def coerce_batched_novelty_response_by_id(
+    parsed: Mapping[str, Any],
+    *,
+    id_to_input: Mapping[int, QualityNoveltyInput],
+    triplet_decisions: Optional[Collection[NoveltyDecision]] = None,
+) -> Dict[int, QualityNoveltyResult]:
+    """
+    Lenient twin of `coerce_batched_novelty_response`.
+
+    Returns only the ids that came back *and* coerced cleanly; unexpected ids
+    and invalid payloads are dropped instead of failing the whole batch.
+    Used by the batched comparator to re-request just the missing ids
+    (see `llm.batch_repair`).
+
+    If `triplet_decisions` is given (fused novelty + triplets prompt), each
+    result also carries the "triplets" the model returned for it; results
+    whose decision is not in `triplet_decisions` get an empty list.
+    """
+    try:
+        id_to_response = _extract_batched_results_by_id(parsed)
+    except ValueError:
+        return {}
+
+    out: Dict[int, QualityNoveltyResult] = {}
+    for rid, payload in id_to_response.items():
+        novelty_input = id_to_input.get(rid)
+        if novelty_input is None:
+            continue
+        try:
+            result = coerce_quality_novelty_result(payload, novelty_input=novelty_input)
+        except ValueError:
+            continue
+        if triplet_decisions is not None:
+            raw = cast(QualityNoveltyResultRaw, payload)
+            triplets = (
+                coerce_triplets({"triplets": raw.get("triplets") or []}, novelty_input.quality)["triplets"]
+                if result.decision in triplet_decisions
+                else []
+            )
+            result = replace(result, triplets=triplets)
+        out[rid] = result
+
+    return out
+
 # For UI routes, we can reuse the same coercion logic to convert browser-sent novelty results
 def coerce_from_browser_dict(d: Dict[str, Any]) -> QualityNoveltyResult:
     """
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from typing import cast
+from typing import Optional, cast
 
+from kbdebugger.extraction.quality_dedup import QualityDedupConfig
 from kbdebugger.extraction.types import SourceKind
+from kbdebugger.llm.concurrency import default_max_concurrency
+from kbdebugger.subgraph_similarity.onnx_encoder import OnnxEncoderConfig
 from kbdebugger.subgraph_similarity.types import SubgraphSimilarityFilterConfig
 
 
@@ -26,6 +29,10 @@ class PipelineConfig:
     2) Corpus ingestion + decomposition:
         - which source kind to read (TEXT / PDF_SENTENCES / PDF_CHUNKS)
         - which path is used for that source kind
+        - how the LLM decomposer batches paragraphs and how many batches run at once
+
+    2b) Quality dedup:
+        - exact / near-duplicate qualities are dropped before embedding
 
     3) Vector similarity filter:
         - which SentenceTransformer encoder is used
@@ -61,6 +68,32 @@ class PipelineConfig:
             Path to corpus PDF file (when KB_SOURCE_KIND starts with "PDF_")
             Default: "data/SDS/InstructCIR.pdf"
 
+        KB_DECOMPOSER_BATCH_SIZE:
+            How many paragraphs to send in one decomposer call.
+            Empty = token-aware adaptive batching (see `llm.batch_planner`).
+            Default: "" (adaptive)
+
+        KB_DECOMPOSER_MAX_CONCURRENCY:
+            Decomposer batches in flight at once. 1 runs them one after another.
+            Default: LLM_MAX_CONCURRENCY (8)
+
+        KB_DECOMPOSER_BATCH_RETRIES:
+            Extra attempts for a decomposer batch whose call or parse failed,
+            before its paragraphs are skipped (other batches are unaffected).
+            Default: 1
+
+    🧹 Quality dedup:
+        KB_QUALITY_DEDUP:
+            Whether exact / near-duplicate qualities are dropped after decomposition.
+            Default: true
+
+        KB_QUALITY_DEDUP_JACCARD:
+            Minimum word-bigram Jaccard similarity for two qualities to count as
+            near-duplicates (1.0 = exact duplicates only; e.g. 0.8 enables
+            near-dedup, which never merges a quality into one it only adds
+            words to).
+            Default: 1.0
+
     3️⃣ Vector similarity filtering:
         KB_ENCODER_MODEL_NAME:
             🤗 HuggingFace model id for the SentenceTransformer encoder used to embed
@@ -76,6 +109,15 @@ class PipelineConfig:
             Whether embeddings are L2-normalized (recommended for cosine similarity).
             Default: true
 
+        KB_ENCODER_BACKEND:
+            "torch" (SentenceTransformer) or "onnx" (cached ONNX export run by
+            onnxruntime on CPU). Also used by the KeyBERT stage.
+            Default: "torch"
+
+        KB_ENCODER_ONNX_INT8:
+            With the ONNX backend, use the dynamically int8-quantized export.
+            Default: false
+
         KB_QUALITY_TO_KG_TOP_K:
             Number of nearest KG relations to retrieve per candidate quality.
             This determines:
@@ -96,10 +138,17 @@ class PipelineConfig:
             Temperature for novelty decision model.
             Default: 0.0
 
+        KB_NOVELTY_FUSED_TRIPLETS:
+            Ask the novelty comparator for the triplets of qualifying items
+            (KB_TRIPLET_QUALIFY_DECISIONS) in the same batched call, skipping
+            the separate triplet extraction LLM round. Non-interactive runs only.
+            Default: false
+
     5️⃣ Triplet extraction:
         KB_TRIPLET_EXTRACTION_BATCH_SIZE:
             How many qualifying quality sentences to send in one triplet extraction call.
-            Default: 5
+            Empty = token-aware adaptive batching (see `llm.batch_planner`).
+            Default: "" (adaptive)
     """
    # ----------------------------
     # KG retrieval
@@ -117,6 +166,14 @@ class PipelineConfig:
     docling_enable_OCR: bool
     docling_enable_table_recognition: bool
 
+    # 🧷 LLM decomposer
+    decomposer_batch_size: Optional[int]
+    decomposer_max_concurrency: int
+    decomposer_batch_retries: int
+
+    # 🧹 Quality dedup
+    quality_dedup: QualityDedupConfig
+
     # ----------------------------
     # Vector similarity filter
     # ----------------------------
@@ -127,11 +184,12 @@ class PipelineConfig:
     # ----------------------------
     novelty_llm_max_tokens: int
     novelty_llm_temperature: float
+    novelty_fused_triplets: bool
 
     # ----------------------------
     # Triplet extraction
     # ----------------------------
-    triplet_extraction_batch_size: int
+    triplet_extraction_batch_size: Optional[int]
 
 
 
@@ -149,9 +207,13 @@ class PipelineConfig:
         Validation / normalization rules
         --------------------------------
         - KB_SOURCE_KIND is validated strictly.
-        - kg_limit_per_pattern and triplet_extraction_batch_size are clamped to >= 1.
+        - kg_limit_per_pattern, decomposer_batch_size, decomposer_max_concurrency and
+          triplet_extraction_batch_size are clamped to >= 1 (an empty
+          KB_DECOMPOSER_BATCH_SIZE / KB_TRIPLET_EXTRACTION_BATCH_SIZE means adaptive batching).
+        - decomposer_batch_retries is clamped to >= 0.
         - quality_to_kg_top_k is clamped to >= 1 (inside SubgraphSimilarityFilterConfig).
         - Empty KB_ENCODER_DEVICE is treated as None (auto device).
+        - KB_ENCODER_BACKEND is validated strictly ("torch" or "onnx").
 
         Returns
         -------
@@ -161,7 +223,8 @@ class PipelineConfig:
         Raises
         ------
         ValueError
-            If KB_SOURCE_KIND is not one of the supported enum values.
+            If KB_SOURCE_KIND is not one of the supported enum values, or
+            KB_ENCODER_BACKEND is not a supported encoder backend.
         """
         # ---------- KG retrieval ----------
         kg_retrieval_keyword = os.getenv("KB_RETRIEVAL_KEYWORD", "requirement").strip()
@@ -182,6 +245,23 @@ class PipelineConfig:
         docling_enable_OCR = os.getenv("DOCLING_ENABLE_OCR", "false").lower() == "true"
         docling_enable_table_recognition = os.getenv("DOCLING_ENABLE_TABLE_RECOGNITION", "false").lower() == "true"
 
+        # ---------- LLM decomposer ----------
+        decomposer_batch_size_raw = os.getenv("KB_DECOMPOSER_BATCH_SIZE", "").strip()
+        decomposer_batch_size = (
+            max(1, int(decomposer_batch_size_raw)) if decomposer_batch_size_raw else None
+        )
+        decomposer_concurrency_raw = os.getenv("KB_DECOMPOSER_MAX_CONCURRENCY", "").strip()
+        decomposer_max_concurrency = (
+            max(1, int(decomposer_concurrency_raw)) if decomposer_concurrency_raw else default_max_concurrency()
+        )
+        decomposer_batch_retries = max(0, int(os.getenv("KB_DECOMPOSER_BATCH_RETRIES", "1").strip()))
+
+        # ---------- Quality dedup ----------
+        quality_dedup = QualityDedupConfig(
+            enabled=os.getenv("KB_QUALITY_DEDUP", "true").strip().lower() in {"1", "true", "yes"},
+            jaccard_threshold=min(1.0, max(0.0, float(os.getenv("KB_QUALITY_DEDUP_JACCARD", "1.0").strip()))),
+        )
+
         # ---------- Vector similarity ----------
         encoder_model_name = os.getenv(
             "KB_ENCODER_MODEL_NAME",
@@ -202,22 +282,33 @@ class PipelineConfig:
 
         min_similarity_threshold = float(os.getenv("KB_MIN_SIMILARITY_THRESHOLD", "0.55").strip())
 
+        encoder_backend = OnnxEncoderConfig.from_env()
+
         vector_similarity = SubgraphSimilarityFilterConfig(
             encoder_model_name=encoder_model_name,
             encoder_device=encoder_device,
             normalize_embeddings=normalize_embeddings,
             quality_to_kg_top_k=quality_to_kg_top_k,
             min_similarity_threshold=min_similarity_threshold,
+            encoder_backend=encoder_backend.backend,
+            encoder_onnx_int8=encoder_backend.int8,
         )
 
         # ---------- Novelty comparator ----------
         novelty_llm_max_tokens = int(os.getenv("KB_NOVELTY_LLM_MAX_TOKENS", "700").strip())
         novelty_llm_temperature = float(os.getenv("KB_NOVELTY_LLM_TEMPERATURE", "0.0").strip())
+        novelty_fused_triplets = os.getenv("KB_NOVELTY_FUSED_TRIPLETS", "false").strip().lower() in {
+            "1",
+            "true",
+            "yes",
+        }
 
 
         # ---------- Triplet extraction ----------
-        triplet_extraction_batch_size = int(os.getenv("KB_TRIPLET_EXTRACTION_BATCH_SIZE", "5").strip())
-        triplet_extraction_batch_size = max(1, triplet_extraction_batch_size)
+        triplet_batch_size_raw = os.getenv("KB_TRIPLET_EXTRACTION_BATCH_SIZE", "").strip()
+        triplet_extraction_batch_size = (
+            max(1, int(triplet_batch_size_raw)) if triplet_batch_size_raw else None
+        )
 
 
         return cls(
@@ -231,9 +322,16 @@ class PipelineConfig:
             
             novelty_llm_max_tokens=novelty_llm_max_tokens,
             novelty_llm_temperature=novelty_llm_temperature,
+            novelty_fused_triplets=novelty_fused_triplets,
             
             triplet_extraction_batch_size=triplet_extraction_batch_size,
 
             docling_enable_OCR=docling_enable_OCR,
-            docling_enable_table_recognition=docling_enable_table_recognition
+            docling_enable_table_recognition=docling_enable_table_recognition,
+
+            decomposer_batch_size=decomposer_batch_size,
+            decomposer_max_concurrency=decomposer_max_concurrency,
+            decomposer_batch_retries=decomposer_batch_retries,
+
+            quality_dedup=quality_dedup,
         )
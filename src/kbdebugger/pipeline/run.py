@@ -20,7 +20,8 @@ End-to-end stages
     Retrieve KG relations around a keyword.
 
 2) Corpus → qualities:
-    Load corpus, chunk it, and decompose into atomic "quality" sentences.
+    Load corpus, chunk it, and decompose into atomic "quality" sentences;
+    drop exact / near-duplicate qualities.
 
 3) Vector similarity filter:
     Compare qualities against KG relation sentences; keep only high-similarity items.
@@ -30,6 +31,8 @@ End-to-end stages
 
 5) Triplet extraction (LLM):
     Extract S-P-O triplets for qualifying novelty decisions (env-controlled policy).
+    With KB_NOVELTY_FUSED_TRIPLETS the comparator already returned them, and
+    this stage makes no LLM call.
 
 6) Human oversight:
     Show extracted relations to a human reviewer; upsert accepted ones into the KG;
@@ -47,6 +50,7 @@ from kbdebugger.graph.api import (
 from kbdebugger.extraction.api import (
     extract_paragraphs_from_pdf,
     decompose_paragraphs_to_qualities,
+    deduplicate_qualities,
 )
 from kbdebugger.keyword_extraction.api import filter_paragraphs_by_keyword
 from kbdebugger.subgraph_similarity.api import filter_qualities_by_subgraph_similarity
@@ -79,7 +83,11 @@ def run_pipeline(cfg: PipelineConfig) -> None:
         from meaningfully operating (e.g., no KG relations retrieved, no qualities extracted).
     """
     timer = RunTimer(run_name="kbdebugger_pipeline")
+    with timer.llm_scope():
+        _run_stages(cfg, timer)
 
+
+def _run_stages(cfg: PipelineConfig, timer: RunTimer) -> None:
     # ---------------------------------------------------------------------
     # Stage 1: Retrieve KG subgraph relations (reference set for similarity)
     # ---------------------------------------------------------------------
@@ -112,9 +120,19 @@ def run_pipeline(cfg: PipelineConfig) -> None:
         # Stage 2c: matched paragraphs -> qualities
         candidate_qualities, decomposer_log = decompose_paragraphs_to_qualities(
             paragraphs=keybert_result.matched_docs,
+            batch_size=cfg.decomposer_batch_size,
+            max_concurrency=cfg.decomposer_max_concurrency,
+            batch_retries=cfg.decomposer_batch_retries,
             # progress=
         )
 
+    # Stage 2d: drop exact / near-duplicate qualities before embedding
+    with timer.stage("🧹 Quality dedup"):
+        candidate_qualities, dedup_log = deduplicate_qualities(
+            qualities=candidate_qualities,
+            cfg=cfg.quality_dedup,
+        )
+
     # ---------------------------------------------------------------------
     # Stage 3: Vector similarity filtering (kept qualities + neighbor context)
     # ---------------------------------------------------------------------
@@ -135,6 +153,7 @@ def run_pipeline(cfg: PipelineConfig) -> None:
             max_tokens=cfg.novelty_llm_max_tokens,
             temperature=cfg.novelty_llm_temperature,
             pretty_print=False,
+            fused_triplets=cfg.novelty_fused_triplets,
             # use_batch=True
             # batch_size=5
         )
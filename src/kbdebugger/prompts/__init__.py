@@ -28,41 +28,61 @@ Without a central helper, this repetitive logic tends to spread across:
 
 The `build_prompt` helper below standardizes this pattern so call sites remain tiny and
 consistent, and we can enforce the same JSON serialization and conventions everywhere.
+
+Static prefix / dynamic suffix
+------------------------------
+Every template puts its instructions and few-shot examples first and the
+per-call payload (`$chunks_json`, `$items_json`, `$payload_json`, ...) last.
+`render_prompt_parts` / `build_prompt_parts` return the rendered prompt split at
+that payload variable (`PromptParts`):
+
+- `prefix`: template + examples, rendered once and cached, byte-identical on
+  every call (so provider-side prompt caching applies to HTTP/Groq);
+- `suffix`: the payload.
+
+Pass `prompt_prefix=parts.prefix` to `respond()` / `acomplete_batch()` so the
+HF local backend can reuse the prefix KV cache across calls
+(see `llm.hf_generation`).
+
+Resources
+---------
+Templates, examples and output schemas are loaded once into the
+`PromptRegistry` (`prompts.registry`), with optional hot reload while
+iterating on prompts (PROMPTS_HOT_RELOAD=1).
+
+Compaction
+----------
+`build_prompt_batch_parts` shrinks batched payloads (shared neighbor table,
+rounded scores, optional token budget) before rendering; see
+`prompts.compaction`.
 """
 
 
-from dataclasses import asdict, is_dataclass
-from importlib.resources import files
+from dataclasses import asdict, dataclass, is_dataclass
 from string import Template
-from functools import lru_cache
 import json
 
+from .registry import PromptRegistry, get_prompt_registry
+from .compaction import compact_prompt
+
 
 # ---------------------------------------------------------------------------
-# Internal resource loaders (cached)
+# Internal resource loaders (served from the prompt registry)
 # ---------------------------------------------------------------------------
-@lru_cache(maxsize=32) # disk read happens once per template. 32 means up to 32 different templates cached.
 def _load_template(name: str) -> Template:
     """
-    Load a prompt template from kbdebugger/prompts/<name>.txt
-    and wrap it as a string.Template.
+    The prompt template kbdebugger/prompts/<name>.txt as a string.Template.
     """
-    path = files("kbdebugger.prompts").joinpath(f"{name}.txt")
-    text = path.read_text(encoding="utf-8")
-    return Template(text) 
+    return get_prompt_registry().template(name).template
     # Template is a wrapper around str with $var substitution. 
     # e.g., Template("Hello $name") will replace $name with the value provided
 
 
-@lru_cache(maxsize=1)
 def load_json_resource(name: str):
     """
-    Load a JSON file from kbdebugger/prompts/<name>.json
-    and return the parsed Python object.
+    The parsed few-shot examples kbdebugger/prompts/examples/<name>.json.
     """
-    path = files("kbdebugger.prompts.examples").joinpath(f"{name}.json")
-    text = path.read_text(encoding="utf-8")
-    return json.loads(text)
+    return get_prompt_registry().examples_resource(name).data
 
 
 def render_prompt(name: str, **kwargs) -> str:
@@ -80,6 +100,71 @@ def render_prompt(name: str, **kwargs) -> str:
     # safeSubstitute so that missing vars won't crash
 
 
+def load_examples_json(name: str) -> str:
+    """
+    Few-shot examples from kbdebugger/prompts/examples/<name>.json, serialized
+    once (at registry load) with the project JSON conventions.
+
+    Returning the same string object on every call keeps prompt prefixes
+    byte-stable (and avoids re-serializing the examples per LLM call).
+    """
+    return get_prompt_registry().examples_resource(name).json
+
+
+def load_output_schema(name: str) -> Mapping[str, Any]:
+    """
+    JSON schema of the answer expected by prompt `name`, from
+    kbdebugger/prompts/schemas/<name>.json.
+
+    Pass it as `json_schema=` to `respond()` / `acomplete_batch()`: the HF
+    local backend then decodes under that schema (`llm.json_constraint`);
+    remote backends ignore it.
+    """
+    return get_prompt_registry().schema(name)
+
+
+@dataclass(frozen=True, slots=True)
+class PromptParts:
+    """
+    A rendered prompt split into a static prefix and a dynamic suffix.
+
+    Attributes
+    ----------
+    prefix:
+        Everything before the per-call payload variable (instructions +
+        few-shot examples). Identical across calls with the same static vars.
+    suffix:
+        The payload and anything after it.
+    """
+    prefix: str
+    suffix: str
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+
+def render_prompt_parts(name: str, *, dynamic_var: str, **kwargs) -> PromptParts:
+    """
+    Render a named prompt template split at its per-call payload variable.
+
+    All variables except `dynamic_var` are treated as static: the prefix they
+    render into is cached. `render_prompt_parts(...).text` equals
+    `render_prompt(name, **kwargs)`.
+
+    Usage:
+    ```
+    parts = render_prompt_parts("triplets_batch", dynamic_var="payload_json",
+                                examples_json=..., payload_json=...)
+    respond(parts.text, prompt_prefix=parts.prefix, ...)
+    ```
+    """
+    static_vars = tuple(sorted((k, str(v)) for k, v in kwargs.items() if k != dynamic_var))
+    prefix, suffix_template = get_prompt_registry().render_prefix(name, dynamic_var, static_vars)
+    suffix = Template(suffix_template).safe_substitute(**kwargs)
+    return PromptParts(prefix=prefix, suffix=suffix)
+
+
 
 # ---------------------------------------------------------------------------
 # JSON shaping helpers
@@ -136,7 +221,7 @@ def _dumps_json(obj: Any) -> str:
 # ---------------------------------------------------------------------------
 # High-level prompt builder(s)
 # ---------------------------------------------------------------------------
-def build_prompt(
+def build_prompt_parts(
     *,
     prompt_name: str,
     input_obj: Any,
@@ -147,7 +232,7 @@ def build_prompt(
     
     include_examples: bool = True,
     extra_vars: Optional[Mapping[str, Any]] = None,
-) -> str:
+) -> PromptParts:
     """
     Build a prompt using a standard "examples + input" convention.
 
@@ -201,8 +286,9 @@ def build_prompt(
 
     Returns
     -------
-    str
-        The rendered prompt string.
+    PromptParts
+        The rendered prompt, split before the input payload (`.text` is the
+        full prompt string).
 
     Raises
     ------
@@ -223,8 +309,7 @@ def build_prompt(
     # --- examples (optional) ---
     if include_examples:
         ex_name = examples_name or prompt_name
-        examples_obj = load_json_resource(ex_name)
-        vars_out[examples_var] = _dumps_json(_to_jsonable(examples_obj))
+        vars_out[examples_var] = load_examples_json(ex_name)
 
     # --- input payload ---
     vars_out[input_var] = _dumps_json(_to_jsonable(input_obj))
@@ -233,10 +318,17 @@ def build_prompt(
     if extra_vars:
         vars_out.update(dict(extra_vars))
 
-    return render_prompt(prompt_name, **vars_out)
+    return render_prompt_parts(prompt_name, dynamic_var=input_var, **vars_out)
+
+
+def build_prompt(**kwargs: Any) -> str:
+    """
+    Same as `build_prompt_parts(...)`, returning the full prompt string.
+    """
+    return build_prompt_parts(**kwargs).text
 
 
-def build_prompt_batch(
+def build_prompt_batch_parts(
     *,
     prompt_name: str,
     items: Any,
@@ -248,7 +340,9 @@ def build_prompt_batch(
     
     include_examples: bool = True,
     extra_vars: Optional[Mapping[str, Any]] = None,
-) -> str:
+    stage: Optional[str] = None,
+    compact: bool = True,
+) -> PromptParts:
     """
     Build a prompt for the common "batched items" pattern.
 
@@ -280,18 +374,50 @@ def build_prompt_batch(
     extra_vars:
         Extra template variables.
 
+    stage:
+        Pipeline stage the prompt belongs to (key of the tokens-saved report).
+
+    compact:
+        If True, the payload goes through `prompts.compaction.compact_prompt`
+        (shared-neighbor table, rounded scores, token budget, ...) when the
+        prompt has compaction variants; the examples are shown in the same form.
+
     Returns
     -------
-    str
-        Rendered prompt text.
+    PromptParts
+        Rendered prompt, split before the items payload.
     """
     payload = {wrapper_key: _to_jsonable(items)}
-    return build_prompt(
-        prompt_name=prompt_name,
-        input_obj=payload,
-        input_var=items_var,
-        examples_name=examples_name,
-        examples_var=examples_var,
-        include_examples=include_examples,
-        extra_vars=extra_vars,
-    )
+    if not compact:
+        return build_prompt_parts(
+            prompt_name=prompt_name,
+            input_obj=payload,
+            input_var=items_var,
+            examples_name=examples_name,
+            examples_var=examples_var,
+            include_examples=include_examples,
+            extra_vars=extra_vars,
+        )
+
+    static_vars: dict[str, Any] = {}
+    examples: Any = None
+    if include_examples:
+        static_vars[examples_var] = load_examples_json(examples_name or prompt_name)
+        examples = load_json_resource(examples_name or prompt_name)
+    if extra_vars:
+        static_vars.update(dict(extra_vars))
+
+    def _render(payload_json: str, examples_json: Optional[str]) -> PromptParts:
+        render_vars = {**static_vars, items_var: payload_json}
+        if include_examples and examples_json is not None:
+            render_vars[examples_var] = examples_json
+        return render_prompt_parts(prompt_name, dynamic_var=items_var, **render_vars)
+
+    return compact_prompt(prompt_name, payload, render=_render, examples=examples, stage=stage)
+
+
+def build_prompt_batch(**kwargs: Any) -> str:
+    """
+    Same as `build_prompt_batch_parts(...)`, returning the full prompt string.
+    """
+    return build_prompt_batch_parts(**kwargs).text
@@ -0,0 +1,309 @@
+"""
+Token-budget-aware compaction of batched prompt payloads.
+
+`compact_prompt` renders the payload in successively smaller forms and keeps
+the first that fits PROMPT_TOKEN_BUDGET:
+
+1) lossless: compact JSON, collapsed whitespace, scores rounded to 3
+   decimals, shared neighbor sentences moved into a `neighbor_sentences` table
+2) neighbors below PROMPT_NEIGHBOR_MIN_SCORE dropped (best one kept)
+3) only with PROMPT_SHORT_KEYS=1: short item keys plus a `keys` legend
+
+The few-shot examples are shown in the same form as the payload. Tokens saved
+are counted per stage (`get_prompt_compaction_stats()`).
+
+Environment variables
+---------------------
+PROMPT_COMPACTION:
+    "0" sends the payloads and examples exactly as built. Default: "1"
+    (the lossless step 1; steps 2-3 need a budget)
+
+PROMPT_TOKEN_BUDGET:
+    Target size of a whole rendered batch prompt, in tokens. 0 applies the
+    lossless step only. Default: 0
+
+PROMPT_NEIGHBOR_MIN_SCORE:
+    Neighbor score cutoff of step 2. Default: 0.5
+
+PROMPT_SHORT_KEYS:
+    Allow step 3. Short keys save tokens but are harder for small models to
+    follow. Default: "0"
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from kbdebugger.llm.batch_planner import get_batch_planner
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Short names used by step 3 (also sent as the payload's `keys` legend).
+_NOVELTY_SHORT_KEYS = {
+    "q": "quality",
+    "m": "max_score",
+    "n": "neighbors",
+    "s": "score",
+    "t": "sentence",
+    "r": "ref",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class PromptCompactionConfig:
+    """
+    Compaction switch, token budget and lossy-step parameters.
+    """
+    enabled: bool = True
+    token_budget: int = 0
+    neighbor_min_score: float = 0.5
+    min_neighbors: int = 1
+    short_keys: bool = False
+
+    @classmethod
+    def from_env(cls) -> PromptCompactionConfig:
+        return cls(
+            enabled=os.getenv("PROMPT_COMPACTION", "1").strip().lower() in {"1", "true", "yes"},
+            token_budget=max(0, int(os.getenv("PROMPT_TOKEN_BUDGET", "0").strip())),
+            neighbor_min_score=float(os.getenv("PROMPT_NEIGHBOR_MIN_SCORE", "0.5").strip()),
+            short_keys=os.getenv("PROMPT_SHORT_KEYS", "0").strip().lower() in {"1", "true", "yes"},
+        )
+
+
+@dataclass
+class PromptCompactionStats:
+    """
+    Process-wide per-stage token counters (monotonic; diff two snapshots for a run).
+    """
+    stages: Dict[str, Counter] = field(default_factory=dict)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def record(self, stage: str, *, tokens_before: int, tokens_after: int) -> None:
+        with self._lock:
+            c = self.stages.setdefault(stage, Counter())
+            c["prompts"] += 1
+            c["tokens_before"] += tokens_before
+            c["tokens_after"] += tokens_after
+
+    def snapshot(self) -> Dict[str, Counter]:
+        with self._lock:
+            return {stage: Counter(c) for stage, c in self.stages.items()}
+
+    def since(self, start: Mapping[str, Counter]) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-stage counters accumulated since `start`, plus tokens saved.
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        for stage, c in self.snapshot().items():
+            c.subtract(start.get(stage, Counter()))
+            if c["prompts"] <= 0:
+                continue
+            saved = c["tokens_before"] - c["tokens_after"]
+            out[stage] = {
+                "prompts": c["prompts"],
+                "tokens_before": c["tokens_before"],
+                "tokens_after": c["tokens_after"],
+                "tokens_saved": saved,
+                "saved_rate": round(saved / c["tokens_before"], 4) if c["tokens_before"] else 0.0,
+            }
+        return out
+
+
+@lru_cache(maxsize=1)
+def get_prompt_compaction_stats() -> PromptCompactionStats:
+    """
+    Process-wide compaction counters.
+    """
+    return PromptCompactionStats()
+
+
+def dumps_compact(obj: Any) -> str:
+    """
+    JSON without the default `", "` / `": "` padding.
+    """
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _squash(text: Any) -> str:
+    return _WHITESPACE.sub(" ", str(text)).strip()
+
+
+def _examples_json(shown: Any) -> Optional[str]:
+    # None keeps the packaged examples.
+    return None if shown is None else dumps_compact(shown)
+
+
+# ---------------------------------------------------------------------------
+# Per-prompt payload variants (most faithful first)
+# ---------------------------------------------------------------------------
+# Each variant is (payload, examples); examples None keeps the packaged ones.
+PayloadVariants = Callable[[Any, Any, PromptCompactionConfig], Iterator[Tuple[Any, Any]]]
+
+
+def _novelty_payload(
+    items: List[Dict[str, Any]],
+    *,
+    min_score: Optional[float],
+    min_neighbors: int,
+    short_keys: bool,
+) -> Dict[str, Any]:
+    if min_score is not None:
+        items = [
+            {
+                **it,
+                "neighbors": [
+                    n for i, n in enumerate(it["neighbors"])
+                    if i < min_neighbors or n["score"] >= min_score
+                ],
+            }
+            for it in items
+        ]
+
+    # Sentences shown to more than one item go to the shared table.
+    seen = Counter(s for it in items for s in {n["sentence"] for n in it["neighbors"]})
+    shared = [s for s, n in seen.items() if n > 1]
+    refs = {s: i for i, s in enumerate(shared)}
+
+    k = {v: s for s, v in _NOVELTY_SHORT_KEYS.items()} if short_keys else {v: v for v in _NOVELTY_SHORT_KEYS.values()}
+
+    out_items: List[Dict[str, Any]] = []
+    for it in items:
+        neighbors = []
+        for n in it["neighbors"]:
+            ref = refs.get(n["sentence"])
+            if ref is None:
+                neighbors.append({k["score"]: n["score"], k["sentence"]: n["sentence"]})
+            else:
+                neighbors.append({k["score"]: n["score"], k["ref"]: ref})
+        out = {"id": it["id"], k["quality"]: it["quality"], k["neighbors"]: neighbors}
+        if "max_score" in it:
+            out[k["max_score"]] = it["max_score"]
+        out_items.append(out)
+
+    payload: Dict[str, Any] = {}
+    if short_keys:
+        payload["keys"] = _NOVELTY_SHORT_KEYS
+    if shared:
+        payload["neighbor_sentences"] = shared
+    payload["items"] = out_items
+    return payload
+
+
+def _novelty_items(items: Any) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for it in items:
+        neighbors = [
+            {"score": round(float(n["score"]), 3), "sentence": _squash(n["sentence"])}
+            for n in it.get("neighbors", [])
+        ]
+        neighbors.sort(key=lambda n: n["score"], reverse=True)
+        item = {"id": it["id"], "quality": _squash(it["quality"]), "neighbors": neighbors}
+        if "max_score" in it:
+            item["max_score"] = round(float(it["max_score"]), 3)
+        out.append(item)
+    return out
+
+
+def _novelty_examples(examples: Any, *, short_keys: bool) -> Any:
+    """
+    The few-shot examples (items + expected `response`) in payload form.
+    """
+    if not examples:
+        return examples
+    shown = _novelty_payload(_novelty_items(examples), min_score=None, min_neighbors=0, short_keys=short_keys)
+    for item, example in zip(shown["items"], examples):
+        item["response"] = example["response"]
+    return shown
+
+
+def _novelty_variants(payload: Any, examples: Any, config: PromptCompactionConfig) -> Iterator[Tuple[Any, Any]]:
+    items = _novelty_items(payload.get("items", []))
+    common = {"min_neighbors": config.min_neighbors}
+    long_examples = _novelty_examples(examples, short_keys=False)
+
+    yield _novelty_payload(items, min_score=None, short_keys=False, **common), long_examples
+    yield _novelty_payload(items, min_score=config.neighbor_min_score, short_keys=False, **common), long_examples
+    if config.short_keys:
+        yield (
+            _novelty_payload(items, min_score=config.neighbor_min_score, short_keys=True, **common),
+            _novelty_examples(examples, short_keys=True),
+        )
+
+
+def _triplets_variants(payload: Any, examples: Any, config: PromptCompactionConfig) -> Iterator[Tuple[Any, Any]]:
+    # The sentence is echoed back in the answer, so only the lossless step applies.
+    yield [{**it, "sentence": _squash(it["sentence"])} for it in payload], None
+
+
+_VARIANTS: Dict[str, PayloadVariants] = {
+    "quality_novelty_comparator_batch": _novelty_variants,
+    "quality_novelty_triplets_batch": _novelty_variants,
+    "triplets_batch": _triplets_variants,
+}
+
+
+def compact_prompt(
+    prompt_name: str,
+    payload: Any,
+    *,
+    render: Callable[[str, Optional[str]], Any],
+    examples: Any = None,
+    stage: Optional[str] = None,
+    config: Optional[PromptCompactionConfig] = None,
+) -> Any:
+    """
+    Render `payload` into prompt `prompt_name` in the most faithful form that
+    fits the token budget (or the smallest form if none does).
+
+    Parameters
+    ----------
+    prompt_name:
+        Template name; selects the payload variants. Prompts without
+        variants are rendered unchanged.
+    payload:
+        The JSON-serializable payload as the caller built it.
+    render:
+        Renders a serialized payload and serialized examples (None: the
+        packaged examples) into the full prompt (`PromptParts`).
+    examples:
+        The parsed few-shot examples, shown in the same form as the payload.
+    stage:
+        Counter key for the tokens-saved report. Defaults to `prompt_name`.
+    config:
+        Defaults to `PromptCompactionConfig.from_env()`.
+
+    Returns
+    -------
+    PromptParts
+        Whatever `render` returns for the chosen payload.
+    """
+    config = config or PromptCompactionConfig.from_env()
+    variants = _VARIANTS.get(prompt_name)
+    if not config.enabled or variants is None:
+        return render(json.dumps(payload, ensure_ascii=False), None)
+
+    forms = list(variants(payload, examples, config))
+    # The baseline shows the lossless variant's examples, so only the payload
+    # is compared (and the prefix does not depend on which variant wins).
+    baseline = render(json.dumps(payload, ensure_ascii=False), _examples_json(forms[0][1]))
+
+    count = get_batch_planner().count_tokens
+    before = count(baseline.text)
+    best, after = baseline, before
+    for variant, variant_examples in forms:
+        parts = render(dumps_compact(variant), _examples_json(variant_examples))
+        tokens = count(parts.text)
+        if tokens < after:
+            best, after = parts, tokens
+        if config.token_budget <= 0 or tokens <= config.token_budget:
+            break
+
+    get_prompt_compaction_stats().record(stage or prompt_name, tokens_before=before, tokens_after=after)
+    return best
@@ -0,0 +1,224 @@
+"""
+Process-wide registry of prompt templates, few-shot examples and output schemas.
+
+Everything under `kbdebugger/prompts/` is loaded once: templates (pre-split at
+their `$variables`), examples (parsed and serialized) and output schemas.
+Rendered static prefixes are cached (see `prompts.render_prompt_parts`).
+
+Environment variables
+---------------------
+PROMPTS_HOT_RELOAD:
+    "1" reloads the registry when a prompt file changes (checked at most once
+    per PROMPTS_RELOAD_INTERVAL_S), so edits apply without a restart.
+    Default: "0"
+
+PROMPTS_RELOAD_INTERVAL_S:
+    Minimum seconds between two file scans. Default: 1.0
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib.resources import files
+from pathlib import Path
+from string import Template
+from threading import RLock
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# `$name` or `${name}` (but not the `$$` escape).
+_VARIABLE = re.compile(r"(?<!\$)\$(?:(?P<plain>[_a-zA-Z][_a-zA-Z0-9]*)|\{(?P<braced>[_a-zA-Z][_a-zA-Z0-9]*)\})")
+
+_PREFIX_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True, slots=True)
+class PromptTemplate:
+    """
+    A loaded template, pre-split at each of its variables.
+
+    Attributes
+    ----------
+    template:
+        The `string.Template` of the whole file.
+    splits:
+        variable name → (raw text before its first occurrence, raw text from it on).
+    """
+    name: str
+    template: Template
+    splits: Mapping[str, Tuple[str, str]]
+
+    @classmethod
+    def from_text(cls, name: str, raw: str) -> PromptTemplate:
+        splits: Dict[str, Tuple[str, str]] = {}
+        for m in _VARIABLE.finditer(raw):
+            var = m.group("plain") or m.group("braced")
+            if var not in splits:
+                splits[var] = (raw[:m.start()], raw[m.start():])
+        return cls(name=name, template=Template(raw), splits=splits)
+
+
+@dataclass(frozen=True, slots=True)
+class ExamplesResource:
+    """
+    Few-shot examples, parsed and serialized once.
+    """
+    data: Any
+    json: str
+
+
+class PromptRegistry:
+    """
+    All prompt resources of the `kbdebugger.prompts` package, loaded eagerly.
+
+    Lookups of names that did not exist at load time fall back to reading the
+    resource (and keep it), so a missing file still raises `FileNotFoundError`
+    at the call site.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        *,
+        hot_reload: bool = False,
+        reload_interval_s: float = 1.0,
+    ) -> None:
+        self.root = Path(str(root or files("kbdebugger.prompts")))
+        self.hot_reload = hot_reload
+        self.reload_interval_s = reload_interval_s
+        self._lock = RLock()
+        self._last_check = 0.0
+        self._fingerprint: Dict[str, float] = {}
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.examples: Dict[str, ExamplesResource] = {}
+        self.schemas: Dict[str, Any] = {}
+        self._prefixes: "OrderedDict[Tuple[str, str, tuple], Tuple[str, str]]" = OrderedDict()
+        self.load()
+
+    @classmethod
+    def from_env(cls) -> PromptRegistry:
+        return cls(
+            hot_reload=os.getenv("PROMPTS_HOT_RELOAD", "0").strip().lower() in {"1", "true", "yes"},
+            reload_interval_s=max(0.0, float(os.getenv("PROMPTS_RELOAD_INTERVAL_S", "1.0").strip())),
+        )
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def _files(self) -> Dict[str, Path]:
+        out: Dict[str, Path] = {}
+        for pattern in ("*.txt", "examples/*.json", "schemas/*.json"):
+            for path in self.root.glob(pattern):
+                out[str(path.relative_to(self.root))] = path
+        return out
+
+    def _scan(self) -> Dict[str, float]:
+        return {rel: path.stat().st_mtime for rel, path in self._files().items()}
+
+    def load(self) -> None:
+        """
+        (Re)load every template, examples file and schema.
+        """
+        templates: Dict[str, PromptTemplate] = {}
+        examples: Dict[str, ExamplesResource] = {}
+        schemas: Dict[str, Any] = {}
+
+        for rel, path in self._files().items():
+            text = path.read_text(encoding="utf-8")
+            if rel.startswith("examples/"):
+                data = json.loads(text)
+                examples[path.stem] = ExamplesResource(data=data, json=json.dumps(data, ensure_ascii=False))
+            elif rel.startswith("schemas/"):
+                schemas[path.stem] = json.loads(text)
+            else:
+                templates[path.stem] = PromptTemplate.from_text(path.stem, text)
+
+        with self._lock:
+            self.templates, self.examples, self.schemas = templates, examples, schemas
+            self._prefixes.clear()
+            self._fingerprint = self._scan()
+            self._last_check = time.monotonic()
+
+    def maybe_reload(self) -> bool:
+        """
+        Reload if hot reload is on and a prompt file changed. Returns True if reloaded.
+        """
+        if not self.hot_reload:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self.reload_interval_s:
+                return False
+            self._last_check = now
+            changed = self._scan() != self._fingerprint
+        if changed:
+            self.load()
+            print("[PromptRegistry] 🔁 Prompt files changed on disk; reloaded templates, examples and schemas.")
+        return changed
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def template(self, name: str) -> PromptTemplate:
+        self.maybe_reload()
+        hit = self.templates.get(name)
+        if hit is None:
+            hit = PromptTemplate.from_text(name, (self.root / f"{name}.txt").read_text(encoding="utf-8"))
+            self.templates[name] = hit
+        return hit
+
+    def examples_resource(self, name: str) -> ExamplesResource:
+        self.maybe_reload()
+        hit = self.examples.get(name)
+        if hit is None:
+            data = json.loads((self.root / "examples" / f"{name}.json").read_text(encoding="utf-8"))
+            hit = ExamplesResource(data=data, json=json.dumps(data, ensure_ascii=False))
+            self.examples[name] = hit
+        return hit
+
+    def schema(self, name: str) -> Any:
+        self.maybe_reload()
+        hit = self.schemas.get(name)
+        if hit is None:
+            hit = json.loads((self.root / "schemas" / f"{name}.json").read_text(encoding="utf-8"))
+            self.schemas[name] = hit
+        return hit
+
+    def render_prefix(self, name: str, dynamic_var: str, static_vars: tuple) -> Tuple[str, str]:
+        """
+        Rendered static prefix of `name` before `$dynamic_var`, plus the raw
+        suffix template. Cached per (name, dynamic_var, static vars).
+        """
+        tmpl = self.template(name)
+        key = (name, dynamic_var, static_vars)
+        with self._lock:
+            hit = self._prefixes.get(key)
+            if hit is not None:
+                self._prefixes.move_to_end(key)
+                return hit
+
+        split = tmpl.splits.get(dynamic_var)
+        if split is None:
+            result = ("", tmpl.template.template)
+        else:
+            raw_prefix, raw_suffix = split
+            result = (Template(raw_prefix).safe_substitute(dict(static_vars)), raw_suffix)
+
+        with self._lock:
+            self._prefixes[key] = result
+            while len(self._prefixes) > _PREFIX_CACHE_SIZE:
+                self._prefixes.popitem(last=False)
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_prompt_registry() -> PromptRegistry:
+    """
+    The process-wide prompt registry (everything is loaded on first call).
+    """
+    return PromptRegistry.from_env()
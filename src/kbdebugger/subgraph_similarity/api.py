@@ -6,7 +6,7 @@ from kbdebugger.extraction.types import Qualities
 from kbdebugger.subgraph_similarity.logging import build_qualities_to_subgraph_similarity_payload
 from kbdebugger.types import GraphRelation
 from kbdebugger.types.ui import ProgressCallback
-from .encoder import SentenceTransformerEncoder
+from .encoder import build_text_encoder
 from .similarity_filter import SubgraphSimilarityFilter
 from .types import KeptQuality, DroppedQuality,SubgraphSimilarityFilterConfig
 
@@ -64,10 +64,12 @@ def filter_qualities_by_subgraph_similarity(
             progress(step, total, msg)
 
     tick("📚 Building KG vector index...")
-    encoder = SentenceTransformerEncoder(
-        model_name=cfg.encoder_model_name,
+    encoder = build_text_encoder(
+        cfg.encoder_model_name,
         device=cfg.encoder_device,
         normalize=cfg.normalize_embeddings,
+        backend=cfg.encoder_backend,
+        onnx_int8=cfg.encoder_onnx_int8,
     )
 
     filt = SubgraphSimilarityFilter(
@@ -24,6 +24,12 @@ We provide:
    - Deterministic output
    - ❌ NOT semantically meaningful (only for pipeline testing)
 
+3) OnnxEncoder (`onnx_encoder.py`, KB_ENCODER_BACKEND=onnx)
+   - The same SentenceTransformer exported to ONNX (optionally int8)
+   - Runs under onnxruntime on CPU; several times faster than PyTorch fp32
+
+`build_text_encoder(...)` picks the backend.
+
 Important note about cosine similarity
 --------------------------------------
 Our VectorIndex uses cosine similarity. For cosine similarity to behave well,
@@ -35,7 +41,11 @@ from dataclasses import dataclass
 from typing import Protocol, Sequence
 
 import numpy as np
-    
+
+ENCODER_BACKENDS = ("torch", "onnx")
+DEFAULT_ENCODER_BACKEND = "torch"
+
+
 class TextEncoder(Protocol):
     """
     Protocol that all embedding backends must implement.
@@ -174,4 +184,25 @@ class DummyEncoder:
             out[i] = v / norm
 
         return out
-    
+
+
+def build_text_encoder(
+    model_name: str,
+    *,
+    device: str | None = None,
+    normalize: bool = True,
+    backend: str = DEFAULT_ENCODER_BACKEND,
+    onnx_int8: bool = False,
+) -> TextEncoder:
+    """
+    Build the encoder for `backend` ("torch" or "onnx").
+
+    The ONNX backend always runs on CPU (`device` is ignored) and is shared
+    process-wide per model.
+    """
+    if backend == "onnx":
+        from .onnx_encoder import get_onnx_encoder
+        return get_onnx_encoder(model_name, normalize=normalize, int8=onnx_int8)
+    if backend != "torch":
+        raise ValueError(f"Unsupported encoder backend: {backend!r} (expected one of {ENCODER_BACKENDS})")
+    return SentenceTransformerEncoder(model_name=model_name, device=device, normalize=normalize)
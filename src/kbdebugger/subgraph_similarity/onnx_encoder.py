@@ -0,0 +1,261 @@
+"""
+ONNX Runtime encoder backend (optionally int8-quantized).
+
+`ensure_onnx_export` exports a SentenceTransformer to ONNX once (and
+quantizes it with `int8=True`), cached under KB_ENCODER_ONNX_CACHE_DIR.
+`OnnxEncoder` runs it on CPU with the model's pooling and normalization.
+Needs `onnxruntime` (plus `onnx` for int8); torch only for the export. Check
+drift against the torch encoder with `python -m tools.benchmark_encoder`.
+
+Environment variables
+---------------------
+KB_ENCODER_BACKEND:
+    "torch" (SentenceTransformer) or "onnx". Default: "torch"
+
+KB_ENCODER_ONNX_INT8:
+    Use the dynamically int8-quantized graph. Default: false
+
+KB_ENCODER_ONNX_CACHE_DIR:
+    Where exports are cached. Default: ".cache/onnx_encoders"
+
+KB_ENCODER_ONNX_THREADS:
+    onnxruntime intra-op threads (0 = onnxruntime default). Default: 0
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import rich
+
+from kbdebugger.utils.json import write_json
+
+from .encoder import DEFAULT_ENCODER_BACKEND, ENCODER_BACKENDS
+
+MANIFEST_NAME = "encoder_onnx.json"
+FP32_NAME = "model.onnx"
+INT8_NAME = "model.int8.onnx"
+
+_SUPPORTED_POOLING = {"mean", "cls", "max"}
+
+
+@dataclass(frozen=True, slots=True)
+class OnnxEncoderConfig:
+    """
+    Encoder backend selection and ONNX export settings.
+    """
+    backend: str = DEFAULT_ENCODER_BACKEND
+    int8: bool = False
+    cache_dir: str = ".cache/onnx_encoders"
+    threads: int = 0
+
+    @classmethod
+    def from_env(cls) -> OnnxEncoderConfig:
+        backend = os.getenv("KB_ENCODER_BACKEND", DEFAULT_ENCODER_BACKEND).strip().lower()
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Invalid KB_ENCODER_BACKEND={backend!r} (expected one of {ENCODER_BACKENDS})")
+        return cls(
+            backend=backend,
+            int8=os.getenv("KB_ENCODER_ONNX_INT8", "false").strip().lower() in {"1", "true", "yes"},
+            cache_dir=os.getenv("KB_ENCODER_ONNX_CACHE_DIR", ".cache/onnx_encoders").strip(),
+            threads=max(0, int(os.getenv("KB_ENCODER_ONNX_THREADS", "0").strip() or 0)),
+        )
+
+
+def export_dir_for(model_name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, re.sub(r"[^\w.-]+", "__", model_name))
+
+
+# ---------------------------------------------------------------------------
+# Export (PyTorch → ONNX, optional int8)
+# ---------------------------------------------------------------------------
+def _export_fp32(model_name: str, out_dir: str) -> Dict[str, Any]:
+    import torch  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    rich.print(f"[ONNXEncoder] 📦 Exporting [cyan]{model_name}[/cyan] to ONNX")
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    hf_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    pooling = "mean"
+    normalize_in_model = False
+    for module in st:
+        kind = type(module).__name__
+        if kind == "Pooling":
+            pooling = module.get_pooling_mode_str()
+        elif kind == "Normalize":
+            normalize_in_model = True
+    if pooling not in _SUPPORTED_POOLING:
+        raise ValueError(f"Pooling mode {pooling!r} of {model_name!r} is not supported by the ONNX encoder")
+
+    sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class _Transformer(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.model = hf_model
+
+        def forward(self, *inputs: Any) -> Any:
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    axes = {0: "batch", 1: "sequence"}
+    os.makedirs(out_dir, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            _Transformer(),
+            tuple(sample[n] for n in input_names),
+            os.path.join(out_dir, FP32_NAME),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{n: axes for n in input_names}, "last_hidden_state": axes},
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(out_dir)
+
+    dim = st.get_sentence_embedding_dimension()
+    return {
+        "model_name": model_name,
+        "pooling": pooling,
+        "normalize_in_model": normalize_in_model,
+        "max_seq_length": int(st.max_seq_length or 512),
+        "dim": int(dim) if dim else int(hf_model.config.hidden_size),
+        "input_names": input_names,
+    }
+
+
+def ensure_onnx_export(model_name: str, *, int8: bool = False, cache_dir: str = ".cache/onnx_encoders") -> str:
+    """
+    Export `model_name` to ONNX (and int8) unless a cached export exists.
+
+    Returns
+    -------
+    str
+        The export directory (manifest, tokenizer, model.onnx[, model.int8.onnx]).
+    """
+    out_dir = export_dir_for(model_name, cache_dir)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    if not os.path.isfile(manifest_path):
+        manifest = _export_fp32(model_name, out_dir)
+        # Written last: its presence marks a complete export.
+        write_json(manifest_path, manifest)
+
+    int8_path = os.path.join(out_dir, INT8_NAME)
+    if int8 and not os.path.isfile(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+        rich.print(f"[ONNXEncoder] 🗜️ Quantizing [cyan]{model_name}[/cyan] to int8")
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(os.path.join(out_dir, FP32_NAME), tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+
+    return out_dir
+
+
+# ---------------------------------------------------------------------------
+# Runtime
+# ---------------------------------------------------------------------------
+@dataclass
+class OnnxEncoder:
+    """
+    `TextEncoder` running an exported SentenceTransformer under onnxruntime (CPU).
+
+    Parameters
+    ----------
+    - model_name:
+        Same identifiers as `SentenceTransformerEncoder`.
+    - normalize:
+        If True, L2-normalize embeddings (also applied when the model itself
+        ends in a Normalize layer).
+    - int8:
+        Run the dynamically int8-quantized graph.
+    - batch_size:
+        Texts per onnxruntime call.
+    - config:
+        Cache directory / threads. Defaults to `OnnxEncoderConfig.from_env()`.
+    """
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    normalize: bool = True
+    int8: bool = False
+    batch_size: int = 32
+    config: OnnxEncoderConfig | None = None
+
+    def __post_init__(self) -> None:
+        import onnxruntime as ort  # type: ignore
+        from transformers import AutoTokenizer
+
+        cfg = self.config or OnnxEncoderConfig.from_env()
+        export_dir = ensure_onnx_export(self.model_name, int8=self.int8, cache_dir=cfg.cache_dir)
+        with open(os.path.join(export_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            self._manifest = json.load(f)
+        self._tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if cfg.threads:
+            options.intra_op_num_threads = cfg.threads
+        self._session = ort.InferenceSession(
+            os.path.join(export_dir, INT8_NAME if self.int8 else FP32_NAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names: List[str] = list(self._manifest["input_names"])
+        self.dim = int(self._manifest["dim"])
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        pooling = self._manifest["pooling"]
+        if pooling == "cls":
+            return hidden[:, 0]
+        m = mask[..., None].astype(np.float32)
+        if pooling == "max":
+            return np.where(m > 0, hidden, -1e9).max(axis=1)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Encode texts into embeddings.
+
+        Returns
+        -------
+        np.ndarray
+            Shape: (N, dim), dtype float32, in input order.
+        """
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return out
+
+        # Length-sorted batches: similar lengths pad to similar sizes.
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            enc = self._tokenizer(
+                [texts[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=int(self._manifest["max_seq_length"]),
+                return_tensors="np",
+            )
+            feeds = {n: np.asarray(enc[n], dtype=np.int64) for n in self._input_names}
+            hidden = self._session.run(None, feeds)[0]
+            out[idx] = self._pool(hidden, feeds["attention_mask"])
+
+        if self.normalize or self._manifest.get("normalize_in_model"):
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+@lru_cache(maxsize=4)
+def get_onnx_encoder(model_name: str, *, normalize: bool = True, int8: bool = False) -> OnnxEncoder:
+    """
+    Process-wide `OnnxEncoder` per (model, normalize, int8): sessions are loaded once.
+    """
+    return OnnxEncoder(model_name=model_name, normalize=normalize, int8=int8)
@@ -37,6 +37,12 @@ class SubgraphSimilarityFilterConfig:
 
     min_similarity_threshold:
         Minimum cosine similarity required to keep a quality.
+
+    encoder_backend:
+        "torch" (SentenceTransformer) or "onnx" (onnxruntime, CPU).
+
+    encoder_onnx_int8:
+        With the ONNX backend, run the dynamically int8-quantized graph.
     """
     encoder_model_name: str
     encoder_device: str | None # None will let sentence-transformers choose
@@ -45,6 +51,9 @@ class SubgraphSimilarityFilterConfig:
     quality_to_kg_top_k: int
     min_similarity_threshold: float
 
+    encoder_backend: str = "torch"
+    encoder_onnx_int8: bool = False
+
 class NeighborHit(TypedDict):
     """
     One nearest-neighbor hit from the KG vector index.
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Mapping
+from typing import Any, Dict, List, Mapping
 import re
 import json
 import rich
@@ -137,6 +137,113 @@ def ensure_json_array(raw: str) -> Any:
 
     return []
 
+class IncrementalJsonArrayParser:
+    """
+    Incremental parser that yields the elements of the array under `key` as
+    soon as each one closes, while the surrounding JSON is still streaming in.
+
+    Works for every batched response shape in this repo:
+        {"results": [{...}, {...}]}            (decomposer, novelty comparator)
+        {"triplets_batch": [{...}, {...}]}     (triplet extraction)
+
+    Usage
+    -----
+    >>> p = IncrementalJsonArrayParser("results")
+    >>> p.feed('{"results": [{"id": 0}, {"i')
+    [{'id': 0}]
+    >>> p.feed('d": 1}]}')
+    [{'id': 1}]
+
+    Only object / array elements are supported. Text before the key
+    (markdown fences, chatter) is ignored.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._buf = ""
+        self._pos = -1          # scan position inside the array (-1: array not found yet)
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._elem_start: int | None = None
+        self.done = False       # True once the array closed (or became unparseable)
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Append `chunk` and return the elements completed by it (in order).
+        """
+        self._buf += chunk or ""
+        out: List[Any] = []
+        if self.done:
+            return out
+
+        if self._pos < 0:
+            key_pos = self._buf.find(f'"{self.key}"')
+            if key_pos == -1:
+                return out
+            start = self._buf.find("[", key_pos + len(self.key) + 2)
+            if start == -1:
+                return out
+            self._pos = start + 1
+
+        text = self._buf
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._elem_start is None:
+                if ch.isspace() or ch == ",":
+                    continue
+                if ch not in "{[":
+                    self.done = True  # end of the array (or an unsupported scalar element)
+                    break
+                self._elem_start = i
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+
+            # Element ends when its outermost bracket closes.
+            if self._depth == 0:
+                try:
+                    out.append(json.loads(text[self._elem_start:i + 1]))
+                except json.JSONDecodeError:
+                    self.done = True
+                    break
+                self._elem_start = None
+
+        return out
+
+
+def salvage_json_array_items(raw: str, key: str) -> List[Any]:
+    """
+    Best-effort: recover the *complete* elements of the array under `key`
+    from a possibly truncated JSON object.
+
+    Example (cut off by max_tokens):
+        '{"results": [{"id": 0, "qualities": ["a"]}, {"id": 1, "quali'
+        -> [{"id": 0, "qualities": ["a"]}]
+
+    Elements are recovered in order; the first incomplete element and
+    everything after it is dropped. Returns [] if `key` is not found.
+    """
+    if not isinstance(raw, str):
+        return []
+    return IncrementalJsonArrayParser(key).feed(_strip_markdown_fences(raw))
+
 def to_jsonable(obj: Any) -> Any:
     """
     Convert `obj` into a JSON-serializable structure.
@@ -29,6 +29,7 @@ Design constraints
     - loops (we can still use rich.track inside loops)
 """
 
+import uuid
 from dataclasses import dataclass, field
 from contextlib import contextmanager
 from time import perf_counter
@@ -37,6 +38,9 @@ from typing import Any, Dict, Iterator, Optional
 from rich.console import Console
 from rich.status import Status
 
+from kbdebugger.llm.cache import CacheStats, get_response_cache
+from kbdebugger.llm.telemetry import get_llm_telemetry, llm_run
+from kbdebugger.prompts.compaction import get_prompt_compaction_stats
 from kbdebugger.utils.json import write_json
 from kbdebugger.utils.time import now_utc_compact
 from .time import _format_seconds_human, now_utc_iso
@@ -62,15 +66,32 @@ class RunTimer:
     Typical usage
     -------------
     >>> timer = RunTimer(run_name="kbdebugger_pipeline")
-    >>> with timer.stage("KG retrieval"):
+    >>> with timer.llm_scope(), timer.stage("KG retrieval"):
     ...     kg = retrieve_keyword_subgraph(...)
     >>> timer.save_json()
+
+    LLM calls are only reported if they were made inside `llm_scope()`, so
+    concurrent runs in one process keep separate logs.
     """
 
     run_name: str = "kbdebugger_pipeline"
     created_at_utc: str = field(default_factory=lambda: now_utc_iso())
     stages: Dict[str, StageTiming] = field(default_factory=dict)
 
+    # Labels this run's LLM calls in the (process-wide) telemetry.
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+
+    # First LLM telemetry record of this run; the run log reports calls from here on.
+    llm_calls_start: int = field(default_factory=lambda: get_llm_telemetry().mark())
+
+    # Prompt compaction counters at run start; the run log reports tokens saved per stage.
+    prompt_compaction_start: Dict[str, Any] = field(
+        default_factory=lambda: get_prompt_compaction_stats().snapshot()
+    )
+
+    # This run's final LLM cache counters, set when `llm_scope()` exits.
+    llm_cache_stats: Optional[CacheStats] = None
+
     def record(
         self,
         *,
@@ -103,12 +124,24 @@ class RunTimer:
         stages_sorted = {k: vars(self.stages[k]) for k in sorted(self.stages.keys())}
         total_seconds = sum(t.elapsed_seconds for t in self.stages.values())
 
+        cache = get_response_cache()
+        llm_cache = {
+            **cache.summary(),
+            # Counted under this run's `llm_scope()` only.
+            **(self.llm_cache_stats or cache.run_stats(self.run_id)).since(),
+        }
+
         return {
             "run_name": self.run_name,
             "created_at_utc": self.created_at_utc,
             "total_elapsed_seconds": float(total_seconds),
             "total_elapsed_human": _format_seconds_human(total_seconds),
             "stages": stages_sorted,
+            "llm_cache": llm_cache,
+            # Per-stage tokens / latency / retries / cache hits + one record per call.
+            "run_id": self.run_id,
+            "llm_calls": get_llm_telemetry().as_json(self.llm_calls_start, run_id=self.run_id),
+            "prompt_compaction": get_prompt_compaction_stats().since(self.prompt_compaction_start),
         }
 
     def save_json(
@@ -140,6 +173,20 @@ class RunTimer:
         write_json(path, self.as_json_dict())
         return path
 
+    @contextmanager
+    def llm_scope(self) -> Iterator[None]:
+        """
+        Attribute every LLM call made inside the block to this run.
+        """
+        cache = get_response_cache()
+        cache.open_run(self.run_id)
+        try:
+            with llm_run(self.run_id):
+                yield
+        finally:
+            # Keep the counters for the run log; the cache forgets the run.
+            self.llm_cache_stats = cache.close_run(self.run_id)
+
     @contextmanager
     def stage(
         self,
@@ -182,6 +229,6 @@ class RunTimer:
         )
 
         if print_done:
-            self.console.print(
+            c.print(
                 f"[green]✅ {title}[/green] [dim](took {_format_seconds_human(elapsed)})[/dim]"
             )
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import pytest
+
+from kbdebugger.llm.batch_planner import get_batch_planner
+from kbdebugger.llm.scheduler import get_llm_scheduler
+
+
+@pytest.fixture(autouse=True)
+def _isolated_llm_singletons(monkeypatch):
+    """
+    Build the process-wide planner / scheduler from a clean environment in
+    every test (no learned ratios read from or written to .cache/).
+    """
+    monkeypatch.setenv("LLM_BATCH_STATS_PATH", "")
+    get_batch_planner.cache_clear()
+    get_llm_scheduler.cache_clear()
+    yield
+    get_batch_planner.cache_clear()
+    get_llm_scheduler.cache_clear()
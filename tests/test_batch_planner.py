@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+
+from kbdebugger.llm.batch_planner import BatchPlanner, BatchPlannerConfig, StageProfile
+
+STAGE = StageProfile(name="test", per_item_overhead=10, default_ratio=1.0)
+
+
+def _planner(tmp_path=None, **overrides) -> BatchPlanner:
+    cfg = {"stats_path": str(tmp_path / "ratios.json") if tmp_path else "", **overrides}
+    return BatchPlanner(BatchPlannerConfig(**cfg), token_counter=len)
+
+
+def test_batches_cover_items_once_in_order():
+    planner = _planner(max_items_per_batch=3)
+    items = [f"item{i}" for i in range(8)]
+
+    batches = planner.plan(STAGE, items, text_of=str)
+
+    assert [b.items for b in batches] == [items[0:3], items[3:6], items[6:8]]
+    assert [b.start for b in batches] == [0, 3, 6]
+    assert batches[0].input_tokens == sum(len(s) for s in items[0:3])
+
+
+def test_batches_close_before_the_output_cap():
+    # Each 100-token item expects 110 output tokens (x1.3 margin): three do not fit 400.
+    planner = _planner(max_output_tokens=400, min_output_tokens=1)
+
+    batches = planner.plan(STAGE, ["x" * 100] * 5, text_of=str)
+
+    assert [len(b.items) for b in batches] == [2, 2, 1]
+    assert all(b.max_tokens <= 400 for b in batches)
+    assert batches[0].max_tokens == 286  # ceil(2 * 110 * 1.3)
+
+
+def test_fixed_batch_size_only_plans_max_tokens():
+    planner = _planner(max_output_tokens=64, min_output_tokens=1)
+
+    batches = planner.plan(STAGE, ["x" * 100] * 5, text_of=str, batch_size=2)
+
+    assert [len(b.items) for b in batches] == [2, 2, 1]
+    assert all(b.max_tokens == 64 for b in batches)
+
+
+def test_observe_learns_ratio_and_truncation_only_raises_it():
+    planner = _planner(ema_alpha=0.5)
+
+    # 2 items, 100 input tokens, 220 output tokens: (220 - 2 * 10) / 100 = 2.0
+    planner.observe(STAGE, input_tokens=100, n_items=2, response="y" * 220)
+    assert planner.ratio(STAGE) == pytest.approx(2.0)
+
+    # A truncated, shorter answer says nothing about the real ratio.
+    planner.observe(STAGE, input_tokens=100, n_items=2, response="y" * 60, truncated=True)
+    assert planner.ratio(STAGE) == pytest.approx(2.0)
+
+    # A truncated, longer answer does raise it.
+    planner.observe(STAGE, input_tokens=100, n_items=2, response="y" * 420, truncated=True)
+    assert planner.ratio(STAGE) == pytest.approx(3.0)
+
+
+def test_learned_ratios_persist(tmp_path):
+    planner = _planner(tmp_path)
+    planner.observe(STAGE, input_tokens=100, n_items=1, response="y" * 60)
+    planner.save()
+
+    assert _planner(tmp_path).ratio(STAGE) == pytest.approx(0.5)
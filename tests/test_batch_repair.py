@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from kbdebugger.llm.batch_repair import arequest_with_repair
+
+
+def _run(items, call, **kwargs):
+    return asyncio.run(arequest_with_repair(items, call, on_unresolved=lambda k, it: f"unresolved:{it}", **kwargs))
+
+
+def test_only_missing_ids_are_requested_again():
+    calls: List[List[int]] = []
+
+    async def call(pairs: List[Tuple[int, str]]) -> Dict[int, str]:
+        calls.append([k for k, _ in pairs])
+        # A truncated response: only the first two items came back.
+        return {k: it.upper() for k, it in pairs[:2]}
+
+    items = list(enumerate("abcde"))
+    result = _run(items, call)
+
+    assert result == {0: "A", 1: "B", 2: "C", 3: "D", 4: "E"}
+    assert calls == [[0, 1, 2, 3, 4], [2, 3, 4], [4]]
+
+
+def test_empty_response_is_split_and_single_failures_are_unresolved():
+    calls: List[List[int]] = []
+
+    async def call(pairs: List[Tuple[int, str]]) -> Dict[int, str]:
+        calls.append([k for k, _ in pairs])
+        if len(pairs) > 2:
+            return {}
+        return {k: it.upper() for k, it in pairs if it != "c"}
+
+    items = list(enumerate("abcd"))
+    result = _run(items, call)
+
+    assert result == {0: "A", 1: "B", 2: "unresolved:c", 3: "D"}
+    assert calls == [[0, 1, 2, 3], [0, 1], [2, 3], [2]]
+
+
+def test_unknown_ids_in_the_response_are_ignored():
+    async def call(pairs: List[Tuple[int, str]]) -> Dict[int, str]:
+        return {**{k: it for k, it in pairs}, 99: "extra"}
+
+    assert _run([(0, "a")], call) == {0: "a"}
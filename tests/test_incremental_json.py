@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+
+from kbdebugger.utils.json import IncrementalJsonArrayParser
+
+RESPONSE = json.dumps(
+    {
+        "results": [
+            {"id": 0, "qualities": ["a {brace}", "b [bracket]"]},
+            {"id": 1, "note": 'escaped \\" quote }'},
+            [2, {"nested": True}],
+        ]
+    }
+)
+
+
+def _feed_in_chunks(parser: IncrementalJsonArrayParser, text: str, size: int):
+    seen = []
+    for i in range(0, len(text), size):
+        seen.append(parser.feed(text[i:i + size]))
+    return seen
+
+
+def test_yields_each_element_once_it_closes():
+    parser = IncrementalJsonArrayParser("results")
+
+    per_chunk = _feed_in_chunks(parser, RESPONSE, 1)
+
+    items = [item for chunk in per_chunk for item in chunk]
+    assert items == json.loads(RESPONSE)["results"]
+    assert parser.done
+    # Elements are reported as they close, not all at the end.
+    assert sum(1 for chunk in per_chunk if chunk) == 3
+
+
+def test_chunking_does_not_change_the_result():
+    expected = json.loads(RESPONSE)["results"]
+    for size in (2, 7, 64, len(RESPONSE)):
+        parser = IncrementalJsonArrayParser("results")
+        assert [item for chunk in _feed_in_chunks(parser, RESPONSE, size) for item in chunk] == expected
+
+
+def test_text_before_the_key_is_ignored():
+    parser = IncrementalJsonArrayParser("triplets_batch")
+
+    items = parser.feed('```json\nSure! {"triplets_batch": [{"id": 0}, {"id": 1}]}\n```')
+
+    assert items == [{"id": 0}, {"id": 1}]
+
+
+def test_truncated_stream_keeps_complete_elements():
+    parser = IncrementalJsonArrayParser("results")
+
+    items = parser.feed('{"results": [{"id": 0}, {"id": 1, "qual')
+
+    assert items == [{"id": 0}]
+    assert not parser.done
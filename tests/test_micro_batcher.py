@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+from typing import List, Union
+
+import pytest
+
+from kbdebugger.llm.batch_planner import PlannedBatch, StageProfile
+from kbdebugger.llm.micro_batcher import MicroBatchConfig, MicroBatcher
+
+STAGE = StageProfile(name="test", per_item_overhead=10, default_ratio=1.0)
+
+
+class _Echo:
+    """
+    `run_batch` that upper-cases every item and fails the ones named "bad".
+    """
+
+    def __init__(self) -> None:
+        self.batches: List[PlannedBatch[str]] = []
+        self._lock = threading.Lock()
+
+    async def __call__(self, batch: PlannedBatch[str]) -> List[Union[str, BaseException]]:
+        with self._lock:
+            self.batches.append(batch)
+        return [ValueError(item) if item == "bad" else item.upper() for item in batch.items]
+
+
+def _batcher(run_batch: _Echo, max_wait_ms: int = 20) -> MicroBatcher[str, str]:
+    return MicroBatcher(
+        STAGE,
+        run_batch,
+        text_of=str,
+        prompt_overhead_tokens=lambda: 0,
+        config=MicroBatchConfig(enabled=True, max_wait_ms=max_wait_ms, max_concurrency=2),
+    )
+
+
+def test_items_are_sent_as_one_batch_and_answered_in_order():
+    run_batch = _Echo()
+    batcher = _batcher(run_batch)
+    seen = []
+
+    results = batcher.map(["a", "b", "c"], on_item=lambda i, r: seen.append((i, r)))
+
+    assert results == ["A", "B", "C"]
+    assert sorted(seen) == [(0, "A"), (1, "B"), (2, "C")]
+    assert len(run_batch.batches) == 1
+    assert run_batch.batches[0].start == 0
+    assert batcher.stats()["flushes_deadline"] == 1
+
+
+def test_items_from_concurrent_jobs_share_a_batch():
+    run_batch = _Echo()
+    batcher = _batcher(run_batch, max_wait_ms=200)
+    results = {}
+
+    def job(name: str, items: List[str]) -> None:
+        results[name] = batcher.map(items)
+
+    threads = [
+        threading.Thread(target=job, args=("one", ["a", "b"])),
+        threading.Thread(target=job, args=("two", ["c"])),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5.0)
+
+    assert results == {"one": ["A", "B"], "two": ["C"]}
+    assert len(run_batch.batches) == 1
+    assert sorted(run_batch.batches[0].items) == ["a", "b", "c"]
+
+
+def test_full_queue_is_flushed_without_waiting(monkeypatch):
+    monkeypatch.setenv("LLM_BATCH_MAX_ITEMS", "2")
+    run_batch = _Echo()
+    batcher = _batcher(run_batch, max_wait_ms=60_000)
+
+    assert batcher.map(["a", "b", "c", "d"]) == ["A", "B", "C", "D"]
+    assert batcher.stats()["flushes_full"] == 2
+
+
+def test_failed_item_only_fails_itself():
+    batcher = _batcher(_Echo())
+
+    results = batcher.map(["a", "bad", "c"], return_exceptions=True)
+
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+
+    with pytest.raises(ValueError):
+        batcher.map(["a", "bad"])
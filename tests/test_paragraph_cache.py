@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("langchain")  # kbdebugger.extraction imports the chunkers
+
+from kbdebugger.extraction.paragraph_cache import ParagraphCacheConfig, ParagraphQualitiesCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParagraphQualitiesCache(ParagraphCacheConfig(enabled=True, path=str(tmp_path / "paragraphs.sqlite3")))
+
+
+def test_round_trip_and_misses(cache):
+    cache.put("k1", ["Dropout reduces overfitting.", "Adam is adaptive."])
+
+    assert cache.get_many(["k1", "k2", "k1"]) == {"k1": ["Dropout reduces overfitting.", "Adam is adaptive."]}
+
+
+def test_empty_results_are_not_stored(cache):
+    cache.put("k1", [])
+
+    assert cache.get_many(["k1"]) == {}
+
+
+def test_keys_follow_sanitized_text_and_settings(cache):
+    (a, b, c) = cache.keys(["A paragraph.", "A paragraph.", "Another paragraph."], temperature=0.0, max_qualities_per_chunk=5)
+    assert a == b != c
+
+    assert cache.keys(["A paragraph."], temperature=0.7, max_qualities_per_chunk=5) != [a]
+    assert cache.keys(["A paragraph."], temperature=0.0, max_qualities_per_chunk=3) != [a]
+
+
+def test_routed_answers_are_keyed_by_the_serving_model(cache, monkeypatch):
+    monkeypatch.setenv("MODEL_BACKEND", "groq")
+    monkeypatch.setenv("GROQ_MODEL", "primary")
+    kwargs = {"temperature": 0.0, "max_qualities_per_chunk": 5}
+
+    primary = cache.keys(["A paragraph."], **kwargs)
+    assert cache.keys(["A paragraph."], served_by=("groq", "primary"), **kwargs) == primary
+    assert cache.keys(["A paragraph."], served_by=("groq", "fallback"), **kwargs) != primary
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("DECOMPOSE_CACHE_ENABLED", raising=False)
+    assert not ParagraphCacheConfig.from_env().enabled
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ParagraphQualitiesCache(ParagraphCacheConfig(enabled=False, path=str(tmp_path / "p.sqlite3")))
+    cache.put("k1", ["q"])
+
+    assert not cache.enabled
+    assert cache.get_many(["k1"]) == {}
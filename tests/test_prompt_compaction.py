@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from typing import List, Optional, Tuple
+
+from kbdebugger.prompts import PromptParts
+from kbdebugger.prompts.compaction import PromptCompactionConfig, compact_prompt
+
+PROMPT = "quality_novelty_comparator_batch"
+
+SHARED = "Batch normalization   stabilizes training."
+
+PAYLOAD = {
+    "items": [
+        {
+            "id": 0,
+            "quality": "Dropout  reduces overfitting.",
+            "max_score": 0.81234,
+            "neighbors": [
+                {"score": 0.41234, "sentence": "Weight decay is a regularizer."},
+                {"score": 0.81234, "sentence": SHARED},
+            ],
+        },
+        {
+            "id": 1,
+            "quality": "Batch norm speeds up training.",
+            "max_score": 0.9,
+            "neighbors": [{"score": 0.9, "sentence": SHARED}],
+        },
+    ]
+}
+
+EXAMPLES = [
+    {
+        "id": 0,
+        "quality": "Adam adapts learning rates.",
+        "max_score": 0.7,
+        "neighbors": [{"score": 0.7, "sentence": "Adam is an optimizer."}],
+        "response": {"id": 0, "decision": "PARTIALLY_NEW"},
+    }
+]
+
+
+class _Recorder:
+    """
+    `render` that keeps every (payload, examples) pair it was given.
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[str, Optional[str]]] = []
+
+    def __call__(self, payload_json: str, examples_json: Optional[str]) -> PromptParts:
+        self.calls.append((payload_json, examples_json))
+        # None stands for the packaged examples: render them at their real size.
+        prefix = examples_json if examples_json is not None else json.dumps(EXAMPLES, ensure_ascii=False)
+        return PromptParts(prefix=prefix, suffix=payload_json)
+
+
+def test_lossless_step_without_budget():
+    render = _Recorder()
+
+    parts = compact_prompt(PROMPT, PAYLOAD, render=render, examples=EXAMPLES, config=PromptCompactionConfig())
+
+    payload = json.loads(parts.suffix)
+    assert ": " not in parts.suffix
+    assert payload["neighbor_sentences"] == ["Batch normalization stabilizes training."]
+    first = payload["items"][0]
+    assert first["quality"] == "Dropout reduces overfitting."
+    assert first["max_score"] == 0.812
+    # Sorted by score, the shared sentence referenced by index.
+    assert first["neighbors"] == [{"score": 0.812, "ref": 0}, {"score": 0.412, "sentence": "Weight decay is a regularizer."}]
+    assert len(render.calls) == 2  # baseline + first variant
+
+
+def test_baseline_shows_the_same_examples_as_the_lossless_variant():
+    render = _Recorder()
+
+    compact_prompt(PROMPT, PAYLOAD, render=render, examples=EXAMPLES, config=PromptCompactionConfig(token_budget=1))
+
+    # Only the payload differs between the candidates: the prefix stays byte-identical.
+    assert len({examples_json for _, examples_json in render.calls}) == 1
+
+
+def test_examples_are_shown_in_payload_form():
+    render = _Recorder()
+
+    parts = compact_prompt(PROMPT, PAYLOAD, render=render, examples=EXAMPLES, config=PromptCompactionConfig())
+
+    examples = json.loads(parts.prefix)
+    assert examples["items"] == [
+        {
+            "id": 0,
+            "quality": "Adam adapts learning rates.",
+            "neighbors": [{"score": 0.7, "sentence": "Adam is an optimizer."}],
+            "max_score": 0.7,
+            "response": {"id": 0, "decision": "PARTIALLY_NEW"},
+        }
+    ]
+
+
+def test_short_keys_are_off_by_default_even_over_budget():
+    render = _Recorder()
+    config = PromptCompactionConfig(token_budget=1)
+
+    assert not PromptCompactionConfig.from_env().short_keys
+    parts = compact_prompt(PROMPT, PAYLOAD, render=render, examples=EXAMPLES, config=config)
+
+    payload = json.loads(parts.suffix)
+    assert "keys" not in payload
+    # Step 2 dropped the weak neighbor but kept the best one.
+    assert [len(it["neighbors"]) for it in payload["items"]] == [1, 1]
+
+
+def test_short_keys_change_payload_and_examples_together():
+    render = _Recorder()
+    config = PromptCompactionConfig(token_budget=1, short_keys=True)
+
+    # Enough items for the short keys to outweigh their legend.
+    many = {
+        "items": [
+            {"id": i, "quality": f"Quality {i}.", "max_score": 0.9, "neighbors": [{"score": 0.9, "sentence": f"Sentence {i}."}]}
+            for i in range(20)
+        ]
+    }
+
+    parts = compact_prompt(PROMPT, many, render=render, examples=EXAMPLES, config=config)
+
+    payload = json.loads(parts.suffix)
+    examples = json.loads(parts.prefix)
+    assert payload["keys"]["q"] == "quality"
+    assert set(payload["items"][0]) == {"id", "q", "n", "m"}
+    assert examples["keys"] == payload["keys"]
+    assert set(examples["items"][0]) == {"id", "q", "n", "m", "response"}
+
+
+def test_disabled_compaction_renders_the_payload_as_built():
+    render = _Recorder()
+
+    parts = compact_prompt(PROMPT, PAYLOAD, render=render, examples=EXAMPLES, config=PromptCompactionConfig(enabled=False))
+
+    assert json.loads(parts.suffix) == PAYLOAD
+    assert render.calls == [(json.dumps(PAYLOAD, ensure_ascii=False), None)]
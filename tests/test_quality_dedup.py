@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("langchain")  # kbdebugger.extraction imports the chunkers
+
+from kbdebugger.extraction.quality_dedup import QualityDedupConfig, dedup_qualities, normalize_quality
+
+NEAR = QualityDedupConfig(jaccard_threshold=0.5)
+
+
+def test_normalize_quality():
+    assert normalize_quality("  The Model's  ACCURACY, improves! ") == "the model s accuracy improves"
+
+
+def test_exact_duplicates_keep_first_occurrence():
+    result = dedup_qualities(["Dropout reduces overfitting.", "Adam is adaptive.", "dropout  reduces overfitting"])
+
+    assert result.qualities == ["Dropout reduces overfitting.", "Adam is adaptive."]
+    assert result.num_exact == 1 and result.num_near == 0
+    assert result.duplicates["Dropout reduces overfitting."][0]["index"] == 2
+
+
+def test_near_duplicates_are_opt_in():
+    a = "the encoder maps every input sentence to a dense vector"
+    b = "the encoder maps each input sentence to a dense vector"
+
+    assert dedup_qualities([a, b]).qualities == [a, b]
+
+    result = dedup_qualities([a, b], NEAR)
+    assert result.qualities == [a]
+    assert result.duplicates[a][0]["match"] == "near"
+    assert result.num_near == 1
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("the model supports batch inference on gpu", "the model does not support batch inference on gpu"),
+        ("the model was trained for 10 epochs on the corpus", "the model was trained for 20 epochs on the corpus"),
+        ("the model was trained on the corpus", "the model was trained on the full corpus"),
+    ],
+    ids=["negation", "number", "added-qualifier"],
+)
+def test_guarded_pairs_are_never_merged(a, b):
+    assert dedup_qualities([a, b], QualityDedupConfig(jaccard_threshold=0.1)).qualities == [a, b]
+
+
+def test_disabled_passes_through():
+    qualities = ["a b", "a b"]
+    assert dedup_qualities(qualities, QualityDedupConfig(enabled=False)).qualities == qualities
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from kbdebugger.llm.rate_limit import (
+    DeadlineExceeded,
+    RateLimitExceeded,
+    RateLimitStats,
+    TokenBucketLimiter,
+    call_with_rate_limit,
+    parse_duration_seconds,
+)
+
+# 60 TPM refills 1 token per second: slow enough to compare levels exactly-ish.
+TPM = 60.0
+
+
+def _tokens(limiter: TokenBucketLimiter) -> float:
+    return limiter.snapshot()["tokens_available"]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("13", 13.0),
+        ("7.66s", 7.66),
+        ("2m59.56s", 179.56),
+        ("120ms", 0.12),
+        ("1h2m3s", 3723.0),
+    ],
+)
+def test_parse_duration_seconds(value, expected):
+    assert parse_duration_seconds(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_duration_seconds_rejects_unparseable(value):
+    assert parse_duration_seconds(value) is None
+
+
+def test_settle_refunds_unused_part_of_reservation():
+    limiter = TokenBucketLimiter(tpm=TPM)
+    sent_at = time.monotonic()
+    assert limiter.acquire(40) == 0.0
+    assert _tokens(limiter) == pytest.approx(20, abs=1)
+    assert limiter.snapshot()["tokens_in_flight"] == 40
+
+    limiter.settle(40, 10, sent_at=sent_at)
+
+    assert _tokens(limiter) == pytest.approx(50, abs=1)
+    assert limiter.snapshot()["tokens_in_flight"] == 0
+
+
+def test_settle_with_unknown_usage_refunds_nothing():
+    limiter = TokenBucketLimiter(tpm=TPM)
+    sent_at = time.monotonic()
+    limiter.acquire(40)
+
+    limiter.settle(40, None, sent_at=sent_at)
+
+    assert _tokens(limiter) == pytest.approx(20, abs=1)
+    assert limiter.snapshot()["tokens_in_flight"] == 0
+
+
+def test_observe_headers_subtracts_unsettled_reservations():
+    limiter = TokenBucketLimiter(tpm=TPM)
+    limiter.acquire(40)
+
+    # The provider has not seen the in-flight call yet.
+    limiter.observe_headers({"x-ratelimit-remaining-tokens": "50"})
+
+    assert _tokens(limiter) == pytest.approx(10, abs=1)
+
+
+def test_settle_after_header_sync_returns_whole_reservation():
+    limiter = TokenBucketLimiter(tpm=TPM)
+    sent_at = time.monotonic()
+    limiter.acquire(40)
+    limiter.observe_headers({"x-ratelimit-remaining-tokens": "50"})
+
+    # `remaining` already accounts for the call: its reservation goes back in full.
+    limiter.settle(40, 30, sent_at=sent_at)
+
+    assert _tokens(limiter) == pytest.approx(50, abs=1)
+
+
+def test_observe_headers_calibrates_capacity_unless_pinned():
+    learned = TokenBucketLimiter()
+    learned.observe_headers({"x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "5000"})
+    assert learned.snapshot()["tpm"] == 6000
+    assert _tokens(learned) == pytest.approx(5000, abs=1)
+
+    pinned = TokenBucketLimiter(tpm=TPM)
+    pinned.observe_headers({"x-ratelimit-limit-tokens": "6000"})
+    assert pinned.snapshot()["tpm"] == TPM
+
+
+def test_acquire_fails_fast_when_budget_misses_deadline():
+    limiter = TokenBucketLimiter(tpm=TPM)
+    limiter.acquire(60)
+
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(30, deadline=time.monotonic() + 0.05)
+
+
+def test_call_with_rate_limit_retries_after_429(monkeypatch):
+    monkeypatch.setenv("LLM_SCHEDULER", "0")
+    limiter = TokenBucketLimiter(tpm=TPM)
+    stats = RateLimitStats()
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RateLimitExceeded("429", retry_after=0.05)
+        return "ok"
+
+    result = call_with_rate_limit(fn, limiter=limiter, tokens=10, max_retries=2, stats=stats, usage_of=lambda _: 5)
+
+    assert result == "ok"
+    assert len(calls) == 2
+    assert stats.retries == 1
+    # The retry waited out the shared block.
+    assert calls[1] - calls[0] >= 0.05
+    # Rejected call: full refund; successful call: 10 reserved, 5 used.
+    assert _tokens(limiter) == pytest.approx(55, abs=1)
+
+
+def test_call_with_rate_limit_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setenv("LLM_SCHEDULER", "0")
+    limiter = TokenBucketLimiter()
+
+    def fn():
+        raise RateLimitExceeded("429", retry_after=0.01)
+
+    with pytest.raises(RateLimitExceeded):
+        call_with_rate_limit(fn, limiter=limiter, tokens=10, max_retries=1)
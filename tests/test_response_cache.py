@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+from kbdebugger.llm.cache import ResponseCache, ResponseCacheConfig, make_cache_key
+from kbdebugger.llm.telemetry import llm_run
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(ResponseCacheConfig(enabled=True, path=str(tmp_path / "responses.sqlite3")))
+
+
+def _key(prompt: str) -> str:
+    return make_cache_key(prompt=prompt, backend="groq", model="m", temperature=0.0, max_tokens=16, json_mode=True)
+
+
+def test_round_trip(cache):
+    cache.put(_key("a"), '{"ok": true}')
+
+    assert cache.get(_key("a")) == '{"ok": true}'
+    assert cache.get(_key("b")) is None
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.writes) == (1, 1, 1)
+
+
+def test_open_run_counts_only_its_own_lookups(cache):
+    cache.put(_key("a"), "x")
+    cache.open_run("run-1")
+
+    with llm_run("run-1"):
+        cache.get(_key("a"))
+        cache.get(_key("b"))
+    with llm_run("run-2"):  # never opened: counted process-wide only
+        cache.get(_key("a"))
+
+    assert cache.run_stats("run-1").since()["hits"] == 1
+    assert cache.run_stats("run-1").since()["misses"] == 1
+    assert cache.run_stats("run-2").since()["hits"] == 0
+    assert cache.stats.hits == 2
+
+
+def test_close_run_returns_final_counters_and_forgets_the_run(cache):
+    cache.open_run("run-1")
+    with llm_run("run-1"):
+        cache.get(_key("a"))
+
+    final = cache.close_run("run-1")
+
+    assert final.misses == 1
+    assert cache.run_stats("run-1").since()["misses"] == 0
+    # Lookups after the run closed are no longer tracked for it.
+    with llm_run("run-1"):
+        cache.get(_key("a"))
+    assert cache.close_run("run-1").misses == 0
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from kbdebugger.llm.scheduler import (
+    DeadlineExceeded,
+    LLMScheduler,
+    RequestClass,
+    SchedulerConfig,
+    llm_request_class,
+)
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> None:
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+def _queued(scheduler: LLMScheduler, request_class: RequestClass) -> int:
+    return scheduler.snapshot()["queued"][str(request_class)]
+
+
+def test_rate_reserve_grows_with_higher_class_weight():
+    cfg = SchedulerConfig()
+
+    assert cfg.rate_reserve_for(RequestClass.INTERACTIVE) == 0.0
+    assert cfg.rate_reserve_for(RequestClass.BULK) == pytest.approx(0.5 * 6 / 10)
+    assert cfg.rate_reserve_for(RequestClass.BACKGROUND) == pytest.approx(0.5 * 9 / 10)
+
+
+def test_reserved_slot_is_kept_for_interactive_calls():
+    scheduler = LLMScheduler(SchedulerConfig(slots=2, interactive_reserved=1))
+
+    with scheduler.slot():
+        # The bulk call cannot take the last slot...
+        with llm_request_class(RequestClass.BULK, deadline_s=0.05):
+            with pytest.raises(DeadlineExceeded):
+                with scheduler.slot():
+                    pass
+        # ...an interactive one can.
+        with llm_request_class(RequestClass.INTERACTIVE):
+            with scheduler.slot() as grant:
+                assert grant.request_class == RequestClass.INTERACTIVE
+                assert scheduler.snapshot()["in_flight"] == 2
+
+    snap = scheduler.snapshot()
+    assert snap["in_flight"] == 0
+    assert snap["classes"]["bulk"]["expired"] == 1
+
+
+def test_expired_waiter_raises_and_leaves_the_scheduler_usable():
+    scheduler = LLMScheduler(SchedulerConfig(slots=1, interactive_reserved=0))
+    errors = []
+
+    def bulk() -> None:
+        with llm_request_class(RequestClass.BULK, deadline_s=0.05):
+            try:
+                with scheduler.slot():
+                    pass
+            except DeadlineExceeded as e:
+                errors.append(e)
+
+    with scheduler.slot():
+        t = threading.Thread(target=bulk, daemon=True)
+        t.start()
+        t.join(timeout=2.0)
+        assert not t.is_alive(), "expired waiter never returned"
+
+    assert len(errors) == 1
+    # The scheduler lock was released: later calls are still granted.
+    with scheduler.slot():
+        pass
+    snap = scheduler.snapshot()
+    assert snap["classes"]["bulk"]["expired"] == 1
+    assert snap["queued"]["bulk"] == 0
+
+
+def test_expired_async_waiter_raises():
+    scheduler = LLMScheduler(SchedulerConfig(slots=1, interactive_reserved=0))
+
+    async def bulk() -> None:
+        with llm_request_class(RequestClass.BULK, deadline_s=0.05):
+            async with scheduler.aslot():
+                pass
+
+    with scheduler.slot():
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(asyncio.wait_for(bulk(), timeout=2.0))
+
+    assert scheduler.snapshot()["classes"]["bulk"]["expired"] == 1
+
+
+def test_free_slot_goes_to_higher_class_first():
+    scheduler = LLMScheduler(SchedulerConfig(slots=1, interactive_reserved=0))
+    order = []
+
+    def worker(request_class: RequestClass) -> None:
+        with llm_request_class(request_class):
+            with scheduler.slot():
+                order.append(request_class)
+
+    with scheduler.slot():
+        threads = [threading.Thread(target=worker, args=(c,)) for c in (RequestClass.BACKGROUND, RequestClass.INTERACTIVE)]
+        for t in threads:
+            t.start()
+        _wait_until(lambda: _queued(scheduler, RequestClass.BACKGROUND) == 1)
+        _wait_until(lambda: _queued(scheduler, RequestClass.INTERACTIVE) == 1)
+
+    for t in threads:
+        t.join(timeout=2.0)
+
+    assert order == [RequestClass.INTERACTIVE, RequestClass.BACKGROUND]
+
+
+def test_earliest_deadline_first_within_a_class():
+    scheduler = LLMScheduler(SchedulerConfig(slots=1, interactive_reserved=0))
+    order = []
+
+    def worker(name: str, deadline_s: float) -> None:
+        with llm_request_class(RequestClass.BULK, deadline_s=deadline_s):
+            with scheduler.slot():
+                order.append(name)
+
+    with scheduler.slot():
+        late = threading.Thread(target=worker, args=("late", 30.0))
+        late.start()
+        _wait_until(lambda: _queued(scheduler, RequestClass.BULK) == 1)
+        early = threading.Thread(target=worker, args=("early", 10.0))
+        early.start()
+        _wait_until(lambda: _queued(scheduler, RequestClass.BULK) == 2)
+
+    late.join(timeout=2.0)
+    early.join(timeout=2.0)
+
+    assert order == ["early", "late"]
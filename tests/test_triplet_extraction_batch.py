@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+pytest.importorskip("langchain")  # kbdebugger.extraction imports the chunkers
+
+from kbdebugger.extraction import triplet_extraction_batch as teb
+from kbdebugger.novelty.types import NoveltyDecision, QualityNoveltyResult
+
+DECISIONS = [NoveltyDecision.NEW, NoveltyDecision.EXISTING, NoveltyDecision.PARTIALLY_NEW, NoveltyDecision.EXISTING]
+
+
+def _triplets(sentence: str):
+    return [{"subject": sentence, "relation": "is", "object": "novel"}]
+
+
+def _results(fused: bool) -> List[QualityNoveltyResult]:
+    out = []
+    for i, decision in enumerate(DECISIONS):
+        quality = f"Quality {i}."
+        triplets = None
+        if fused:
+            # The fused comparator only extracts for qualifying decisions.
+            triplets = _triplets(quality) if decision != NoveltyDecision.EXISTING else []
+        out.append(
+            QualityNoveltyResult(
+                quality=quality,
+                max_score=0.5,
+                decision=decision,
+                rationale="",
+                novel_spans=[],
+                matched_neighbor_sentence=None,
+                confidence=1.0,
+                triplets=triplets,
+            )
+        )
+    return out
+
+
+@pytest.fixture
+def extracted_sentences(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # the fused path writes its results log
+    monkeypatch.setenv("KB_TRIPLET_QUALIFY_DECISIONS", "NEW,PARTIALLY_NEW")
+    sent: List[str] = []
+
+    def fake_extract(sentences, *, batch_size=None):
+        sent.extend(sentences)
+        return [{"sentence": s, "triplets": _triplets(s)} for s in sentences]
+
+    monkeypatch.setattr(teb, "extract_triplets_batch", fake_extract)
+    return sent
+
+
+def test_fused_flag_only_changes_the_llm_rounds(extracted_sentences):
+    unfused = teb.extract_triplets_from_novelty_results(_results(fused=False))
+    assert extracted_sentences == ["Quality 0.", "Quality 2."]
+
+    extracted_sentences.clear()
+    fused = teb.extract_triplets_from_novelty_results(_results(fused=True))
+    assert extracted_sentences == []
+
+    assert fused == unfused
+    assert [r["sentence"] for r in fused] == ["Quality 0.", "Quality 2."]
@@ -0,0 +1,178 @@
+"""
+Throughput and cosine drift of the encoder backends on CPU.
+
+Why this exists
+---------------
+The ONNX encoder (`subgraph_similarity.onnx_encoder`, KB_ENCODER_BACKEND=onnx)
+is only worth switching to if it is faster *and* its embeddings stay close
+to the PyTorch SentenceTransformer the thresholds were tuned on
+(KB_MIN_SIMILARITY_THRESHOLD, the KeyBERT fallbacks). This harness embeds
+the same texts with:
+
+    torch       SentenceTransformerEncoder (reference)
+    onnx        OnnxEncoder, fp32 export
+    onnx-int8   OnnxEncoder, dynamically int8-quantized export
+
+and reports per backend:
+- texts/second (best of `--repeat` timed runs, after one warm-up run)
+- cosine(torch, backend) per text: mean / p5 / min
+- max |Δ| of pairwise text similarities against torch, and how many pairs
+  cross `--threshold` (the decisions the filter would change)
+
+Texts come from `--input` (one per line) or, by default, from the packaged
+few-shot examples (paragraphs and qualities), repeated to `--texts`.
+
+Usage:
+$ python -m tools.benchmark_encoder --texts 512
+$ python -m tools.benchmark_encoder --model sentence-transformers/all-mpnet-base-v2 --input data/DSA/DSA_knowledge.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from time import perf_counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def example_texts(n: int) -> List[str]:
+    from kbdebugger.prompts import load_json_resource
+
+    base: List[str] = []
+    for ex in load_json_resource("chunk_decompose"):
+        base.append(ex["chunk"])
+        base.extend(ex.get("qualities", []))
+    return [f"{base[i % len(base)]} ({i + 1})" for i in range(n)]
+
+
+def load_texts(args: argparse.Namespace) -> List[str]:
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[: args.texts] if args.texts else texts
+    return example_texts(args.texts)
+
+
+def _time_encode(encoder: Any, texts: List[str], repeat: int) -> tuple[np.ndarray, float]:
+    vectors = encoder.encode(texts)  # warm-up (graph optimization, allocator)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = perf_counter()
+        vectors = encoder.encode(texts)
+        best = min(best, perf_counter() - t0)
+    return vectors, best
+
+
+def drift(reference: np.ndarray, vectors: np.ndarray, threshold: float) -> Dict[str, Any]:
+    """
+    Per-text cosine to the reference, and the change in pairwise similarities.
+    """
+    per_text = np.sum(reference * vectors, axis=1)
+    ref_pairs = reference @ reference.T
+    pairs = vectors @ vectors.T
+    upper = np.triu_indices(len(reference), k=1)
+    flipped = (ref_pairs[upper] >= threshold) != (pairs[upper] >= threshold)
+    return {
+        "cosine_to_torch_mean": round(float(per_text.mean()), 6),
+        "cosine_to_torch_p5": round(float(np.percentile(per_text, 5)), 6),
+        "cosine_to_torch_min": round(float(per_text.min()), 6),
+        "pairwise_max_abs_delta": round(float(np.abs(pairs - ref_pairs)[upper].max()), 6) if len(upper[0]) else 0.0,
+        "pairs_crossing_threshold": int(flipped.sum()),
+        "pairs_total": int(len(upper[0])),
+    }
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title="🧮 Encoder benchmark (CPU)")
+    for col in ("backend", "seconds", "texts/s", "speedup", "cos mean", "cos min", "max |Δ| pair", "flips"):
+        table.add_column(col, justify="right")
+    for r in results:
+        d = r.get("drift") or {}
+        table.add_row(
+            r["backend"], f"{r['seconds']:.3f}", f"{r['texts_per_second']:.1f}", f"{r['speedup_vs_torch']:.2f}x",
+            str(d.get("cosine_to_torch_mean", "-")), str(d.get("cosine_to_torch_min", "-")),
+            str(d.get("pairwise_max_abs_delta", "-")),
+            f"{d['pairs_crossing_threshold']}/{d['pairs_total']}" if d else "-",
+        )
+    Console().print(table)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare throughput and cosine drift of the torch and ONNX (fp32 / int8) encoder backends."
+    )
+    parser.add_argument(
+        "--model",
+        default=os.getenv("KB_ENCODER_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"),
+        help="Encoder model. Default: KB_ENCODER_MODEL_NAME",
+    )
+    parser.add_argument("--input", default=None, help="Text file with one text per line (default: packaged examples)")
+    parser.add_argument("--texts", type=int, default=512, help="Number of texts. Default: 512")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per backend (best is kept). Default: 3")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("KB_MIN_SIMILARITY_THRESHOLD", "0.55")),
+                        help="Similarity threshold for the flip count. Default: KB_MIN_SIMILARITY_THRESHOLD")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        choices=["torch", "onnx", "onnx-int8"], help="Backends to compare (torch is the reference)")
+    parser.add_argument("--out", default=None, help="Output JSON path. Default: logs/benchmark_encoder_<ts>.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    from kbdebugger.subgraph_similarity.encoder import SentenceTransformerEncoder
+    from kbdebugger.subgraph_similarity.onnx_encoder import OnnxEncoder
+    from kbdebugger.utils.json import write_json
+    from kbdebugger.utils.time import now_utc_compact, now_utc_iso
+
+    texts = load_texts(args)
+    print(f"🧮 Embedding {len(texts)} texts with {args.model}")
+
+    builders = {
+        "torch": lambda: SentenceTransformerEncoder(model_name=args.model, device="cpu"),
+        "onnx": lambda: OnnxEncoder(model_name=args.model),
+        "onnx-int8": lambda: OnnxEncoder(model_name=args.model, int8=True),
+    }
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    results: List[Dict[str, Any]] = []
+    reference: np.ndarray | None = None
+    for name in backends:
+        t0 = perf_counter()
+        encoder = builders[name]()
+        load_s = perf_counter() - t0
+        vectors, seconds = _time_encode(encoder, texts, max(1, args.repeat))
+        if reference is None:
+            reference = vectors
+        results.append({
+            "backend": name,
+            "load_seconds": round(load_s, 3),
+            "seconds": round(seconds, 4),
+            "texts_per_second": round(len(texts) / seconds, 2) if seconds else None,
+            "drift": None if name == "torch" else drift(reference, vectors, args.threshold),
+        })
+
+    torch_seconds = results[0]["seconds"]
+    for r in results:
+        r["speedup_vs_torch"] = round(torch_seconds / r["seconds"], 3) if r["seconds"] else 0.0
+
+    print_summary(results)
+
+    out = args.out or f"logs/benchmark_encoder_{now_utc_compact()}.json"
+    write_json(out, {
+        "created_at_utc": now_utc_iso(),
+        "model": args.model,
+        "num_texts": len(texts),
+        "threshold": args.threshold,
+        "results": results,
+    })
+    print(f"📝 Saved benchmark results to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Offline benchmark of the LLM pipeline stages under controlled load.
+
+Why this exists
+---------------
+Throughput changes (concurrency, batch planning, caching, streaming, rate
+limiting) must be compared on the same workload against the same endpoint
+behaviour. This harness starts the local mock endpoint
+(`tools.mock_llm_server`) in-process, points the `http` backend at it and
+times the three LLM stages on synthetic inputs:
+
+    🧷 decompose_documents          paragraphs → qualities
+    🧠 classify_qualities_novelty   kept qualities → novelty decisions
+    🧬 extract_triplets_batch       sentences → S-P-O triplets
+
+for every combination of `--concurrency` and `--batch-size`. Each scenario
+reports wall time, items/second and the endpoint counters (requests, 429s,
+truncated answers), and everything is written to one JSON file.
+
+The similarity filter and the KG upsert are not LLM-bound and are left out.
+
+Usage:
+$ python -m tools.benchmark_stages --paragraphs 40 --concurrency 1 4 8 --batch-size adaptive 5 --latency-ms 300 --tps 100
+
+Against an already running endpoint (mock or real):
+$ python -m tools.benchmark_stages --url http://127.0.0.1:8089/v1/chat/completions
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+from dataclasses import asdict
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from tools.mock_llm_server import (
+    CannedResponder,
+    MockLLMServer,
+    add_server_arguments,
+    config_from_args,
+    start_server,
+)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic workload (built from the few-shot examples, so answers are canned)
+# ---------------------------------------------------------------------------
+def synthetic_paragraphs(n: int) -> List[str]:
+    examples = CannedResponder().chunk_examples
+    return [f"{examples[i % len(examples)]['chunk']} (Section {i + 1}.)" for i in range(n)]
+
+
+def synthetic_sentences(n: int) -> List[str]:
+    examples = CannedResponder().triplet_examples
+    return [f"{examples[i % len(examples)]['sentence']} [{i + 1}]" for i in range(n)]
+
+
+def synthetic_kept_qualities(n: int) -> List[Dict[str, Any]]:
+    """
+    `KeptQuality` dicts shaped like the similarity filter output.
+    """
+    examples = CannedResponder().novelty_examples
+    kept: List[Dict[str, Any]] = []
+    for i in range(n):
+        ex = examples[i % len(examples)]
+        neighbors = [
+            {
+                "score": float(nb.get("score", 0.0)),
+                "relation": {
+                    "source": {"label": "", "id": None, "created_at": None, "last_updated_at": None},
+                    "target": {"label": "", "id": None, "created_at": None, "last_updated_at": None},
+                    "edge": {"label": "", "properties": {"sentence": nb.get("sentence", "")}},
+                },
+            }
+            for nb in ex.get("neighbors", [])
+        ]
+        kept.append({
+            "quality": f"{ex['quality']} ({i + 1})",
+            "max_score": max((nb["score"] for nb in neighbors), default=0.0),
+            "neighbors": neighbors,
+        })
+    return kept
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+def _configure_environment(args: argparse.Namespace, url: str, workdir: str) -> None:
+    """
+    Point the pipeline at `url`. Must run before `kbdebugger.llm` is imported
+    (backend settings are read at import time).
+    """
+    os.environ["MODEL_BACKEND"] = "http"
+    os.environ["MODEL_SERVICE_URL"] = url
+    os.environ.setdefault("MODEL_SERVICE_NAME", "mock")
+    os.environ["LLM_STREAMING"] = "1" if args.stream else "0"
+    os.environ["LLM_CACHE_ENABLED"] = "1" if args.cache else "0"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_responses.sqlite3")
+    # Learned output ratios would make scenarios depend on their order.
+    os.environ["LLM_BATCH_STATS_PATH"] = ""
+
+
+def _time_stage(fn: Callable[[], Any]) -> float:
+    t0 = perf_counter()
+    fn()
+    return perf_counter() - t0
+
+
+def run_scenario(
+    *,
+    concurrency: int,
+    batch_size: Optional[int],
+    paragraphs: Sequence[str],
+    kept: Sequence[Dict[str, Any]],
+    sentences: Sequence[str],
+    server: Optional[MockLLMServer],
+) -> Dict[str, Any]:
+    """
+    Time every stage once for one (concurrency, batch size) setting.
+    """
+    from kbdebugger.compat.langchain import Document
+    from kbdebugger.extraction.decompose import decompose_documents
+    from kbdebugger.extraction.triplet_extraction_batch import extract_triplets_batch
+    from kbdebugger.extraction.types import DecomposeMode
+    from kbdebugger.llm.telemetry import get_llm_telemetry, summarize
+    from kbdebugger.novelty.comparator import classify_qualities_novelty
+    from kbdebugger.prompts.compaction import get_prompt_compaction_stats
+
+    docs = [Document(page_content=p) for p in paragraphs]
+    stages: Dict[str, Callable[[], Any]] = {
+        "decompose": lambda: decompose_documents(
+            docs,
+            mode=DecomposeMode.CHUNKS,
+            batch_size=batch_size,
+            parallel=True,
+            max_workers=concurrency,
+        ),
+        "novelty": lambda: classify_qualities_novelty(
+            kept,  # type: ignore[arg-type]
+            batch_size=batch_size,
+            max_concurrency=concurrency,
+            pretty_print=False,
+        ),
+        "triplets": lambda: extract_triplets_batch(
+            sentences,
+            batch_size=batch_size,
+            max_concurrency=concurrency,
+        ),
+    }
+    n_items = {"decompose": len(paragraphs), "novelty": len(kept), "triplets": len(sentences)}
+
+    results: Dict[str, Any] = {}
+    for name, fn in stages.items():
+        before = server.snapshot() if server else {}
+        mark = get_llm_telemetry().mark()
+        compaction = get_prompt_compaction_stats().snapshot()
+        seconds = _time_stage(fn)
+        after = server.snapshot() if server else {}
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "items": n_items[name],
+            "items_per_second": round(n_items[name] / seconds, 3) if seconds > 0 else None,
+            "server": {k: after[k] - before.get(k, 0) for k in after},
+            "llm_calls": summarize(get_llm_telemetry().since(mark)).get("all", {}),
+            "prompt_compaction": get_prompt_compaction_stats().since(compaction),
+        }
+
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size if batch_size is not None else "adaptive",
+        "stages": results,
+    }
+
+
+def print_summary(scenarios: Sequence[Dict[str, Any]]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title="⏱️ Stage benchmark")
+    for col in ("concurrency", "batch", "stage", "seconds", "items/s", "requests", "429s", "truncated"):
+        table.add_column(col, justify="right")
+    for sc in scenarios:
+        for stage, r in sc["stages"].items():
+            srv = r["server"]
+            table.add_row(
+                str(sc["concurrency"]), str(sc["batch_size"]), stage,
+                f"{r['seconds']:.2f}", f"{r['items_per_second'] or 0:.2f}",
+                str(srv.get("requests", "-")), str(srv.get("rate_limited", "-")), str(srv.get("truncated", "-")),
+            )
+    Console().print(table)
+
+
+def _parse_batch_size(value: str) -> Optional[int]:
+    return None if value.lower() in {"adaptive", "auto", "none"} else int(value)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time the LLM pipeline stages against a local mock endpoint under controlled load."
+    )
+    parser.add_argument("--url", default=None,
+                        help="Benchmark an already running endpoint instead of starting the mock server.")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Number of synthetic paragraphs. Default: 40")
+    parser.add_argument("--qualities", type=int, default=60, help="Number of synthetic kept qualities. Default: 60")
+    parser.add_argument("--sentences", type=int, default=60, help="Number of synthetic sentences. Default: 60")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8],
+                        help="In-flight request bounds to compare. Default: 1 8")
+    parser.add_argument("--batch-size", type=_parse_batch_size, nargs="+", default=[None],
+                        help="Batch sizes to compare ('adaptive' = token-budget planner). Default: adaptive")
+    parser.add_argument("--stream", action="store_true", help="Enable LLM_STREAMING for the batched stages.")
+    parser.add_argument("--cache", action="store_true",
+                        help="Enable the response cache (fresh per benchmark run; later scenarios hit it).")
+    parser.add_argument("--out", default=None,
+                        help="Output JSON path. Default: logs/benchmark_stages_<timestamp>.json")
+    add_server_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    server: Optional[MockLLMServer] = None
+    if args.url:
+        url = args.url
+    else:
+        server = start_server(config_from_args(args))
+        url = server.url
+        print(f"🧪 Mock LLM server on {url}")
+
+    with tempfile.TemporaryDirectory(prefix="kbdebugger-bench-") as workdir:
+        _configure_environment(args, url, workdir)
+
+        from kbdebugger.utils.json import write_json
+        from kbdebugger.utils.time import now_utc_compact, now_utc_iso
+
+        paragraphs = synthetic_paragraphs(args.paragraphs)
+        kept = synthetic_kept_qualities(args.qualities)
+        sentences = synthetic_sentences(args.sentences)
+
+        scenarios = [
+            run_scenario(
+                concurrency=c,
+                batch_size=b,
+                paragraphs=paragraphs,
+                kept=kept,
+                sentences=sentences,
+                server=server,
+            )
+            for c in args.concurrency
+            for b in args.batch_size
+        ]
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    print_summary(scenarios)
+
+    out = args.out or f"logs/benchmark_stages_{now_utc_compact()}.json"
+    write_json(out, {
+        "created_at_utc": now_utc_iso(),
+        "endpoint": url if args.url else "mock",
+        "mock_config": None if args.url else asdict(config_from_args(args)),
+        "stream": args.stream,
+        "cache": args.cache,
+        "scenarios": scenarios,
+    })
+    print(f"📝 Saved benchmark results to {out}")
+
+
+if __name__ == "__main__":
+    main()
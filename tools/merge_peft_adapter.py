@@ -0,0 +1,110 @@
+"""
+Merge a fine-tuned LoRA adapter into its base model for fast local startup.
+
+It:
+1) Loads the PEFT adapter (default: PEFT_MODEL_PATH) on CPU
+2) Folds the LoRA weights into the base model (`merge_and_unload`)
+3) Saves the merged model as safetensors where `hf_local` picks it up
+   automatically (`llm.peft_merge.merged_model_dir`)
+4) Optionally converts it to a quantized GGUF for MODEL_BACKEND=llamacpp,
+   using the scripts of a llama.cpp checkout (`--llama-cpp-dir`)
+
+Usage:
+$ python -m tools.merge_peft_adapter --adapter Graph_Structuring/fine-tuned-mistral --dtype bfloat16
+
+Quantized CPU artifact (then LLAMACPP_MODEL_PATH=<printed .gguf>):
+$ python -m tools.merge_peft_adapter --gguf Q4_K_M --llama-cpp-dir ~/src/llama.cpp
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+from kbdebugger.llm.peft_merge import merge_peft_adapter
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Merge a PEFT/LoRA adapter into its base model and export it as safetensors (and optionally GGUF)."
+    )
+    parser.add_argument(
+        "--adapter",
+        default=os.getenv("PEFT_MODEL_PATH", "Graph_Structuring/fine-tuned-mistral"),
+        help="PEFT adapter directory. Default: PEFT_MODEL_PATH",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output directory. Default: PEFT_MERGED_DIR/<adapter>-<fingerprint> (found automatically by hf_local)",
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "bfloat16", "float16"],
+        default="float32",
+        help="Stored weight dtype. Default: float32",
+    )
+    parser.add_argument(
+        "--gguf",
+        default=None,
+        metavar="QUANT",
+        help="Also write a quantized GGUF (e.g. Q4_K_M, Q5_K_M, Q8_0) for MODEL_BACKEND=llamacpp",
+    )
+    parser.add_argument(
+        "--llama-cpp-dir",
+        default=os.getenv("LLAMA_CPP_DIR", ""),
+        help="llama.cpp checkout with convert_hf_to_gguf.py and a built llama-quantize. Default: LLAMA_CPP_DIR",
+    )
+    return parser.parse_args()
+
+
+def _find_quantize_bin(llama_cpp_dir: str) -> str:
+    for candidate in (
+        os.path.join(llama_cpp_dir, "build", "bin", "llama-quantize"),
+        os.path.join(llama_cpp_dir, "llama-quantize"),
+    ):
+        if os.path.isfile(candidate):
+            return candidate
+    found = shutil.which("llama-quantize")
+    if found:
+        return found
+    raise FileNotFoundError(f"llama-quantize not found in {llama_cpp_dir!r} or on PATH")
+
+
+def export_gguf(merged_dir: str, quant: str, llama_cpp_dir: str) -> str:
+    """
+    Convert a merged HF model to f16 GGUF, then quantize it. Returns the .gguf path.
+    """
+    convert_script = os.path.join(llama_cpp_dir, "convert_hf_to_gguf.py")
+    if not os.path.isfile(convert_script):
+        raise FileNotFoundError(f"convert_hf_to_gguf.py not found in {llama_cpp_dir!r} (--llama-cpp-dir)")
+
+    f16_path = os.path.join(merged_dir, "model-f16.gguf")
+    out_path = os.path.join(merged_dir, f"model-{quant}.gguf")
+
+    print(f"[Merge] 🦙 Converting to GGUF: {f16_path}")
+    subprocess.run(
+        [sys.executable, convert_script, merged_dir, "--outfile", f16_path, "--outtype", "f16"],
+        check=True,
+    )
+    print(f"[Merge] 🦙 Quantizing to {quant}: {out_path}")
+    subprocess.run([_find_quantize_bin(llama_cpp_dir), f16_path, out_path, quant], check=True)
+    os.remove(f16_path)
+    return out_path
+
+
+def main() -> None:
+    args = parse_args()
+    info = merge_peft_adapter(args.adapter, output_dir=args.output, dtype=args.dtype)
+    print(f"[Merge] ✅ Base model: {info.base_model or '?'} | adapter fingerprint: {info.adapter_fingerprint}")
+
+    if args.gguf:
+        gguf_path = export_gguf(info.output_dir, args.gguf, args.llama_cpp_dir)
+        print(f"[Merge] ✅ GGUF ready. Use: MODEL_BACKEND=llamacpp LLAMACPP_MODEL_PATH={gguf_path}")
+
+
+if __name__ == "__main__":
+    main()
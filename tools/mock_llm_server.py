@@ -0,0 +1,460 @@
+"""
+Local OpenAI-compatible stand-in for the LLM endpoint (no model, no network).
+
+Why this exists
+---------------
+Concurrency, batching, caching and rate-limiting changes cannot be measured
+reproducibly against the shared DFKI endpoint or Groq: latency depends on
+other users, and quotas change under us. This server speaks the same
+`/v1/chat/completions` shape that `HTTPChatResponder` uses (including
+`stream: true` SSE), with fully controlled behaviour:
+
+- latency:    fixed / uniform / lognormal time-to-first-token
+- throughput: completion tokens per second (generation time grows with output)
+- 429s:       injected with a configurable probability, with `retry-after`
+              and `x-ratelimit-*` headers like a real provider
+- truncation: `max_tokens` is honoured; longer answers are cut off and
+              reported with finish_reason="length"
+
+Answers are canned: the JSON payload at the end of the prompt is recognised
+(batched decomposer / novelty / triplet prompts, single-item prompts) and
+answered with outputs taken from `prompts/examples/*.json`, chosen
+deterministically from the item text. Same prompt + same seed => same bytes.
+
+Usage:
+$ python -m tools.mock_llm_server --port 8089 --latency lognormal --latency-ms 400 --tps 80 --rate-429 0.05
+
+Then point the pipeline at it:
+$ MODEL_BACKEND=http MODEL_SERVICE_URL=http://127.0.0.1:8089/v1/chat/completions python -m kbdebugger.main
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EXAMPLES_DIR = Path(__file__).resolve().parents[1] / "src" / "kbdebugger" / "prompts" / "examples"
+
+CHARS_PER_TOKEN = 4.0  # same heuristic as kbdebugger.llm.rate_limit
+
+
+@dataclass(frozen=True, slots=True)
+class MockServerConfig:
+    """
+    Behaviour of the mock endpoint.
+
+    Attributes
+    ----------
+    latency:
+        Time-to-first-token distribution: "fixed", "uniform" or "lognormal".
+    latency_ms:
+        Mean time-to-first-token in milliseconds.
+    latency_jitter:
+        Spread of the distribution: half-width as a fraction of the mean
+        (uniform) or sigma of the underlying normal (lognormal).
+    tokens_per_second:
+        Completion throughput per request. 0 disables generation delay.
+    rate_429:
+        Probability in [0, 1] that a request is answered with HTTP 429.
+    retry_after:
+        Seconds sent in the `retry-after` header of injected 429s.
+    limit_requests / limit_tokens:
+        Values reported in `x-ratelimit-limit-*` headers (0: omit the headers).
+    seed:
+        Seed for latency and 429 sampling.
+    """
+    latency: str = "fixed"
+    latency_ms: float = 200.0
+    latency_jitter: float = 0.5
+    tokens_per_second: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    limit_requests: int = 0
+    limit_tokens: int = 0
+    seed: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Canned answers
+# ---------------------------------------------------------------------------
+def _load_examples(name: str) -> List[Dict[str, Any]]:
+    path = EXAMPLES_DIR / f"{name}.json"
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [x for x in data if isinstance(x, dict)]
+
+
+class CannedResponder:
+    """
+    Builds deterministic JSON answers for the prompt shapes used in this repo.
+    """
+
+    def __init__(self) -> None:
+        self.chunk_examples = _load_examples("chunk_decompose")
+        self.novelty_examples = _load_examples("quality_novelty_comparator")
+        self.triplet_examples = _load_examples("triplets_batch")
+
+    @staticmethod
+    def _pick(examples: List[Dict[str, Any]], text: str) -> Dict[str, Any]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return examples[int.from_bytes(digest[:4], "big") % len(examples)]
+
+    def _novelty(self, item_id: Any, quality: str) -> Dict[str, Any]:
+        response = dict(self._pick(self.novelty_examples, quality).get("response") or {})
+        response["id"] = item_id
+        return response
+
+    def answer(self, prompt: str) -> str:
+        """
+        Return the canned JSON answer for `prompt`.
+
+        The payload is the last non-empty line of the prompt (every template in
+        `prompts/` ends with its `$..._json` payload).
+        """
+        lines = [ln for ln in prompt.strip().splitlines() if ln.strip()]
+        payload: Any = None
+        if lines:
+            try:
+                payload = json.loads(lines[-1])
+            except json.JSONDecodeError:
+                payload = lines[-1].strip()
+
+        # Batched chunk decomposer: {"chunks": [{"id", "text"}]}
+        if isinstance(payload, dict) and isinstance(payload.get("chunks"), list):
+            results = [
+                {"id": c.get("id"), "qualities": self._pick(self.chunk_examples, str(c.get("text", ""))).get("qualities", [])}
+                for c in payload["chunks"] if isinstance(c, dict)
+            ]
+            return json.dumps({"results": results}, ensure_ascii=False)
+
+        # Batched novelty comparator: {"items": [{"id", "quality", "neighbors"}]},
+        # possibly compacted with a {"keys": {"q": "quality", ...}} legend.
+        if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+            legend = payload.get("keys") if isinstance(payload.get("keys"), dict) else {}
+            quality_key = next((short for short, name in legend.items() if name == "quality"), "quality")
+            results = [
+                self._novelty(it.get("id"), str(it.get(quality_key, "")))
+                for it in payload["items"] if isinstance(it, dict)
+            ]
+            return json.dumps({"results": results}, ensure_ascii=False)
+
+        # Batched triplet extraction: [{"id", "sentence"}]
+        if isinstance(payload, list):
+            batch = [
+                {
+                    "id": it.get("id"),
+                    "sentence": it.get("sentence", ""),
+                    "triplets": self._pick(self.triplet_examples, str(it.get("sentence", ""))).get("triplets", []),
+                }
+                for it in payload if isinstance(it, dict)
+            ]
+            return json.dumps({"triplets_batch": batch}, ensure_ascii=False)
+
+        # Single novelty item: {"quality", "neighbors"}
+        if isinstance(payload, dict) and "quality" in payload:
+            response = self._novelty(None, str(payload["quality"]))
+            response.pop("id", None)
+            return json.dumps(response, ensure_ascii=False)
+
+        # Single-item prompts (chunk / sentence decomposer, single triplets,
+        # keyword synonyms): one object carrying every key they read.
+        text = payload if isinstance(payload, str) else json.dumps(payload)
+        return json.dumps(
+            {
+                "qualities": self._pick(self.chunk_examples, text).get("qualities", []),
+                "sentence": text,
+                "triplets": self._pick(self.triplet_examples, text).get("triplets", []),
+                "synonyms": [],
+            },
+            ensure_ascii=False,
+        )
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+def _count_tokens(text: str) -> int:
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN))
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server holding the config, canned answers and counters.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockServerConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self.canned = CannedResponder()
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "rate_limited": 0,
+            "truncated": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def sample_latency(self) -> float:
+        cfg = self.config
+        mean = max(0.0, cfg.latency_ms) / 1000.0
+        with self._lock:
+            if cfg.latency == "uniform":
+                half = mean * cfg.latency_jitter
+                return max(0.0, self._rng.uniform(mean - half, mean + half))
+            if cfg.latency == "lognormal" and mean > 0:
+                sigma = max(0.0, cfg.latency_jitter)
+                # Parametrised so that the distribution mean equals `mean`.
+                return self._rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            return mean
+
+    def should_rate_limit(self) -> bool:
+        with self._lock:
+            return self.config.rate_429 > 0 and self._rng.random() < self.config.rate_429
+
+    def count(self, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] = self.stats.get(k, 0) + v
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockLLMServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 (stdlib signature)
+        pass
+
+    def _rate_limit_headers(self, prompt_tokens: int) -> Dict[str, str]:
+        cfg = self.server.config
+        headers: Dict[str, str] = {}
+        if cfg.limit_requests:
+            headers["x-ratelimit-limit-requests"] = str(cfg.limit_requests)
+        if cfg.limit_tokens:
+            headers["x-ratelimit-limit-tokens"] = str(cfg.limit_tokens)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, cfg.limit_tokens - prompt_tokens))
+        return headers
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # noqa: N802 (stdlib naming)
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:  # noqa: N802 (stdlib naming)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+
+        messages = request.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+        user_prompt = next(
+            (str(m.get("content", "")) for m in reversed(messages) if isinstance(m, dict) and m.get("role") == "user"),
+            prompt,
+        )
+        prompt_tokens = _count_tokens(prompt)
+        headers = self._rate_limit_headers(prompt_tokens)
+        server = self.server
+        cfg = server.config
+
+        server.count(requests=1)
+        if server.should_rate_limit():
+            server.count(rate_limited=1)
+            headers["retry-after"] = f"{cfg.retry_after:g}"
+            if cfg.limit_tokens:
+                headers["x-ratelimit-remaining-tokens"] = "0"
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}}, headers)
+            return
+
+        text = server.canned.answer(user_prompt)
+        finish_reason = "stop"
+        max_tokens = int(request.get("max_tokens") or request.get("max_completion_tokens") or 0)
+        if max_tokens and _count_tokens(text) > max_tokens:
+            text = text[: int(max_tokens * CHARS_PER_TOKEN)]
+            finish_reason = "length"
+            server.count(truncated=1)
+
+        completion_tokens = _count_tokens(text)
+        server.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        model = request.get("model", "mock")
+
+        time.sleep(server.sample_latency())
+
+        if request.get("stream"):
+            self._stream(text, finish_reason=finish_reason, model=model, headers=headers)
+            return
+
+        if cfg.tokens_per_second > 0:
+            time.sleep(completion_tokens / cfg.tokens_per_second)
+
+        self._send_json(
+            200,
+            {
+                "id": f"mock-{server.snapshot()['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": usage,
+            },
+            headers,
+        )
+
+    def _stream(self, text: str, *, finish_reason: str, model: str, headers: Dict[str, str]) -> None:
+        """
+        Send `text` as OpenAI-style SSE chunks paced at the configured throughput.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.close_connection = True
+
+        tps = self.server.config.tokens_per_second
+        for piece in _pieces(text, tokens_per_piece=4):
+            if tps > 0:
+                time.sleep(_count_tokens(piece) / tps)
+            self._event({"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        self._event({"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, body: Dict[str, Any]) -> None:
+        self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def _pieces(text: str, *, tokens_per_piece: int) -> Iterator[str]:
+    step = max(1, int(tokens_per_piece * CHARS_PER_TOKEN))
+    for i in range(0, len(text), step):
+        yield text[i:i + step]
+
+
+def start_server(config: MockServerConfig, *, host: str = "127.0.0.1", port: int = 0) -> MockLLMServer:
+    """
+    Start the mock server on a background thread and return it.
+
+    `port=0` picks a free port; read the endpoint from `server.url`.
+    Stop it with `server.shutdown()`.
+    """
+    server = MockLLMServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True)
+    thread.start()
+    return server
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Register the `MockServerConfig` options on `parser` (shared with the benchmark).
+    """
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed",
+                        help="Time-to-first-token distribution. Default: fixed")
+    parser.add_argument("--latency-ms", type=float, default=200.0,
+                        help="Mean time-to-first-token in milliseconds. Default: 200")
+    parser.add_argument("--latency-jitter", type=float, default=0.5,
+                        help="Uniform half-width (fraction of mean) or lognormal sigma. Default: 0.5")
+    parser.add_argument("--tps", type=float, default=0.0,
+                        help="Completion tokens per second per request (0: instant). Default: 0")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="Probability of answering HTTP 429. Default: 0")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="retry-after seconds on injected 429s. Default: 1")
+    parser.add_argument("--limit-requests", type=int, default=0,
+                        help="Reported x-ratelimit-limit-requests (0: omit). Default: 0")
+    parser.add_argument("--limit-tokens", type=int, default=0,
+                        help="Reported x-ratelimit-limit-tokens (0: omit). Default: 0")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed. Default: 0")
+
+
+def config_from_args(args: argparse.Namespace) -> MockServerConfig:
+    return MockServerConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter=args.latency_jitter,
+        tokens_per_second=args.tps,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        limit_requests=args.limit_requests,
+        limit_tokens=args.limit_tokens,
+        seed=args.seed,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve a local OpenAI-compatible mock of /v1/chat/completions with canned JSON answers."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address. Default: 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089, help="Port. Default: 8089")
+    add_server_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    server = MockLLMServer((args.host, args.port), config_from_args(args))
+    print(f"🧪 Mock LLM server listening on {server.url} (stats: GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 {server.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
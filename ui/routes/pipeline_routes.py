@@ -13,6 +13,11 @@ Notes
 -----
 Flask is the server. Our 'kbdebugger' code runs *inside* Flask
 in the background job thread.
+
+Each job thread labels its LLM calls with a request class
+(`kbdebugger.llm.scheduler`): full pipeline runs are BULK, triplet extraction
+for the qualities a reviewer selected is INTERACTIVE, so it is served first
+when both share the LLM quota.
 """
 import os
 from pathlib import Path
@@ -20,6 +25,8 @@ from threading import Thread
 
 from flask import Blueprint, jsonify, request
 
+from kbdebugger.llm.scheduler import RequestClass, llm_request_class
+from kbdebugger.llm.telemetry import llm_run
 from kbdebugger.pipeline.config import PipelineConfig
 
 from ui.services.job_store import JOB_STORE
@@ -99,7 +106,8 @@ def start_pipeline_run():
 
     def worker() -> None:
         try:
-            result = run_pipeline(job_id=job.job_id, file_path=path, keyword=keyword, cfg=cfg)
+            with llm_run(job.job_id), llm_request_class(RequestClass.BULK):
+                result = run_pipeline(job_id=job.job_id, file_path=path, keyword=keyword, cfg=cfg)
             JOB_STORE.set_done(job.job_id, result)
         except Exception as e:
             JOB_STORE.set_error(job.job_id, str(e))
@@ -199,10 +207,12 @@ def start_triplet_extraction():
             
             cfg = get_pipeline_config()
 
-            extracted = extract_triplets_batch(
-                qualities,
-                batch_size=cfg.triplet_extraction_batch_size,  # or just hardcode to 5 for now
-            )
+            # A reviewer is waiting on this one: it goes ahead of bulk runs.
+            with llm_run(job.job_id), llm_request_class(RequestClass.INTERACTIVE):
+                extracted = extract_triplets_batch(
+                    qualities,
+                    batch_size=cfg.triplet_extraction_batch_size,  # or just hardcode to 5 for now
+                )
 
             result = {
                 "extracted_triplets": extracted,
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import math
 
 """
 Pipeline runner for the UI.
@@ -21,11 +20,14 @@ from kbdebugger.extraction.api import extract_paragraphs_from_pdf
 
 from kbdebugger.keyword_extraction.api import filter_paragraphs_by_keyword
 
-from kbdebugger.extraction.api import decompose_paragraphs_to_qualities
+from kbdebugger.extraction.api import decompose_paragraphs_to_qualities, deduplicate_qualities
+from kbdebugger.extraction.decompose import plan_decompose_batches
+from kbdebugger.llm.model_access import streaming_enabled
+from kbdebugger.llm.micro_batcher import micro_batching_enabled
 # Optional next stages (enable when ready):
 from kbdebugger.graph.api import retrieve_keyword_subgraph
 from kbdebugger.subgraph_similarity.api import filter_qualities_by_subgraph_similarity
-from kbdebugger.novelty.comparator import classify_qualities_novelty
+from kbdebugger.novelty.comparator import classify_qualities_novelty, plan_novelty_batches
 
 from ui.services.job_store import JOB_STORE, JobProgressStage
 from ui.services.json_sanitize import to_jsonable
@@ -100,22 +102,35 @@ def run_pipeline(
     # Stage 2c: LLM Decomposer
     # ---------------------------
     # NOTE: total here depends on our decomposer loop granularity:
-    # - if progress reports batches: total = num_batches
-    # - if progress reports paragraphs: total = len(matched_docs)
-    num_batches = math.ceil(len(matched_docs) / 5) # TODO: change 5 if batch size changed!
+    # - if progress reports batches: total = num_batches (same plan as the decomposer)
+    # - if progress reports paragraphs (LLM_STREAMING, or LLM_MICRO_BATCHING where
+    #   batches are shared with other jobs): total = len(matched_docs)
+    if streaming_enabled() or micro_batching_enabled():
+        decomposer_total = len(matched_docs)
+    else:
+        decomposer_total = len(plan_decompose_batches(
+            [doc.page_content for doc in matched_docs],
+            batch_size=cfg.decomposer_batch_size,
+        ))
     init_stage(
         job_id=job_id,
         stage="DecomposerLLM",
         message=f"🧷 LLM Decomposer: Decomposing {len(matched_docs)} matched paragraphs into qualities..",
         current=0,
-        total=num_batches,
+        total=max(decomposer_total, 1),  # avoid total=0 in UI
     )
 
     qualities, decomposer_log = decompose_paragraphs_to_qualities(
         paragraphs=list(matched_docs),
+        batch_size=cfg.decomposer_batch_size,
+        max_concurrency=cfg.decomposer_max_concurrency,
+        batch_retries=cfg.decomposer_batch_retries,
         progress=make_job_progress_callback(job_id=job_id, stage="DecomposerLLM")
     )
 
+    # Drop exact / near-duplicate qualities (fast; reported with the decomposer stage)
+    qualities, dedup_log = deduplicate_qualities(qualities=qualities, cfg=cfg.quality_dedup)
+
     # ---------------------------------------------------------------------
     # Stage 3: Quality-to-Subgraph similarity filter (needs KG relations)
     # ---------------------------------------------------------------------
@@ -147,15 +162,20 @@ def run_pipeline(
     # ---------------------------------------------------------------------
     # Stage 4: Novelty decision (LLM comparator)
     # ---------------------------------------------------------------------
-    batch_size = 5  # TODO: move to cfg if you want (cfg.novelty_batch_size)
-    num_batches = math.ceil(len(kept) / batch_size) if kept else 0
+    # Batches are planned by token budget; size the bar from the same plan.
+    # Streamed or micro-batched (items of several jobs share batches): progress
+    # is per quality, like the decomposer above.
+    if streaming_enabled() or micro_batching_enabled():
+        novelty_total = len(kept)
+    else:
+        novelty_total = len(plan_novelty_batches(kept, max_tokens=cfg.novelty_llm_max_tokens))
 
     init_stage(
         job_id=job_id,
         stage="NoveltyLLM",
         message=f"🧑🏻‍⚖️ Novelty comparator: classifying {len(kept)} kept qualities...",
         current=0,
-        total=max(num_batches, 1),  # avoid total=0 in UI
+        total=max(novelty_total, 1),  # avoid total=0 in UI
     )
 
     _, novelty_log = classify_qualities_novelty(
@@ -163,7 +183,7 @@ def run_pipeline(
         max_tokens=cfg.novelty_llm_max_tokens,
         temperature=cfg.novelty_llm_temperature,
         use_batch=True,
-        batch_size=batch_size,
+        batch_size=None,
         pretty_print=False,
         progress=make_job_progress_callback(job_id=job_id, stage="NoveltyLLM"),
     )
@@ -173,6 +193,7 @@ def run_pipeline(
         "Docling": docling_log,
         "KeyBERT": keybert_log,
         "DecomposerLLM": decomposer_log,
+        "QualityDedup": dedup_log,
         "SubgraphSimilarity": subgraph_similarity_log,
         "NoveltyLLM": novelty_log,
     }
@@ -0,0 +1,56 @@
+"""
+Background synonym warm-up.
+
+Every pipeline run starts by asking the LLM for synonyms of the selected
+search keyword. The UI only offers the curated keywords
+(`search_keywords_service.load_search_keywords`), so their synonyms can be
+generated ahead of time: the answers land in the LLM response cache and the
+first run for each keyword skips that call.
+
+The warm-up runs in a daemon thread under the BACKGROUND request class
+(`kbdebugger.llm.scheduler`), so it only uses LLM capacity that interactive
+and bulk jobs leave free.
+
+Environment variables
+---------------------
+KB_SYNONYM_WARMUP:
+    Start the warm-up when the app is created. Default: "0"
+"""
+
+from __future__ import annotations
+
+import os
+from threading import Thread
+
+from kbdebugger.llm.scheduler import RequestClass, llm_request_class
+
+from .search_keywords_service import load_search_keywords
+
+
+def synonym_warmup_enabled() -> bool:
+    return os.getenv("KB_SYNONYM_WARMUP", "0").strip().lower() in {"1", "true", "yes"}
+
+
+def _warm_synonyms() -> None:
+    from kbdebugger.keyword_extraction.keyword_synonyms import generate_synonyms_for_keyword
+
+    keywords = load_search_keywords()
+    warmed = 0
+    with llm_request_class(RequestClass.BACKGROUND):
+        for keyword in keywords:
+            try:
+                generate_synonyms_for_keyword(keyword)
+                warmed += 1
+            except Exception as e:  # noqa: BLE001 (warm-up is best effort)
+                print(f"[WARN] Synonym warm-up failed for {keyword!r}: {e}", flush=True)
+    print(f">>> 🔥 Synonym warm-up done ({warmed}/{len(keywords)} keywords)", flush=True)
+
+
+def start_synonym_warmup() -> bool:
+    """
+    Start the warm-up thread if KB_SYNONYM_WARMUP is set. Returns whether it started.
+    """
+    if not synonym_warmup_enabled():
+        return False
+    Thread(target=_warm_synonyms, name="synonym-warmup", daemon=True).start()
+    return True
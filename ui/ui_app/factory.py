@@ -35,6 +35,11 @@ def create_app() -> Flask:
         load_dotenv(dotenv_path=env_path)
         print(">>> dotenv loaded", flush=True)
 
+    # Load every prompt template / few-shot examples file once, up front.
+    from kbdebugger.prompts.registry import get_prompt_registry
+    get_prompt_registry()
+    print(">>> prompts loaded", flush=True)
+
     app = Flask(
         __name__,
         template_folder="../templates",
@@ -46,4 +51,9 @@ def create_app() -> Flask:
     register_blueprints(app)
     print(">>> blueprints registered", flush=True)
 
+    # Optional: pre-generate synonyms of the curated keywords (KB_SYNONYM_WARMUP=1).
+    from ..services.synonym_warmup import start_synonym_warmup
+    if start_synonym_warmup():
+        print(">>> synonym warm-up started", flush=True)
+
     return app
\ No newline at end of file